@@ -91,6 +91,18 @@ def help_cmd(ctx, comando):
             'desc': 'Lista os modelos disponíveis na OpenAI para sua chave.',
             'exemplo': 'python -m cli.main listar_modelos'
         },
+        'indexar': {
+            'desc': 'Indexa trechos de texto (JSONL) para o /chat com contexto.',
+            'exemplo': 'python -m cli.main indexar trechos.jsonl --diretorio dados/indice'
+        },
+        'lote': {
+            'desc': 'Processa um JSONL de requisições em paralelo, com retomada e ETA.',
+            'exemplo': 'python -m cli.main lote prompts.jsonl respostas.jsonl --trabalhadores 16'
+        },
+        'cache': {
+            'desc': 'Inspeciona, poda ou limpa o cache persistente de respostas (SQLite).',
+            'exemplo': 'python -m cli.main cache info'
+        },
     }
     if not comando:
         click.echo("\nComandos disponíveis:")
@@ -169,15 +181,23 @@ def help_cmd(ctx, comando):
 @cli.command()
 @click.option("--message", required=True, help="A mensagem para enviar ao modelo.")
 @click.option("--model", default="gpt-3.5-turbo", help="O modelo OpenAI a ser usado.")
+@click.option("--temperature", type=float, default=None, help="Temperatura da resposta (com 0, a resposta pode vir do cache).")
+@click.option("--sem-cache", is_flag=True, help="Ignora o cache de respostas nesta chamada.")
 @click.pass_obj # Permite acessar o objeto passado pelo comando pai (ctx.obj)
-def chat(app_config: Config, message: str, model: str): # Adiciona 'app_config' como parâmetro
+def chat(app_config: Config, message: str, model: str, temperature: float, sem_cache: bool): # Adiciona 'app_config' como parâmetro
     """Envia uma mensagem para o modelo de chat da OpenAI."""
+    from src.client_registry import obter_cliente_compartilhado
     try:
-        # O ChatModule deve ser capaz de usar a chave API que já foi definida globalmente
-        # ou, idealmente, receber a app_config ou a chave diretamente.
-        chat_module = ChatModule() 
+        # O cliente compartilhado traz da Config o cache de respostas (OPENAI_CACHE_*), retries e limites
+        chat_module = ChatModule(cliente_http=obter_cliente_compartilhado())
         logger.info(f"Iniciando comando 'chat' com mensagem: '{message}' e modelo: '{model}'")
-        response = chat_module.criar_conversa(mensagens=[{"role": "user", "content": message}], modelo=model)
+        extras = {"temperature": temperature} if temperature is not None else {}
+        response = chat_module.criar_conversa(
+            mensagens=[{"role": "user", "content": message}],
+            modelo=model,
+            usar_cache=False if sem_cache else None,
+            **extras
+        )
         click.echo(formatar_resposta_chat(response))
         logger.info("Comando 'chat' executado com sucesso.")
     # Tratamento de exceções específicas da OpenAI
@@ -252,13 +272,20 @@ def enviar(app_config: Config, endpoint: str, dados: str):
 def interativo(app_config: Config, model: str):
     """Inicia um chat interativo com o modelo OpenAI."""
     from src.chat import ChatModule
+    from src.context_manager import ContextManager
     import json
     import datetime
     import colorama
     colorama.init(autoreset=True)
     click.echo(f"Modo interativo iniciado (modelo: {model}). Comandos: /sair, /limpar, /ajuda, /salvar, /carregar, /historico")
     chat_module = ChatModule()
-    contexto = []
+    resumidor = None
+    if app_config.OPENAI_CONTEXT_SUMMARY_ENABLED:
+        from src.summarizer import ResumidorConversa
+        resumidor = ResumidorConversa(cliente_http=chat_module.cliente_http, modelo=app_config.OPENAI_CONTEXT_SUMMARY_MODEL)
+    # O histórico enviado é limitado por tokens (e não por quantidade de mensagens): as mais antigas
+    # saem primeiro ou, com o resumo ativado, são trocadas por um resumo
+    contexto = ContextManager(max_length=None, max_tokens=app_config.OPENAI_CONTEXT_MAX_TOKENS, modelo=model, resumidor=resumidor)
     historico = []
     def print_ajuda():
         click.echo("\nComandos disponíveis:")
@@ -268,7 +295,6 @@ def interativo(app_config: Config, model: str):
         click.echo("  /salvar    - Salvar conversa atual em arquivo")
         click.echo("  /carregar  - Carregar conversa de arquivo")
         click.echo("  /historico - Exibir histórico desta sessão\n")
-    LIMITE_CONTEXTO = 10  # Enviar apenas as últimas 10 mensagens para o modelo
     while True:
         user_input = input("Você: ")
         if user_input.strip().startswith("/"):
@@ -277,21 +303,23 @@ def interativo(app_config: Config, model: str):
                 click.echo("Encerrando modo interativo.")
                 break
             elif comando == "/limpar":
-                contexto.clear()
+                contexto.limpar()
                 click.echo("Conversa limpa.")
             elif comando == "/ajuda":
                 print_ajuda()
             elif comando == "/salvar":
                 nome = f"conversa_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
                 with open(nome, "w", encoding="utf-8") as f:
-                    json.dump(contexto, f, ensure_ascii=False, indent=2)
+                    json.dump(contexto.get_contexto(), f, ensure_ascii=False, indent=2)
                 click.echo(f"Conversa salva em {nome}.")
             elif comando == "/carregar":
                 nome = input("Arquivo para carregar: ")
                 try:
                     with open(nome, "r", encoding="utf-8") as f:
-                        contexto.clear()
-                        contexto.extend(json.load(f))
+                        mensagens = json.load(f)
+                    contexto.limpar()
+                    for mensagem in mensagens:
+                        contexto.adicionar_mensagem(**mensagem)
                     click.echo(f"Conversa carregada de {nome}.")
                 except Exception as e:
                     click.echo(f"Erro ao carregar: {e}", err=True)
@@ -305,19 +333,30 @@ def interativo(app_config: Config, model: str):
             else:
                 click.echo("Comando não reconhecido. Use /ajuda para ver os comandos.")
             continue
-        contexto.append({"role": "user", "content": user_input})
-        # Limitar o contexto enviado para o modelo
-        contexto_envio = contexto[-LIMITE_CONTEXTO:]
-        click.echo(colorama.Fore.YELLOW + "Aguardando resposta..." + colorama.Style.RESET_ALL)
+        contexto.adicionar_mensagem("user", user_input)
+        click.echo(colorama.Fore.GREEN + "OpenAI:" + colorama.Style.RESET_ALL + " " + colorama.Style.DIM + "(Ctrl+C interrompe a resposta)" + colorama.Style.RESET_ALL)
+        # Os tokens são exibidos à medida que chegam; Ctrl+C cancela apenas a geração em andamento
+        partes = []
+        stream = None
         try:
-            resposta = chat_module.criar_conversa(mensagens=contexto_envio, modelo=model)
-            resposta_texto = resposta['choices'][0]['message']['content']
-            contexto.append({"role": "assistant", "content": resposta_texto})
-            historico.append(f"Você: {user_input}\nOpenAI: {resposta_texto}")
-            click.echo(colorama.Fore.GREEN + "OpenAI:" + colorama.Style.RESET_ALL)
-            click.echo(colorama.Fore.CYAN + resposta_texto + colorama.Style.RESET_ALL)
+            stream = chat_module.criar_conversa_stream(mensagens=contexto.get_contexto(), modelo=model)
+            for delta in stream:
+                partes.append(delta)
+                click.echo(colorama.Fore.CYAN + delta + colorama.Style.RESET_ALL, nl=False)
+            click.echo()
+        except KeyboardInterrupt:
+            if stream is not None:
+                stream.fechar()
+            click.echo()
+            click.echo(colorama.Fore.YELLOW + "[Geração interrompida]" + colorama.Style.RESET_ALL)
         except Exception as e:
+            click.echo()
             click.echo(f"Erro: {e}", err=True)
+        resposta_texto = "".join(partes)
+        if resposta_texto:
+            # Mesmo uma resposta parcial entra no contexto, para que a conversa continue coerente
+            contexto.adicionar_mensagem("assistant", resposta_texto)
+            historico.append(f"Você: {user_input}\nOpenAI: {resposta_texto}")
 
 
 # Comando para exibir configurações atuais
@@ -334,16 +373,13 @@ def config(app_config: Config):
 @click.pass_obj
 def test_connection(app_config: Config):
     """Testa se a chave da API está funcionando."""
-    import requests
+    from src.client_registry import obter_catalogo_modelos
     try:
-        response = requests.get(
-            "https://api.openai.com/v1/models",
-            headers={"Authorization": f"Bearer {app_config.OPENAI_API_KEY}"}
-        )
-        if response.status_code == 200:
-            click.echo(formatar_aviso("Conexão bem-sucedida! Sua chave está válida."))
-        else:
-            click.echo(formatar_erro(f"Falha na conexão. Código: {response.status_code} - {response.text}"), err=True)
+        # Sempre consulta a API (um teste de conexão não pode vir de memória), já deixando o catálogo atualizado
+        modelos, _ = obter_catalogo_modelos().atualizar()
+        click.echo(formatar_aviso(f"Conexão bem-sucedida! Sua chave está válida ({len(modelos)} modelos disponíveis)."))
+    except OpenAIClientError as e:
+        click.echo(formatar_erro(f"Falha na conexão: {e}"), err=True)
     except Exception as e:
         click.echo(formatar_erro(f"Erro ao testar conexão: {e}"), err=True)
 
@@ -352,22 +388,146 @@ def test_connection(app_config: Config):
 @click.pass_obj
 def listar_modelos(app_config: Config):
     """Lista os modelos disponíveis na OpenAI para sua chave."""
-    import requests
+    from src.client_registry import obter_catalogo_modelos
     try:
-        response = requests.get(
-            "https://api.openai.com/v1/models",
-            headers={"Authorization": f"Bearer {app_config.OPENAI_API_KEY}"}
-        )
-        if response.status_code == 200:
-            modelos = response.json().get("data", [])
-            click.echo(formatar_aviso("Modelos disponíveis:"))
-            for modelo in modelos:
-                click.echo(f"- {modelo.get('id')}")
-        else:
-            click.echo(formatar_erro(f"Erro ao listar modelos. Código: {response.status_code} - {response.text}"), err=True)
+        modelos = obter_catalogo_modelos().listar()
+        click.echo(formatar_aviso("Modelos disponíveis:"))
+        for modelo in modelos:
+            click.echo(f"- {modelo}")
     except Exception as e:
         click.echo(formatar_erro(f"Erro ao listar modelos: {e}"), err=True)
 
+# Comando para processar um lote de requisições a partir de um JSONL
+def _formatar_duracao(segundos: float) -> str:
+    if segundos is None:
+        return "--:--:--"
+    segundos = int(segundos)
+    return f"{segundos // 3600:02d}:{segundos % 3600 // 60:02d}:{segundos % 60:02d}"
+
+@cli.command()
+@click.argument('entrada', type=click.Path(exists=True, dir_okay=False))
+@click.argument('saida', type=click.Path(dir_okay=False))
+@click.option('--trabalhadores', default=8, show_default=True, help='Requisições simultâneas.')
+@click.option('--endpoint', default='chat/completions', show_default=True, help='Endpoint das linhas sem o campo "endpoint".')
+@click.option('--recomecar', is_flag=True, help='Ignora a saída existente em vez de retomar de onde parou.')
+@click.option('--intervalo', default=5.0, show_default=True, help='Segundos entre os relatórios de progresso.')
+@click.pass_obj
+def lote(app_config: Config, entrada: str, saida: str, trabalhadores: int, endpoint: str, recomecar: bool, intervalo: float):
+    """Envia cada linha do JSONL ENTRADA à API e grava as respostas em SAIDA (retomável)."""
+    from src.client_registry import obter_cliente_compartilhado
+    from src.lote import executar_lote
+
+    def relatar(resumo: dict):
+        total = f"/{resumo['total']}" if resumo['total'] is not None else ""
+        click.echo(
+            f"[lote] {resumo['concluidas']}{total} linhas ({resumo['vazao']:.1f}/s), "
+            f"{resumo['erros']} erros, decorrido {_formatar_duracao(resumo['decorrido'])}, "
+            f"ETA {_formatar_duracao(resumo['eta'])}",
+            err=True,
+        )
+
+    try:
+        resumo = executar_lote(
+            obter_cliente_compartilhado(), entrada, saida,
+            trabalhadores=trabalhadores, endpoint_padrao=endpoint,
+            retomar=not recomecar, ao_progredir=relatar, intervalo_progresso=intervalo,
+        )
+    except OpenAIClientError as e:
+        click.echo(formatar_erro(f"Lote interrompido: {e}"), err=True)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        click.echo(formatar_aviso(f"Lote interrompido. Execute o mesmo comando novamente para retomar de '{saida}'."), err=True)
+        sys.exit(130)
+    if resumo['puladas']:
+        click.echo(formatar_aviso(f"{resumo['puladas']} linhas já concluídas foram puladas."))
+    click.echo(formatar_aviso(f"Lote concluído: {resumo['concluidas']} linhas processadas, {resumo['erros']} com erro."))
+
+# Comando para indexar trechos de texto no índice de vetores (contexto do /chat)
+@cli.command()
+@click.argument('entrada', type=click.Path(exists=True, dir_okay=False))
+@click.option('--diretorio', default=None, help='Diretório do índice (padrão: OPENAI_VECTOR_STORE_PATH).')
+@click.option('--tamanho-lote', default=1000, show_default=True, help='Trechos convertidos em embeddings por vez.')
+@click.pass_obj
+def indexar(app_config: Config, entrada: str, diretorio: str, tamanho_lote: int):
+    """Acrescenta ao índice de vetores os trechos do JSONL ENTRADA (um {"texto": ...} por linha)."""
+    import json
+    from src.client_registry import obter_cliente_compartilhado
+    from src.embeddings import EmbeddingsModule
+    from src.vector_store import ArmazemVetores
+
+    diretorio = diretorio or app_config.OPENAI_VECTOR_STORE_PATH
+    if not diretorio:
+        click.echo(formatar_erro("Informe --diretorio ou configure OPENAI_VECTOR_STORE_PATH."), err=True)
+        sys.exit(1)
+    embeddings = EmbeddingsModule(cliente_http=obter_cliente_compartilhado())
+    armazem = None
+    total = 0
+
+    def gravar(itens: list):
+        nonlocal armazem, total
+        vetores = embeddings.gerar_embeddings([i["texto"] for i in itens], modelo=app_config.OPENAI_EMBEDDINGS_MODEL)
+        if armazem is None:
+            armazem = ArmazemVetores(diretorio, dimensao=vetores.shape[1])
+        armazem.adicionar(vetores, itens)
+        total += len(itens)
+        click.echo(f"[indexar] {total} trechos indexados.", err=True)
+
+    try:
+        pendentes = []
+        with open(entrada, encoding="utf-8") as arquivo:
+            for linha in arquivo:
+                if linha.strip():
+                    pendentes.append(json.loads(linha))
+                if len(pendentes) >= tamanho_lote:
+                    gravar(pendentes)
+                    pendentes = []
+        if pendentes:
+            gravar(pendentes)
+    except (OpenAIClientError, ValueError, KeyError) as e:
+        click.echo(formatar_erro(f"Erro ao indexar (após {total} trechos): {e}"), err=True)
+        sys.exit(1)
+    click.echo(formatar_aviso(f"Índice '{diretorio}' com {len(armazem) if armazem else 0} vetores."))
+
+# Comandos para o cache persistente de respostas
+@cli.group()
+@click.option('--arquivo', default=None, help='Arquivo SQLite do cache (padrão: OPENAI_CACHE_DB_PATH).')
+@click.pass_context
+def cache(ctx, arquivo: str):
+    """Inspeciona, poda ou limpa o cache persistente de respostas."""
+    from src.cache import CacheRespostasSQLite
+    app_config = ctx.obj
+    ctx.obj = CacheRespostasSQLite(
+        arquivo or app_config.OPENAI_CACHE_DB_PATH or None,
+        max_bytes=app_config.OPENAI_CACHE_MAX_BYTES,
+        ttl=app_config.OPENAI_CACHE_TTL,
+    )
+
+@cache.command('info')
+@click.pass_obj
+def cache_info(cache_respostas):
+    """Exibe quantidade de respostas, tamanho e reaproveitamento do cache."""
+    estatisticas = cache_respostas.estatisticas()
+    click.echo(formatar_aviso(f"Cache: {cache_respostas.caminho}"))
+    click.echo(f"Respostas guardadas: {estatisticas['itens']}")
+    click.echo(f"Tamanho das respostas: {estatisticas['bytes'] / 1024:.1f} KB (limite: {cache_respostas.max_bytes / 1024 / 1024:.0f} MB)")
+    click.echo(f"Tamanho do arquivo: {estatisticas['arquivo_bytes'] / 1024:.1f} KB")
+    click.echo(f"Acertos acumulados: {estatisticas['acessos_totais']}")
+
+@cache.command('podar')
+@click.pass_obj
+def cache_podar(cache_respostas):
+    """Remove respostas expiradas e aplica o limite de tamanho."""
+    removidas = cache_respostas.podar()
+    click.echo(formatar_aviso(f"Removidas {removidas['expiradas']} respostas expiradas e {removidas['por_tamanho']} por limite de tamanho."))
+
+@cache.command('limpar')
+@click.confirmation_option(prompt='Remover todas as respostas do cache?')
+@click.pass_obj
+def cache_limpar(cache_respostas):
+    """Remove todas as respostas do cache."""
+    cache_respostas.limpar()
+    click.echo(formatar_aviso("Cache limpo."))
+
 if __name__ == "__main__":
     cli()
 
@@ -376,10 +536,11 @@ if __name__ == "__main__":
 # Este arquivo define a CLI principal do projeto OpenAI Integration Hub.
 # Funções principais:
 # - Permite interagir com a API da OpenAI via linha de comando, sem depender do frontend.
-# - Usa Click para criar comandos como: chat, obter, enviar, interativo, config, test_connection, listar_modelos, help.
+# - Usa Click para criar comandos como: chat, obter, enviar, interativo, config, test_connection, listar_modelos, lote, indexar, cache, help.
 # - Carrega e valida configurações (chave da OpenAI, variáveis de ambiente) automaticamente.
 # - Implementa tratamento robusto de erros, logs detalhados e mensagens amigáveis para o usuário.
 # - O modo interativo permite conversar com o modelo em tempo real, salvar e carregar conversas, e visualizar histórico.
+#   As respostas são exibidas token a token (streaming) e Ctrl+C interrompe apenas a geração em andamento.
 # - Todos os comandos são documentados e podem ser acessados com --help ou pelo comando help.
 # - O arquivo serve como ponto de entrada para automação, testes e uso avançado do backend sem interface gráfica.
 #
@@ -0,0 +1,403 @@
+import asyncio
+import json
+import time
+import logging
+from collections import deque
+
+import httpx
+
+from src.exceptions import (
+    OpenAIServerError,
+    OpenAIClientError,
+    OpenAITimeoutError,
+    OpenAIConnectionError,
+    OpenAIRateLimitError,
+    OpenAIRetryError,
+    OpenAICircuitOpenError,
+)
+from src.config import Config
+from src.http_client import tratar_erro_resposta
+from src.streaming import iterar_eventos_sse_async
+from src.retry import CicloRetry, OrcamentoRetry
+from src.cache import CacheRespostas, CacheRespostasSQLite, chave_payload, eh_deterministico
+from src.circuit_breaker import RegistroDisjuntores
+from src.singleflight import GrupoChamadasAsync
+from src.rate_limiter import (
+    BackendLimitadorMemoria,
+    BaldeTokens,
+    LimitadorPorModelo,
+    LimitesServidor,
+    Reserva,
+    estimar_tokens_payload,
+    ler_cabecalhos_rate_limit,
+    namespace_chave_api,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _erro_mapeado(resposta: httpx.Response) -> OpenAIClientError:
+    """Devolve (sem levantar) a exceção customizada correspondente a uma resposta de erro."""
+    try:
+        tratar_erro_resposta(resposta)
+    except OpenAIClientError as erro:
+        return erro
+
+
+class ClienteHttpOpenAIAsync:
+    """
+    Versão assíncrona do ClienteHttpOpenAI, construída sobre `httpx.AsyncClient`.
+    Mantém a mesma interface (`obter`/`enviar`), a mesma política de retry/backoff,
+    o mesmo mapeamento de exceções e as mesmas métricas do cliente síncrono,
+    permitindo que rotas `async def` aguardem a OpenAI sem ocupar uma thread.
+    """
+
+    def __init__(self, max_tentativas: int = 2, fator_backoff: float = 0.01, tempo_limite: int = 10, max_requisicoes_por_segundo: float = 3.0, tamanho_pool: int = 10, tempo_keepalive: float = 30.0, limitador_modelos: LimitadorPorModelo = None, transporte: httpx.AsyncBaseTransport = None, backend_limitador=None, orcamento_retry: OrcamentoRetry = None, tempo_maximo_retries: float = 30.0, teto_backoff: float = 20.0, disjuntores: RegistroDisjuntores = None, cache: CacheRespostas = None, agrupar_chamadas: bool = True):
+        """
+        Inicializa o cliente HTTP assíncrono para OpenAI.
+        Args:
+            max_tentativas (int): Número máximo de tentativas de retry para erros temporários (default: 2).
+            fator_backoff (float): Fator inicial para cálculo do backoff exponencial em segundos (default: 0.01).
+            tempo_limite (int): Timeout em segundos para cada requisição (default: 10).
+            max_requisicoes_por_segundo (float): Limite de requisições por segundo (rate limit local, default: 3.0).
+            tamanho_pool (int): Máximo de conexões simultâneas/keep-alive no pool (default: 10).
+            tempo_keepalive (float): Segundos que uma conexão ociosa permanece no pool (default: 30.0).
+            limitador_modelos (LimitadorPorModelo): Limitador RPM/TPM por modelo, opcional (pode ser compartilhado).
+            transporte (httpx.AsyncBaseTransport): Transporte httpx opcional (útil para testes).
+            backend_limitador: Backend compartilhado para o limite por segundo (ex: SQLite). Padrão: estado local.
+            orcamento_retry (OrcamentoRetry): Orçamento de retries compartilhado pelas requisições (default: 10% do tráfego).
+            tempo_maximo_retries (float): Tempo máximo, em segundos, de uma requisição somando todas as tentativas (default: 30.0).
+            teto_backoff (float): Maior espera entre tentativas, em segundos (default: 20.0).
+            disjuntores (RegistroDisjuntores): Circuit breakers por endpoint e modelo (default: 5 falhas abrem por 30s).
+            cache (CacheRespostas): Cache de respostas de `enviar`, opcional (pode ser compartilhado).
+            agrupar_chamadas (bool): Se True, chamadas idênticas simultâneas (GETs e POSTs determinísticos)
+                compartilham uma única requisição à API (default: True).
+        """
+        self.configuracao = Config.get_instance()
+        self.chave_api = self.configuracao.OPENAI_API_KEY
+        self.url_base = "https://api.openai.com/v1"
+        self.tempo_limite = tempo_limite
+        self.max_tentativas = max_tentativas
+        self.fator_backoff = fator_backoff
+        self.teto_backoff = teto_backoff
+        self.tempo_maximo_retries = tempo_maximo_retries
+        self.orcamento_retry = orcamento_retry or OrcamentoRetry()
+        self.disjuntores = disjuntores or RegistroDisjuntores()
+        self.cache = cache
+        self._cache_bloqueante = isinstance(cache, CacheRespostasSQLite)
+        self.agrupador = GrupoChamadasAsync() if agrupar_chamadas else None
+        self.sessao = httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {self.chave_api}"},
+            timeout=tempo_limite,
+            limits=httpx.Limits(max_connections=tamanho_pool, max_keepalive_connections=tamanho_pool, keepalive_expiry=tempo_keepalive),
+            transport=transporte,
+        )
+
+        # --- Rate Limiter (Token Bucket) ---
+        self.max_requisicoes_por_segundo = max_requisicoes_por_segundo
+        self._tokens = self.max_requisicoes_por_segundo
+        self._ultimo_token = time.time()
+        self._trava_rate_limiter = asyncio.Lock()
+        self._balde_compartilhado = None
+        if backend_limitador is not None:
+            self._balde_compartilhado = BaldeTokens(
+                self.max_requisicoes_por_segundo, self.max_requisicoes_por_segundo,
+                backend_limitador, f"{namespace_chave_api(self.chave_api)}requisicoes_por_segundo",
+            )
+        self.limitador_modelos = limitador_modelos
+        # Backends compartilhados (SQLite) fazem E/S e podem esperar pelo lock do arquivo: rodam fora do event loop
+        self._limitador_bloqueante = limitador_modelos is not None and not isinstance(limitador_modelos.backend, BackendLimitadorMemoria)
+
+        # --- Métricas de uso ---
+        self.metricas = {
+            'total_requisicoes': 0,
+            'requisicoes_sucesso': 0,
+            'requisicoes_falha': 0,
+            'tempo_total': 0.0,
+            'ultimos_status': deque(maxlen=100),
+        }
+
+    async def obter(self, ponto_final: str, params: dict = None) -> dict:
+        """
+        Realiza uma requisição GET assíncrona para o endpoint especificado.
+        Args:
+            ponto_final (str): Endpoint da API (ex: 'models').
+            params (dict): Parâmetros de consulta opcionais.
+        Returns:
+            dict: Resposta da API em formato JSON.
+        """
+        if self.agrupador is None:
+            return await self._realizar_requisicao("GET", ponto_final, params=params)
+        return await self.agrupador.executar(
+            chave_payload(f"GET {ponto_final}", params or {}),
+            lambda: self._realizar_requisicao("GET", ponto_final, params=params),
+        )
+
+    async def enviar(self, ponto_final: str, dados: dict = None, usar_cache: bool = None) -> dict:
+        """
+        Realiza uma requisição POST assíncrona para o endpoint especificado.
+        Args:
+            ponto_final (str): Endpoint da API (ex: 'chat/completions').
+            dados (dict): Dados para envio no corpo da requisição.
+            usar_cache (bool): True força o uso do cache, False o ignora; None (padrão) usa o cache
+                apenas em chamadas determinísticas (temperature 0). Sem efeito se o cliente não tem cache.
+        Returns:
+            dict: Resposta da API em formato JSON.
+        """
+        chave = self._chave_reaproveitavel(ponto_final, dados, usar_cache)
+        if chave is not None and self.cache is not None:
+            em_cache = await self._fora_do_loop(self._cache_bloqueante, self.cache.obter, chave)
+            if em_cache is not None:
+                return em_cache
+        if chave is not None and self.agrupador is not None:
+            # Chamadas idênticas simultâneas esperam a primeira em vez de irem à API
+            return await self.agrupador.executar(chave, lambda: self._enviar_post(ponto_final, dados, chave))
+        return await self._enviar_post(ponto_final, dados, chave)
+
+    async def _enviar_post(self, ponto_final: str, dados: dict, chave_cache: str = None) -> dict:
+        headers = {"Content-Type": "application/json"}
+        reserva = await self._reservar_limite_modelo(dados)
+        resultado = await self._realizar_requisicao("POST", ponto_final, json=dados, headers=headers)
+        await self._conciliar_limite_modelo(reserva, (resultado or {}).get("usage"))
+        if chave_cache is not None and self.cache is not None and isinstance(resultado, dict):
+            await self._fora_do_loop(self._cache_bloqueante, self.cache.guardar, chave_cache, resultado)
+        return resultado
+
+    def _chave_reaproveitavel(self, ponto_final: str, dados: dict, usar_cache: bool):
+        """
+        Chave da chamada para cache e agrupamento, ou None quando a resposta não pode ser reaproveitada
+        (chamadas não determinísticas, a menos que `usar_cache=True`, ou `usar_cache=False`).
+        """
+        if usar_cache is False:
+            return None
+        if usar_cache or eh_deterministico(dados):
+            return chave_payload(ponto_final, dados)
+        return None
+
+    async def enviar_stream(self, ponto_final: str, dados: dict = None):
+        """
+        Realiza uma requisição POST com `stream: true` e devolve os chunks à medida que chegam.
+        Os retries valem até o recebimento dos cabeçalhos da resposta.
+        Args:
+            ponto_final (str): Endpoint da API (ex: 'chat/completions').
+            dados (dict): Dados para envio no corpo da requisição.
+        Returns:
+            AsyncIterator[dict]: Gerador assíncrono com os chunks JSON do stream.
+        """
+        dados = dict(dados or {})
+        dados["stream"] = True
+        headers = {"Content-Type": "application/json", "Accept": "text/event-stream"}
+        reserva = await self._reservar_limite_modelo(dados)
+        resposta = await self._realizar_requisicao("POST", ponto_final, stream=True, json=dados, headers=headers)
+        return self._iterar_stream(resposta, reserva)
+
+    async def _iterar_stream(self, resposta: httpx.Response, reserva: Reserva = None):
+        usage = None
+        try:
+            async for chunk in iterar_eventos_sse_async(resposta.aiter_lines()):
+                usage = chunk.get("usage") or usage
+                yield chunk
+        except httpx.HTTPError as e:
+            raise OpenAIConnectionError("Stream interrompido durante a leitura da resposta da API OpenAI.", original_exception=e)
+        finally:
+            await resposta.aclose()
+            await self._conciliar_limite_modelo(reserva, usage)
+
+    async def _reservar_limite_modelo(self, dados: dict):
+        """Cobra a chamada no limitador RPM/TPM do modelo (se configurado), aguardando sem bloquear o loop."""
+        if self.limitador_modelos is None or not dados or not dados.get("model"):
+            return None
+        reserva = await self._fora_do_loop(self._limitador_bloqueante, self.limitador_modelos.reservar, dados["model"], estimar_tokens_payload(dados))
+        if reserva.espera > 0:
+            logger.info(f"Limite RPM/TPM de '{reserva.modelo}' atingido. Aguardando {reserva.espera:.2f}s...")
+            await asyncio.sleep(reserva.espera)
+        return reserva
+
+    async def _conciliar_limite_modelo(self, reserva: Reserva, usage: dict):
+        """Concilia a reserva com o consumo real informado em `usage` pela API."""
+        if reserva is not None and usage:
+            await self._fora_do_loop(self._limitador_bloqueante, self.limitador_modelos.reconciliar, reserva, usage.get("total_tokens"))
+
+    async def _aplicar_cabecalhos_rate_limit(self, resposta: httpx.Response, modelo: str) -> LimitesServidor:
+        """Lê Retry-After e x-ratelimit-* da resposta e repassa ao limitador do modelo."""
+        limites = ler_cabecalhos_rate_limit(resposta.headers)
+        if self.limitador_modelos is not None and modelo:
+            await self._fora_do_loop(self._limitador_bloqueante, self.limitador_modelos.sincronizar, modelo, limites)
+        return limites
+
+    @staticmethod
+    async def _fora_do_loop(bloqueante: bool, funcao, *args):
+        """Executa `funcao` em uma thread quando ela pode bloquear (limitador ou cache em SQLite), sem travar as demais corrotinas."""
+        if bloqueante:
+            return await asyncio.to_thread(funcao, *args)
+        return funcao(*args)
+
+    def get_metricas(self):
+        """Retorna as métricas de uso do cliente HTTP."""
+        metricas = self.metricas.copy()
+        metricas['ultimos_status'] = list(self.metricas['ultimos_status'])
+        if self.limitador_modelos is not None:
+            metricas['limites_modelos'] = self.limitador_modelos.estado()
+        metricas['orcamento_retry'] = self.orcamento_retry.estado()
+        metricas['circuitos'] = self.disjuntores.estado()
+        if self.cache is not None:
+            metricas['cache'] = self.cache.estatisticas()
+        if self.agrupador is not None:
+            metricas['chamadas_agrupadas'] = self.agrupador.estatisticas()
+        return metricas
+
+    async def fechar(self):
+        """Fecha o pool de conexões do cliente."""
+        await self.sessao.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.fechar()
+
+    async def _rate_limiter(self):
+        """
+        Rate limiter (token bucket) assíncrono: permite até N requisições por segundo.
+        Se não houver tokens disponíveis, aguarda sem bloquear o event loop.
+        Como no cliente síncrono, o token é reservado sob a trava (o saldo pode ficar negativo)
+        e a espera acontece fora dela, então as corrotinas aguardam em paralelo, cada uma pela sua vez.
+        Com um backend compartilhado, o mesmo balde vale para todos os processos do host.
+        """
+        if self._balde_compartilhado is not None:
+            tempo_espera = await asyncio.to_thread(self._balde_compartilhado.reservar, 1)
+            if tempo_espera > 0:
+                logger.info(f"Rate limit compartilhado atingido. Aguardando {tempo_espera:.2f}s para próxima requisição...")
+                await asyncio.sleep(tempo_espera)
+            return
+        async with self._trava_rate_limiter:
+            agora = time.time()
+            tokens_para_adicionar = (agora - self._ultimo_token) * self.max_requisicoes_por_segundo
+            if tokens_para_adicionar > 0:
+                self._tokens = min(self.max_requisicoes_por_segundo, self._tokens + tokens_para_adicionar)
+                self._ultimo_token = agora
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return
+            tempo_espera = -self._tokens / self.max_requisicoes_por_segundo
+        logger.info(f"Rate limit atingido. Aguardando {tempo_espera:.2f}s para próxima requisição...")
+        await asyncio.sleep(tempo_espera)
+
+    def _registrar_metrica(self, sucesso: bool, inicio: float, status):
+        self.metricas['total_requisicoes'] += 1
+        self.metricas['requisicoes_sucesso' if sucesso else 'requisicoes_falha'] += 1
+        self.metricas['tempo_total'] += time.time() - inicio
+        self.metricas['ultimos_status'].append(status)
+
+    async def _realizar_requisicao(self, metodo: str, ponto_final: str, stream: bool = False, **kwargs) -> dict:
+        url_completa = f"{self.url_base}/{ponto_final}"
+        kwargs.setdefault('timeout', self.tempo_limite)
+        modelo = (kwargs.get('json') or {}).get('model')
+        self.orcamento_retry.registrar_requisicao()
+        ciclo = CicloRetry(self.fator_backoff, self.teto_backoff, self.tempo_maximo_retries, self.orcamento_retry)
+        chave_circuito = RegistroDisjuntores.chave(ponto_final, modelo)
+        last_caught_custom_exception = None
+        for tentativa in range(self.max_tentativas + 1):
+            try:
+                self.disjuntores.verificar(chave_circuito)
+            except OpenAICircuitOpenError:
+                self._registrar_metrica(False, time.time(), 'circuito_aberto')
+                raise
+            await self._rate_limiter()
+            inicio = time.time()
+            ultima_tentativa = tentativa == self.max_tentativas
+            last_caught_custom_exception = None
+            try:
+                if stream:
+                    requisicao = self.sessao.build_request(metodo, url_completa, **kwargs)
+                    resposta = await self.sessao.send(requisicao, stream=True)
+                else:
+                    resposta = await self.sessao.request(metodo, url_completa, **kwargs)
+            except httpx.TimeoutException as e:
+                self.disjuntores.registrar(chave_circuito, False)
+                last_caught_custom_exception = OpenAITimeoutError("Tempo limite excedido na conexão com a API OpenAI.", original_exception=e)
+                logger.warning(f"Tentativa {tentativa + 1}/{self.max_tentativas + 1}: Tempo limite. Re-tentando...")
+            except httpx.TransportError as e:
+                self.disjuntores.registrar(chave_circuito, False)
+                last_caught_custom_exception = OpenAIConnectionError(f"Erro de conexão para {url_completa}", original_exception=e)
+                logger.warning(f"Tentativa {tentativa + 1}/{self.max_tentativas + 1}: Erro de conexão. Re-tentando...")
+            except httpx.HTTPError as e:
+                self.disjuntores.registrar(chave_circuito, False)
+                last_caught_custom_exception = OpenAIClientError(f"Erro de requisição inesperado para {url_completa}", original_exception=e)
+                logger.warning(f"Tentativa {tentativa + 1}/{self.max_tentativas + 1}: Erro de requisição inesperado. Re-tentando...")
+            else:
+                status = resposta.status_code
+                self.disjuntores.registrar(chave_circuito, status < 500)
+                limites = await self._aplicar_cabecalhos_rate_limit(resposta, modelo)
+                if stream and status < 400:
+                    # Em streaming o corpo é consumido pelo chamador; a requisição conta como sucesso ao receber os cabeçalhos
+                    self._registrar_metrica(True, inicio, status)
+                    return resposta
+                if stream:
+                    await resposta.aread()
+                    await resposta.aclose()
+                if status < 400:
+                    try:
+                        resultado = resposta.json()
+                    except json.JSONDecodeError:
+                        resultado = {"mensagem": "Requisição bem-sucedida, mas resposta não é JSON", "resposta_bruta": resposta.text}
+                    self._registrar_metrica(True, inicio, status)
+                    return resultado
+                # 429 e 5xx são retentáveis; o erro mapeado só é levantado na última tentativa
+                if (status == 429 or status >= 500) and not ultima_tentativa:
+                    logger.warning(f"Tentativa {tentativa + 1}/{self.max_tentativas + 1}: Erro HTTP {status}. Re-tentando...")
+                    await self._aguardar_backoff(ciclo, url_completa, inicio, status, lambda: _erro_mapeado(resposta), limites.retry_after)
+                    continue
+                self._registrar_metrica(False, inicio, status)
+                tratar_erro_resposta(resposta)
+
+            if not ultima_tentativa:
+                if isinstance(last_caught_custom_exception, (OpenAIRateLimitError, OpenAIServerError, OpenAITimeoutError, OpenAIConnectionError)):
+                    await self._aguardar_backoff(ciclo, url_completa, inicio, 'erro', lambda: last_caught_custom_exception)
+                continue
+
+            # Esgotou as tentativas para erros de rede
+            self._registrar_metrica(False, inicio, 'erro')
+            if self.max_tentativas == 0 or not isinstance(last_caught_custom_exception, (OpenAITimeoutError, OpenAIConnectionError)):
+                raise last_caught_custom_exception
+            raise OpenAIRetryError(
+                f"Máximo de retries ({self.max_tentativas}) excedido para {url_completa}",
+                original_exception=last_caught_custom_exception
+            )
+        raise OpenAIClientError("Erro desconhecido: A requisição falhou sem exceção capturada e sem retorno de dados.")
+
+    async def _aguardar_backoff(self, ciclo: CicloRetry, url_completa: str, inicio: float, status, obter_erro, espera_servidor: float = None):
+        """
+        Aguarda o backoff com jitter (ou o Retry-After da API) antes da próxima tentativa.
+        Se o orçamento de retries ou o tempo máximo estiverem esgotados, desiste com OpenAIRetryError.
+        """
+        tempo_espera = ciclo.proxima_espera(espera_servidor)
+        if tempo_espera is None:
+            self._registrar_metrica(False, inicio, status)
+            raise OpenAIRetryError(f"Retries interrompidos para {url_completa}: {ciclo.motivo}", original_exception=obter_erro())
+        logger.info(f"Aguardando {tempo_espera:.2f} segundos antes da próxima tentativa...")
+        await asyncio.sleep(tempo_espera)
+
+# -----------------------------------------------------------------------------
+#
+# Este módulo implementa o ClienteHttpOpenAIAsync, a versão assíncrona do
+# ClienteHttpOpenAI baseada em httpx.AsyncClient. Ele é pensado para rotas
+# `async def` do FastAPI, onde um único worker pode manter centenas de chamadas
+# à OpenAI em andamento sem ocupar uma thread por requisição.
+#
+# Principais pontos:
+# - Mesma interface do cliente síncrono: `await obter(...)` e `await enviar(...)`.
+# - Mesmos retries com backoff exponencial para 429, 5xx, timeout e conexão,
+#   respeitando Retry-After e sincronizando o limitador com x-ratelimit-*.
+# - Mesma política de retry: jitter, orçamento compartilhado e tempo máximo.
+# - Mesmo circuit breaker por endpoint e modelo (OpenAICircuitOpenError).
+# - Mesmo cache opcional de respostas em enviar().
+# - Mesmo mapeamento de erros (reutiliza tratar_erro_resposta de http_client).
+# - Rate limiter local (token bucket) protegido por asyncio.Lock.
+# - Mesmas métricas de uso, acessíveis via get_metricas().
+#
+# Uso típico:
+#   async with ClienteHttpOpenAIAsync() as cliente:
+#       resposta = await cliente.enviar('chat/completions', dados)
+#
+# -----------------------------------------------------------------------------
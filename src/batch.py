@@ -0,0 +1,276 @@
+import io
+import json
+import os
+import time
+import uuid
+import logging
+
+from src.exceptions import OpenAIAPIError, OpenAITimeoutError, OpenAIValidationError
+from src.http_client import ClienteHttpOpenAI
+
+logger = logging.getLogger(__name__)
+
+# Limite da Batch API por arquivo de entrada
+MAX_REQUISICOES_POR_ARQUIVO = 50000
+STATUS_FINAIS = ("completed", "failed", "expired", "cancelled")
+
+
+def escrever_entrada_lote(requisicoes, caminho: str, endpoint: str = "/v1/chat/completions") -> int:
+    """
+    Grava o JSONL de entrada da Batch API, uma requisição por linha, sem montar o arquivo na memória.
+    Args:
+        requisicoes: Iterável de pares (custom_id, payload), com payloads no formato usado pelo
+            ChatModule (ex: {"model": ..., "messages": [...]}).
+        caminho (str): Arquivo JSONL a ser gravado.
+        endpoint (str): Endpoint de todas as linhas (default: '/v1/chat/completions').
+    Returns:
+        int: Quantidade de requisições gravadas.
+    Raises:
+        OpenAIValidationError: Se um custom_id se repetir ou o limite por arquivo for ultrapassado.
+    """
+    vistos = set()
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        for custom_id, payload in requisicoes:
+            custom_id = str(custom_id)
+            if custom_id in vistos:
+                raise OpenAIValidationError(f"custom_id repetido no lote: '{custom_id}'.", field="custom_id", value=custom_id)
+            if len(vistos) >= MAX_REQUISICOES_POR_ARQUIVO:
+                raise OpenAIValidationError(f"Um lote aceita no máximo {MAX_REQUISICOES_POR_ARQUIVO} requisições por arquivo.", field="requisicoes")
+            vistos.add(custom_id)
+            linha = {"custom_id": custom_id, "method": "POST", "url": endpoint, "body": payload}
+            arquivo.write(json.dumps(linha, ensure_ascii=False) + "\n")
+    return len(vistos)
+
+
+class CorpoMultipart:
+    """
+    Corpo multipart/form-data lido sob demanda: o arquivo é enviado em blocos, direto do disco.
+    Tem tamanho conhecido (Content-Length) e pode ser rebobinado para um retry.
+    """
+
+    def __init__(self, caminho: str, campos: dict, nome_campo_arquivo: str = "file", tipo_arquivo: str = "application/jsonl"):
+        fronteira = uuid.uuid4().hex
+        self.tipo_conteudo = f"multipart/form-data; boundary={fronteira}"
+        preambulo = "".join(
+            f'--{fronteira}\r\nContent-Disposition: form-data; name="{nome}"\r\n\r\n{valor}\r\n'
+            for nome, valor in campos.items()
+        )
+        preambulo += (
+            f'--{fronteira}\r\nContent-Disposition: form-data; name="{nome_campo_arquivo}"; '
+            f'filename="{os.path.basename(caminho)}"\r\nContent-Type: {tipo_arquivo}\r\n\r\n'
+        )
+        epilogo = f"\r\n--{fronteira}--\r\n".encode("utf-8")
+        self._arquivo = open(caminho, "rb")
+        self._partes = [io.BytesIO(preambulo.encode("utf-8")), self._arquivo, io.BytesIO(epilogo)]
+        self._tamanho = len(preambulo.encode("utf-8")) + os.path.getsize(caminho) + len(epilogo)
+        self._atual = 0
+
+    def __len__(self) -> int:
+        return self._tamanho
+
+    def read(self, tamanho: int = -1) -> bytes:
+        blocos = []
+        while self._atual < len(self._partes) and tamanho != 0:
+            bloco = self._partes[self._atual].read(tamanho)
+            if not bloco:
+                self._atual += 1
+                continue
+            blocos.append(bloco)
+            if tamanho > 0:
+                tamanho -= len(bloco)
+        return b"".join(blocos)
+
+    def seek(self, posicao: int, de_onde: int = 0):
+        if posicao != 0 or de_onde != 0:
+            raise io.UnsupportedOperation("CorpoMultipart só pode ser rebobinado para o início.")
+        for parte in self._partes:
+            parte.seek(0)
+        self._atual = 0
+
+    def close(self):
+        self._arquivo.close()
+
+
+def _indexar_resultados(caminhos: list) -> dict:
+    """Mapeia custom_id -> (índice do arquivo, posição da linha), guardando só as posições."""
+    indice = {}
+    for i, caminho in enumerate(caminhos):
+        with open(caminho, "rb") as arquivo:
+            posicao = arquivo.tell()
+            for linha in iter(arquivo.readline, b""):
+                if linha.strip():
+                    indice[json.loads(linha)["custom_id"]] = (i, posicao)
+                posicao = arquivo.tell()
+    return indice
+
+
+def juntar_resultados(caminho_entrada: str, *caminhos_resultado: str):
+    """
+    Associa cada requisição do JSONL de entrada ao seu resultado, na ordem da entrada.
+    Os arquivos de resultado (saída e erros do lote) são indexados por posição e lidos sob
+    demanda, de modo que nenhum dos arquivos é carregado inteiro na memória.
+    Args:
+        caminho_entrada (str): JSONL de entrada (gerado por escrever_entrada_lote).
+        *caminhos_resultado (str): JSONLs de saída e de erros baixados do lote (os ausentes podem ser None).
+    Returns:
+        Iterator[dict]: {"custom_id", "requisicao", "status_code", "resposta", "erro"} por linha de entrada;
+            requisições sem resultado (ex: lote expirado) vêm com status_code None e erro "sem resultado".
+    """
+    caminhos = [c for c in caminhos_resultado if c]
+    indice = _indexar_resultados(caminhos)
+    arquivos = [open(c, "rb") for c in caminhos]
+    try:
+        with open(caminho_entrada, encoding="utf-8") as entrada:
+            for linha in entrada:
+                if not linha.strip():
+                    continue
+                requisicao = json.loads(linha)
+                custom_id = requisicao["custom_id"]
+                registro = {"custom_id": custom_id, "requisicao": requisicao.get("body"), "status_code": None, "resposta": None, "erro": "sem resultado"}
+                localizacao = indice.get(custom_id)
+                if localizacao is not None:
+                    arquivo = arquivos[localizacao[0]]
+                    arquivo.seek(localizacao[1])
+                    resultado = json.loads(arquivo.readline())
+                    resposta = resultado.get("response") or {}
+                    registro["status_code"] = resposta.get("status_code")
+                    registro["resposta"] = resposta.get("body")
+                    registro["erro"] = resultado.get("error")
+                yield registro
+    finally:
+        for arquivo in arquivos:
+            arquivo.close()
+
+
+class BatchModule:
+    """
+    Processamento assíncrono de grandes volumes pela Batch API da OpenAI (/v1/files + /v1/batches):
+    custo menor e sem consumir os limites de taxa das chamadas interativas, com prazo de até 24h.
+    """
+
+    def __init__(self, cliente_http: ClienteHttpOpenAI = None):
+        # Permite reutilizar um cliente compartilhado (pool de conexões e rate limiter do processo)
+        self.cliente_http = cliente_http if cliente_http is not None else ClienteHttpOpenAI()
+
+    def enviar_arquivo(self, caminho: str, finalidade: str = "batch") -> dict:
+        """
+        Envia um arquivo para /v1/files em streaming (multipart), sem carregá-lo na memória.
+        Returns:
+            dict: Objeto `file` da API (o campo "id" é usado em criar_lote).
+        """
+        corpo = CorpoMultipart(caminho, {"purpose": finalidade})
+        try:
+            return self.cliente_http.enviar_arquivo("files", corpo, corpo.tipo_conteudo)
+        finally:
+            corpo.close()
+
+    def criar_lote(self, id_arquivo: str, endpoint: str = "/v1/chat/completions", janela: str = "24h", metadados: dict = None) -> dict:
+        """
+        Cria o lote a partir de um arquivo de entrada já enviado.
+        Returns:
+            dict: Objeto `batch` da API.
+        """
+        dados = {"input_file_id": id_arquivo, "endpoint": endpoint, "completion_window": janela}
+        if metadados:
+            dados["metadata"] = metadados
+        return self.cliente_http.enviar("batches", dados=dados)
+
+    def consultar_lote(self, id_lote: str) -> dict:
+        return self.cliente_http.obter(f"batches/{id_lote}")
+
+    def cancelar_lote(self, id_lote: str) -> dict:
+        return self.cliente_http.enviar(f"batches/{id_lote}/cancel")
+
+    def aguardar_lote(self, id_lote: str, intervalo_inicial: float = 5.0, intervalo_maximo: float = 60.0, fator: float = 1.5, tempo_maximo: float = None, ao_consultar=None) -> dict:
+        """
+        Consulta o lote até ele chegar a um status final, espaçando as consultas com backoff.
+        Args:
+            id_lote (str): ID do lote.
+            intervalo_inicial (float): Segundos até a segunda consulta (default: 5).
+            intervalo_maximo (float): Maior intervalo entre consultas (default: 60).
+            fator (float): Multiplicador do intervalo a cada consulta (default: 1.5).
+            tempo_maximo (float): Segundos máximos aguardando; None aguarda indefinidamente.
+            ao_consultar: Função chamada com o objeto `batch` a cada consulta (ex: para exibir progresso).
+        Returns:
+            dict: Objeto `batch` com status final (completed, failed, expired ou cancelled).
+        Raises:
+            OpenAITimeoutError: Se `tempo_maximo` for atingido antes do fim do lote.
+        """
+        inicio = time.monotonic()
+        intervalo = intervalo_inicial
+        while True:
+            lote = self.consultar_lote(id_lote)
+            if ao_consultar is not None:
+                ao_consultar(lote)
+            if lote.get("status") in STATUS_FINAIS:
+                return lote
+            if tempo_maximo is not None and time.monotonic() - inicio + intervalo > tempo_maximo:
+                raise OpenAITimeoutError(f"Lote {id_lote} ainda '{lote.get('status')}' após {tempo_maximo:.0f}s.")
+            time.sleep(intervalo)
+            intervalo = min(intervalo_maximo, intervalo * fator)
+
+    def baixar_resultados(self, lote: dict, diretorio: str) -> dict:
+        """
+        Baixa os arquivos de saída e de erros do lote, em streaming, para `diretorio`.
+        Returns:
+            dict: {"saida": caminho ou None, "erros": caminho ou None}.
+        """
+        os.makedirs(diretorio, exist_ok=True)
+        caminhos = {"saida": None, "erros": None}
+        for chave, campo in (("saida", "output_file_id"), ("erros", "error_file_id")):
+            id_arquivo = lote.get(campo)
+            if id_arquivo:
+                caminho = os.path.join(diretorio, f"{lote['id']}_{chave}.jsonl")
+                self.cliente_http.baixar(f"files/{id_arquivo}/content", caminho)
+                caminhos[chave] = caminho
+        return caminhos
+
+    def executar(self, requisicoes, diretorio: str, endpoint: str = "/v1/chat/completions", metadados: dict = None, **opcoes_espera):
+        """
+        Fluxo completo: grava a entrada, envia, cria o lote, aguarda, baixa e junta os resultados.
+        Args:
+            requisicoes: Iterável de pares (custom_id, payload).
+            diretorio (str): Onde ficam o JSONL de entrada e os resultados baixados.
+            endpoint (str): Endpoint das requisições (default: '/v1/chat/completions').
+            metadados (dict): Metadados do lote, opcionais.
+            **opcoes_espera: Repassadas a aguardar_lote (intervalo_inicial, tempo_maximo, ...).
+        Returns:
+            Iterator[dict]: Resultados na ordem da entrada (ver juntar_resultados).
+        Raises:
+            OpenAIAPIError: Se o lote falhar na validação da API.
+        """
+        os.makedirs(diretorio, exist_ok=True)
+        caminho_entrada = os.path.join(diretorio, f"entrada_{uuid.uuid4().hex[:8]}.jsonl")
+        total = escrever_entrada_lote(requisicoes, caminho_entrada, endpoint)
+        arquivo = self.enviar_arquivo(caminho_entrada)
+        lote = self.criar_lote(arquivo["id"], endpoint=endpoint, metadados=metadados)
+        logger.info(f"Lote {lote['id']} criado com {total} requisições.")
+        lote = self.aguardar_lote(lote["id"], **opcoes_espera)
+        if lote["status"] == "failed":
+            raise OpenAIAPIError(f"Lote {lote['id']} falhou: {lote.get('errors')}", error_details=lote.get("errors"))
+        caminhos = self.baixar_resultados(lote, diretorio)
+        return juntar_resultados(caminho_entrada, caminhos["saida"], caminhos["erros"])
+
+# -----------------------------------------------------------------------------
+#
+# Este módulo implementa o uso da Batch API da OpenAI (/v1/files e
+# /v1/batches) para cargas grandes e sem urgência, que saem por uma fração do
+# custo e não disputam os limites de taxa das chamadas interativas.
+#
+# Principais pontos:
+# - escrever_entrada_lote: monta o JSONL de entrada a partir de payloads no
+#   formato do ChatModule, validando custom_ids e o limite por arquivo.
+# - CorpoMultipart + ClienteHttpOpenAI.enviar_arquivo: upload em streaming,
+#   rebobinado a cada retry.
+# - BatchModule.aguardar_lote: consultas com intervalo crescente (backoff).
+# - ClienteHttpOpenAI.baixar: download do resultado direto para o disco.
+# - juntar_resultados: associa resultados aos custom_ids da entrada, na ordem
+#   da entrada, lendo os arquivos sob demanda.
+#
+# Uso típico:
+#   lote = BatchModule(cliente_http=obter_cliente_compartilhado())
+#   pedidos = ((f"p{i}", {"model": "gpt-4o-mini", "messages": msgs}) for i, msgs in enumerate(conversas))
+#   for resultado in lote.executar(pedidos, "lotes/", tempo_maximo=24 * 3600):
+#       print(resultado["custom_id"], resultado["resposta"])
+#
+# -----------------------------------------------------------------------------
@@ -0,0 +1,305 @@
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def chave_payload(ponto_final: str, dados: dict) -> str:
+    """
+    Gera a chave de cache de uma chamada a partir de uma serialização canônica do payload.
+    A ordem das chaves e os espaços não importam: payloads equivalentes geram a mesma chave.
+    Args:
+        ponto_final (str): Endpoint da API (ex: 'chat/completions').
+        dados (dict): Payload da requisição.
+    Returns:
+        str: Hash SHA-256 hexadecimal.
+    """
+    canonico = json.dumps(
+        {"ponto_final": ponto_final, "dados": dados},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(canonico.encode("utf-8")).hexdigest()
+
+
+def eh_deterministico(dados: dict) -> bool:
+    """
+    Indica se a chamada tende a produzir sempre a mesma resposta e, portanto, pode ser
+    cacheada por padrão: temperature 0, uma única escolha e sem streaming.
+    """
+    if not dados or dados.get("stream"):
+        return False
+    return dados.get("temperature") == 0 and (dados.get("n") or 1) == 1
+
+
+class CacheRespostas:
+    """
+    Cache em memória, thread-safe, com expulsão LRU por tamanho e expiração por TTL.
+    Os valores são copiados na entrada e na saída, para que quem altera uma resposta
+    devolvida não corrompa o que está guardado.
+    """
+
+    def __init__(self, max_itens: int = 1000, ttl: float = 3600.0):
+        """
+        Args:
+            max_itens (int): Máximo de respostas guardadas; a menos usada recentemente sai primeiro (default: 1000).
+            ttl (float): Segundos que uma resposta permanece válida; None desativa a expiração (default: 3600).
+        """
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+        self._acertos = 0
+        self._falhas = 0
+        self._expulsoes = 0
+
+    def obter(self, chave: str):
+        """
+        Returns:
+            dict: Cópia da resposta guardada, ou None se ausente/expirada.
+        """
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is not None and self.ttl is not None and time.monotonic() - item[1] > self.ttl:
+                del self._itens[chave]
+                item = None
+            if item is None:
+                self._falhas += 1
+                return None
+            self._itens.move_to_end(chave)
+            self._acertos += 1
+            valor = item[0]
+        return copy.deepcopy(valor)
+
+    def guardar(self, chave: str, valor: dict):
+        """Guarda uma cópia de `valor`, expulsando as entradas menos usadas se o limite for excedido."""
+        valor = copy.deepcopy(valor)
+        with self._trava:
+            self._itens[chave] = (valor, time.monotonic())
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+                self._expulsoes += 1
+
+    def remover(self, chave: str):
+        with self._trava:
+            self._itens.pop(chave, None)
+
+    def limpar(self):
+        """Remove todas as respostas (os contadores são mantidos)."""
+        with self._trava:
+            self._itens.clear()
+
+    def estatisticas(self) -> dict:
+        """Contadores de acertos, falhas e expulsões, e a ocupação atual (para métricas)."""
+        with self._trava:
+            consultas = self._acertos + self._falhas
+            return {
+                "acertos": self._acertos,
+                "falhas": self._falhas,
+                "taxa_acerto": self._acertos / consultas if consultas else 0.0,
+                "expulsoes": self._expulsoes,
+                "itens": len(self._itens),
+            }
+
+
+class CacheRespostasSQLite:
+    """
+    Cache de respostas persistente em um arquivo SQLite, com a mesma interface de CacheRespostas.
+    Sobrevive a reinícios e é compartilhado por todos os processos que apontam para o mesmo
+    arquivo (backend, CLI, lotes noturnos). Usa WAL para que leitores não bloqueiem o escritor,
+    expira entradas por TTL e mantém o tamanho total abaixo de `max_bytes` expulsando as
+    entradas acessadas há mais tempo (LRU).
+    """
+
+    # A verificação de tamanho roda a cada N gravações, para não somar a tabela a cada escrita
+    INTERVALO_PODA = 100
+
+    def __init__(self, caminho: str = None, max_bytes: int = 100 * 1024 * 1024, ttl: float = 7 * 24 * 3600.0, tempo_limite_lock: float = 30.0):
+        """
+        Args:
+            caminho (str): Arquivo do banco. Padrão: ~/.cache/projetoapi/respostas.sqlite3.
+            max_bytes (int): Tamanho máximo somado das respostas guardadas (default: 100 MB).
+            ttl (float): Segundos que uma resposta permanece válida; None desativa a expiração (default: 7 dias).
+            tempo_limite_lock (float): Segundos aguardando o lock do arquivo antes de falhar.
+        """
+        self.caminho = caminho or os.path.join(os.path.expanduser("~"), ".cache", "projetoapi", "respostas.sqlite3")
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.tempo_limite_lock = tempo_limite_lock
+        self._local = threading.local()
+        self._trava = threading.Lock()
+        self._acertos = 0
+        self._falhas = 0
+        self._expulsoes = 0
+        self._escritas_desde_poda = 0
+        diretorio = os.path.dirname(self.caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        conexao = self._conexao()
+        conexao.execute(
+            "CREATE TABLE IF NOT EXISTS respostas ("
+            " chave TEXT PRIMARY KEY, valor TEXT NOT NULL, criado REAL NOT NULL,"
+            " ultimo_acesso REAL NOT NULL, tamanho INTEGER NOT NULL, acessos INTEGER NOT NULL DEFAULT 0)"
+        )
+        conexao.execute("CREATE INDEX IF NOT EXISTS idx_respostas_ultimo_acesso ON respostas (ultimo_acesso)")
+
+    def _conexao(self) -> sqlite3.Connection:
+        # Uma conexão por thread e por processo: conexões SQLite não sobrevivem a um fork
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None or self._local.pid != os.getpid():
+            conexao = sqlite3.connect(self.caminho, timeout=self.tempo_limite_lock, isolation_level=None)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexao = conexao
+            self._local.pid = os.getpid()
+        return conexao
+
+    def _contar(self, contador: str, quantidade: int = 1):
+        with self._trava:
+            setattr(self, contador, getattr(self, contador) + quantidade)
+
+    def obter(self, chave: str):
+        """
+        Returns:
+            dict: Resposta guardada, ou None se ausente/expirada.
+        """
+        conexao = self._conexao()
+        linha = conexao.execute("SELECT valor, criado FROM respostas WHERE chave = ?", (chave,)).fetchone()
+        agora = time.time()
+        if linha is not None and self.ttl is not None and agora - linha[1] > self.ttl:
+            conexao.execute("DELETE FROM respostas WHERE chave = ?", (chave,))
+            linha = None
+        if linha is None:
+            self._contar("_falhas")
+            return None
+        conexao.execute("UPDATE respostas SET ultimo_acesso = ?, acessos = acessos + 1 WHERE chave = ?", (agora, chave))
+        self._contar("_acertos")
+        return json.loads(linha[0])
+
+    def guardar(self, chave: str, valor: dict):
+        """Guarda `valor` (serializado em JSON) e, periodicamente, aplica o limite de tamanho."""
+        serializado = json.dumps(valor, ensure_ascii=False)
+        agora = time.time()
+        self._conexao().execute(
+            "INSERT OR REPLACE INTO respostas (chave, valor, criado, ultimo_acesso, tamanho, acessos) VALUES (?, ?, ?, ?, ?, 0)",
+            (chave, serializado, agora, agora, len(serializado.encode("utf-8"))),
+        )
+        with self._trava:
+            self._escritas_desde_poda += 1
+            podar = self._escritas_desde_poda >= self.INTERVALO_PODA
+            if podar:
+                self._escritas_desde_poda = 0
+        if podar:
+            self.podar()
+
+    def remover(self, chave: str):
+        self._conexao().execute("DELETE FROM respostas WHERE chave = ?", (chave,))
+
+    def limpar(self):
+        """Remove todas as respostas e devolve o espaço ao sistema de arquivos."""
+        conexao = self._conexao()
+        conexao.execute("DELETE FROM respostas")
+        conexao.execute("VACUUM")
+
+    def podar(self) -> dict:
+        """
+        Remove as entradas expiradas e, se o total passar de `max_bytes`, as menos acessadas recentemente.
+        Returns:
+            dict: Quantidade de entradas removidas por expiração e por tamanho.
+        """
+        conexao = self._conexao()
+        expiradas = 0
+        if self.ttl is not None:
+            expiradas = conexao.execute("DELETE FROM respostas WHERE criado < ?", (time.time() - self.ttl,)).rowcount
+        por_tamanho = 0
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            total = conexao.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0]
+            if total > self.max_bytes:
+                # Percorre das mais antigas para as mais recentes até liberar o excesso
+                excesso, limite_acesso = total - self.max_bytes, None
+                for ultimo_acesso, tamanho in conexao.execute("SELECT ultimo_acesso, tamanho FROM respostas ORDER BY ultimo_acesso"):
+                    excesso -= tamanho
+                    limite_acesso = ultimo_acesso
+                    if excesso <= 0:
+                        break
+                por_tamanho = conexao.execute("DELETE FROM respostas WHERE ultimo_acesso <= ?", (limite_acesso,)).rowcount
+            conexao.execute("COMMIT")
+        except BaseException:
+            conexao.execute("ROLLBACK")
+            raise
+        self._contar("_expulsoes", expiradas + por_tamanho)
+        return {"expiradas": expiradas, "por_tamanho": por_tamanho}
+
+    def estatisticas(self) -> dict:
+        """Contadores deste processo e a ocupação atual do arquivo (para métricas e para a CLI)."""
+        itens, total_bytes, acessos = self._conexao().execute(
+            "SELECT COUNT(*), COALESCE(SUM(tamanho), 0), COALESCE(SUM(acessos), 0) FROM respostas"
+        ).fetchone()
+        with self._trava:
+            consultas = self._acertos + self._falhas
+            return {
+                "acertos": self._acertos,
+                "falhas": self._falhas,
+                "taxa_acerto": self._acertos / consultas if consultas else 0.0,
+                "expulsoes": self._expulsoes,
+                "itens": itens,
+                "bytes": total_bytes,
+                "acessos_totais": acessos,
+                "arquivo_bytes": os.path.getsize(self.caminho) if os.path.exists(self.caminho) else 0,
+            }
+
+
+def criar_cache(tipo: str = "memoria", caminho: str = None, max_itens: int = 1000, max_bytes: int = 100 * 1024 * 1024, ttl: float = 3600.0):
+    """
+    Cria o cache de respostas.
+    Args:
+        tipo (str): "memoria" (por processo) ou "sqlite" (persistente e compartilhado entre processos).
+        caminho (str): Arquivo do banco, usado apenas pelo cache "sqlite".
+        max_itens (int): Limite de entradas do cache "memoria".
+        max_bytes (int): Limite de tamanho do cache "sqlite".
+        ttl (float): Validade das respostas, em segundos.
+    Returns:
+        CacheRespostas | CacheRespostasSQLite: Cache pronto para uso.
+    Raises:
+        ValueError: Se o tipo não for reconhecido.
+    """
+    tipo = (tipo or "memoria").lower()
+    if tipo == "memoria":
+        return CacheRespostas(max_itens=max_itens, ttl=ttl)
+    if tipo == "sqlite":
+        return CacheRespostasSQLite(caminho, max_bytes=max_bytes, ttl=ttl)
+    raise ValueError(f"Tipo de cache desconhecido: '{tipo}'. Use 'memoria' ou 'sqlite'.")
+
+# -----------------------------------------------------------------------------
+#
+# Este módulo implementa o cache de respostas usado pelos clientes HTTP.
+# Muitas chamadas de /chat e /completions são repetições exatas (prompts de
+# classificação com temperature 0); responder essas do cache evita latência
+# e custo.
+#
+# Principais pontos:
+# - chave_payload: hash SHA-256 de uma serialização canônica (chaves ordenadas).
+# - eh_deterministico: só chamadas com temperature 0, n=1 e sem stream são
+#   cacheadas por padrão; `usar_cache=True/False` força ou ignora o cache.
+# - CacheRespostas: LRU limitado por tamanho, com TTL e contadores de acerto.
+# - CacheRespostasSQLite: mesma interface, persistente em disco (WAL), com
+#   limite em bytes e poda por TTL/LRU; sobrevive a reinícios e é visível
+#   para todos os processos (ex: reexecuções de lotes da CLI).
+#
+# Uso típico:
+#   cliente = ClienteHttpOpenAI(cache=CacheRespostas(max_itens=500, ttl=600))
+#   cliente.enviar('completions', dados={..., "temperature": 0})
+#   cliente.get_metricas()["cache"]
+#
+# -----------------------------------------------------------------------------
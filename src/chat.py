@@ -1,12 +1,58 @@
 from src.exceptions import OpenAIValidationError  
 from src.http_client import ClienteHttpOpenAI     
 from src.config import Config
+from src.streaming import RespostaStream
+from src.tokenizer import verificar_janela_contexto
 
 class ChatModule:   
-    def __init__(self):
-        self.cliente_http = ClienteHttpOpenAI()
+    def __init__(self, cliente_http: ClienteHttpOpenAI = None, cache_semantico=None):
+        # Permite reutilizar um cliente compartilhado (pool de conexões e rate limiter do processo)
+        self.cliente_http = cliente_http if cliente_http is not None else ClienteHttpOpenAI()
+        # Cache opcional por similaridade da pergunta (src/semantic_cache.py)
+        self.cache_semantico = cache_semantico
 
-    def criar_conversa(self, mensagens: list, modelo: str = "gpt-3.5-turbo"):
+    def criar_conversa(self, mensagens: list, modelo: str = "gpt-3.5-turbo", usar_cache: bool = None, ajustar_contexto: bool = False, **kwargs):
+        """
+        Cria uma conversa e devolve a resposta completa da API.
+        Parâmetros extras (temperature, max_tokens, ...) vão direto para o payload; com
+        temperature 0 a resposta pode vir do cache do cliente, e `usar_cache` força ou ignora esse cache.
+        Com um cache semântico configurado, uma pergunta equivalente a outra já respondida (mesmo
+        modelo, mesmo histórico) devolve a resposta guardada; `usar_cache=False` também o ignora.
+        Conversas que não cabem na janela de contexto do modelo são recusadas antes do envio, ou,
+        com `ajustar_contexto=True`, enviadas sem as mensagens mais antigas.
+        """
+        self._validar_entrada(mensagens, modelo)
+        payload = {"model": modelo, "messages": mensagens}
+        payload.update(kwargs)
+        payload = verificar_janela_contexto(payload, ajustar=ajustar_contexto)
+        mensagens = payload["messages"]
+        consulta = None
+        if self.cache_semantico is not None and usar_cache is not False:
+            resposta, consulta = self.cache_semantico.obter(modelo, mensagens, kwargs)
+            if resposta is not None:
+                return resposta
+        if usar_cache is None:
+            resposta = self.cliente_http.enviar("chat/completions", dados=payload)
+        else:
+            resposta = self.cliente_http.enviar("chat/completions", dados=payload, usar_cache=usar_cache)
+        if consulta is not None:
+            self.cache_semantico.guardar(modelo, consulta, resposta)
+        return resposta
+
+    def criar_conversa_stream(self, mensagens: list, modelo: str = "gpt-3.5-turbo", ajustar_contexto: bool = False, **kwargs) -> RespostaStream:
+        """
+        Cria uma conversa em modo streaming.
+        Itere sobre o retorno para receber os deltas de texto à medida que o modelo os gera;
+        ao final, `resposta_final()` devolve a resposta agregada no formato de criar_conversa.
+        A janela de contexto é verificada como em criar_conversa.
+        """
+        self._validar_entrada(mensagens, modelo)
+        payload = {"model": modelo, "messages": mensagens, "stream_options": {"include_usage": True}}
+        payload.update(kwargs)
+        payload = verificar_janela_contexto(payload, ajustar=ajustar_contexto)
+        return RespostaStream(self.cliente_http.enviar_stream("chat/completions", dados=payload))
+
+    def _validar_entrada(self, mensagens: list, modelo: str):
         if not isinstance(mensagens, list) or not mensagens:
             raise OpenAIValidationError("O parâmetro 'mensagens' deve ser uma lista não vazia de objetos de mensagem.", field="mensagens")
         if not all(isinstance(m, dict) and "role" in m and "content" in m for m in mensagens):
@@ -14,9 +60,6 @@ class ChatModule:
         if not isinstance(modelo, str) or not modelo:
             raise OpenAIValidationError("O parâmetro 'modelo' deve ser uma string não vazia.", field="modelo")
 
-        payload = {"model": modelo, "messages": mensagens}
-        return self.cliente_http.enviar("chat/completions", dados=payload)
-
 if __name__ == "__main__":
     print("Módulo Chat executado diretamente.")
 
@@ -40,6 +83,10 @@ if __name__ == "__main__":
 # Principais pontos:
 # - Validação rigorosa dos parâmetros de entrada (mensagens e modelo).
 # - Utilização de uma classe cliente HTTP dedicada para abstrair a comunicação.
+# - Pré-checagem da janela de contexto (src/tokenizer.py): recusa ou ajusta
+#   conversas grandes demais antes de gastar uma chamada à API.
+# - Cache semântico opcional (cache_semantico) consultado antes da chamada à API.
+# - criar_conversa_stream() entrega os tokens à medida que são gerados (SSE).
 # - Lança exceções customizadas (OpenAIValidationError) em caso de erro de uso.
 # - Pode ser executado diretamente para testes rápidos, exibindo a resposta da API.
 #
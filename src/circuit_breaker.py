@@ -0,0 +1,162 @@
+import threading
+import time
+import logging
+
+from src.exceptions import OpenAICircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+FECHADO = "fechado"
+ABERTO = "aberto"
+MEIO_ABERTO = "meio_aberto"
+
+
+class Disjuntor:
+    """
+    Circuit breaker de um único endpoint/modelo.
+    - fechado: chamadas passam; falhas consecutivas são contadas.
+    - aberto: após `limiar_falhas` falhas seguidas, chamadas falham na hora durante `tempo_abertura`.
+    - meio_aberto: passado esse tempo, até `chamadas_meio_aberto` chamadas de teste são liberadas;
+      um sucesso fecha o circuito e uma falha o reabre.
+    """
+
+    def __init__(self, limiar_falhas: int = 5, tempo_abertura: float = 30.0, chamadas_meio_aberto: int = 1):
+        self.limiar_falhas = limiar_falhas
+        self.tempo_abertura = tempo_abertura
+        self.chamadas_meio_aberto = chamadas_meio_aberto
+        self.estado = FECHADO
+        self.falhas_consecutivas = 0
+        self._aberto_em = 0.0
+        self._testes_em_andamento = 0
+        self._ultimo_teste_em = 0.0
+
+    def tempo_restante(self) -> float:
+        return max(0.0, self._aberto_em + self.tempo_abertura - time.monotonic())
+
+    def permitir(self) -> bool:
+        """Indica se uma chamada pode seguir agora (e a contabiliza como teste, se meio aberto)."""
+        if self.estado == ABERTO:
+            if self.tempo_restante() > 0:
+                return False
+            self.estado = MEIO_ABERTO
+            self._testes_em_andamento = 0
+        if self.estado == MEIO_ABERTO:
+            # Um teste sem resultado (ex: tarefa cancelada) não pode prender o circuito para sempre
+            if time.monotonic() - self._ultimo_teste_em > self.tempo_abertura:
+                self._testes_em_andamento = 0
+            if self._testes_em_andamento >= self.chamadas_meio_aberto:
+                return False
+            self._testes_em_andamento += 1
+            self._ultimo_teste_em = time.monotonic()
+        return True
+
+    def registrar(self, sucesso: bool) -> str:
+        """
+        Registra o resultado de uma chamada.
+        Returns:
+            str: Estado anterior, para quem quiser registrar a transição.
+        """
+        anterior = self.estado
+        if sucesso:
+            self.estado = FECHADO
+            self.falhas_consecutivas = 0
+            self._testes_em_andamento = 0
+            return anterior
+        self.falhas_consecutivas += 1
+        if self.estado == MEIO_ABERTO or self.falhas_consecutivas >= self.limiar_falhas:
+            self.estado = ABERTO
+            self._aberto_em = time.monotonic()
+            self._testes_em_andamento = 0
+        return anterior
+
+
+class RegistroDisjuntores:
+    """
+    Conjunto thread-safe de disjuntores, um por chave (endpoint + modelo), criados sob demanda.
+    Uma falha no gpt-4o não bloqueia chamadas ao gpt-4o-mini nem a outros endpoints.
+    """
+
+    def __init__(self, limiar_falhas: int = 5, tempo_abertura: float = 30.0, chamadas_meio_aberto: int = 1):
+        """
+        Args:
+            limiar_falhas (int): Falhas consecutivas que abrem o circuito (default: 5).
+            tempo_abertura (float): Segundos com o circuito aberto antes de liberar chamadas de teste (default: 30.0).
+            chamadas_meio_aberto (int): Chamadas de teste simultâneas no estado meio aberto (default: 1).
+        """
+        self.limiar_falhas = limiar_falhas
+        self.tempo_abertura = tempo_abertura
+        self.chamadas_meio_aberto = chamadas_meio_aberto
+        self._disjuntores = {}
+        self._trava = threading.Lock()
+
+    @staticmethod
+    def chave(ponto_final: str, modelo: str = None) -> str:
+        return f"{ponto_final}|{modelo or '-'}"
+
+    def _obter(self, chave: str) -> Disjuntor:
+        disjuntor = self._disjuntores.get(chave)
+        if disjuntor is None:
+            disjuntor = Disjuntor(self.limiar_falhas, self.tempo_abertura, self.chamadas_meio_aberto)
+            self._disjuntores[chave] = disjuntor
+        return disjuntor
+
+    def verificar(self, chave: str):
+        """
+        Libera a chamada ou falha imediatamente se o circuito da chave estiver aberto.
+        Raises:
+            OpenAICircuitOpenError: Se o circuito está aberto (ou meio aberto sem vagas de teste).
+        """
+        with self._trava:
+            disjuntor = self._obter(chave)
+            if disjuntor.permitir():
+                return
+            tempo_restante = disjuntor.tempo_restante()
+        raise OpenAICircuitOpenError(
+            f"Circuito aberto para '{chave}': chamadas suspensas após falhas consecutivas da API OpenAI.",
+            chave=chave,
+            tempo_restante=tempo_restante,
+        )
+
+    def registrar(self, chave: str, sucesso: bool):
+        """Registra o resultado de uma tentativa (sucesso = a API respondeu sem erro de servidor)."""
+        with self._trava:
+            disjuntor = self._obter(chave)
+            anterior = disjuntor.registrar(sucesso)
+            atual = disjuntor.estado
+        if anterior != atual:
+            if atual == ABERTO:
+                logger.warning(f"Circuito '{chave}' aberto por {self.tempo_abertura:.0f}s após falhas consecutivas.")
+            else:
+                logger.info(f"Circuito '{chave}' {atual}.")
+
+    def estado(self) -> dict:
+        """Estado de cada circuito conhecido (para métricas)."""
+        with self._trava:
+            return {
+                chave: {
+                    "estado": disjuntor.estado,
+                    "falhas_consecutivas": disjuntor.falhas_consecutivas,
+                    "tempo_restante": disjuntor.tempo_restante() if disjuntor.estado == ABERTO else 0.0,
+                }
+                for chave, disjuntor in self._disjuntores.items()
+            }
+
+# -----------------------------------------------------------------------------
+#
+# Este módulo implementa o circuit breaker (disjuntor) usado pelos clientes
+# HTTP. Quando a API da OpenAI está fora do ar para um endpoint/modelo, cada
+# chamada esperaria o timeout em todas as tentativas, prendendo threads do
+# servidor; com o circuito aberto, as chamadas falham imediatamente.
+#
+# Principais pontos:
+# - Disjuntor: estados fechado, aberto e meio aberto (chamadas de teste).
+# - RegistroDisjuntores: um disjuntor por endpoint + modelo, thread-safe.
+# - Só erros de servidor, timeout e conexão contam como falha; erros 4xx
+#   (inclusive 429) mostram que a API está respondendo.
+# - OpenAICircuitOpenError (src/exceptions.py) sinaliza a rejeição imediata.
+#
+# Uso típico:
+#   disjuntores = RegistroDisjuntores(limiar_falhas=5, tempo_abertura=30)
+#   cliente = ClienteHttpOpenAI(disjuntores=disjuntores)
+#
+# -----------------------------------------------------------------------------
@@ -0,0 +1,331 @@
+import threading
+import logging
+
+from src.config import Config
+from src.exceptions import OpenAIValidationError
+from src.http_client import ClienteHttpOpenAI
+from src.async_http_client import ClienteHttpOpenAIAsync
+from src.rate_limiter import LimitadorPorModelo, criar_backend_limitador, namespace_chave_api
+from src.retry import OrcamentoRetry
+from src.circuit_breaker import RegistroDisjuntores
+from src.cache import CacheRespostas, criar_cache
+from src.model_catalog import CatalogoModelos
+from src.vector_store import ArmazemVetores
+from src.semantic_cache import CacheSemantico
+from src.sessions import ArmazemSessoes
+
+logger = logging.getLogger(__name__)
+
+_clientes = {}
+_clientes_async = {}
+_limitador_modelos = None
+_backend_limitador = None
+_orcamento_retry = None
+_disjuntores = None
+_cache_respostas = None
+_catalogo_modelos = None
+_armazem_vetores = None
+_cache_semantico = None
+_armazem_sessoes = None
+_trava = threading.Lock()
+
+
+def obter_cache_compartilhado() -> CacheRespostas:
+    """
+    Retorna o cache de respostas do processo, ou None se OPENAI_CACHE_ENABLED estiver desligado.
+    Os clientes síncrono e assíncrono compartilham o mesmo cache; com OPENAI_CACHE_BACKEND=sqlite
+    ele também é compartilhado entre processos e sobrevive a reinícios.
+    """
+    global _cache_respostas
+    configuracao = Config.get_instance()
+    if not configuracao.OPENAI_CACHE_ENABLED:
+        return None
+    with _trava:
+        if _cache_respostas is None:
+            _cache_respostas = criar_cache(
+                configuracao.OPENAI_CACHE_BACKEND,
+                caminho=configuracao.OPENAI_CACHE_DB_PATH or None,
+                max_itens=configuracao.OPENAI_CACHE_MAX_ITEMS,
+                max_bytes=configuracao.OPENAI_CACHE_MAX_BYTES,
+                ttl=configuracao.OPENAI_CACHE_TTL,
+            )
+        return _cache_respostas
+
+
+def obter_cache_semantico() -> CacheSemantico:
+    """
+    Retorna o cache semântico do /chat, ou None se OPENAI_SEMANTIC_CACHE_ENABLED estiver desligado.
+    Os embeddings das perguntas são gerados pelo cliente compartilhado.
+    """
+    global _cache_semantico
+    configuracao = Config.get_instance()
+    if not configuracao.OPENAI_SEMANTIC_CACHE_ENABLED:
+        return None
+    cliente = obter_cliente_compartilhado()
+    with _trava:
+        if _cache_semantico is None:
+            _cache_semantico = CacheSemantico(
+                cliente_http=cliente,
+                modelo_embeddings=configuracao.OPENAI_EMBEDDINGS_MODEL,
+                limiar=configuracao.OPENAI_SEMANTIC_CACHE_THRESHOLD,
+                max_itens_por_modelo=configuracao.OPENAI_SEMANTIC_CACHE_MAX_ITEMS,
+                ttl=configuracao.OPENAI_CACHE_TTL,
+            )
+        return _cache_semantico
+
+
+def obter_armazem_sessoes() -> ArmazemSessoes:
+    """
+    Retorna o armazém de sessões de conversa do /chat, com os limites da Config.
+    Com OPENAI_CONTEXT_SUMMARY_ENABLED, o histórico das sessões é compactado por resumo.
+    """
+    global _armazem_sessoes
+    if _armazem_sessoes is not None:
+        return _armazem_sessoes
+    configuracao = Config.get_instance()
+    resumidor = None
+    if configuracao.OPENAI_CONTEXT_SUMMARY_ENABLED:
+        from src.summarizer import ResumidorConversa
+        resumidor = ResumidorConversa(cliente_http=obter_cliente_compartilhado(), modelo=configuracao.OPENAI_CONTEXT_SUMMARY_MODEL)
+    with _trava:
+        if _armazem_sessoes is None:
+            _armazem_sessoes = ArmazemSessoes(
+                max_sessoes=configuracao.OPENAI_SESSIONS_MAX,
+                ttl_ocioso=configuracao.OPENAI_SESSION_IDLE_TTL,
+                max_tokens_por_sessao=configuracao.OPENAI_SESSION_MAX_TOKENS,
+                resumidor=resumidor,
+            )
+        return _armazem_sessoes
+
+
+def obter_armazem_vetores() -> ArmazemVetores:
+    """
+    Retorna o índice de vetores de OPENAI_VECTOR_STORE_PATH, aberto somente para leitura,
+    ou None se o caminho não estiver configurado ou o índice ainda não existir.
+    """
+    global _armazem_vetores
+    caminho = Config.get_instance().OPENAI_VECTOR_STORE_PATH
+    if not caminho:
+        return None
+    with _trava:
+        if _armazem_vetores is None:
+            try:
+                _armazem_vetores = ArmazemVetores(caminho, somente_leitura=True)
+            except OpenAIValidationError as e:
+                logger.warning(f"Índice de vetores indisponível: {e}")
+                return None
+        return _armazem_vetores
+
+
+def obter_disjuntores_compartilhados() -> RegistroDisjuntores:
+    """
+    Retorna os circuit breakers do processo, compartilhados pelos clientes síncrono e
+    assíncrono: um endpoint/modelo fora do ar é detectado uma vez para o processo inteiro.
+    """
+    global _disjuntores
+    with _trava:
+        if _disjuntores is None:
+            configuracao = Config.get_instance()
+            _disjuntores = RegistroDisjuntores(
+                limiar_falhas=configuracao.OPENAI_CIRCUIT_FAILURE_THRESHOLD,
+                tempo_abertura=configuracao.OPENAI_CIRCUIT_OPEN_SECONDS,
+            )
+        return _disjuntores
+
+
+def obter_orcamento_retry_compartilhado() -> OrcamentoRetry:
+    """
+    Retorna o orçamento de retries do processo, compartilhado pelos clientes síncrono e
+    assíncrono: durante uma instabilidade, o total de retries fica limitado à fração
+    OPENAI_RETRY_BUDGET_RATIO do tráfego, seja qual for o cliente que falhou.
+    """
+    global _orcamento_retry
+    with _trava:
+        if _orcamento_retry is None:
+            _orcamento_retry = OrcamentoRetry(proporcao=Config.get_instance().OPENAI_RETRY_BUDGET_RATIO)
+        return _orcamento_retry
+
+
+def obter_backend_limitador():
+    """
+    Retorna o backend de estado dos limitadores do processo, conforme OPENAI_RATE_LIMIT_BACKEND.
+    Com 'sqlite', todos os processos do host apontam para o mesmo arquivo e dividem os limites.
+    """
+    global _backend_limitador
+    with _trava:
+        if _backend_limitador is None:
+            configuracao = Config.get_instance()
+            _backend_limitador = criar_backend_limitador(
+                configuracao.OPENAI_RATE_LIMIT_BACKEND, configuracao.OPENAI_RATE_LIMIT_DB_PATH or None
+            )
+            logger.info(f"Backend de rate limit: {configuracao.OPENAI_RATE_LIMIT_BACKEND}.")
+        return _backend_limitador
+
+
+def _backend_compartilhado():
+    # O limite por segundo só vai para o backend quando ele é de fato compartilhado entre processos
+    if Config.get_instance().OPENAI_RATE_LIMIT_BACKEND.lower() == "memoria":
+        return None
+    return obter_backend_limitador()
+
+
+def obter_limitador_compartilhado() -> LimitadorPorModelo:
+    """
+    Retorna o limitador RPM/TPM por modelo do processo, compartilhado pelos clientes
+    síncrono e assíncrono para que ambos consumam o mesmo orçamento.
+    """
+    global _limitador_modelos
+    backend = obter_backend_limitador()
+    with _trava:
+        if _limitador_modelos is None:
+            configuracao = Config.get_instance()
+            _limitador_modelos = LimitadorPorModelo(
+                limites=configuracao.OPENAI_MODEL_RATE_LIMITS,
+                rpm_padrao=configuracao.OPENAI_DEFAULT_RPM,
+                tpm_padrao=configuracao.OPENAI_DEFAULT_TPM,
+                backend=backend,
+                namespace=namespace_chave_api(configuracao.OPENAI_API_KEY),
+            )
+        return _limitador_modelos
+
+
+def obter_cliente_compartilhado(nome: str = "padrao") -> ClienteHttpOpenAI:
+    """
+    Retorna o ClienteHttpOpenAI compartilhado do processo, criando-o na primeira chamada.
+    Reutilizar a mesma instância mantém as conexões TCP/TLS abertas no pool e faz com
+    que o rate limiter e as métricas valham para o processo inteiro, e não por requisição.
+    Args:
+        nome (str): Nome do cliente no registro, para quem precisar de pools separados.
+    Returns:
+        ClienteHttpOpenAI: Instância compartilhada e segura para uso entre threads.
+    """
+    cliente = _clientes.get(nome)
+    if cliente is not None:
+        return cliente
+    limitador = obter_limitador_compartilhado()
+    backend = _backend_compartilhado()
+    orcamento = obter_orcamento_retry_compartilhado()
+    disjuntores = obter_disjuntores_compartilhados()
+    cache = obter_cache_compartilhado()
+    with _trava:
+        if nome not in _clientes:
+            configuracao = Config.get_instance()
+            _clientes[nome] = ClienteHttpOpenAI(
+                max_tentativas=configuracao.OPENAI_MAX_RETRIES,
+                fator_backoff=configuracao.OPENAI_BACKOFF_FACTOR,
+                tempo_limite=configuracao.OPENAI_TIMEOUT,
+                max_requisicoes_por_segundo=configuracao.OPENAI_MAX_REQUESTS_PER_SECOND,
+                tamanho_pool=configuracao.OPENAI_POOL_MAXSIZE,
+                limitador_modelos=limitador,
+                backend_limitador=backend,
+                orcamento_retry=orcamento,
+                tempo_maximo_retries=configuracao.OPENAI_RETRY_MAX_TOTAL_TIME,
+                teto_backoff=configuracao.OPENAI_BACKOFF_MAX,
+                disjuntores=disjuntores,
+                cache=cache,
+                agrupar_chamadas=configuracao.OPENAI_COALESCE_REQUESTS,
+            )
+            logger.info(f"Cliente HTTP compartilhado '{nome}' criado (pool: {configuracao.OPENAI_POOL_MAXSIZE} conexões).")
+        return _clientes[nome]
+
+
+def obter_catalogo_modelos() -> CatalogoModelos:
+    """
+    Retorna o catálogo de modelos do processo, que consulta GET /models pelo cliente compartilhado
+    e mantém a lista em memória por OPENAI_MODELS_TTL segundos.
+    """
+    global _catalogo_modelos
+    if _catalogo_modelos is not None:
+        return _catalogo_modelos
+    cliente = obter_cliente_compartilhado()
+    with _trava:
+        if _catalogo_modelos is None:
+            configuracao = Config.get_instance()
+            _catalogo_modelos = CatalogoModelos(
+                cliente,
+                ttl=configuracao.OPENAI_MODELS_TTL,
+                max_obsoleto=configuracao.OPENAI_MODELS_MAX_STALE,
+            )
+        return _catalogo_modelos
+
+
+def obter_cliente_async_compartilhado(nome: str = "padrao") -> ClienteHttpOpenAIAsync:
+    """
+    Retorna o ClienteHttpOpenAIAsync compartilhado do processo, criando-o na primeira chamada.
+    Deve ser chamado de dentro do event loop que usará o cliente (ex: no lifespan do FastAPI).
+    Args:
+        nome (str): Nome do cliente no registro.
+    Returns:
+        ClienteHttpOpenAIAsync: Instância compartilhada pelas rotas assíncronas.
+    """
+    if nome not in _clientes_async:
+        configuracao = Config.get_instance()
+        _clientes_async[nome] = ClienteHttpOpenAIAsync(
+            max_tentativas=configuracao.OPENAI_MAX_RETRIES,
+            fator_backoff=configuracao.OPENAI_BACKOFF_FACTOR,
+            tempo_limite=configuracao.OPENAI_TIMEOUT,
+            max_requisicoes_por_segundo=configuracao.OPENAI_MAX_REQUESTS_PER_SECOND,
+            tamanho_pool=configuracao.OPENAI_POOL_MAXSIZE,
+            tempo_keepalive=configuracao.OPENAI_KEEPALIVE_EXPIRY,
+            limitador_modelos=obter_limitador_compartilhado(),
+            backend_limitador=_backend_compartilhado(),
+            orcamento_retry=obter_orcamento_retry_compartilhado(),
+            tempo_maximo_retries=configuracao.OPENAI_RETRY_MAX_TOTAL_TIME,
+            teto_backoff=configuracao.OPENAI_BACKOFF_MAX,
+            disjuntores=obter_disjuntores_compartilhados(),
+            cache=obter_cache_compartilhado(),
+            agrupar_chamadas=configuracao.OPENAI_COALESCE_REQUESTS,
+        )
+        logger.info(f"Cliente HTTP assíncrono compartilhado '{nome}' criado.")
+    return _clientes_async[nome]
+
+
+async def fechar_clientes_async():
+    """Fecha todos os clientes assíncronos registrados e esvazia o registro."""
+    clientes = list(_clientes_async.values())
+    _clientes_async.clear()
+    for cliente in clientes:
+        await cliente.fechar()
+
+
+def fechar_clientes():
+    """Fecha todos os clientes registrados e esvazia o registro (ex: no shutdown do servidor)."""
+    global _catalogo_modelos, _cache_semantico, _armazem_sessoes
+    with _trava:
+        clientes = list(_clientes.values())
+        _clientes.clear()
+        _catalogo_modelos = None
+        _cache_semantico = None
+        sessoes, _armazem_sessoes = _armazem_sessoes, None
+    if sessoes is not None and sessoes.resumidor is not None:
+        sessoes.resumidor.fechar()
+    for cliente in clientes:
+        cliente.fechar()
+
+# -----------------------------------------------------------------------------
+#
+# Este módulo mantém o registro de clientes HTTP compartilhados pelo processo.
+# Em vez de cada requisição web criar seu próprio ClienteHttpOpenAI (nova
+# sessão, novo handshake TCP+TLS e um rate limiter zerado), o backend obtém
+# sempre a mesma instância, criada uma única vez a partir da Config.
+#
+# Principais pontos:
+# - Criação preguiçosa e thread-safe (double-checked locking).
+# - Parâmetros de retry, timeout, rate limit e pool vindos da Config.
+# - Um único limitador RPM/TPM por modelo, um único orçamento de retries e
+#   um único conjunto de circuit breakers, compartilhados pelos clientes.
+# - Cache de respostas opcional (OPENAI_CACHE_ENABLED), em memória ou em SQLite.
+# - Catálogo de modelos em memória (obter_catalogo_modelos) para /models e a CLI.
+# - Cache semântico do /chat (obter_cache_semantico), opcional.
+# - Sessões de conversa do /chat (obter_armazem_sessoes), em memória.
+# - Índice de vetores somente leitura (obter_armazem_vetores) para o /chat com contexto.
+# - Com OPENAI_RATE_LIMIT_BACKEND=sqlite, os limites (RPM/TPM e por segundo)
+#   valem para todos os processos do host que usam a mesma chave da API.
+# - Versão assíncrona (obter_cliente_async_compartilhado) para rotas async/streaming.
+# - fechar_clientes() / fechar_clientes_async() liberam as conexões no encerramento.
+#
+# Uso típico:
+#   cliente = obter_cliente_compartilhado()
+#   chat = ChatModule(cliente_http=cliente)
+#
+# -----------------------------------------------------------------------------
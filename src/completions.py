@@ -1,19 +1,131 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 from src.exceptions import OpenAIValidationError
 from src.http_client import ClienteHttpOpenAI
+from src.rate_limiter import estimar_tokens_payload
 from src.config import Config
+from src.streaming import RespostaStream
+from src.tokenizer import janela_contexto, verificar_janela_contexto
 
 class CompletionsModule:
-    def __init__(self):
-        self.cliente_http = ClienteHttpOpenAI()
+    def __init__(self, cliente_http: ClienteHttpOpenAI = None):
+        # Permite reutilizar um cliente compartilhado (pool de conexões e rate limiter do processo)
+        self.cliente_http = cliente_http if cliente_http is not None else ClienteHttpOpenAI()
 
-    def gerar_texto(self, prompt: str, modelo: str = "text-davinci-003", **kwargs):
+    def gerar_texto(self, prompt: str, modelo: str = "text-davinci-003", usar_cache: bool = None, **kwargs):
         if not isinstance(prompt, str) or not prompt:
             raise OpenAIValidationError("O parâmetro 'prompt' deve ser uma string não vazia.", field="prompt")
         if not isinstance(modelo, str) or not modelo:
             raise OpenAIValidationError("O parâmetro 'modelo' deve ser uma string não vazia.", field="modelo")
         payload = {"model": modelo, "prompt": prompt}
         payload.update(kwargs)  # Permite parâmetros extras como temperature, max_tokens, etc.
-        return self.cliente_http.enviar("completions", dados=payload)
+        verificar_janela_contexto(payload)
+        if usar_cache is None:
+            return self.cliente_http.enviar("completions", dados=payload)
+        return self.cliente_http.enviar("completions", dados=payload, usar_cache=usar_cache)
+
+    def gerar_textos(self, prompts: list, modelo: str = "text-davinci-003", max_prompts_por_requisicao: int = 20, max_tokens_por_requisicao: int = None, max_concorrencia: int = 4, usar_cache: bool = None, **kwargs) -> list:
+        """
+        Gera textos para várias prompts, agrupando-as em poucas requisições ao endpoint "completions",
+        que aceita uma lista em `prompt`. Os grupos são enviados em paralelo e as `choices` de cada
+        resposta são devolvidas à prompt de origem pelo índice.
+        Args:
+            prompts (list[str]): Prompts a completar.
+            modelo (str): Modelo de completions.
+            max_prompts_por_requisicao (int): Máximo de prompts em uma requisição (default: 20).
+            max_tokens_por_requisicao (int): Estimativa máxima de tokens (prompts + respostas) por requisição
+                (default: a janela de contexto do modelo, ou 8000 se ela não for conhecida).
+            max_concorrencia (int): Requisições simultâneas (default: 4).
+            usar_cache (bool): Repassado ao cliente HTTP, como em gerar_texto.
+            **kwargs: Parâmetros extras do payload (temperature, max_tokens, n, ...), iguais para todas as prompts.
+        Returns:
+            list[dict]: Uma resposta por prompt, na mesma ordem, no formato de gerar_texto
+                (com `choices` indexadas a partir de 0 e sem `usage`, que é da requisição inteira).
+                As prompts de um grupo cuja requisição falhou recebem {"erro", "tipo_erro"}; as dos
+                demais grupos, já pagas, não são descartadas. Uma prompt que sozinha não cabe na janela
+                de contexto recebe o erro sem ser enviada.
+        """
+        if not isinstance(prompts, list) or not prompts:
+            raise OpenAIValidationError("O parâmetro 'prompts' deve ser uma lista não vazia.", field="prompts")
+        for prompt in prompts:
+            if not isinstance(prompt, str) or not prompt:
+                raise OpenAIValidationError("Cada prompt deve ser uma string não vazia.", field="prompts", value=prompt)
+        if not isinstance(modelo, str) or not modelo:
+            raise OpenAIValidationError("O parâmetro 'modelo' deve ser uma string não vazia.", field="modelo")
+
+        if max_tokens_por_requisicao is None:
+            max_tokens_por_requisicao = janela_contexto(modelo) or 8000
+
+        resultados = [None] * len(prompts)
+        validas = []
+        for i, prompt in enumerate(prompts):
+            # Cada prompt da lista tem a própria janela de contexto: a checagem é por prompt, não por grupo
+            try:
+                verificar_janela_contexto(dict(kwargs, model=modelo, prompt=prompt))
+            except OpenAIValidationError as e:
+                resultados[i] = {"erro": str(e), "tipo_erro": type(e).__name__}
+                continue
+            validas.append(i)
+        if not validas:
+            return resultados
+
+        grupos = self._agrupar_prompts(prompts, validas, max_prompts_por_requisicao, max_tokens_por_requisicao, kwargs)
+        escolhas_por_prompt = kwargs.get("n") or 1
+
+        def enviar_grupo(indices: list):
+            payload = {"model": modelo, "prompt": [prompts[i] for i in indices]}
+            payload.update(kwargs)
+            if usar_cache is None:
+                return self.cliente_http.enviar("completions", dados=payload)
+            return self.cliente_http.enviar("completions", dados=payload, usar_cache=usar_cache)
+
+        with ThreadPoolExecutor(max_workers=min(max_concorrencia, len(grupos))) as executor:
+            futuros = {executor.submit(enviar_grupo, indices): indices for indices in grupos}
+            for futuro in as_completed(futuros):
+                indices = futuros[futuro]
+                try:
+                    resposta = futuro.result()
+                except Exception as e:
+                    # Uma falha (ex: 429 ou timeout) atinge só as prompts do próprio grupo
+                    for i in indices:
+                        resultados[i] = {"erro": str(e), "tipo_erro": type(e).__name__}
+                    continue
+                base = {k: v for k, v in resposta.items() if k not in ("choices", "usage")}
+                for i in indices:
+                    resultados[i] = dict(base, choices=[])
+                for escolha in resposta.get("choices", []):
+                    # A API numera as choices em sequência: prompt k, escolha j -> index k * n + j
+                    k, j = divmod(escolha["index"], escolhas_por_prompt)
+                    resultados[indices[k]]["choices"].append(dict(escolha, index=j))
+        return resultados
+
+    @staticmethod
+    def _agrupar_prompts(prompts: list, indices: list, max_prompts: int, max_tokens: int, parametros: dict) -> list:
+        """Divide os índices das prompts em grupos limitados por quantidade e por tokens estimados."""
+        grupos, atual, tokens_atual = [], [], 0
+        for i in indices:
+            tokens = estimar_tokens_payload({"prompt": prompts[i], "max_tokens": parametros.get("max_tokens"), "n": parametros.get("n")})
+            if atual and (len(atual) >= max_prompts or tokens_atual + tokens > max_tokens):
+                grupos.append(atual)
+                atual, tokens_atual = [], 0
+            atual.append(i)
+            tokens_atual += tokens
+        grupos.append(atual)
+        return grupos
+
+    def gerar_texto_stream(self, prompt: str, modelo: str = "text-davinci-003", **kwargs) -> RespostaStream:
+        """
+        Gera texto em modo streaming, produzindo os deltas à medida que chegam.
+        Ao final, `resposta_final()` devolve a resposta agregada no formato de gerar_texto.
+        """
+        if not isinstance(prompt, str) or not prompt:
+            raise OpenAIValidationError("O parâmetro 'prompt' deve ser uma string não vazia.", field="prompt")
+        if not isinstance(modelo, str) or not modelo:
+            raise OpenAIValidationError("O parâmetro 'modelo' deve ser uma string não vazia.", field="modelo")
+        payload = {"model": modelo, "prompt": prompt}
+        payload.update(kwargs)
+        verificar_janela_contexto(payload)
+        return RespostaStream(self.cliente_http.enviar_stream("completions", dados=payload))
 
 if __name__ == "__main__":
     print("Módulo Completions executado diretamente.")
@@ -34,6 +146,12 @@ if __name__ == "__main__":
 # Principais pontos:
 # - Validação dos parâmetros de entrada (prompt e modelo).
 # - Permite parâmetros extras (como temperature, max_tokens, etc) via **kwargs.
+# - gerar_textos() agrupa muitas prompts em poucas requisições (prompt em lista),
+#   enviadas em paralelo, e devolve uma resposta por prompt (ou o erro do seu grupo).
+# - Pré-checagem da janela de contexto (verificar_janela_contexto) antes do
+#   envio em todas as entradas, inclusive no streaming; em gerar_textos,
+#   prompt a prompt (cada uma tem a própria janela).
+# - gerar_texto_stream() entrega o texto incrementalmente (SSE).
 # - Utilização de uma classe cliente HTTP dedicada para abstrair a comunicação.
 # - Lança exceções customizadas (OpenAIValidationError) em caso de erro de uso.
 # - Pode ser executado diretamente para testes rápidos, exibindo a resposta da API.
@@ -32,6 +32,57 @@ class Config(BaseSettings):
     # --- Configurações de Retry e Backoff ---
     OPENAI_MAX_RETRIES: int = Field(3, description="Número máximo de tentativas para requisições à API OpenAI.")
     OPENAI_BACKOFF_FACTOR: float = Field(0.5, description="Fator de backoff exponencial para retries da API OpenAI.")
+    OPENAI_BACKOFF_MAX: float = Field(20.0, description="Maior espera, em segundos, entre duas tentativas (backoff com jitter).")
+    OPENAI_RETRY_BUDGET_RATIO: float = Field(0.1, description="Fração máxima do tráfego que pode ser re-tentada (orçamento de retries).")
+    OPENAI_RETRY_MAX_TOTAL_TIME: float = Field(30.0, description="Tempo máximo, em segundos, de uma requisição somando todas as tentativas.")
+
+    # --- Cache de respostas ---
+    OPENAI_CACHE_ENABLED: bool = Field(False, description="Ativa o cache de respostas determinísticas (temperature 0) no cliente compartilhado.")
+    OPENAI_CACHE_BACKEND: str = Field("memoria", description="Onde fica o cache: 'memoria' (por processo) ou 'sqlite' (persistente, compartilhado entre processos).")
+    OPENAI_CACHE_DB_PATH: str = Field("", description="Arquivo SQLite do cache persistente. Padrão: ~/.cache/projetoapi/respostas.sqlite3.")
+    OPENAI_CACHE_MAX_ITEMS: int = Field(1000, description="Máximo de respostas mantidas no cache em memória (expulsão LRU).")
+    OPENAI_CACHE_MAX_BYTES: int = Field(100 * 1024 * 1024, description="Tamanho máximo, em bytes, das respostas no cache SQLite (expulsão LRU).")
+    OPENAI_CACHE_TTL: float = Field(3600.0, description="Segundos que uma resposta permanece válida no cache.")
+    OPENAI_SEMANTIC_CACHE_ENABLED: bool = Field(False, description="Ativa o cache semântico do /chat: perguntas equivalentes (por embedding) reaproveitam a resposta.")
+    OPENAI_SEMANTIC_CACHE_THRESHOLD: float = Field(0.95, description="Similaridade de cosseno mínima para duas perguntas serem consideradas equivalentes.")
+    OPENAI_SEMANTIC_CACHE_MAX_ITEMS: int = Field(1000, description="Máximo de perguntas guardadas por modelo no cache semântico (expulsão LRU).")
+    OPENAI_COALESCE_REQUESTS: bool = Field(True, description="Agrupa chamadas idênticas simultâneas (GETs e POSTs determinísticos) em uma única requisição à API.")
+
+    # --- Circuit breaker por endpoint/modelo ---
+    OPENAI_CIRCUIT_FAILURE_THRESHOLD: int = Field(5, description="Falhas consecutivas (5xx, timeout, conexão) que abrem o circuito de um endpoint/modelo.")
+    OPENAI_CIRCUIT_OPEN_SECONDS: float = Field(30.0, description="Segundos com o circuito aberto antes de liberar uma chamada de teste.")
+
+    # --- Catálogo de modelos (/models) ---
+    OPENAI_MODELS_TTL: float = Field(300.0, description="Segundos em que a lista de modelos em memória é considerada atual.")
+    OPENAI_MODELS_MAX_STALE: float = Field(86400.0, description="Idade máxima da lista de modelos servida enquanto ela é atualizada em segundo plano.")
+
+    # --- Embeddings e busca por contexto (RAG) ---
+    OPENAI_EMBEDDINGS_MODEL: str = Field("text-embedding-3-small", description="Modelo usado para gerar embeddings.")
+    OPENAI_VECTOR_STORE_PATH: str = Field("", description="Diretório do índice de vetores usado como contexto no /chat (vazio desativa).")
+    OPENAI_RAG_TOP_K: int = Field(3, description="Trechos do índice de vetores injetados como contexto por pergunta.")
+    OPENAI_RAG_MIN_SIMILARITY: float = Field(0.3, description="Similaridade de cosseno mínima para um trecho entrar no contexto.")
+
+    # --- Contexto de conversa ---
+    OPENAI_CONTEXT_MAX_TOKENS: int = Field(8000, description="Orçamento de tokens do histórico enviado ao modelo no modo interativo; as mensagens mais antigas saem primeiro.")
+    OPENAI_CONTEXT_SUMMARY_ENABLED: bool = Field(False, description="Troca os turnos mais antigos por um resumo gerado pelo modelo (em segundo plano) em vez de apenas descartá-los.")
+    OPENAI_CONTEXT_SUMMARY_MODEL: str = Field("gpt-4o-mini", description="Modelo usado para resumir os turnos antigos da conversa.")
+
+    # --- Sessões do /chat ---
+    OPENAI_SESSIONS_MAX: int = Field(1000, description="Máximo de sessões de conversa mantidas no servidor; no limite, novas sessões são recusadas (503) até alguma expirar.")
+    OPENAI_SESSION_IDLE_TTL: float = Field(1800.0, description="Segundos sem uso após os quais uma sessão de conversa expira.")
+    OPENAI_SESSION_MAX_TOKENS: int = Field(16000, description="Orçamento de tokens do histórico guardado em cada sessão; as mensagens mais antigas saem (ou são resumidas) primeiro.")
+
+    # --- Configurações do Cliente Compartilhado (pool de conexões) ---
+    OPENAI_POOL_MAXSIZE: int = Field(20, description="Máximo de conexões keep-alive mantidas no pool do cliente HTTP compartilhado.")
+    OPENAI_KEEPALIVE_EXPIRY: float = Field(30.0, description="Segundos que uma conexão ociosa permanece aberta no pool (cliente assíncrono).")
+    OPENAI_MAX_REQUESTS_PER_SECOND: float = Field(10.0, description="Limite local de requisições por segundo do cliente HTTP compartilhado.")
+
+    # --- Limites RPM/TPM por modelo ---
+    OPENAI_DEFAULT_RPM: int = Field(500, description="Requisições por minuto permitidas por modelo, quando não especificado em OPENAI_MODEL_RATE_LIMITS.")
+    OPENAI_DEFAULT_TPM: int = Field(30000, description="Tokens por minuto permitidos por modelo, quando não especificado em OPENAI_MODEL_RATE_LIMITS.")
+    OPENAI_MODEL_RATE_LIMITS: dict = Field(default_factory=dict, description='Limites por modelo em JSON, ex: {"gpt-4o": {"rpm": 500, "tpm": 30000}}.')
+    OPENAI_RATE_LIMIT_BACKEND: str = Field("memoria", description="Onde fica o estado dos limites: 'memoria' (por processo) ou 'sqlite' (compartilhado entre processos do host).")
+    OPENAI_RATE_LIMIT_DB_PATH: str = Field("", description="Arquivo SQLite do backend 'sqlite'. Padrão: openai_rate_limit.sqlite3 no diretório temporário.")
 
     # --- Configurações de Logging ---
     # Mapeamento de nível de log 
@@ -112,6 +163,7 @@ if __name__ == "__main__":
         print(f"OPENAI_TIMEOUT: {settings.OPENAI_TIMEOUT}s")
         print(f"OPENAI_MAX_RETRIES: {settings.OPENAI_MAX_RETRIES}")
         print(f"OPENAI_BACKOFF_FACTOR: {settings.OPENAI_BACKOFF_FACTOR}")
+        print(f"OPENAI_POOL_MAXSIZE: {settings.OPENAI_POOL_MAXSIZE}")
         print(f"LOG_LEVEL (Console/Root): {settings.LOG_LEVEL} (parsed: {settings.parsed_log_level})")
         print(f"LOG_DIR: {settings.LOG_DIR}")
         print(f"LOG_FILE_NAME: {settings.LOG_FILE_NAME}")
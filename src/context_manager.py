@@ -1,23 +1,304 @@
+import copy
+import logging
+
+from src.tokenizer import TOKENS_INICIO_RESPOSTA, contar_tokens_mensagem
+
+logger = logging.getLogger(__name__)
+
+# Papéis fixados no início do contexto, que nunca são descartados pelos limites
+PAPEIS_FIXOS = ("system", "developer")
+# Início da mensagem de sistema que carrega o resumo dos turnos compactados
+PREFIXO_RESUMO = "Resumo da conversa até aqui:\n"
+# Fração de max_tokens a partir da qual a compactação por resumo começa (se não informado o limiar)
+FRACAO_LIMIAR_RESUMO = 0.75
+
+
+class ContextoSomenteLeitura(list):
+    """
+    Lista de mensagens devolvida por ContextManager.get_contexto().
+    Pode ser enviada diretamente à API (é uma lista), mas não pode ser alterada: a mesma
+    instância é reaproveitada enquanto o contexto não muda. Para editar, faça uma cópia (list(...)).
+    """
+
+    def _somente_leitura(self, *args, **kwargs):
+        raise TypeError("O contexto é somente leitura; use ContextManager.adicionar_mensagem ou faça uma cópia com list().")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _somente_leitura
+    append = extend = insert = pop = remove = clear = sort = reverse = _somente_leitura
+
+    def __reduce_ex__(self, protocolo):
+        # copy, deepcopy e pickle produzem uma lista comum, editável
+        return (list, (list(self),))
+
+
+class _No:
+    """
+    Nó imutável do histórico: uma mensagem e o ponteiro para a anterior.
+    Ramificações de uma conversa apontam para os mesmos nós e compartilham o prefixo comum.
+    """
+    __slots__ = ("mensagem", "tokens", "anterior", "salto", "posicao", "acumulado")
+
+    def __init__(self, mensagem, tokens, anterior=None):
+        self.mensagem = mensagem
+        self.tokens = tokens
+        self.anterior = anterior
+        if anterior is None:
+            self.posicao = 0
+            self.acumulado = tokens
+            self.salto = self
+        else:
+            self.posicao = anterior.posicao + 1
+            self.acumulado = anterior.acumulado + tokens
+            # Ponteiro de salto (skew-binary): qualquer ancestral é alcançado em O(log n) passos
+            salto = anterior.salto
+            if anterior.posicao - salto.posicao == salto.posicao - salto.salto.posicao:
+                self.salto = salto.salto
+            else:
+                self.salto = anterior
+
+    def ancestral(self, posicao):
+        """Nó da mesma cadeia na `posicao` informada (que deve ser <= self.posicao)."""
+        no = self
+        while no.posicao > posicao:
+            no = no.salto if no.salto.posicao >= posicao else no.anterior
+        return no
+
+
 class ContextManager:
     """
     Gerencia o histórico de mensagens para manter o contexto de conversação com o modelo.
-    Permite adicionar, recuperar e limpar o contexto.
+    Permite adicionar, recuperar, limpar e ramificar o contexto.
+    As mensagens de sistema ficam fixadas no início; as demais formam uma cadeia imutável de nós
+    e as mais antigas são descartadas quando o contexto passa do limite de mensagens ou de tokens.
+    Com um resumidor, os turnos mais antigos são antes trocados por um resumo (compactação).
     """
-    def __init__(self, max_length=20):
-        self.mensagens = []
+    def __init__(self, max_length=20, max_tokens=None, modelo=None, resumidor=None, limiar_resumo=None, mensagens_por_resumo=6):
+        """
+        Args:
+            max_length (int): Máximo de mensagens da conversa (sem contar as de sistema); None desativa (default: 20).
+            max_tokens (int): Orçamento de tokens do contexto inteiro, incluindo as mensagens de sistema; None desativa.
+            modelo (str): Modelo de destino, usado na contagem de tokens.
+            resumidor: Objeto com `resumir_em_segundo_plano(mensagens, resumo_anterior)` (ex: ResumidorConversa);
+                None desativa a compactação.
+            limiar_resumo (int): Total de tokens a partir do qual os turnos antigos são resumidos (default: 75% de max_tokens).
+            mensagens_por_resumo (int): Mensagens mais antigas trocadas pelo resumo a cada compactação (default: 6).
+        """
         self.max_length = max_length
+        self.max_tokens = max_tokens
+        self.modelo = modelo
+        self.resumidor = resumidor
+        if limiar_resumo is None and max_tokens is not None:
+            limiar_resumo = int(max_tokens * FRACAO_LIMIAR_RESUMO)
+        self.limiar_resumo = limiar_resumo
+        self.mensagens_por_resumo = mensagens_por_resumo
+        self._fixas = ()
+        self._tokens_fixas = 0
+        self._cauda = None  # nó da mensagem mais recente
+        self._primeiro = None  # nó da mensagem mais antiga ainda no contexto
+        self._resumo = None  # (mensagem, tokens, texto)
+        self._resumo_pendente = None  # (futuro, mensagens resumidas)
+        self._adicionadas = 0
+        self._proxima_tentativa_resumo = 0
+        self._visao = None
+
+    def adicionar_mensagem(self, role, content, **campos):
+        """
+        Acrescenta uma mensagem ao contexto, descartando as mais antigas se necessário.
+        Args:
+            role (str): Papel da mensagem ('system', 'user', 'assistant', 'tool', ...).
+            content: Conteúdo (texto ou lista de partes).
+            **campos: Campos extras da mensagem (ex: name, tool_calls, tool_call_id).
+        """
+        self._aplicar_resumo_pronto()
+        mensagem = {"role": role, "content": content, **campos}
+        tokens = contar_tokens_mensagem(mensagem, self.modelo)
+        if role in PAPEIS_FIXOS:
+            self._fixas += (mensagem,)
+            self._tokens_fixas += tokens
+        else:
+            self._cauda = _No(mensagem, tokens, self._cauda)
+            if self._primeiro is None:
+                self._primeiro = self._cauda
+            self._adicionadas += 1
+        # O resumo é agendado antes do descarte, para cobrir também as mensagens que vão sair
+        self._agendar_resumo()
+        self._aplicar_limites()
+        self._visao = None
+
+    def ramificar(self):
+        """
+        Cria uma ramificação da conversa (ex: regenerar uma resposta ou testar outro modelo).
+        A cópia é O(1): as duas conversas compartilham o histórico atual e, daqui em diante,
+        cada uma acrescenta suas próprias mensagens sem afetar a outra.
+        Returns:
+            ContextManager: A nova ramificação, com os mesmos limites e resumidor.
+        """
+        return copy.copy(self)
+
+    def _quantidade_conversa(self) -> int:
+        return 0 if self._cauda is None else self._cauda.posicao - self._primeiro.posicao + 1
+
+    def _tokens_conversa(self) -> int:
+        if self._cauda is None:
+            return 0
+        return self._cauda.acumulado - self._primeiro.acumulado + self._primeiro.tokens
+
+    def _mensagens_conversa(self) -> list:
+        """Mensagens da conversa, da mais antiga para a mais recente (percorre a cadeia uma vez)."""
+        mensagens = []
+        no = self._cauda
+        while no is not None and no.posicao >= self._primeiro.posicao:
+            mensagens.append(no.mensagem)
+            no = no.anterior
+        mensagens.reverse()
+        return mensagens
+
+    def _excede(self) -> bool:
+        if self.max_length is not None and self._quantidade_conversa() > self.max_length:
+            return True
+        return self.max_tokens is not None and self.total_tokens > self.max_tokens
+
+    def _aplicar_limites(self):
+        # A mensagem mais recente é sempre mantida, mesmo que sozinha passe do orçamento
+        while self._quantidade_conversa() > 1 and self._excede():
+            self._descartar_mais_antigas()
+            # Respostas de ferramenta sem a chamada que as originou seriam recusadas pela API
+            while self._quantidade_conversa() > 1 and self._primeiro.mensagem.get("role") == "tool":
+                self._descartar_mais_antigas()
+        self._reenraizar_se_necessario()
+
+    def _descartar_mais_antigas(self, quantidade=1):
+        self._primeiro = self._cauda.ancestral(self._primeiro.posicao + quantidade)
 
-    def adicionar_mensagem(self, role, content):
-        self.mensagens.append({"role": role, "content": content})
-        # Mantém apenas as últimas max_length mensagens
-        if len(self.mensagens) > self.max_length:
-            self.mensagens = self.mensagens[-self.max_length:]
+    def _reenraizar_se_necessario(self):
+        """
+        Os nós descartados continuam presos à cadeia (outras ramificações podem usá-los). Quando eles
+        passam a ser a maioria, esta conversa passa a usar uma cadeia nova só com as mensagens atuais,
+        para que a memória dos descartados possa ser liberada. O custo é amortizado pelos descartes.
+        """
+        if self._primeiro is None or self._primeiro.posicao <= max(64, self._quantidade_conversa()):
+            return
+        antigos = []
+        no = self._cauda
+        while no.posicao >= self._primeiro.posicao:
+            antigos.append(no)
+            no = no.anterior
+        no = None
+        for antigo in reversed(antigos):
+            no = _No(antigo.mensagem, antigo.tokens, no)
+            if no.anterior is None:
+                self._primeiro = no
+        self._cauda = no
+
+    def _agendar_resumo(self):
+        """Começa, em segundo plano, o resumo das mensagens mais antigas se o contexto passou do limiar."""
+        if self.resumidor is None or self.limiar_resumo is None or self._resumo_pendente is not None:
+            return
+        if self.total_tokens <= self.limiar_resumo or self._adicionadas < self._proxima_tentativa_resumo:
+            return
+        # O último par pergunta/resposta fica sempre fora do resumo
+        disponiveis = self._quantidade_conversa() - 2
+        if disponiveis <= 0:
+            return
+        conversa = self._mensagens_conversa()
+        quantidade = min(self.mensagens_por_resumo, disponiveis)
+        # O trecho resumido termina em uma fronteira de turno (logo antes de uma mensagem do usuário)
+        while quantidade > 0 and conversa[quantidade].get("role") != "user":
+            quantidade -= 1
+        if quantidade <= 0:
+            return
+        lote = conversa[:quantidade]
+        anterior = self._resumo[2] if self._resumo is not None else None
+        self._resumo_pendente = (self.resumidor.resumir_em_segundo_plano(lote, anterior), lote)
+
+    def _aplicar_resumo_pronto(self, esperar=False, timeout=None) -> bool:
+        """
+        Troca as mensagens resumidas pelo resumo, se ele já estiver pronto (ou após esperá-lo).
+        Returns:
+            bool: True se um resumo foi aplicado.
+        """
+        if self._resumo_pendente is None:
+            return False
+        futuro, lote = self._resumo_pendente
+        if not esperar and not futuro.done():
+            return False
+        try:
+            texto = futuro.result(timeout=timeout)
+        except TimeoutError:
+            return False
+        except Exception as e:
+            # Sem resumo, o contexto continua sendo limitado apenas pelo descarte; nova tentativa mais adiante
+            self._resumo_pendente = None
+            self._proxima_tentativa_resumo = self._adicionadas + self.mensagens_por_resumo
+            logger.warning(f"Falha ao resumir o contexto: {e}")
+            return False
+        self._resumo_pendente = None
+        # Parte do trecho resumido pode já ter sido descartada pelos limites enquanto o resumo era gerado
+        if self._cauda is not None:
+            inicio = next((i for i, m in enumerate(lote) if m is self._primeiro.mensagem), None)
+            if inicio is not None:
+                self._descartar_mais_antigas(min(len(lote) - inicio, self._quantidade_conversa() - 1))
+        if self._resumo is not None:
+            self._tokens_fixas -= self._resumo[1]
+        mensagem = {"role": "system", "content": PREFIXO_RESUMO + texto}
+        tokens = contar_tokens_mensagem(mensagem, self.modelo)
+        self._resumo = (mensagem, tokens, texto)
+        self._tokens_fixas += tokens
+        # Se o contexto ainda estiver acima do limiar, a próxima compactação já começa
+        self._agendar_resumo()
+        self._aplicar_limites()
+        self._visao = None
+        return True
+
+    def aguardar_resumo(self, timeout=None) -> bool:
+        """
+        Espera o resumo em andamento (se houver) e o aplica ao contexto.
+        Returns:
+            bool: True se um resumo foi aplicado.
+        """
+        return self._aplicar_resumo_pronto(esperar=True, timeout=timeout)
+
+    @property
+    def resumo(self):
+        """Texto do resumo dos turnos compactados, ou None."""
+        return self._resumo[2] if self._resumo is not None else None
+
+    @property
+    def total_tokens(self) -> int:
+        """Tokens de prompt do contexto atual (todas as mensagens, mais o início da resposta)."""
+        return self._tokens_fixas + self._tokens_conversa() + TOKENS_INICIO_RESPOSTA
+
+    @property
+    def mensagens(self):
+        return self.get_contexto()
 
     def get_contexto(self):
-        return list(self.mensagens)
+        """
+        Returns:
+            ContextoSomenteLeitura: Mensagens de sistema seguidas da conversa, prontas para o payload.
+            A lista só é montada quando pedida; leituras seguidas sem alterações devolvem a mesma
+            instância, sem copiar o histórico.
+        """
+        self._aplicar_resumo_pronto()
+        if self._visao is None:
+            visao = ContextoSomenteLeitura(self._fixas)
+            if self._resumo is not None:
+                list.append(visao, self._resumo[0])
+            list.extend(visao, self._mensagens_conversa())
+            self._visao = visao
+        return self._visao
+
+    def __len__(self):
+        return len(self._fixas) + (self._resumo is not None) + self._quantidade_conversa()
 
     def limpar(self):
-        self.mensagens.clear()
+        self._fixas = ()
+        self._tokens_fixas = 0
+        self._cauda = None
+        self._primeiro = None
+        self._resumo = None
+        self._resumo_pendente = None
+        self._visao = None
 
 if __name__ == "__main__":
     ctx = ContextManager(max_length=3)
@@ -37,16 +318,31 @@ if __name__ == "__main__":
 #
 # Principais pontos:
 # - Mantém o contexto de conversas para interações mais naturais com o modelo.
-# - Limita o número de mensagens armazenadas (max_length) para evitar excesso de contexto.
-# - Métodos simples para adicionar, recuperar e limpar mensagens.
+# - Mensagens de sistema fixadas no início; nunca são descartadas.
+# - Conversa em uma cadeia imutável de nós (cada um aponta para a mensagem
+#   anterior e guarda o total acumulado de tokens): acrescentar é O(1) e
+#   descartar as mais antigas só move o início da janela (O(log n) com os
+#   ponteiros de salto).
+# - ramificar(): cópia O(1) da conversa; as ramificações compartilham o
+#   prefixo comum na memória e a lista de mensagens só é montada no envio.
+# - Limites por quantidade de mensagens (max_length) e por orçamento de tokens
+#   (max_tokens, contados por src/tokenizer.py), o que evita tanto estourar a
+#   janela do modelo com documentos colados quanto descartar demais.
+# - Compactação opcional (resumidor, ver src/summarizer.py): ao passar de
+#   limiar_resumo, as mensagens mais antigas são resumidas em segundo plano e
+#   trocadas por uma única mensagem de sistema com o resumo, sem bloquear o
+#   turno seguinte; cada novo resumo incorpora o anterior.
+# - get_contexto() devolve uma lista somente leitura, reaproveitada enquanto o
+#   contexto não muda (sem cópia a cada leitura).
 # - Pode ser executado diretamente para testes rápidos do gerenciamento de contexto.
 #
 # Uso típico:
-#   ctx = ContextManager(max_length=10)
+#   ctx = ContextManager(max_length=None, max_tokens=8000, modelo="gpt-4o-mini")
+#   ctx.adicionar_mensagem("system", "Você é um assistente útil.")
 #   ctx.adicionar_mensagem("user", "Olá!")
-#   contexto = ctx.get_contexto()
+#   resposta = chat.criar_conversa(ctx.get_contexto(), modelo="gpt-4o-mini")
+#   alternativa = ctx.ramificar()  # "e se?" com outro modelo, sem copiar o histórico
 #
 # Este arquivo é útil para aplicações que precisam manter o histórico de
 # interações do usuário com o assistente, garantindo que o modelo tenha
 # acesso ao contexto recente da conversa.
-
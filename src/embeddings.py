@@ -0,0 +1,152 @@
+import base64
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.exceptions import OpenAIValidationError
+from src.http_client import ClienteHttpOpenAI
+from src.rate_limiter import estimar_tokens_payload
+
+# Limites do endpoint /embeddings por requisição
+MAX_ENTRADAS_POR_REQUISICAO = 2048
+MAX_TOKENS_POR_REQUISICAO = 300000
+
+
+class EmbeddingsModule:
+    def __init__(self, cliente_http: ClienteHttpOpenAI = None):
+        # Permite reutilizar um cliente compartilhado (pool de conexões e rate limiter do processo)
+        self.cliente_http = cliente_http if cliente_http is not None else ClienteHttpOpenAI()
+
+    def gerar_embeddings(self, textos: list, modelo: str = "text-embedding-3-small", max_entradas_por_requisicao: int = MAX_ENTRADAS_POR_REQUISICAO, max_tokens_por_requisicao: int = MAX_TOKENS_POR_REQUISICAO, max_concorrencia: int = 4, **kwargs) -> np.ndarray:
+        """
+        Gera os embeddings de vários textos em poucas requisições.
+        Textos repetidos são enviados uma única vez; os únicos são agrupados respeitando os limites
+        de entradas e de tokens por requisição, e os grupos são enviados em paralelo. Os vetores
+        são pedidos em base64 e decodificados direto para float32, sem passar por listas Python.
+        Args:
+            textos (list[str]): Textos a converter.
+            modelo (str): Modelo de embeddings (default: 'text-embedding-3-small').
+            max_entradas_por_requisicao (int): Máximo de textos por requisição (default: 2048).
+            max_tokens_por_requisicao (int): Estimativa máxima de tokens por requisição (default: 300000).
+            max_concorrencia (int): Requisições simultâneas (default: 4).
+            **kwargs: Parâmetros extras do payload (ex: dimensions, user).
+        Returns:
+            np.ndarray: Matriz float32 contígua (len(textos), dimensão), uma linha por texto, na ordem recebida.
+        """
+        if not isinstance(textos, list) or not textos:
+            raise OpenAIValidationError("O parâmetro 'textos' deve ser uma lista não vazia.", field="textos")
+        for texto in textos:
+            if not isinstance(texto, str) or not texto:
+                raise OpenAIValidationError("Cada texto deve ser uma string não vazia.", field="textos", value=texto)
+        if not isinstance(modelo, str) or not modelo:
+            raise OpenAIValidationError("O parâmetro 'modelo' deve ser uma string não vazia.", field="modelo")
+
+        posicoes = {}
+        inversos = np.fromiter((posicoes.setdefault(t, len(posicoes)) for t in textos), dtype=np.intp, count=len(textos))
+        unicos = list(posicoes)
+        grupos = self._agrupar(unicos, max_entradas_por_requisicao, max_tokens_por_requisicao)
+
+        def enviar_grupo(inicio_fim: tuple):
+            inicio, fim = inicio_fim
+            payload = {"model": modelo, "input": unicos[inicio:fim], "encoding_format": "base64"}
+            payload.update(kwargs)
+            return inicio, self.cliente_http.enviar("embeddings", dados=payload)
+
+        matriz = None
+        with ThreadPoolExecutor(max_workers=min(max_concorrencia, len(grupos))) as executor:
+            for inicio, resposta in executor.map(enviar_grupo, grupos):
+                for item in resposta["data"]:
+                    vetor = _decodificar_vetor(item["embedding"])
+                    if matriz is None:
+                        matriz = np.empty((len(unicos), vetor.shape[0]), dtype=np.float32)
+                    matriz[inicio + item["index"]] = vetor
+        return matriz if len(unicos) == len(textos) else matriz[inversos]
+
+    @staticmethod
+    def _agrupar(textos: list, max_entradas: int, max_tokens: int) -> list:
+        """Divide os textos em faixas contíguas [inicio, fim) limitadas por quantidade e por tokens estimados."""
+        grupos, inicio, tokens_atual = [], 0, 0
+        for i, texto in enumerate(textos):
+            tokens = estimar_tokens_payload({"input": texto})
+            if i > inicio and (i - inicio >= max_entradas or tokens_atual + tokens > max_tokens):
+                grupos.append((inicio, i))
+                inicio, tokens_atual = i, 0
+            tokens_atual += tokens
+        grupos.append((inicio, len(textos)))
+        return grupos
+
+
+def _decodificar_vetor(embedding) -> np.ndarray:
+    """Converte o embedding da API (base64 de float32 little-endian ou lista de floats) em um vetor float32."""
+    if isinstance(embedding, str):
+        return np.frombuffer(base64.b64decode(embedding), dtype="<f4")
+    return np.asarray(embedding, dtype=np.float32)
+
+
+def normalizar(matriz: np.ndarray) -> np.ndarray:
+    """
+    Normaliza os vetores (linhas) para norma 1, de modo que o produto escalar seja a similaridade de cosseno.
+    Vetores nulos permanecem nulos.
+    """
+    matriz = np.asarray(matriz, dtype=np.float32)
+    normas = np.linalg.norm(matriz, axis=-1, keepdims=True)
+    return matriz / np.where(normas == 0, 1, normas)
+
+
+def similaridade_cosseno(consultas: np.ndarray, matriz: np.ndarray) -> np.ndarray:
+    """
+    Similaridade de cosseno entre cada consulta e cada linha de `matriz`, em uma única multiplicação de matrizes.
+    Args:
+        consultas (np.ndarray): Vetor (d,) ou matriz (q, d).
+        matriz (np.ndarray): Matriz (n, d).
+    Returns:
+        np.ndarray: (n,) para uma consulta ou (q, n) para várias.
+    """
+    return normalizar(consultas) @ normalizar(matriz).T
+
+
+def top_k(consultas: np.ndarray, matriz: np.ndarray, k: int = 5, ja_normalizados: bool = False) -> tuple:
+    """
+    Os `k` vetores de `matriz` mais similares (cosseno) a cada consulta.
+    Usa argpartition (O(n)) e ordena apenas os k escolhidos.
+    Args:
+        consultas (np.ndarray): Vetor (d,) ou matriz (q, d).
+        matriz (np.ndarray): Matriz (n, d).
+        k (int): Quantidade de resultados por consulta.
+        ja_normalizados (bool): Se True, pula a normalização (vetores já com norma 1).
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (índices, similaridades), com forma (k,) ou (q, k), da maior para a menor.
+    """
+    if ja_normalizados:
+        similaridades = np.asarray(consultas, dtype=np.float32) @ np.asarray(matriz, dtype=np.float32).T
+    else:
+        similaridades = similaridade_cosseno(consultas, matriz)
+    k = min(k, similaridades.shape[-1])
+    if k <= 0:
+        vazio = np.empty(similaridades.shape[:-1] + (0,))
+        return vazio.astype(np.intp), vazio.astype(np.float32)
+    candidatos = np.argpartition(-similaridades, k - 1, axis=-1)[..., :k]
+    valores = np.take_along_axis(similaridades, candidatos, axis=-1)
+    ordem = np.argsort(-valores, axis=-1)
+    return np.take_along_axis(candidatos, ordem, axis=-1), np.take_along_axis(valores, ordem, axis=-1)
+
+# -----------------------------------------------------------------------------
+#
+# Este módulo implementa o suporte ao endpoint /embeddings da OpenAI e as
+# operações vetoriais usadas sobre os embeddings (busca por similaridade).
+#
+# Principais pontos:
+# - EmbeddingsModule.gerar_embeddings: deduplica os textos, agrupa em
+#   requisições dentro dos limites de entradas e de tokens, envia em paralelo
+#   e devolve uma matriz NumPy float32 contígua, na ordem de entrada.
+# - Vetores pedidos em base64 e decodificados com np.frombuffer (evita criar
+#   milhares de floats Python por resposta).
+# - normalizar, similaridade_cosseno e top_k: operações vetorizadas; top_k
+#   usa argpartition e aceita várias consultas de uma vez.
+#
+# Uso típico:
+#   embeddings = EmbeddingsModule(cliente_http=obter_cliente_compartilhado())
+#   matriz = embeddings.gerar_embeddings(documentos)
+#   indices, scores = top_k(embeddings.gerar_embeddings([pergunta])[0], matriz, k=3)
+#
+# -----------------------------------------------------------------------------
@@ -72,6 +72,13 @@ class OpenAIRetryError(OpenAIClientError):
         super().__init__(message, details=str(original_exception) if original_exception else None)
         self.original_exception = original_exception
 
+class OpenAICircuitOpenError(OpenAIClientError):
+    """Exception for calls rejected locally because the circuit breaker for the endpoint/model is open."""
+    def __init__(self, message="Circuito aberto: a API OpenAI está instável para este endpoint/modelo.", chave=None, tempo_restante=None):
+        super().__init__(message, details=f"nova tentativa em {tempo_restante:.1f}s" if tempo_restante is not None else None)
+        self.chave = chave
+        self.tempo_restante = tempo_restante
+
 class OpenAIAPIError(OpenAIClientError):
     """Generic exception for errors returned by OpenAI API not specifically mapped."""
     def __init__(self, message, status_code=None, error_details=None, original_exception=None):
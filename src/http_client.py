@@ -3,6 +3,9 @@ import requests
 import json
 import time
 import logging
+import threading
+from collections import deque
+from requests.adapters import HTTPAdapter
 from requests.exceptions import Timeout, ConnectionError, HTTPError, RequestException
 
 from src.exceptions import (
@@ -16,11 +19,63 @@ from src.exceptions import (
     OpenAITimeoutError,
     OpenAIConnectionError,
     OpenAIRetryError,
+    OpenAICircuitOpenError,
 )
 from src.config import Config
+from src.streaming import iterar_eventos_sse
+from src.retry import CicloRetry, OrcamentoRetry
+from src.cache import CacheRespostas, chave_payload, eh_deterministico
+from src.circuit_breaker import RegistroDisjuntores
+from src.singleflight import GrupoChamadas
+from src.rate_limiter import (
+    BaldeTokens,
+    LimitadorPorModelo,
+    LimitesServidor,
+    Reserva,
+    estimar_tokens_payload,
+    ler_cabecalhos_rate_limit,
+    namespace_chave_api,
+)
 
 logger = logging.getLogger(__name__)
 
+
+def tratar_erro_resposta(resposta):
+    """
+    Converte uma resposta HTTP de erro na exceção customizada correspondente e a levanta.
+    Aceita tanto `requests.Response` quanto `httpx.Response`, permitindo que os clientes
+    síncrono e assíncrono compartilhem o mesmo mapeamento de erros.
+    Args:
+        resposta: Resposta HTTP com status de erro.
+    """
+    from src.http_status_reasons import HTTP_STATUS_REASONS
+    codigo_status = resposta.status_code
+    reason = getattr(resposta, "reason", None) or getattr(resposta, "reason_phrase", None) or HTTP_STATUS_REASONS.get(codigo_status, "Unknown Error")
+    mensagem_erro = f"{codigo_status} - {reason}"
+    error_details = None
+
+    try:
+        json_erro = resposta.json()
+        if "error" in json_erro:
+            error_details = json_erro["error"]
+            mensagem_erro += f" | Detalhes da API: {error_details.get('message', 'N/A')}"
+    except json.JSONDecodeError:
+        mensagem_erro += f" | Corpo da resposta não-JSON: {resposta.text[:200]}..."
+
+    if codigo_status in (401, 403):
+        raise OpenAIAuthenticationError(mensagem_erro, status_code=codigo_status, error_details=error_details)
+    elif codigo_status == 400:
+        raise OpenAIBadRequestError(mensagem_erro, status_code=codigo_status, error_details=error_details)
+    elif codigo_status == 404:
+        raise OpenAINotFoundError(mensagem_erro, status_code=codigo_status, error_details=error_details)
+    elif codigo_status == 429:
+        raise OpenAIRateLimitError(mensagem_erro, status_code=codigo_status, error_details=error_details)
+    elif codigo_status >= 500:
+        raise OpenAIServerError(mensagem_erro, status_code=codigo_status, error_details=error_details)
+    else:
+        raise OpenAIAPIError(mensagem_erro, status_code=codigo_status, error_details=error_details)
+
+
 class ClienteHttpOpenAI:
     def obter(self, ponto_final: str, params: dict = None) -> dict:
         """
@@ -31,28 +86,165 @@ class ClienteHttpOpenAI:
         Returns:
             dict: Resposta da API em formato JSON.
         """
-        return self._realizar_requisicao("GET", ponto_final, params=params)
+        if self.agrupador is None:
+            return self._realizar_requisicao("GET", ponto_final, params=params)
+        return self.agrupador.executar(
+            chave_payload(f"GET {ponto_final}", params or {}),
+            lambda: self._realizar_requisicao("GET", ponto_final, params=params),
+        )
 
-    def enviar(self, ponto_final: str, dados: dict = None) -> dict:
+    def enviar(self, ponto_final: str, dados: dict = None, usar_cache: bool = None) -> dict:
         """
         Realiza uma requisição POST para o endpoint especificado.
         Args:
             ponto_final (str): Endpoint da API (ex: 'chat/completions').
             dados (dict): Dados para envio no corpo da requisição.
+            usar_cache (bool): True força o uso do cache, False o ignora; None (padrão) usa o cache
+                apenas em chamadas determinísticas (temperature 0). Sem efeito se o cliente não tem cache.
         Returns:
             dict: Resposta da API em formato JSON.
         """
+        chave = self._chave_reaproveitavel(ponto_final, dados, usar_cache)
+        if chave is not None and self.cache is not None:
+            em_cache = self.cache.obter(chave)
+            if em_cache is not None:
+                return em_cache
+        if chave is not None and self.agrupador is not None:
+            # Chamadas idênticas simultâneas esperam a primeira em vez de irem à API
+            return self.agrupador.executar(chave, lambda: self._enviar_post(ponto_final, dados, chave))
+        return self._enviar_post(ponto_final, dados, chave)
+
+    def _enviar_post(self, ponto_final: str, dados: dict, chave_cache: str = None) -> dict:
         headers = {"Content-Type": "application/json"}
-        return self._realizar_requisicao("POST", ponto_final, json=dados, headers=headers)
+        reserva = self._reservar_limite_modelo(dados)
+        resultado = self._realizar_requisicao("POST", ponto_final, json=dados, headers=headers)
+        self._conciliar_limite_modelo(reserva, (resultado or {}).get("usage"))
+        if chave_cache is not None and self.cache is not None and isinstance(resultado, dict):
+            self.cache.guardar(chave_cache, resultado)
+        return resultado
+
+    def _chave_reaproveitavel(self, ponto_final: str, dados: dict, usar_cache: bool):
+        """
+        Chave da chamada para cache e agrupamento, ou None quando a resposta não pode ser reaproveitada
+        (chamadas não determinísticas, a menos que `usar_cache=True`, ou `usar_cache=False`).
+        """
+        if usar_cache is False:
+            return None
+        if usar_cache or eh_deterministico(dados):
+            return chave_payload(ponto_final, dados)
+        return None
+
+    def enviar_stream(self, ponto_final: str, dados: dict = None):
+        """
+        Realiza uma requisição POST com `stream: true` e devolve os chunks à medida que chegam.
+        Os retries valem até o recebimento dos cabeçalhos da resposta; depois disso, os
+        chunks são entregues incrementalmente (Server-Sent Events).
+        Args:
+            ponto_final (str): Endpoint da API (ex: 'chat/completions').
+            dados (dict): Dados para envio no corpo da requisição.
+        Returns:
+            Iterator[dict]: Gerador com os chunks JSON do stream.
+        """
+        dados = dict(dados or {})
+        dados["stream"] = True
+        headers = {"Content-Type": "application/json", "Accept": "text/event-stream"}
+        reserva = self._reservar_limite_modelo(dados)
+        resposta = self._realizar_requisicao("POST", ponto_final, json=dados, headers=headers, stream=True)
+        return self._iterar_stream(resposta, reserva)
+
+    def enviar_arquivo(self, ponto_final: str, corpo, tipo_conteudo: str) -> dict:
+        """
+        Realiza um POST com um corpo lido sob demanda (ex: upload multipart de um arquivo grande).
+        O corpo é rebobinado antes de cada tentativa, por isso precisa ter `read` e `seek`.
+        Args:
+            ponto_final (str): Endpoint da API (ex: 'files').
+            corpo: Objeto tipo arquivo com `read`, `seek` e tamanho conhecido (`__len__`).
+            tipo_conteudo (str): Content-Type do corpo (ex: 'multipart/form-data; boundary=...').
+        Returns:
+            dict: Resposta da API em formato JSON.
+        """
+        return self._realizar_requisicao("POST", ponto_final, data=corpo, headers={"Content-Type": tipo_conteudo})
+
+    def baixar(self, ponto_final: str, destino: str, tamanho_bloco: int = 1024 * 1024) -> int:
+        """
+        Baixa o conteúdo de um endpoint direto para um arquivo, em blocos (sem carregá-lo na memória).
+        Args:
+            ponto_final (str): Endpoint da API (ex: 'files/file-abc/content').
+            destino (str): Caminho do arquivo a ser gravado.
+            tamanho_bloco (int): Bytes lidos por vez (default: 1 MB).
+        Returns:
+            int: Bytes gravados.
+        """
+        resposta = self._realizar_requisicao("GET", ponto_final, stream=True)
+        gravados = 0
+        try:
+            with open(destino, "wb") as arquivo:
+                for bloco in resposta.iter_content(chunk_size=tamanho_bloco):
+                    arquivo.write(bloco)
+                    gravados += len(bloco)
+        except RequestException as e:
+            raise OpenAIConnectionError(f"Download interrompido para {ponto_final}.", original_exception=e)
+        finally:
+            resposta.close()
+        return gravados
+
+    def _iterar_stream(self, resposta: requests.Response, reserva: Reserva = None):
+        resposta.encoding = "utf-8"  # SSE é sempre UTF-8; requests assumiria ISO-8859-1 para text/*
+        usage = None
+        try:
+            for chunk in iterar_eventos_sse(resposta.iter_lines(decode_unicode=True)):
+                usage = chunk.get("usage") or usage
+                yield chunk
+        except RequestException as e:
+            raise OpenAIConnectionError("Stream interrompido durante a leitura da resposta da API OpenAI.", original_exception=e)
+        finally:
+            resposta.close()
+            self._conciliar_limite_modelo(reserva, usage)
+
+    def _reservar_limite_modelo(self, dados: dict):
+        """Cobra a chamada no limitador RPM/TPM do modelo (se configurado), aguardando se necessário."""
+        if self.limitador_modelos is None or not dados or not dados.get("model"):
+            return None
+        return self.limitador_modelos.adquirir(dados["model"], estimar_tokens_payload(dados))
+
+    def _conciliar_limite_modelo(self, reserva: Reserva, usage: dict):
+        """Concilia a reserva com o consumo real informado em `usage` pela API."""
+        if reserva is not None and usage:
+            self.limitador_modelos.reconciliar(reserva, usage.get("total_tokens"))
+
+    def _aplicar_cabecalhos_rate_limit(self, resposta, modelo: str) -> LimitesServidor:
+        """
+        Lê Retry-After e x-ratelimit-* da resposta e repassa ao limitador do modelo.
+        Returns:
+            LimitesServidor: Limites lidos (retry_after define a espera antes da próxima tentativa).
+        """
+        limites = ler_cabecalhos_rate_limit(getattr(resposta, 'headers', None))
+        if self.limitador_modelos is not None and modelo:
+            self.limitador_modelos.sincronizar(modelo, limites)
+        return limites
     
-    def __init__(self, max_tentativas: int = 2, fator_backoff: float = 0.01, tempo_limite: int = 10, max_requisicoes_por_segundo: float = 3.0):
+    def __init__(self, max_tentativas: int = 2, fator_backoff: float = 0.01, tempo_limite: int = 10, max_requisicoes_por_segundo: float = 3.0, tamanho_pool: int = 10, limitador_modelos: LimitadorPorModelo = None, backend_limitador=None, orcamento_retry: OrcamentoRetry = None, tempo_maximo_retries: float = 30.0, teto_backoff: float = 20.0, disjuntores: RegistroDisjuntores = None, cache: CacheRespostas = None, agrupar_chamadas: bool = True):
         """
         Inicializa o cliente HTTP para OpenAI.
+        A instância é segura para uso concorrente por várias threads: rate limiter,
+        métricas e registros de backoff são protegidos, e o pool de conexões da
+        sessão é compartilhado (reaproveitando TCP/TLS entre requisições).
         Args:
             max_tentativas (int): Número máximo de tentativas de retry para erros temporários (default: 2).
             fator_backoff (float): Fator inicial para cálculo do backoff exponencial em segundos (default: 0.01).
             tempo_limite (int): Timeout em segundos para cada requisição (default: 10).
             max_requisicoes_por_segundo (float): Limite de requisições por segundo (rate limit local, default: 3.0).
+            tamanho_pool (int): Máximo de conexões keep-alive mantidas no pool por host (default: 10).
+            limitador_modelos (LimitadorPorModelo): Limitador RPM/TPM por modelo, opcional (pode ser compartilhado).
+            backend_limitador: Backend compartilhado para o limite por segundo (ex: SQLite), para que
+                vários processos com a mesma chave dividam o mesmo orçamento. Padrão: estado local.
+            orcamento_retry (OrcamentoRetry): Orçamento de retries compartilhado pelas requisições (default: 10% do tráfego).
+            tempo_maximo_retries (float): Tempo máximo, em segundos, de uma requisição somando todas as tentativas (default: 30.0).
+            teto_backoff (float): Maior espera entre tentativas, em segundos (default: 20.0).
+            disjuntores (RegistroDisjuntores): Circuit breakers por endpoint e modelo (default: 5 falhas abrem por 30s).
+            cache (CacheRespostas): Cache de respostas de `enviar`, opcional (pode ser compartilhado).
+            agrupar_chamadas (bool): Se True, chamadas idênticas simultâneas (GETs e POSTs determinísticos)
+                compartilham uma única requisição à API (default: True).
         """
         self.configuracao = Config.get_instance()
         self.chave_api = self.configuracao.OPENAI_API_KEY
@@ -60,13 +252,34 @@ class ClienteHttpOpenAI:
         self.tempo_limite = tempo_limite
         self.max_tentativas = max_tentativas
         self.fator_backoff = fator_backoff
+        self.teto_backoff = teto_backoff
+        self.tempo_maximo_retries = tempo_maximo_retries
+        self.orcamento_retry = orcamento_retry or OrcamentoRetry()
+        self.disjuntores = disjuntores or RegistroDisjuntores()
+        self.cache = cache
+        self.agrupador = GrupoChamadas() if agrupar_chamadas else None
+        self.tamanho_pool = tamanho_pool
         self.sessao = requests.Session()
         self.sessao.headers.update({"Authorization": f"Bearer {self.chave_api}"})
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=tamanho_pool)
+        self.sessao.mount("https://", adaptador)
+        self.sessao.mount("http://", adaptador)
+
+        # Protege o estado compartilhado entre threads (token bucket e métricas)
+        self._trava = threading.Lock()
+        self._local = threading.local()
 
         # --- Rate Limiter (Token Bucket) ---
         self.max_requisicoes_por_segundo = max_requisicoes_por_segundo
         self._tokens = self.max_requisicoes_por_segundo
         self._ultimo_token = time.time()
+        self._balde_compartilhado = None
+        if backend_limitador is not None:
+            self._balde_compartilhado = BaldeTokens(
+                self.max_requisicoes_por_segundo, self.max_requisicoes_por_segundo,
+                backend_limitador, f"{namespace_chave_api(self.chave_api)}requisicoes_por_segundo",
+            )
+        self.limitador_modelos = limitador_modelos
 
         # --- Métricas de uso ---
         self.metricas = {
@@ -74,16 +287,41 @@ class ClienteHttpOpenAI:
             'requisicoes_sucesso': 0,
             'requisicoes_falha': 0,
             'tempo_total': 0.0,
-            'ultimos_status': [],
+            'ultimos_status': deque(maxlen=100),
         }
-       
-        #BACKOFF 
 
-        self._backoff_calls = []
+    @property
+    def _backoff_calls(self) -> list:
+        """Intervalos de backoff aplicados na requisição corrente desta thread."""
+        if not hasattr(self._local, 'backoff_calls'):
+            self._local.backoff_calls = []
+        return self._local.backoff_calls
 
     def get_metricas(self):
         """Retorna as métricas de uso do cliente HTTP."""
-        return self.metricas.copy()
+        with self._trava:
+            metricas = self.metricas.copy()
+            metricas['ultimos_status'] = list(self.metricas['ultimos_status'])
+        if self.limitador_modelos is not None:
+            metricas['limites_modelos'] = self.limitador_modelos.estado()
+        metricas['orcamento_retry'] = self.orcamento_retry.estado()
+        metricas['circuitos'] = self.disjuntores.estado()
+        if self.cache is not None:
+            metricas['cache'] = self.cache.estatisticas()
+        if self.agrupador is not None:
+            metricas['chamadas_agrupadas'] = self.agrupador.estatisticas()
+        return metricas
+
+    def fechar(self):
+        """Fecha a sessão e libera as conexões do pool."""
+        self.sessao.close()
+
+    def _registrar_metrica(self, sucesso: bool, inicio: float, status):
+        with self._trava:
+            self.metricas['total_requisicoes'] += 1
+            self.metricas['requisicoes_sucesso' if sucesso else 'requisicoes_falha'] += 1
+            self.metricas['tempo_total'] += time.time() - inicio
+            self.metricas['ultimos_status'].append(status)
 
     def _tratar_erro_resposta(self, resposta: requests.Response):
         """
@@ -91,147 +329,138 @@ class ClienteHttpOpenAI:
         Este método é chamado para erros HTTP que NÃO são retentáveis (ex: 400, 401, 404, 403)
         ou para o erro final após o esgotamento das retries.
         """
-        from src.http_status_reasons import HTTP_STATUS_REASONS
-        codigo_status = resposta.status_code
-        reason = resposta.reason or HTTP_STATUS_REASONS.get(codigo_status, "Unknown Error")
-        mensagem_erro = f"{codigo_status} - {reason}"
-        error_details = None
-
-        try:
-            json_erro = resposta.json()
-            if "error" in json_erro:
-                error_details = json_erro["error"]
-                mensagem_erro += f" | Detalhes da API: {error_details.get('message', 'N/A')}"
-        except json.JSONDecodeError:
-            mensagem_erro += f" | Corpo da resposta não-JSON: {resposta.text[:200]}..."
-
-        if codigo_status in (401, 403):
-            raise OpenAIAuthenticationError(mensagem_erro, status_code=codigo_status, error_details=error_details)
-        elif codigo_status == 400:
-            raise OpenAIBadRequestError(mensagem_erro, status_code=codigo_status, error_details=error_details)
-        elif codigo_status == 404:
-            raise OpenAINotFoundError(mensagem_erro, status_code=codigo_status, error_details=error_details)
-        elif codigo_status == 429:
-            raise OpenAIRateLimitError(mensagem_erro, status_code=codigo_status, error_details=error_details)
-        elif codigo_status >= 500:
-            raise OpenAIServerError(mensagem_erro, status_code=codigo_status, error_details=error_details)
-        else:
-            raise OpenAIAPIError(mensagem_erro, status_code=codigo_status, error_details=error_details)
-
+        tratar_erro_resposta(resposta)
 
     def _rate_limiter(self):
         """
         Rate limiter simples (token bucket): permite até N requisições por segundo.
         Se não houver tokens disponíveis, aguarda até liberar.
+        O token é reservado sob a trava e a espera acontece fora dela, de modo que
+        threads concorrentes fiquem enfileiradas sem bloquear umas às outras.
+        Com um backend compartilhado, o mesmo balde vale para todos os processos do host.
         """
-        agora = time.time()
-        tokens_para_adicionar = (agora - self._ultimo_token) * self.max_requisicoes_por_segundo
-        if tokens_para_adicionar > 0:
-            self._tokens = min(self.max_requisicoes_por_segundo, self._tokens + tokens_para_adicionar)
-            self._ultimo_token = agora
-        if self._tokens >= 1:
-            self._tokens -= 1
+        if self._balde_compartilhado is not None:
+            tempo_espera = self._balde_compartilhado.reservar(1)
+            if tempo_espera > 0:
+                logger.info(f"Rate limit compartilhado atingido. Aguardando {tempo_espera:.2f}s para próxima requisição...")
+                time.sleep(tempo_espera)
             return
-        tempo_espera = (1 - self._tokens) / self.max_requisicoes_por_segundo
+        with self._trava:
+            agora = time.time()
+            tokens_para_adicionar = (agora - self._ultimo_token) * self.max_requisicoes_por_segundo
+            if tokens_para_adicionar > 0:
+                self._tokens = min(self.max_requisicoes_por_segundo, self._tokens + tokens_para_adicionar)
+                self._ultimo_token = agora
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return
+            tempo_espera = -self._tokens / self.max_requisicoes_por_segundo
         logger.info(f"Rate limit atingido. Aguardando {tempo_espera:.2f}s para próxima requisição...")
         time.sleep(tempo_espera)
-        self._tokens = 0
-        self._ultimo_token = time.time()
+
+    def _verificar_circuito(self, chave_circuito: str):
+        """Falha imediatamente (OpenAICircuitOpenError) se o circuito do endpoint/modelo estiver aberto."""
+        try:
+            self.disjuntores.verificar(chave_circuito)
+        except OpenAICircuitOpenError:
+            self._registrar_metrica(False, time.time(), 'circuito_aberto')
+            raise
 
     def _realizar_requisicao(self, metodo: str, ponto_final: str, **kwargs) -> dict:
         self._backoff_calls.clear()  # Clear previous backoff intervals before each request
         url_completa = f"{self.url_base}/{ponto_final}"
         kwargs.setdefault('timeout', self.tempo_limite)
+        modelo = (kwargs.get('json') or {}).get('model')
+        self.orcamento_retry.registrar_requisicao()
+        ciclo = CicloRetry(self.fator_backoff, self.teto_backoff, self.tempo_maximo_retries, self.orcamento_retry)
+        chave_circuito = RegistroDisjuntores.chave(ponto_final, modelo)
         last_caught_custom_exception = None
         for tentativa in range(self.max_tentativas + 1):
+            self._verificar_circuito(chave_circuito)
             self._rate_limiter()
             inicio = time.time()
             status = None
+            espera_servidor = None
             last_caught_custom_exception = None
+            if hasattr(kwargs.get('data'), 'seek'):
+                kwargs['data'].seek(0)  # Corpo em arquivo: a tentativa anterior já o consumiu
             try:
                 resposta = self.sessao.request(metodo, url_completa, **kwargs)
                 resposta.raise_for_status()
+                self.disjuntores.registrar(chave_circuito, True)
+                self._aplicar_cabecalhos_rate_limit(resposta, modelo)
+                if kwargs.get('stream'):
+                    # Em streaming o corpo é consumido pelo chamador; a requisição conta como sucesso ao receber os cabeçalhos
+                    self._registrar_metrica(True, inicio, getattr(resposta, 'status_code', 'erro'))
+                    return resposta
                 try:
                     resultado = resposta.json()
                 except json.JSONDecodeError:
                     resultado = {"mensagem": "Requisição bem-sucedida, mas resposta não é JSON", "resposta_bruta": resposta.text}
-                self.metricas['total_requisicoes'] += 1
-                self.metricas['requisicoes_sucesso'] += 1
-                self.metricas['tempo_total'] += time.time() - inicio
-                self.metricas['ultimos_status'].append(getattr(resposta, 'status_code', 'erro'))
+                self._registrar_metrica(True, inicio, getattr(resposta, 'status_code', 'erro'))
                 return resultado
             except HTTPError as e:
-                status = e.response.status_code if e.response else None
-                if status == 429:
-                    from src.http_status_reasons import HTTP_STATUS_REASONS
-                    reason = e.response.reason if e.response else None
-                    error_details = e.response.json().get('error') if e.response and e.response.content else None
-                    mensagem_erro = f"Erro na API da OpenAI: {status} - {reason}"
-                    if error_details and 'message' in error_details:
-                        mensagem_erro += f" Detalhes da API: {error_details['message']}"
-                    last_caught_custom_exception = OpenAIRateLimitError(
-                        mensagem_erro,
-                        status_code=status,
-                        error_details=error_details,
-                        original_exception=e
-                    )
-                    logger.warning(f"Tentativa {tentativa + 1}/{self.max_tentativas + 1}: Erro HTTP 429. Re-tentando...")
-                elif status and status >= 500:
-                    from src.http_status_reasons import HTTP_STATUS_REASONS
-                    reason = e.response.reason if e.response else None
-                    error_details = e.response.json().get('error') if e.response and e.response.content else None
-                    mensagem_erro = f"Erro na API da API: {status} - {reason}"
-                    if error_details and 'message' in error_details:
-                        mensagem_erro += f" Detalhes da API: {error_details['message']}"
-                    last_caught_custom_exception = OpenAIServerError(
-                        mensagem_erro,
+                # Response com status de erro é "falsy"; por isso a comparação explícita com None
+                status = e.response.status_code if e.response is not None else None
+                # Só erro de servidor indica API instável; 4xx (inclusive 429) mostra que ela está respondendo
+                self.disjuntores.registrar(chave_circuito, not (status and status >= 500))
+                if status == 429 or (status and status >= 500):
+                    espera_servidor = self._aplicar_cabecalhos_rate_limit(e.response, modelo).retry_after
+                    if tentativa == self.max_tentativas:
+                        # Esgotadas as tentativas, levanta o erro mapeado (OpenAIRateLimitError/OpenAIServerError)
+                        self._registrar_metrica(False, inicio, status)
+                        self._tratar_erro_resposta(e.response)
+                    classe_erro = OpenAIRateLimitError if status == 429 else OpenAIServerError
+                    last_caught_custom_exception = classe_erro(
+                        f"Erro na API da OpenAI: {status} - {e.response.reason}",
                         status_code=status,
-                        error_details=error_details,
                         original_exception=e
                     )
                     logger.warning(f"Tentativa {tentativa + 1}/{self.max_tentativas + 1}: Erro HTTP {status}. Re-tentando...")
                 elif status in (400, 401, 403, 404):
-                    self.metricas['total_requisicoes'] += 1
-                    self.metricas['requisicoes_falha'] += 1
-                    self.metricas['tempo_total'] += time.time() - inicio
-                    self.metricas['ultimos_status'].append(status)
+                    self._registrar_metrica(False, inicio, status)
                     self._tratar_erro_resposta(e.response)
                     return  # Interrompe o loop imediatamente para erro 400, 401, 403, 404
                 else:
                     if tentativa == self.max_tentativas:
-                        self.metricas['total_requisicoes'] += 1
-                        self.metricas['requisicoes_falha'] += 1
-                        self.metricas['tempo_total'] += time.time() - inicio
-                        self.metricas['ultimos_status'].append(status)
+                        self._registrar_metrica(False, inicio, status)
                         self._tratar_erro_resposta(e.response)
                         return
             except Timeout as e:
                 status = 'timeout'
+                self.disjuntores.registrar(chave_circuito, False)
                 last_caught_custom_exception = OpenAITimeoutError("Tempo limite excedido na conexão com a API OpenAI.", original_exception=e)
                 logger.warning(f"Tentativa {tentativa + 1}/{self.max_tentativas + 1}: Tempo limite. Re-tentando...")
             except ConnectionError as e:
                 status = 'connection'
+                self.disjuntores.registrar(chave_circuito, False)
                 last_caught_custom_exception = OpenAIConnectionError(f"Erro de conexão para {url_completa}", original_exception=e)
                 logger.warning(f"Tentativa {tentativa + 1}/{self.max_tentativas + 1}: Erro de conexão. Re-tentando...")
             except RequestException as e:
                 status = 'request'
+                self.disjuntores.registrar(chave_circuito, False)
                 last_caught_custom_exception = OpenAIClientError(f"Erro de requisição inesperado para {url_completa}", original_exception=e)
                 logger.warning(f"Tentativa {tentativa + 1}/{self.max_tentativas + 1}: Erro de requisição inesperado. Re-tentando...")
             except Exception as e:
                 status = 'exception'
+                self.disjuntores.registrar(chave_circuito, False)
                 if tentativa == self.max_tentativas:
-                    self.metricas['total_requisicoes'] += 1
-                    self.metricas['requisicoes_falha'] += 1
-                    self.metricas['tempo_total'] += time.time() - inicio
-                    self.metricas['ultimos_status'].append(getattr(e, 'status_code', 'erro'))
+                    self._registrar_metrica(False, inicio, getattr(e, 'status_code', 'erro'))
                 last_caught_custom_exception = OpenAIClientError(f"Erro inesperado durante a requisição para {url_completa}", details=str(e), original_exception=e)
                 logger.error(f"Tentativa {tentativa + 1}/{self.max_tentativas + 1}: Erro inesperado. Re-tentando...", exc_info=True)
 
 
-            # Backoff só para 429/500, Timeout, ConnectionError
+            # Backoff com jitter só para 429/500, Timeout, ConnectionError; Retry-After do servidor tem prioridade
             if last_caught_custom_exception and tentativa < self.max_tentativas:
                 if status == 429 or (isinstance(last_caught_custom_exception, (OpenAIServerError, OpenAITimeoutError, OpenAIConnectionError))):
-                    tempo_espera = self.fator_backoff * (2 ** tentativa)
+                    tempo_espera = ciclo.proxima_espera(espera_servidor)
+                    if tempo_espera is None:
+                        # Orçamento ou tempo máximo esgotado: desiste antes de somar mais carga à API
+                        self._registrar_metrica(False, inicio, status)
+                        raise OpenAIRetryError(
+                            f"Retries interrompidos para {url_completa}: {ciclo.motivo}",
+                            original_exception=last_caught_custom_exception
+                        )
                     self._backoff_calls.append(tempo_espera)
                     logger.info(f"Aguardando {tempo_espera:.2f} segundos antes da próxima tentativa...")
                     time.sleep(tempo_espera)
@@ -240,7 +469,7 @@ class ClienteHttpOpenAI:
             if tentativa == self.max_tentativas and last_caught_custom_exception:
                 if self.max_tentativas == 0:
                     raise last_caught_custom_exception
-                # Para 429/500/Timeout/ConnectionError, SEMPRE levanta OpenAIRetryError
+                # Para Timeout/ConnectionError, SEMPRE levanta OpenAIRetryError (429/5xx já saíram com o erro mapeado)
                 if status == 429 or (isinstance(last_caught_custom_exception, (OpenAIServerError, OpenAITimeoutError, OpenAIConnectionError))):
                     raise OpenAIRetryError(
                         f"Máximo de retries ({self.max_tentativas}) excedido para {url_completa}",
@@ -258,9 +487,15 @@ class ClienteHttpOpenAI:
 #
 # Principais pontos:
 # - Suporte a GET e POST para endpoints da OpenAI.
-# - Implementa retries automáticos com backoff para erros temporários (429, 5xx, timeout, conexão).
+# - Implementa retries automáticos com backoff para erros temporários (429, 5xx, timeout, conexão),
+#   com jitter, orçamento de retries compartilhado e tempo máximo total (src/retry.py).
 # - Rate limiter local para evitar excesso de requisições por segundo.
+# - Limitador opcional de RPM/TPM por modelo, conciliado com o `usage` real e
+#   ajustado pelos cabeçalhos Retry-After e x-ratelimit-* de cada resposta.
 # - Tratamento detalhado de erros, lançando exceções customizadas para cada tipo de falha.
+# - Circuit breaker por endpoint e modelo: com a API fora do ar, falha na hora
+#   (OpenAICircuitOpenError) em vez de esperar o timeout em cada tentativa.
+# - Cache opcional de respostas (src/cache.py) para chamadas determinísticas.
 # - Coleta métricas de uso para monitoramento.
 #
 # Uso típico:
@@ -0,0 +1,208 @@
+import json
+import os
+import threading
+import time
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from src.exceptions import OpenAIAuthenticationError, OpenAIConfigurationError
+
+logger = logging.getLogger(__name__)
+
+# Campos de controle de uma linha de entrada; o restante é o payload enviado à API
+CAMPOS_CONTROLE = ("id", "endpoint", "dados")
+
+
+class ProgressoLote:
+    """Contadores de um lote em execução, com vazão e estimativa de término."""
+
+    def __init__(self, total: int = None, ja_concluidas: int = 0):
+        """
+        Args:
+            total (int): Linhas a processar nesta execução (sem as já concluídas), se conhecido.
+            ja_concluidas (int): Linhas puladas por já constarem na saída (retomada).
+        """
+        self.total = total
+        self.ja_concluidas = ja_concluidas
+        self.concluidas = 0
+        self.erros = 0
+        self._inicio = time.monotonic()
+        self._trava = threading.Lock()
+
+    def registrar(self, sucesso: bool):
+        with self._trava:
+            self.concluidas += 1
+            if not sucesso:
+                self.erros += 1
+
+    def resumo(self) -> dict:
+        """
+        Returns:
+            dict: concluidas, erros, puladas, vazao (linhas/s), decorrido e eta (segundos; None se desconhecido).
+        """
+        with self._trava:
+            decorrido = time.monotonic() - self._inicio
+            vazao = self.concluidas / decorrido if decorrido > 0 else 0.0
+            eta = None
+            if self.total is not None and vazao > 0:
+                eta = max(0, self.total - self.concluidas) / vazao
+            return {
+                "concluidas": self.concluidas,
+                "erros": self.erros,
+                "puladas": self.ja_concluidas,
+                "total": self.total,
+                "vazao": vazao,
+                "decorrido": decorrido,
+                "eta": eta,
+            }
+
+
+def ler_concluidas(caminho_saida: str) -> set:
+    """
+    Lê a saída de uma execução anterior e devolve os números das linhas já respondidas com sucesso.
+    Uma última linha incompleta (processo morto no meio da escrita) é descartada do arquivo,
+    para que as novas linhas sejam gravadas a partir de um JSONL válido.
+    Args:
+        caminho_saida (str): Arquivo JSONL de saída (que também serve de checkpoint).
+    Returns:
+        set[int]: Números das linhas de entrada já concluídas.
+    """
+    concluidas = set()
+    if not os.path.exists(caminho_saida):
+        return concluidas
+    with open(caminho_saida, "rb+") as arquivo:
+        posicao_valida = 0
+        for linha in arquivo:
+            if not linha.endswith(b"\n"):
+                break
+            posicao_valida += len(linha)
+            try:
+                registro = json.loads(linha)
+            except ValueError:
+                continue
+            if "resposta" in registro:
+                concluidas.add(registro["linha"])
+        arquivo.truncate(posicao_valida)
+    return concluidas
+
+
+def _iterar_entrada(caminho_entrada: str, concluidas: set):
+    """Lê o JSONL de entrada sob demanda, pulando linhas vazias e as já concluídas."""
+    with open(caminho_entrada, encoding="utf-8") as arquivo:
+        for numero, linha in enumerate(arquivo, start=1):
+            if linha.strip() and numero not in concluidas:
+                yield numero, linha
+
+
+def contar_linhas(caminho_entrada: str) -> int:
+    """Conta as linhas não vazias do JSONL de entrada (para a estimativa de término)."""
+    with open(caminho_entrada, encoding="utf-8") as arquivo:
+        return sum(1 for linha in arquivo if linha.strip())
+
+
+def _processar_linha(cliente_http, numero: int, linha: str, endpoint_padrao: str) -> dict:
+    try:
+        requisicao = json.loads(linha)
+    except ValueError as e:
+        return {"id": None, "linha": numero, "erro": f"JSON inválido: {e}", "tipo_erro": "JSONDecodeError"}
+    identificador = requisicao.get("id", numero)
+    endpoint = requisicao.get("endpoint", endpoint_padrao)
+    dados = requisicao.get("dados")
+    if dados is None:
+        dados = {k: v for k, v in requisicao.items() if k not in CAMPOS_CONTROLE}
+    try:
+        resposta = cliente_http.enviar(endpoint, dados=dados)
+        return {"id": identificador, "linha": numero, "resposta": resposta}
+    except (OpenAIAuthenticationError, OpenAIConfigurationError):
+        # Todas as linhas falhariam do mesmo jeito: interrompe o lote
+        raise
+    except Exception as e:
+        return {"id": identificador, "linha": numero, "erro": str(e), "tipo_erro": type(e).__name__}
+
+
+def executar_lote(cliente_http, caminho_entrada: str, caminho_saida: str, trabalhadores: int = 8, endpoint_padrao: str = "chat/completions", retomar: bool = True, ao_progredir=None, intervalo_progresso: float = 2.0) -> dict:
+    """
+    Envia cada linha de um JSONL de requisições à API, com no máximo `trabalhadores` chamadas simultâneas.
+    Cada linha de entrada é um objeto JSON com o payload da requisição (ex: {"model", "messages"}),
+    opcionalmente com "id" (copiado para a saída), "endpoint" e "dados" (payload explícito).
+    Os resultados são gravados na saída à medida que terminam (fora de ordem), um por linha:
+    {"id", "linha", "resposta"} ou {"id", "linha", "erro", "tipo_erro"}.
+    Args:
+        cliente_http: Cliente HTTP thread-safe (ex: o compartilhado); seus limites de taxa valem para o lote todo.
+        caminho_entrada (str): JSONL de entrada, lido sob demanda (não é carregado inteiro na memória).
+        caminho_saida (str): JSONL de saída; também é o checkpoint da retomada.
+        trabalhadores (int): Chamadas simultâneas (default: 8).
+        endpoint_padrao (str): Endpoint das linhas sem "endpoint" (default: 'chat/completions').
+        retomar (bool): Se True, pula as linhas já respondidas com sucesso na saída; se False, recomeça do zero.
+        ao_progredir: Função chamada com `ProgressoLote.resumo()` a cada `intervalo_progresso` segundos e ao final.
+        intervalo_progresso (float): Segundos entre relatórios de progresso.
+    Returns:
+        dict: Resumo final (ver ProgressoLote.resumo).
+    Raises:
+        OpenAIAuthenticationError, OpenAIConfigurationError: Interrompem o lote, pois afetariam todas as linhas.
+    """
+    if not retomar and os.path.exists(caminho_saida):
+        os.remove(caminho_saida)
+    concluidas = ler_concluidas(caminho_saida)
+    total = contar_linhas(caminho_entrada) - len(concluidas)
+    progresso = ProgressoLote(total=total, ja_concluidas=len(concluidas))
+    if concluidas:
+        logger.info(f"Retomando lote: {len(concluidas)} linhas já concluídas em '{caminho_saida}'.")
+
+    ultimo_relatorio = time.monotonic()
+    with open(caminho_saida, "a", encoding="utf-8") as saida, ThreadPoolExecutor(max_workers=trabalhadores) as executor:
+        pendentes = set()
+        entrada = _iterar_entrada(caminho_entrada, concluidas)
+        esgotada = False
+        try:
+            while pendentes or not esgotada:
+                # Mantém a fila limitada para não ler o arquivo inteiro para a memória
+                while not esgotada and len(pendentes) < trabalhadores * 2:
+                    proxima = next(entrada, None)
+                    if proxima is None:
+                        esgotada = True
+                        break
+                    pendentes.add(executor.submit(_processar_linha, cliente_http, *proxima, endpoint_padrao))
+                if not pendentes:
+                    break
+                prontas, pendentes = wait(pendentes, timeout=intervalo_progresso, return_when=FIRST_COMPLETED)
+                for futura in prontas:
+                    resultado = futura.result()
+                    saida.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+                    progresso.registrar("resposta" in resultado)
+                saida.flush()
+                if ao_progredir is not None and time.monotonic() - ultimo_relatorio >= intervalo_progresso:
+                    ultimo_relatorio = time.monotonic()
+                    ao_progredir(progresso.resumo())
+        except BaseException:
+            for futura in pendentes:
+                futura.cancel()
+            raise
+
+    resumo = progresso.resumo()
+    if ao_progredir is not None:
+        ao_progredir(resumo)
+    logger.info(f"Lote concluído: {resumo['concluidas']} linhas ({resumo['erros']} com erro) em {resumo['decorrido']:.1f}s.")
+    return resumo
+
+# -----------------------------------------------------------------------------
+#
+# Este módulo implementa a execução de lotes de requisições a partir de um
+# arquivo JSONL, usada pelo comando `lote` da CLI. Substitui o laço de shell
+# que abria um processo Python por prompt: um único processo mantém o pool de
+# conexões, o rate limiter e o orçamento de retries para o lote inteiro.
+#
+# Principais pontos:
+# - Entrada lida sob demanda e fila de trabalho limitada (memória constante).
+# - ThreadPoolExecutor com `trabalhadores` chamadas simultâneas, todas pelo
+#   mesmo cliente HTTP (respeitando seus limites de taxa).
+# - Saída gravada à medida que cada linha termina; o próprio JSONL de saída é
+#   o checkpoint: uma nova execução pula as linhas já respondidas.
+# - Erros de uma linha são gravados na saída; erros de autenticação ou de
+#   configuração interrompem o lote.
+# - ProgressoLote: vazão (linhas/s) e estimativa de término (ETA).
+#
+# Uso típico:
+#   resumo = executar_lote(obter_cliente_compartilhado(), "prompts.jsonl", "respostas.jsonl", trabalhadores=16)
+#
+# -----------------------------------------------------------------------------
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogoModelos:
+    """
+    Catálogo dos modelos disponíveis para a chave da API, mantido em memória.
+    - Dentro do `ttl`, `listar()` responde da memória, sem chamar a API.
+    - Vencido o `ttl`, responde com a lista antiga ("stale-while-revalidate") e dispara uma
+      atualização em segundo plano; só uma atualização roda por vez.
+    - Se a lista for mais velha que `max_obsoleto` (ou ainda não existir), a atualização é feita
+      na hora, e um erro da API é propagado.
+    Falhas na atualização em segundo plano mantêm a lista antiga e são apenas registradas no log.
+    """
+
+    def __init__(self, cliente_http, ttl: float = 300.0, max_obsoleto: float = 86400.0):
+        """
+        Args:
+            cliente_http: Cliente HTTP usado para consultar GET /models (ex: o cliente compartilhado).
+            ttl (float): Segundos em que a lista é considerada atual (default: 5 minutos).
+            max_obsoleto (float): Idade máxima, em segundos, de uma lista antiga servida enquanto
+                a atualização roda em segundo plano (default: 24 horas).
+        """
+        self.cliente_http = cliente_http
+        self.ttl = ttl
+        self.max_obsoleto = max_obsoleto
+        self._modelos = None
+        self._etag = None
+        self._atualizado_em = 0.0
+        self._atualizando = False
+        self._trava = threading.Lock()
+        self._trava_atualizacao = threading.Lock()
+
+    @property
+    def etag(self) -> str:
+        """ETag da lista atual (muda apenas quando a lista de modelos muda)."""
+        return self._etag
+
+    def _idade(self) -> float:
+        return time.monotonic() - self._atualizado_em
+
+    def listar(self) -> list:
+        """
+        Returns:
+            list[str]: IDs dos modelos disponíveis, na ordem devolvida pela API.
+        """
+        return self.listar_com_etag()[0]
+
+    def listar_com_etag(self) -> tuple:
+        """
+        Igual a `listar()`, mas devolve também o ETag correspondente à mesma lista
+        (uma atualização em segundo plano pode trocar a lista entre duas leituras separadas).
+        Returns:
+            tuple[list[str], str]: IDs dos modelos e o ETag da lista.
+        """
+        with self._trava:
+            modelos, etag = self._modelos, self._etag
+            idade = self._idade()
+            revalidar = modelos is not None and idade > self.ttl and not self._atualizando
+            if revalidar:
+                self._atualizando = True
+        if modelos is None or idade > self.max_obsoleto:
+            return self.atualizar()
+        if revalidar:
+            threading.Thread(target=self._atualizar_em_segundo_plano, name="catalogo-modelos", daemon=True).start()
+        return list(modelos), etag
+
+    def atualizar(self) -> tuple:
+        """
+        Consulta GET /models agora e substitui a lista em memória.
+        Chamadas simultâneas esperam a atualização em andamento em vez de repetir a consulta.
+        Returns:
+            tuple[list[str], str]: IDs dos modelos disponíveis e o ETag da lista.
+        """
+        inicio = time.monotonic()
+        with self._trava_atualizacao:
+            if self._modelos is not None and self._atualizado_em >= inicio:
+                return list(self._modelos), self._etag
+            resposta = self.cliente_http.obter("models")
+            modelos = [m["id"] for m in resposta.get("data", [])]
+            etag = '"' + hashlib.sha256(json.dumps(modelos).encode("utf-8")).hexdigest()[:16] + '"'
+            with self._trava:
+                if etag != self._etag:
+                    logger.info(f"Catálogo de modelos atualizado: {len(modelos)} modelos.")
+                self._modelos = modelos
+                self._etag = etag
+                self._atualizado_em = time.monotonic()
+            return list(modelos), etag
+
+    def _atualizar_em_segundo_plano(self):
+        try:
+            self.atualizar()
+        except Exception as e:
+            logger.warning(f"Falha ao atualizar o catálogo de modelos em segundo plano; mantendo a lista anterior: {e}")
+        finally:
+            with self._trava:
+                self._atualizando = False
+
+    def estado(self) -> dict:
+        """Quantidade de modelos, idade da lista e ETag atual (para métricas)."""
+        with self._trava:
+            return {
+                "modelos": len(self._modelos) if self._modelos is not None else 0,
+                "idade": self._idade() if self._modelos is not None else None,
+                "etag": self._etag,
+                "atualizando": self._atualizando,
+            }
+
+# -----------------------------------------------------------------------------
+#
+# Este módulo implementa o catálogo de modelos usado pela rota /models do
+# backend e pelo comando `listar_modelos` da CLI. A lista de modelos muda
+# raramente, mas o seletor de modelos do frontend a pede a cada carregamento
+# de página; consultar GET /v1/models toda vez só adiciona latência e uso de
+# rate limit.
+#
+# Principais pontos:
+# - Lista em memória com TTL e atualização em segundo plano
+#   (stale-while-revalidate), sem bloquear quem está lendo.
+# - ETag estável derivado da lista, para respostas 304 (If-None-Match) ao
+#   frontend.
+# - Falha na atualização em segundo plano mantém a lista anterior.
+#
+# Uso típico:
+#   catalogo = CatalogoModelos(obter_cliente_compartilhado(), ttl=300)
+#   modelos = catalogo.listar()
+#
+# -----------------------------------------------------------------------------
@@ -0,0 +1,412 @@
+import hashlib
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import logging
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+
+from src.tokenizer import contar_tokens_prompt
+
+logger = logging.getLogger(__name__)
+
+# Tokens reservados para a resposta quando o payload não informa max_tokens
+TOKENS_RESPOSTA_PADRAO = 256
+
+# Componentes de duração no formato usado pela OpenAI em x-ratelimit-reset-* (ex: "6m0s", "20ms")
+_PADRAO_DURACAO = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_SEGUNDOS_POR_UNIDADE = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def estimar_tokens_payload(dados: dict, tokens_resposta_padrao: int = TOKENS_RESPOSTA_PADRAO) -> int:
+    """
+    Estima quantos tokens uma chamada vai consumir do limite TPM: prompt + máximo da resposta.
+    O prompt é contado pelo tokenizador local (src/tokenizer.py); o valor real é
+    conciliado depois com o `usage` devolvido pela API.
+    Args:
+        dados (dict): Payload de chat/completions, completions ou embeddings.
+        tokens_resposta_padrao (int): Tokens de resposta assumidos quando não há max_tokens.
+    Returns:
+        int: Estimativa de tokens da chamada.
+    """
+    if not dados:
+        return 0
+    if "messages" not in dados and "prompt" not in dados:
+        # Embeddings (input) não geram resposta; outros payloads não consomem tokens
+        return contar_tokens_prompt(dados)
+    tokens_prompt = contar_tokens_prompt(dados)
+    max_tokens = dados.get("max_completion_tokens") or dados.get("max_tokens") or tokens_resposta_padrao
+    respostas = dados.get("n") or 1
+    if "prompt" in dados and isinstance(dados["prompt"], list) and all(isinstance(p, str) for p in dados["prompt"]):
+        # Várias prompts na mesma requisição: cada uma tem sua própria resposta
+        respostas *= len(dados["prompt"])
+    return tokens_prompt + max_tokens * respostas
+
+
+def interpretar_duracao(valor) -> float:
+    """
+    Converte uma duração dos cabeçalhos de rate limit em segundos.
+    Aceita números puros ("30", "0.5") e o formato composto da OpenAI ("1h2m3s", "6m0s", "20ms").
+    Returns:
+        float: Duração em segundos, ou None se o valor estiver ausente ou não for reconhecido.
+    """
+    if valor is None:
+        return None
+    texto = str(valor).strip()
+    try:
+        return max(0.0, float(texto))
+    except ValueError:
+        pass
+    partes = _PADRAO_DURACAO.findall(texto)
+    if not partes or _PADRAO_DURACAO.sub("", texto):
+        return None
+    return sum(float(numero) * _SEGUNDOS_POR_UNIDADE[unidade] for numero, unidade in partes)
+
+
+def _interpretar_inteiro(valor):
+    try:
+        return int(float(valor))
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class LimitesServidor:
+    """Limites informados pela API nos cabeçalhos `Retry-After` e `x-ratelimit-*` de uma resposta."""
+    retry_after: float = None
+    limite_requisicoes: int = None
+    limite_tokens: int = None
+    requisicoes_restantes: int = None
+    tokens_restantes: int = None
+    reset_requisicoes: float = None
+    reset_tokens: float = None
+
+
+def ler_cabecalhos_rate_limit(cabecalhos) -> LimitesServidor:
+    """
+    Extrai os limites informados pelo servidor dos cabeçalhos de uma resposta.
+    Args:
+        cabecalhos: Cabeçalhos da resposta (requests ou httpx, sem distinção de maiúsculas).
+    Returns:
+        LimitesServidor: Valores encontrados; campos ausentes ficam como None.
+    """
+    if not cabecalhos:
+        return LimitesServidor()
+    retry_after = None
+    if cabecalhos.get("retry-after-ms") is not None:
+        retry_after = interpretar_duracao(cabecalhos.get("retry-after-ms"))
+        retry_after = retry_after / 1000 if retry_after is not None else None
+    if retry_after is None and cabecalhos.get("retry-after") is not None:
+        retry_after = interpretar_duracao(cabecalhos.get("retry-after"))
+        if retry_after is None:
+            # Retry-After também pode vir como data HTTP
+            try:
+                retry_after = max(0.0, parsedate_to_datetime(cabecalhos.get("retry-after")).timestamp() - time.time())
+            except (TypeError, ValueError):
+                retry_after = None
+    return LimitesServidor(
+        retry_after=retry_after,
+        limite_requisicoes=_interpretar_inteiro(cabecalhos.get("x-ratelimit-limit-requests")),
+        limite_tokens=_interpretar_inteiro(cabecalhos.get("x-ratelimit-limit-tokens")),
+        requisicoes_restantes=_interpretar_inteiro(cabecalhos.get("x-ratelimit-remaining-requests")),
+        tokens_restantes=_interpretar_inteiro(cabecalhos.get("x-ratelimit-remaining-tokens")),
+        reset_requisicoes=interpretar_duracao(cabecalhos.get("x-ratelimit-reset-requests")),
+        reset_tokens=interpretar_duracao(cabecalhos.get("x-ratelimit-reset-tokens")),
+    )
+
+
+def namespace_chave_api(chave_api: str) -> str:
+    """
+    Prefixo das chaves de balde derivado da chave da API, para que processos usando a
+    mesma conta dividam o mesmo orçamento. Só um hash curto é gravado, nunca a chave.
+    """
+    return hashlib.sha256((chave_api or "").encode("utf-8")).hexdigest()[:12] + ":"
+
+
+class BackendLimitadorMemoria:
+    """
+    Backend padrão: guarda o estado dos baldes em memória, visível apenas para o processo atual.
+    """
+
+    def __init__(self):
+        self._estado = {}
+        self._trava = threading.Lock()
+
+    def ajustar(self, chave: str, capacidade: float, taxa_por_segundo: float, delta: float, teto: float = None) -> float:
+        """
+        Repõe o balde `chave` pelo tempo decorrido e soma `delta` ao saldo, de forma atômica.
+        Args:
+            chave (str): Identificador do balde.
+            capacidade (float): Saldo máximo (e inicial) do balde.
+            taxa_por_segundo (float): Reposição por segundo.
+            delta (float): Valor somado ao saldo (negativo para debitar, 0 para só consultar).
+            teto (float): Limite superior opcional aplicado ao saldo resultante.
+        Returns:
+            float: Saldo resultante (pode ser negativo).
+        """
+        with self._trava:
+            agora = time.monotonic()
+            saldo, ultimo = self._estado.get(chave, (capacidade, agora))
+            saldo = min(capacidade, saldo + (agora - ultimo) * taxa_por_segundo + delta)
+            if teto is not None:
+                saldo = min(saldo, teto)
+            self._estado[chave] = (saldo, agora)
+            return saldo
+
+
+class BackendLimitadorSQLite:
+    """
+    Backend que guarda o estado dos baldes em um arquivo SQLite compartilhado, coordenando
+    todos os processos do mesmo host (workers do uvicorn, lotes da CLI em paralelo).
+    Cada ajuste roda em uma transação `BEGIN IMMEDIATE`, que serializa os escritores pelo
+    lock do próprio arquivo, sem depender de nenhum serviço externo.
+    """
+
+    def __init__(self, caminho: str = None, tempo_limite_lock: float = 30.0):
+        """
+        Args:
+            caminho (str): Arquivo do banco. Padrão: `openai_rate_limit.sqlite3` no diretório temporário.
+            tempo_limite_lock (float): Segundos aguardando o lock do arquivo antes de falhar.
+        """
+        self.caminho = caminho or os.path.join(tempfile.gettempdir(), "openai_rate_limit.sqlite3")
+        self.tempo_limite_lock = tempo_limite_lock
+        self._local = threading.local()
+        with self._conexao() as conexao:
+            conexao.execute(
+                "CREATE TABLE IF NOT EXISTS baldes (chave TEXT PRIMARY KEY, saldo REAL NOT NULL, atualizado REAL NOT NULL)"
+            )
+
+    def _conexao(self) -> sqlite3.Connection:
+        # Uma conexão por thread e por processo: conexões SQLite não sobrevivem a um fork
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None or self._local.pid != os.getpid():
+            conexao = sqlite3.connect(self.caminho, timeout=self.tempo_limite_lock, isolation_level=None)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            self._local.conexao = conexao
+            self._local.pid = os.getpid()
+        return conexao
+
+    def ajustar(self, chave: str, capacidade: float, taxa_por_segundo: float, delta: float, teto: float = None) -> float:
+        """Mesma semântica de BackendLimitadorMemoria.ajustar, atômica entre processos."""
+        conexao = self._conexao()
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            # Relógio de parede: o único comparável entre processos diferentes
+            agora = time.time()
+            linha = conexao.execute("SELECT saldo, atualizado FROM baldes WHERE chave = ?", (chave,)).fetchone()
+            saldo, ultimo = linha if linha else (capacidade, agora)
+            saldo = min(capacidade, saldo + max(0.0, agora - ultimo) * taxa_por_segundo + delta)
+            if teto is not None:
+                saldo = min(saldo, teto)
+            conexao.execute(
+                "INSERT OR REPLACE INTO baldes (chave, saldo, atualizado) VALUES (?, ?, ?)",
+                (chave, saldo, agora),
+            )
+            conexao.execute("COMMIT")
+        except BaseException:
+            conexao.execute("ROLLBACK")
+            raise
+        return saldo
+
+
+def criar_backend_limitador(tipo: str = "memoria", caminho: str = None):
+    """
+    Cria o backend de estado dos limitadores.
+    Args:
+        tipo (str): "memoria" (por processo) ou "sqlite" (compartilhado entre processos do host).
+        caminho (str): Arquivo do banco, usado apenas pelo backend "sqlite".
+    Returns:
+        BackendLimitadorMemoria | BackendLimitadorSQLite: Backend pronto para uso.
+    Raises:
+        ValueError: Se o tipo não for reconhecido.
+    """
+    tipo = (tipo or "memoria").lower()
+    if tipo == "memoria":
+        return BackendLimitadorMemoria()
+    if tipo == "sqlite":
+        return BackendLimitadorSQLite(caminho)
+    raise ValueError(f"Backend de rate limit desconhecido: '{tipo}'. Use 'memoria' ou 'sqlite'.")
+
+
+class BaldeTokens:
+    """
+    Token bucket thread-safe que admite saldo negativo.
+    Quem reserva mais do que há disponível fica "devendo" e recebe o tempo de espera
+    necessário para a dívida ser reposta; assim chamadas concorrentes são enfileiradas
+    de forma justa sem que a espera aconteça dentro da trava.
+    O estado fica no `backend`: em memória por padrão, ou em SQLite para que baldes com
+    a mesma `chave` em processos diferentes consumam um único orçamento.
+    """
+
+    def __init__(self, capacidade: float, taxa_por_segundo: float, backend=None, chave: str = "balde"):
+        self.capacidade = float(capacidade)
+        self.taxa_por_segundo = float(taxa_por_segundo)
+        self.backend = backend or BackendLimitadorMemoria()
+        self.chave = chave
+
+    def _ajustar(self, delta: float, teto: float = None) -> float:
+        return self.backend.ajustar(self.chave, self.capacidade, self.taxa_por_segundo, delta, teto)
+
+    def reservar(self, quantidade: float) -> float:
+        """
+        Debita `quantidade` do balde.
+        Returns:
+            float: Segundos que o chamador deve aguardar antes de prosseguir (0 se há saldo).
+        """
+        saldo = self._ajustar(-quantidade)
+        return 0.0 if saldo >= 0 else -saldo / self.taxa_por_segundo
+
+    def creditar(self, quantidade: float):
+        """Ajusta o saldo (positivo devolve, negativo cobra a mais), respeitando a capacidade."""
+        self._ajustar(quantidade)
+
+    def limitar(self, teto: float):
+        """Reduz o saldo para no máximo `teto` (nunca aumenta), ex: para alinhar com o servidor."""
+        self._ajustar(0.0, teto)
+
+    def disponivel(self) -> float:
+        return self._ajustar(0.0)
+
+
+@dataclass
+class Reserva:
+    """Reserva feita no limitador, usada para conciliar o consumo real depois da resposta."""
+    modelo: str
+    tokens_reservados: int
+    espera: float = 0.0
+
+
+class LimitadorPorModelo:
+    """
+    Limitador de taxa ciente de RPM (requisições por minuto) e TPM (tokens por minuto),
+    com um par de baldes independente para cada modelo, como a OpenAI aplica.
+    Cada chamada é cobrada pela estimativa (prompt + max_tokens) e depois conciliada com
+    o `usage` real da resposta, devolvendo ou cobrando a diferença.
+    """
+
+    def __init__(self, limites: dict = None, rpm_padrao: int = 500, tpm_padrao: int = 30000, backend=None, namespace: str = ""):
+        """
+        Args:
+            limites (dict): Limites por modelo, ex: {"gpt-4o": {"rpm": 500, "tpm": 30000}}.
+            rpm_padrao (int): RPM para modelos não listados em `limites`.
+            tpm_padrao (int): TPM para modelos não listados em `limites`.
+            backend: Backend de estado dos baldes (padrão: memória do processo).
+            namespace (str): Prefixo das chaves no backend (ex: namespace_chave_api(chave)).
+        """
+        self.limites = dict(limites or {})
+        self.rpm_padrao = rpm_padrao
+        self.tpm_padrao = tpm_padrao
+        self.backend = backend or BackendLimitadorMemoria()
+        self.namespace = namespace
+        self._baldes = {}
+        self._trava = threading.Lock()
+
+    def _baldes_do_modelo(self, modelo: str):
+        baldes = self._baldes.get(modelo)
+        if baldes is None:
+            with self._trava:
+                baldes = self._baldes.get(modelo)
+                if baldes is None:
+                    limite = self.limites.get(modelo, {})
+                    rpm = limite.get("rpm", self.rpm_padrao)
+                    tpm = limite.get("tpm", self.tpm_padrao)
+                    prefixo = f"{self.namespace}{modelo}"
+                    baldes = (
+                        BaldeTokens(rpm, rpm / 60.0, self.backend, f"{prefixo}:rpm"),
+                        BaldeTokens(tpm, tpm / 60.0, self.backend, f"{prefixo}:tpm"),
+                    )
+                    self._baldes[modelo] = baldes
+        return baldes
+
+    def reservar(self, modelo: str, tokens_estimados: int) -> Reserva:
+        """
+        Reserva uma requisição e `tokens_estimados` tokens para o modelo, sem bloquear.
+        Returns:
+            Reserva: Reserva com o tempo de espera (`espera`) que o chamador deve respeitar.
+        """
+        balde_req, balde_tok = self._baldes_do_modelo(modelo)
+        espera = max(balde_req.reservar(1), balde_tok.reservar(tokens_estimados))
+        return Reserva(modelo=modelo, tokens_reservados=tokens_estimados, espera=espera)
+
+    def adquirir(self, modelo: str, tokens_estimados: int) -> Reserva:
+        """Reserva e aguarda (bloqueando a thread) até que a chamada possa ser feita."""
+        reserva = self.reservar(modelo, tokens_estimados)
+        if reserva.espera > 0:
+            logger.info(f"Limite RPM/TPM de '{modelo}' atingido. Aguardando {reserva.espera:.2f}s...")
+            time.sleep(reserva.espera)
+        return reserva
+
+    def reconciliar(self, reserva: Reserva, tokens_reais: int):
+        """Ajusta o balde TPM com a diferença entre o estimado e o `usage` real da resposta."""
+        if reserva is None or tokens_reais is None:
+            return
+        _, balde_tok = self._baldes_do_modelo(reserva.modelo)
+        balde_tok.creditar(reserva.tokens_reservados - tokens_reais)
+
+    def sincronizar(self, modelo: str, limites: LimitesServidor):
+        """
+        Alinha os baldes do modelo com o que a API informou nos cabeçalhos da resposta.
+        - `x-ratelimit-limit-*` corrige capacidade e reposição para os limites reais da conta;
+        - `x-ratelimit-remaining-*` reduz o saldo local quando o servidor vê menos folga
+          (ex: outra máquina usando a mesma chave), freando antes de a cota acabar;
+        - `Retry-After` pausa novas requisições do modelo pelo tempo pedido.
+        Args:
+            modelo (str): Modelo da requisição.
+            limites (LimitesServidor): Valores lidos com ler_cabecalhos_rate_limit.
+        """
+        if limites is None:
+            return
+        balde_req, balde_tok = self._baldes_do_modelo(modelo)
+        for balde, limite, restantes in (
+            (balde_req, limites.limite_requisicoes, limites.requisicoes_restantes),
+            (balde_tok, limites.limite_tokens, limites.tokens_restantes),
+        ):
+            if limite and limite != balde.capacidade:
+                balde.capacidade = float(limite)
+                balde.taxa_por_segundo = limite / 60.0
+            if restantes is not None:
+                balde.limitar(restantes)
+        if limites.retry_after:
+            self.pausar(modelo, limites.retry_after)
+
+    def pausar(self, modelo: str, segundos: float):
+        """Faz a próxima requisição do modelo aguardar `segundos` (ex: após um 429 com Retry-After)."""
+        balde_req, _ = self._baldes_do_modelo(modelo)
+        balde_req.limitar(1 - segundos * balde_req.taxa_por_segundo)
+        logger.info(f"Requisições para '{modelo}' pausadas por {segundos:.2f}s a pedido da API.")
+
+    def estado(self) -> dict:
+        """Saldo atual de requisições e tokens de cada modelo (para métricas)."""
+        return {
+            modelo: {"requisicoes_disponiveis": req.disponivel(), "tokens_disponiveis": tok.disponivel()}
+            for modelo, (req, tok) in list(self._baldes.items())
+        }
+
+# -----------------------------------------------------------------------------
+#
+# Este módulo implementa o controle de taxa por modelo usado pelos clientes
+# HTTP. A OpenAI limita cada modelo por requisições por minuto (RPM) e por
+# tokens por minuto (TPM); espaçar as requisições de forma uniforme não basta
+# quando o volume de tokens chega em rajadas.
+#
+# Principais pontos:
+# - BaldeTokens: token bucket thread-safe com reserva (saldo negativo).
+# - Backends de estado: memória (por processo) ou SQLite (compartilhado entre
+#   os processos do host, ex: vários workers do uvicorn usando a mesma chave).
+# - LimitadorPorModelo: par de baldes RPM/TPM por modelo, criado sob demanda.
+# - estimar_tokens_payload: estimativa de prompt + max_tokens antes do envio.
+# - reconciliar(): corrige o balde TPM com o `usage` real da resposta.
+# - sincronizar(): ajusta os baldes pelos cabeçalhos Retry-After e x-ratelimit-*
+#   (limites reais da conta, saldo restante visto pelo servidor e pausas).
+#
+# Uso típico:
+#   limitador = LimitadorPorModelo({"gpt-4o": {"rpm": 500, "tpm": 30000}})
+#   cliente = ClienteHttpOpenAI(limitador_modelos=limitador)
+#
+#   backend = criar_backend_limitador("sqlite")
+#   limitador = LimitadorPorModelo(backend=backend, namespace=namespace_chave_api(chave))
+#
+# -----------------------------------------------------------------------------
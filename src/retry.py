@@ -0,0 +1,135 @@
+import random
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def espera_decorrelacionada(anterior: float, base: float, teto: float, sortear=random.uniform) -> float:
+    """
+    Calcula a próxima espera de backoff com "decorrelated jitter".
+    Cada espera é sorteada entre `base` e o triplo da anterior, limitada a `teto`; assim
+    clientes que falharam juntos se espalham no tempo em vez de re-tentarem em sincronia.
+    Args:
+        anterior (float): Espera usada na tentativa anterior (ou `base` na primeira).
+        base (float): Menor espera possível, em segundos.
+        teto (float): Maior espera possível, em segundos.
+        sortear: Função de sorteio uniforme (substituível em testes).
+    Returns:
+        float: Segundos a aguardar antes da próxima tentativa.
+    """
+    return min(teto, sortear(base, max(base, anterior * 3)))
+
+
+class OrcamentoRetry:
+    """
+    Orçamento de retries compartilhado por todas as requisições de um cliente.
+    Cada requisição nova deposita `proporcao` de um retry e cada retry consome um inteiro,
+    de modo que, no longo prazo, os retries não passam de `proporcao` do tráfego (ex: 10%).
+    O saldo começa em `capacidade`, o que permite retries mesmo com pouco tráfego.
+    """
+
+    def __init__(self, proporcao: float = 0.1, capacidade: float = 10.0):
+        """
+        Args:
+            proporcao (float): Fração do tráfego que pode virar retry (default: 0.1).
+            capacidade (float): Saldo inicial e máximo de retries acumulados (default: 10).
+        """
+        self.proporcao = proporcao
+        self.capacidade = float(capacidade)
+        self._saldo = float(capacidade)
+        self._retries_negados = 0
+        self._trava = threading.Lock()
+
+    def registrar_requisicao(self):
+        """Deposita a fração de retry correspondente a uma requisição nova."""
+        with self._trava:
+            self._saldo = min(self.capacidade, self._saldo + self.proporcao)
+
+    def consumir(self) -> bool:
+        """
+        Tenta retirar um retry do orçamento.
+        Returns:
+            bool: True se o retry é permitido; False se o orçamento está esgotado.
+        """
+        with self._trava:
+            # Tolerância para o acúmulo de frações em ponto flutuante (10 x 0.1 != 1.0)
+            if self._saldo >= 1 - 1e-9:
+                self._saldo = max(0.0, self._saldo - 1)
+                return True
+            self._retries_negados += 1
+            return False
+
+    def estado(self) -> dict:
+        """Saldo atual e quantidade de retries negados (para métricas)."""
+        with self._trava:
+            return {"saldo": self._saldo, "retries_negados": self._retries_negados}
+
+
+class CicloRetry:
+    """
+    Controla os retries de uma única requisição: sorteia as esperas com jitter, consulta o
+    orçamento compartilhado e respeita o tempo máximo total gasto em retries.
+    """
+
+    def __init__(self, base: float, teto: float, tempo_maximo: float = None, orcamento: OrcamentoRetry = None):
+        """
+        Args:
+            base (float): Menor espera entre tentativas (normalmente o fator_backoff do cliente).
+            teto (float): Maior espera entre tentativas.
+            tempo_maximo (float): Segundos máximos desde o início da requisição; None desativa o limite.
+            orcamento (OrcamentoRetry): Orçamento compartilhado; None desativa o controle.
+        """
+        self.base = base
+        self.teto = teto
+        self.tempo_maximo = tempo_maximo
+        self.orcamento = orcamento
+        self.motivo = None
+        self._anterior = base
+        self._inicio = time.monotonic()
+
+    def proxima_espera(self, espera_servidor: float = None) -> float:
+        """
+        Decide se a requisição pode ser re-tentada e quanto aguardar antes disso.
+        Args:
+            espera_servidor (float): Retry-After informado pela API, que tem prioridade sobre o jitter.
+        Returns:
+            float: Segundos de espera, ou None se o retry foi negado (o motivo fica em `self.motivo`).
+        """
+        if espera_servidor is not None:
+            tempo_espera = espera_servidor
+        else:
+            tempo_espera = espera_decorrelacionada(self._anterior, self.base, self.teto)
+            self._anterior = tempo_espera
+
+        if self.tempo_maximo is not None and time.monotonic() - self._inicio + tempo_espera > self.tempo_maximo:
+            self.motivo = f"tempo máximo de retries ({self.tempo_maximo:.1f}s) excedido"
+            return None
+        if self.orcamento is not None and not self.orcamento.consumir():
+            self.motivo = "orçamento de retries do cliente esgotado"
+            logger.warning("Orçamento de retries esgotado; a requisição não será re-tentada.")
+            return None
+        return tempo_espera
+
+# -----------------------------------------------------------------------------
+#
+# Este módulo implementa a política de retry usada pelos clientes HTTP.
+# Backoff exponencial determinístico faz com que todos os chamadores que
+# falharam juntos (ex: durante uma instabilidade da OpenAI) voltem juntos,
+# e retries ilimitados multiplicam a carga justamente quando o servidor está
+# com problemas.
+#
+# Principais pontos:
+# - espera_decorrelacionada: backoff com "decorrelated jitter", limitado a um teto.
+# - OrcamentoRetry: retries limitados a uma fração do tráfego do cliente.
+# - CicloRetry: por requisição, combina jitter, Retry-After, orçamento e o
+#   tempo máximo total gasto em retries.
+#
+# Uso típico:
+#   ciclo = CicloRetry(base=0.5, teto=20.0, tempo_maximo=30.0, orcamento=orcamento)
+#   espera = ciclo.proxima_espera()
+#   if espera is None:
+#       raise OpenAIRetryError(ciclo.motivo)
+#
+# -----------------------------------------------------------------------------
@@ -0,0 +1,238 @@
+import copy
+import hashlib
+import threading
+import time
+import logging
+
+import numpy as np
+
+from src.cache import chave_payload
+from src.embeddings import EmbeddingsModule, normalizar
+
+logger = logging.getLogger(__name__)
+
+# Parâmetros que não mudam o conteúdo da resposta e, portanto, não separam entradas do cache
+PARAMETROS_IGNORADOS = ("user", "stream", "stream_options")
+
+
+def _hash_contexto(mensagens: list, parametros: dict) -> int:
+    """Resume em um inteiro de 64 bits tudo o que vem antes da última pergunta (histórico e parâmetros)."""
+    relevantes = {k: v for k, v in (parametros or {}).items() if k not in PARAMETROS_IGNORADOS}
+    chave = chave_payload("chat/completions", {"contexto": mensagens[:-1], "parametros": relevantes})
+    return int.from_bytes(hashlib.sha256(chave.encode("ascii")).digest()[:8], "little", signed=True)
+
+
+class _Namespace:
+    """Perguntas e respostas guardadas de um modelo, em arrays NumPy que crescem sob demanda."""
+
+    def __init__(self, dimensao: int, capacidade: int = 64):
+        self.quantidade = 0
+        self.vetores = np.empty((capacidade, dimensao), dtype=np.float32)
+        self.contextos = np.empty(capacidade, dtype=np.int64)
+        self.criacao = np.empty(capacidade, dtype=np.float64)
+        self.ultimo_uso = np.empty(capacidade, dtype=np.float64)
+        self.respostas = []
+        self.consultas = 0
+        self.acertos = 0
+
+    def acrescentar(self, vetor: np.ndarray, contexto: int, resposta: dict, agora: float):
+        if self.quantidade == len(self.vetores):
+            nova = len(self.vetores) * 2
+            self.vetores = np.resize(self.vetores, (nova, self.vetores.shape[1]))
+            self.contextos = np.resize(self.contextos, nova)
+            self.criacao = np.resize(self.criacao, nova)
+            self.ultimo_uso = np.resize(self.ultimo_uso, nova)
+        i = self.quantidade
+        self.vetores[i] = vetor
+        self.contextos[i] = contexto
+        self.criacao[i] = self.ultimo_uso[i] = agora
+        self.respostas.append(resposta)
+        self.quantidade += 1
+
+    def remover(self, i: int):
+        """Remove a entrada `i` trazendo a última para o seu lugar (O(1), sem deslocar o array)."""
+        ultima = self.quantidade - 1
+        if i != ultima:
+            self.vetores[i] = self.vetores[ultima]
+            self.contextos[i] = self.contextos[ultima]
+            self.criacao[i] = self.criacao[ultima]
+            self.ultimo_uso[i] = self.ultimo_uso[ultima]
+            self.respostas[i] = self.respostas[ultima]
+        self.respostas.pop()
+        self.quantidade = ultima
+
+
+class CacheSemantico:
+    """
+    Cache de respostas do chat por similaridade de significado.
+    A última mensagem do usuário é convertida em embedding e comparada (cosseno) com as perguntas
+    já respondidas para o mesmo modelo; acima do limiar, a resposta guardada é devolvida.
+    O histórico anterior e os parâmetros da chamada também precisam coincidir, para que uma
+    pergunta parecida em outra conversa (ou com outro system prompt) não receba a resposta errada.
+    """
+
+    def __init__(self, cliente_http=None, modelo_embeddings: str = "text-embedding-3-small", limiar: float = 0.95, max_itens_por_modelo: int = 1000, ttl: float = 3600.0):
+        """
+        Args:
+            cliente_http: Cliente usado para gerar os embeddings (ex: o compartilhado).
+            modelo_embeddings (str): Modelo de embeddings (default: 'text-embedding-3-small').
+            limiar (float): Similaridade de cosseno mínima para considerar a pergunta equivalente (default: 0.95).
+            max_itens_por_modelo (int): Máximo de perguntas guardadas por modelo; a menos usada recentemente sai primeiro (default: 1000).
+            ttl (float): Segundos que uma resposta permanece válida; None desativa a expiração (default: 3600).
+        """
+        self.embeddings = EmbeddingsModule(cliente_http=cliente_http)
+        self.modelo_embeddings = modelo_embeddings
+        self.limiar = limiar
+        self.max_itens_por_modelo = max_itens_por_modelo
+        self.ttl = ttl
+        self._namespaces = {}
+        self._trava = threading.Lock()
+        self._expulsoes = 0
+        self._erros_embedding = 0
+
+    @staticmethod
+    def _pergunta(mensagens: list):
+        """Texto da última mensagem, se ela for uma pergunta do usuário em texto simples."""
+        ultima = mensagens[-1] if mensagens else None
+        if isinstance(ultima, dict) and ultima.get("role") == "user" and isinstance(ultima.get("content"), str) and ultima["content"].strip():
+            return ultima["content"]
+        return None
+
+    def _embedding(self, pergunta: str):
+        try:
+            return normalizar(self.embeddings.gerar_embeddings([pergunta], modelo=self.modelo_embeddings))[0]
+        except Exception as e:
+            # O cache nunca deve impedir a chamada ao modelo
+            with self._trava:
+                self._erros_embedding += 1
+            logger.warning(f"Cache semântico ignorado: falha ao gerar embedding ({e}).")
+            return None
+
+    def obter(self, modelo: str, mensagens: list, parametros: dict = None) -> tuple:
+        """
+        Procura uma resposta guardada para uma pergunta equivalente.
+        Args:
+            modelo (str): Modelo do chat (cada modelo tem seu próprio espaço de perguntas).
+            mensagens (list): Mensagens da conversa; a última deve ser do usuário.
+            parametros (dict): Demais parâmetros do payload (temperature, max_tokens, ...).
+        Returns:
+            tuple: (resposta, consulta). `resposta` é uma cópia da resposta guardada ou None;
+            `consulta` deve ser repassada a `guardar` após uma falha, para não gerar o embedding de novo.
+        """
+        pergunta = self._pergunta(mensagens)
+        if pergunta is None:
+            return None, None
+        vetor = self._embedding(pergunta)
+        if vetor is None:
+            return None, None
+        contexto = _hash_contexto(mensagens, parametros)
+        agora = time.monotonic()
+        with self._trava:
+            namespace = self._namespaces.get(modelo)
+            if namespace is None or namespace.vetores.shape[1] != vetor.shape[0]:
+                namespace = self._namespaces[modelo] = _Namespace(vetor.shape[0])
+            namespace.consultas += 1
+            n = namespace.quantidade
+            if n:
+                similaridades = namespace.vetores[:n] @ vetor
+                similaridades[namespace.contextos[:n] != contexto] = -np.inf
+                if self.ttl is not None:
+                    similaridades[agora - namespace.criacao[:n] > self.ttl] = -np.inf
+                melhor = int(np.argmax(similaridades))
+                if similaridades[melhor] >= self.limiar:
+                    namespace.acertos += 1
+                    namespace.ultimo_uso[melhor] = agora
+                    logger.debug(f"Cache semântico: acerto para '{modelo}' (similaridade {similaridades[melhor]:.3f}).")
+                    return copy.deepcopy(namespace.respostas[melhor]), None
+        return None, (vetor, contexto)
+
+    def guardar(self, modelo: str, consulta: tuple, resposta: dict):
+        """
+        Guarda a resposta obtida após uma falha de `obter`.
+        Args:
+            modelo (str): Modelo do chat.
+            consulta (tuple): Segundo valor devolvido por `obter` (None é ignorado).
+            resposta (dict): Resposta da API.
+        """
+        if consulta is None or not isinstance(resposta, dict) or not resposta.get("choices"):
+            return
+        vetor, contexto = consulta
+        agora = time.monotonic()
+        with self._trava:
+            namespace = self._namespaces.get(modelo)
+            if namespace is None or namespace.vetores.shape[1] != vetor.shape[0]:
+                namespace = self._namespaces[modelo] = _Namespace(vetor.shape[0])
+            self._remover_expiradas(namespace, agora)
+            while namespace.quantidade >= self.max_itens_por_modelo > 0:
+                namespace.remover(int(np.argmin(namespace.ultimo_uso[:namespace.quantidade])))
+                self._expulsoes += 1
+            if self.max_itens_por_modelo > 0:
+                namespace.acrescentar(vetor, contexto, copy.deepcopy(resposta), agora)
+
+    def _remover_expiradas(self, namespace: _Namespace, agora: float):
+        if self.ttl is None:
+            return
+        for i in np.flatnonzero(agora - namespace.criacao[:namespace.quantidade] > self.ttl)[::-1]:
+            namespace.remover(int(i))
+            self._expulsoes += 1
+
+    def limpar(self, modelo: str = None):
+        """Descarta as perguntas guardadas de um modelo, ou de todos se `modelo` for None."""
+        with self._trava:
+            if modelo is None:
+                self._namespaces.clear()
+            else:
+                self._namespaces.pop(modelo, None)
+
+    def estatisticas(self) -> dict:
+        """
+        Returns:
+            dict: consultas, acertos, taxa_acerto, itens, expulsoes, erros_embedding e por_modelo
+            ({modelo: {consultas, acertos, taxa_acerto, itens}}).
+        """
+        with self._trava:
+            por_modelo = {
+                modelo: {
+                    "consultas": ns.consultas,
+                    "acertos": ns.acertos,
+                    "taxa_acerto": ns.acertos / ns.consultas if ns.consultas else 0.0,
+                    "itens": ns.quantidade,
+                }
+                for modelo, ns in self._namespaces.items()
+            }
+            consultas = sum(m["consultas"] for m in por_modelo.values())
+            acertos = sum(m["acertos"] for m in por_modelo.values())
+            return {
+                "consultas": consultas,
+                "acertos": acertos,
+                "taxa_acerto": acertos / consultas if consultas else 0.0,
+                "itens": sum(m["itens"] for m in por_modelo.values()),
+                "expulsoes": self._expulsoes,
+                "erros_embedding": self._erros_embedding,
+                "por_modelo": por_modelo,
+            }
+
+# -----------------------------------------------------------------------------
+#
+# Este módulo implementa o cache semântico do chat: perguntas reformuladas
+# ("como troco minha senha?" / "qual o procedimento para alterar a senha?")
+# reaproveitam a resposta já obtida, coisa que o cache exato (src/cache.py)
+# não consegue fazer.
+#
+# Principais pontos:
+# - Embedding da última mensagem do usuário, normalizado; a busca é um único
+#   produto matriz-vetor sobre as perguntas guardadas do modelo.
+# - Um espaço (namespace) por modelo de chat, cada um com sua matriz float32
+#   que cresce por duplicação.
+# - Acerto exige similaridade >= limiar E o mesmo histórico/parâmetros antes
+#   da pergunta (hash de 64 bits comparado de forma vetorizada).
+# - Expiração por TTL e expulsão da entrada usada há mais tempo (LRU) ao
+#   atingir max_itens_por_modelo; remoção em O(1) trocando com a última linha.
+# - estatisticas(): taxa de acertos geral e por modelo.
+# - Falhas ao gerar o embedding apenas desviam a chamada para a API.
+#
+# Uso típico:
+#   cache = CacheSemantico(cliente_http=obter_cliente_compartilhado(), limiar=0.93)
+#   chat = ChatModule(cliente_http=obter_cliente_compartilhado(), cache_semantico=cache)
+#
+# -----------------------------------------------------------------------------
@@ -0,0 +1,143 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from src.context_manager import ContextManager
+
+
+class LimiteSessoesAtingido(Exception):
+    """Todas as vagas de sessão estão ocupadas por sessões ainda ativas."""
+
+    def __init__(self, max_sessoes: int, tempo_restante: float):
+        super().__init__(f"Limite de {max_sessoes} sessões ativas atingido; tente novamente em {tempo_restante:.0f}s.")
+        self.max_sessoes = max_sessoes
+        self.tempo_restante = tempo_restante
+
+
+class Sessao:
+    """Conversa mantida no servidor entre as requisições de um mesmo cliente."""
+
+    def __init__(self, identificador: str, contexto: ContextManager):
+        self.id = identificador
+        self.contexto = contexto
+        self.criada_em = time.monotonic()
+        self.ultimo_uso = self.criada_em
+        # Protege a troca do contexto ao fim de cada turno (ex: duas abas enviando ao mesmo tempo)
+        self.trava = threading.Lock()
+
+
+class ArmazemSessoes:
+    """
+    Guarda as sessões de conversa em memória, com limite de quantidade, expiração por inatividade
+    e orçamento de tokens por sessão. Uma sessão ativa nunca é descartada para abrir espaço a outra:
+    no limite, novas sessões são recusadas até alguma expirar ou ser encerrada.
+    """
+
+    def __init__(self, max_sessoes: int = 1000, ttl_ocioso: float = 1800.0, max_tokens_por_sessao: int = 16000, resumidor=None):
+        """
+        Args:
+            max_sessoes (int): Máximo de sessões simultâneas (default: 1000).
+            ttl_ocioso (float): Segundos sem uso após os quais a sessão expira (default: 1800).
+            max_tokens_por_sessao (int): Orçamento de tokens do histórico de cada sessão; as mensagens
+                mais antigas saem (ou são resumidas) ao ultrapassá-lo (default: 16000).
+            resumidor: ResumidorConversa opcional, para compactar o histórico em vez de só descartar.
+        """
+        self.max_sessoes = max_sessoes
+        self.ttl_ocioso = ttl_ocioso
+        self.max_tokens_por_sessao = max_tokens_por_sessao
+        self.resumidor = resumidor
+        self._sessoes = OrderedDict()
+        self._trava = threading.Lock()
+        self._expiradas = 0
+        self._recusadas = 0
+
+    def _remover_expiradas(self, agora: float):
+        # As sessões ficam em ordem de último uso: as expiradas estão sempre no começo
+        while self._sessoes:
+            sessao = next(iter(self._sessoes.values()))
+            if agora - sessao.ultimo_uso <= self.ttl_ocioso:
+                break
+            self._sessoes.popitem(last=False)
+            self._expiradas += 1
+
+    def criar(self, modelo: str = None) -> Sessao:
+        """
+        Cria uma sessão vazia.
+        Args:
+            modelo (str): Modelo usado na contagem de tokens do histórico.
+        Returns:
+            Sessao: A nova sessão, com um id aleatório não adivinhável.
+        Raises:
+            LimiteSessoesAtingido: Se as max_sessoes vagas estiverem ocupadas por sessões ativas.
+        """
+        contexto = ContextManager(max_length=None, max_tokens=self.max_tokens_por_sessao, modelo=modelo, resumidor=self.resumidor)
+        sessao = Sessao(secrets.token_urlsafe(16), contexto)
+        with self._trava:
+            self._remover_expiradas(sessao.criada_em)
+            if len(self._sessoes) >= self.max_sessoes > 0:
+                self._recusadas += 1
+                mais_ociosa = next(iter(self._sessoes.values()))
+                raise LimiteSessoesAtingido(self.max_sessoes, self.ttl_ocioso - (sessao.criada_em - mais_ociosa.ultimo_uso))
+            self._sessoes[sessao.id] = sessao
+        return sessao
+
+    def obter(self, identificador: str) -> Sessao:
+        """
+        Returns:
+            Sessao: A sessão (marcada como usada agora), ou None se não existir ou tiver expirado.
+        """
+        agora = time.monotonic()
+        with self._trava:
+            self._remover_expiradas(agora)
+            sessao = self._sessoes.get(identificador)
+            if sessao is not None:
+                sessao.ultimo_uso = agora
+                self._sessoes.move_to_end(identificador)
+            return sessao
+
+    def remover(self, identificador: str) -> bool:
+        """Returns: bool: True se a sessão existia."""
+        with self._trava:
+            return self._sessoes.pop(identificador, None) is not None
+
+    def __len__(self):
+        with self._trava:
+            self._remover_expiradas(time.monotonic())
+            return len(self._sessoes)
+
+    def estatisticas(self) -> dict:
+        """
+        Returns:
+            dict: sessoes (ativas), expiradas e recusadas (por falta de vaga) desde o início.
+        """
+        with self._trava:
+            self._remover_expiradas(time.monotonic())
+            return {"sessoes": len(self._sessoes), "expiradas": self._expiradas, "recusadas": self._recusadas}
+
+# -----------------------------------------------------------------------------
+#
+# Este módulo mantém as conversas do /chat no servidor. Com uma sessão, o
+# navegador envia a cada turno apenas a mensagem nova (e o session_id), em vez
+# do histórico inteiro com os arquivos em base64, que era revalidado pelo
+# Pydantic a cada requisição.
+#
+# Principais pontos:
+# - Sessao: ContextManager da conversa; cada turno monta o payload em uma
+#   ramificação e só grava no histórico da sessão quando termina com sucesso.
+# - ArmazemSessoes: OrderedDict em ordem de último uso; expiração por
+#   inatividade (ttl_ocioso), O(1) por sessão removida. Ao atingir
+#   max_sessoes, criar() recusa com LimiteSessoesAtingido (503 na rota) em
+#   vez de descartar uma sessão ativa: quem cria sessões em massa não apaga
+#   as conversas dos outros usuários.
+# - Memória limitada por sessão pelo orçamento de tokens do ContextManager
+#   (e, opcionalmente, compactação por resumo).
+# - Ids gerados com secrets.token_urlsafe (não adivinháveis).
+#
+# Uso típico:
+#   sessoes = ArmazemSessoes(max_sessoes=1000, ttl_ocioso=1800)
+#   sessao = sessoes.criar(modelo="gpt-4o-mini")  # LimiteSessoesAtingido se lotado
+#   ...
+#   sessao = sessoes.obter(session_id)  # None se expirou
+#
+# -----------------------------------------------------------------------------
@@ -0,0 +1,162 @@
+import asyncio
+import copy
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Chamada:
+    """Chamada em andamento: o resultado (ou a exceção) é publicado para quem está aguardando."""
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.erro = None
+        self.aguardando = 0
+
+
+class _ChamadaAsync:
+    """Chamada assíncrona em andamento, publicada em um futuro do event loop."""
+
+    def __init__(self, futuro: asyncio.Future):
+        self.futuro = futuro
+        self.aguardando = 0
+
+
+class GrupoChamadas:
+    """
+    Agrupa chamadas idênticas simultâneas ("single flight") entre threads.
+    A primeira chamada de uma chave executa a função; as que chegam enquanto ela está em
+    andamento aguardam e recebem uma cópia do mesmo resultado, ou a mesma exceção.
+    Terminada a chamada, a chave é liberada: nada é guardado (para isso, use o cache).
+    """
+
+    def __init__(self):
+        self._em_andamento = {}
+        self._agrupadas = 0
+        self._trava = threading.Lock()
+
+    def executar(self, chave: str, funcao):
+        """
+        Executa `funcao()` ou, se já houver uma chamada com a mesma chave em andamento, aguarda o resultado dela.
+        Args:
+            chave (str): Identifica chamadas equivalentes (ex: hash do endpoint + payload).
+            funcao: Função sem argumentos que realiza a chamada.
+        Returns:
+            O resultado de `funcao()` (cópia, para quem aguardou outra chamada).
+        """
+        with self._trava:
+            chamada = self._em_andamento.get(chave)
+            lider = chamada is None
+            if lider:
+                chamada = _Chamada()
+                self._em_andamento[chave] = chamada
+            else:
+                chamada.aguardando += 1
+                self._agrupadas += 1
+
+        if not lider:
+            chamada.evento.wait()
+            if chamada.erro is not None:
+                raise chamada.erro
+            return copy.deepcopy(chamada.resultado)
+
+        try:
+            resultado = funcao()
+        except BaseException as e:
+            chamada.erro = e
+            raise
+        finally:
+            with self._trava:
+                del self._em_andamento[chave]
+            if chamada.erro is None and chamada.aguardando:
+                # Quem aguardou copia um retrato tirado antes de o resultado voltar ao chamador da líder,
+                # que pode alterá-lo enquanto as cópias são feitas
+                chamada.resultado = copy.deepcopy(resultado)
+            chamada.evento.set()
+        return resultado
+
+    def estatisticas(self) -> dict:
+        """Chamadas atendidas por outra já em andamento e chaves em andamento agora (para métricas)."""
+        with self._trava:
+            return {"agrupadas": self._agrupadas, "em_andamento": len(self._em_andamento)}
+
+
+class GrupoChamadasAsync:
+    """
+    Versão assíncrona de GrupoChamadas, para corrotinas de um mesmo event loop.
+    Quem aguarda fica protegido do cancelamento da chamada líder: se ela for cancelada,
+    o próximo da fila refaz a chamada em vez de propagar o cancelamento.
+    """
+
+    def __init__(self):
+        self._em_andamento = {}
+        self._agrupadas = 0
+
+    async def executar(self, chave: str, fabrica_corrotina):
+        """
+        Executa `await fabrica_corrotina()` ou aguarda a chamada idêntica já em andamento.
+        Args:
+            chave (str): Identifica chamadas equivalentes (ex: hash do endpoint + payload).
+            fabrica_corrotina: Função sem argumentos que devolve a corrotina da chamada.
+        Returns:
+            O resultado da corrotina (cópia, para quem aguardou outra chamada).
+        """
+        while True:
+            chamada = self._em_andamento.get(chave)
+            if chamada is None:
+                break
+            self._agrupadas += 1
+            chamada.aguardando += 1
+            # asyncio.wait não repassa o cancelamento da líder a esta tarefa; o desta tarefa, sim, interrompe a espera
+            await asyncio.wait((chamada.futuro,))
+            if chamada.futuro.cancelled():
+                # Líder cancelada: tenta de novo (possivelmente como líder)
+                continue
+            return copy.deepcopy(chamada.futuro.result())
+
+        chamada = _ChamadaAsync(asyncio.get_running_loop().create_future())
+        self._em_andamento[chave] = chamada
+        try:
+            resultado = await fabrica_corrotina()
+        except asyncio.CancelledError:
+            chamada.futuro.cancel()
+            raise
+        except BaseException as e:
+            chamada.futuro.set_exception(e)
+            chamada.futuro.exception()  # marca como consumida quando ninguém estava aguardando
+            raise
+        else:
+            # Publica um retrato: o chamador da líder recebe o original e pode alterá-lo antes de as demais copiarem
+            chamada.futuro.set_result(copy.deepcopy(resultado) if chamada.aguardando else resultado)
+            return resultado
+        finally:
+            del self._em_andamento[chave]
+
+    def estatisticas(self) -> dict:
+        """Chamadas atendidas por outra já em andamento e chaves em andamento agora (para métricas)."""
+        return {"agrupadas": self._agrupadas, "em_andamento": len(self._em_andamento)}
+
+# -----------------------------------------------------------------------------
+#
+# Este módulo implementa o agrupamento de chamadas idênticas simultâneas
+# ("single flight") usado pelos clientes HTTP. Em picos (ex: um dashboard
+# atualizado por muitos usuários ao mesmo tempo), várias requisições com o
+# mesmo payload chegariam juntas à OpenAI; com o agrupamento, só a primeira
+# vai à API e as demais recebem o mesmo resultado ou a mesma exceção.
+#
+# Principais pontos:
+# - GrupoChamadas: para o cliente síncrono (threads, threading.Event).
+# - GrupoChamadasAsync: para o cliente assíncrono (asyncio futures).
+# - Nada é guardado após a chamada terminar; a reutilização entre chamadas
+#   não simultâneas é papel do cache (src/cache.py).
+# - Quem aguardou recebe uma cópia de um retrato do resultado, tirado antes
+#   de a líder devolvê-lo: alterações feitas por um chamador não aparecem
+#   para os outros, nem durante a cópia.
+#
+# Uso típico:
+#   grupo = GrupoChamadas()
+#   resultado = grupo.executar(chave_payload(ponto_final, dados), lambda: chamar_api(dados))
+#
+# -----------------------------------------------------------------------------
@@ -0,0 +1,220 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+FIM_STREAM = "[DONE]"
+
+
+def iterar_eventos_sse(linhas):
+    """
+    Interpreta um fluxo Server-Sent Events linha a linha e produz o JSON de cada evento.
+    Linhas `data:` consecutivas são unidas até a linha em branco que fecha o evento;
+    comentários (`:`) e outros campos (`event:`, `id:`) são ignorados.
+    Args:
+        linhas: Iterável de linhas (str ou bytes) já sem o terminador.
+    Yields:
+        dict: Cada chunk JSON enviado pela API, até o marcador `[DONE]`.
+    """
+    dados = []
+    for linha in linhas:
+        if isinstance(linha, bytes):
+            linha = linha.decode("utf-8")
+        if linha:
+            if linha.startswith("data:"):
+                dados.append(linha[5:].lstrip(" "))
+            continue
+        if not dados:
+            continue
+        evento, dados = "\n".join(dados), []
+        if evento == FIM_STREAM:
+            return
+        yield _decodificar_evento(evento)
+    if dados and "\n".join(dados) != FIM_STREAM:
+        yield _decodificar_evento("\n".join(dados))
+
+
+async def iterar_eventos_sse_async(linhas):
+    """Versão assíncrona de iterar_eventos_sse, para `httpx.Response.aiter_lines()`."""
+    dados = []
+    async for linha in linhas:
+        if linha:
+            if linha.startswith("data:"):
+                dados.append(linha[5:].lstrip(" "))
+            continue
+        if not dados:
+            continue
+        evento, dados = "\n".join(dados), []
+        if evento == FIM_STREAM:
+            return
+        yield _decodificar_evento(evento)
+    if dados and "\n".join(dados) != FIM_STREAM:
+        yield _decodificar_evento("\n".join(dados))
+
+
+def _decodificar_evento(evento: str) -> dict:
+    try:
+        return json.loads(evento)
+    except json.JSONDecodeError:
+        logger.warning(f"Evento SSE não-JSON ignorado: {evento[:200]}")
+        return {}
+
+
+class AgregadorStream:
+    """
+    Acumula os chunks de um stream de chat/completions e monta a resposta final no
+    mesmo formato da resposta não-streaming (`choices`, `usage`, etc).
+    """
+
+    def __init__(self):
+        self.id = None
+        self.modelo = None
+        self.criado = None
+        self.objeto = None
+        self.usage = None
+        self._escolhas = {}
+
+    def adicionar(self, chunk: dict) -> str:
+        """
+        Incorpora um chunk ao agregado.
+        Args:
+            chunk (dict): Chunk recebido do stream.
+        Returns:
+            str: Texto incremental da primeira escolha neste chunk ('' se não houver).
+        """
+        self.id = self.id or chunk.get("id")
+        self.modelo = self.modelo or chunk.get("model")
+        self.criado = self.criado or chunk.get("created")
+        self.objeto = self.objeto or chunk.get("object")
+        if chunk.get("usage"):
+            self.usage = chunk["usage"]
+        delta_principal = ""
+        for escolha in chunk.get("choices") or []:
+            indice = escolha.get("index", 0)
+            atual = self._escolhas.setdefault(indice, {"index": indice, "role": None, "partes": [], "finish_reason": None, "chat": False})
+            if "delta" in escolha:
+                atual["chat"] = True
+                delta = escolha.get("delta") or {}
+                atual["role"] = atual["role"] or delta.get("role")
+                texto = delta.get("content") or ""
+            else:
+                texto = escolha.get("text") or ""
+            if texto:
+                atual["partes"].append(texto)
+            if escolha.get("finish_reason"):
+                atual["finish_reason"] = escolha["finish_reason"]
+            if indice == 0:
+                delta_principal = texto
+        return delta_principal
+
+    def resposta_final(self) -> dict:
+        """Retorna a resposta agregada no formato de uma resposta não-streaming."""
+        escolhas = []
+        for indice in sorted(self._escolhas):
+            atual = self._escolhas[indice]
+            conteudo = "".join(atual["partes"])
+            if atual["chat"]:
+                escolha = {"index": indice, "message": {"role": atual["role"] or "assistant", "content": conteudo}}
+            else:
+                escolha = {"index": indice, "text": conteudo}
+            escolha["finish_reason"] = atual["finish_reason"]
+            escolhas.append(escolha)
+        objeto = (self.objeto or "").replace(".chunk", "") or None
+        resposta = {"id": self.id, "object": objeto, "created": self.criado, "model": self.modelo, "choices": escolhas}
+        if self.usage:
+            resposta["usage"] = self.usage
+        return resposta
+
+
+class RespostaStream:
+    """
+    Iterador sobre os deltas de texto de uma resposta em streaming.
+    Cada iteração produz o texto incremental da primeira escolha; ao final (ou a
+    qualquer momento), `resposta_final()` devolve a resposta agregada até ali.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.agregador = AgregadorStream()
+        self.concluida = False
+
+    def __iter__(self):
+        try:
+            for chunk in self._chunks:
+                delta = self.agregador.adicionar(chunk)
+                if delta:
+                    yield delta
+            self.concluida = True
+        finally:
+            self.fechar()
+
+    def resposta_final(self) -> dict:
+        return self.agregador.resposta_final()
+
+    def fechar(self):
+        """Interrompe o stream e libera a conexão subjacente."""
+        fechar = getattr(self._chunks, "close", None)
+        if fechar:
+            fechar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.fechar()
+
+
+class RespostaStreamAsync:
+    """Equivalente assíncrono de RespostaStream, para uso com `async for`."""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.agregador = AgregadorStream()
+        self.concluida = False
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self._chunks:
+                delta = self.agregador.adicionar(chunk)
+                if delta:
+                    yield delta
+            self.concluida = True
+        finally:
+            await self.fechar()
+
+    def resposta_final(self) -> dict:
+        return self.agregador.resposta_final()
+
+    async def fechar(self):
+        """Interrompe o stream e libera a conexão subjacente."""
+        fechar = getattr(self._chunks, "aclose", None)
+        if fechar:
+            await fechar()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.fechar()
+
+# -----------------------------------------------------------------------------
+#
+# Este módulo reúne o suporte a respostas em streaming (Server-Sent Events) da
+# API da OpenAI. Com `stream: true`, a API envia a resposta em pedaços
+# (`data: {...}`) à medida que o modelo gera os tokens, encerrando com
+# `data: [DONE]`.
+#
+# Principais pontos:
+# - iterar_eventos_sse / iterar_eventos_sse_async: parser incremental de SSE.
+# - AgregadorStream: reconstrói a resposta completa (choices, usage) a partir
+#   dos chunks, no mesmo formato da resposta não-streaming.
+# - RespostaStream / RespostaStreamAsync: iteram sobre os deltas de texto e
+#   expõem resposta_final() ao término.
+#
+# Uso típico:
+#   stream = chat.criar_conversa_stream([{"role": "user", "content": "Olá"}])
+#   for delta in stream:
+#       print(delta, end="", flush=True)
+#   resposta = stream.resposta_final()
+#
+# -----------------------------------------------------------------------------
@@ -0,0 +1,113 @@
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from src.cache import CacheRespostas, chave_payload
+from src.chat import ChatModule
+
+logger = logging.getLogger(__name__)
+
+INSTRUCAO_RESUMO = (
+    "Resuma a conversa abaixo de forma concisa, para que ela possa continuar sem o histórico completo. "
+    "Preserve fatos, decisões, nomes, números, preferências e pedidos ainda pendentes do usuário. "
+    "Escreva no idioma da conversa e responda apenas com o resumo."
+)
+
+
+def _texto_mensagem(mensagem: dict) -> str:
+    conteudo = mensagem.get("content")
+    if isinstance(conteudo, list):
+        conteudo = " ".join(p.get("text", "") for p in conteudo if isinstance(p, dict) and p.get("type") == "text")
+    if not conteudo and mensagem.get("tool_calls"):
+        conteudo = "(chamada de ferramenta: " + ", ".join(c.get("function", {}).get("name", "?") for c in mensagem["tool_calls"]) + ")"
+    return f"[{mensagem.get('role')}] {conteudo or ''}"
+
+
+class ResumidorConversa:
+    """
+    Gera, com o próprio modelo, resumos das partes antigas de uma conversa (compactação do contexto).
+    Os resumos ficam em cache: o mesmo trecho com o mesmo resumo anterior não é resumido de novo.
+    """
+
+    def __init__(self, cliente_http=None, modelo: str = "gpt-4o-mini", max_tokens_resumo: int = 400, max_trabalhadores: int = 2, max_itens_cache: int = 256):
+        """
+        Args:
+            cliente_http: Cliente usado nas chamadas de resumo (ex: o compartilhado).
+            modelo (str): Modelo que escreve os resumos (default: 'gpt-4o-mini').
+            max_tokens_resumo (int): Tamanho máximo de cada resumo, em tokens (default: 400).
+            max_trabalhadores (int): Resumos gerados em paralelo em segundo plano (default: 2).
+            max_itens_cache (int): Resumos mantidos em cache (default: 256).
+        """
+        self.chat = ChatModule(cliente_http=cliente_http)
+        self.modelo = modelo
+        self.max_tokens_resumo = max_tokens_resumo
+        self.max_trabalhadores = max_trabalhadores
+        self.cache = CacheRespostas(max_itens=max_itens_cache, ttl=None)
+        self._executor = None
+        self._trava = threading.Lock()
+
+    def resumir(self, mensagens: list, resumo_anterior: str = None) -> str:
+        """
+        Resume um trecho da conversa, incorporando o resumo do que veio antes dele.
+        Args:
+            mensagens (list): Mensagens a resumir, em ordem.
+            resumo_anterior (str): Resumo das mensagens anteriores a este trecho, se houver.
+        Returns:
+            str: O novo resumo, que substitui o anterior.
+        """
+        transcricao = "\n".join(_texto_mensagem(m) for m in mensagens)
+        chave = chave_payload("resumo", {"modelo": self.modelo, "anterior": resumo_anterior, "transcricao": transcricao})
+        em_cache = self.cache.obter(chave)
+        if em_cache is not None:
+            return em_cache
+        if resumo_anterior:
+            transcricao = f"Resumo do início da conversa:\n{resumo_anterior}\n\nContinuação:\n{transcricao}"
+        resposta = self.chat.criar_conversa(
+            [{"role": "system", "content": INSTRUCAO_RESUMO}, {"role": "user", "content": transcricao}],
+            modelo=self.modelo,
+            temperature=0,
+            max_tokens=self.max_tokens_resumo,
+        )
+        resumo = resposta["choices"][0]["message"]["content"].strip()
+        self.cache.guardar(chave, resumo)
+        return resumo
+
+    def resumir_em_segundo_plano(self, mensagens: list, resumo_anterior: str = None):
+        """
+        Agenda `resumir` em uma thread de fundo.
+        Returns:
+            concurrent.futures.Future: Futuro com o resumo (ou a exceção da chamada).
+        """
+        with self._trava:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_trabalhadores, thread_name_prefix="resumo")
+            return self._executor.submit(self.resumir, list(mensagens), resumo_anterior)
+
+    def fechar(self):
+        """Encerra as threads de fundo (aguardando os resumos em andamento)."""
+        with self._trava:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+# -----------------------------------------------------------------------------
+#
+# Este módulo implementa a compactação de conversas longas por resumo:
+# em vez de simplesmente descartar os turnos mais antigos quando o contexto
+# cresce, o ContextManager os troca por um resumo escrito pelo modelo.
+#
+# Principais pontos:
+# - Resumo "rolante": cada novo resumo incorpora o anterior, então o contexto
+#   carrega sempre um único resumo + os turnos recentes.
+# - resumir_em_segundo_plano: o resumo é gerado em uma thread de fundo, sem
+#   bloquear o próximo turno do usuário.
+# - Cache dos resumos (CacheRespostas): o mesmo trecho não é resumido duas vezes
+#   (ex: ao recarregar uma conversa salva).
+# - Chamadas com temperature 0 pelo ChatModule, passando pelo rate limiter,
+#   retries e circuit breaker do cliente.
+#
+# Uso típico:
+#   resumidor = ResumidorConversa(cliente_http=obter_cliente_compartilhado())
+#   ctx = ContextManager(max_length=None, max_tokens=8000, resumidor=resumidor)
+#
+# -----------------------------------------------------------------------------
@@ -0,0 +1,262 @@
+import copy
+import hashlib
+import json
+import math
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from src.exceptions import OpenAIValidationError
+
+try:
+    import tiktoken
+except ImportError:
+    # Sem o tiktoken, as contagens usam a aproximação de ~4 caracteres por token
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Tokens fixos por mensagem (delimitadores e papel) e do início da resposta do assistente
+TOKENS_POR_MENSAGEM = 3
+TOKENS_INICIO_RESPOSTA = 3
+# Custo aproximado de uma imagem enviada em uma mensagem (detalhe baixo)
+TOKENS_POR_IMAGEM = 85
+# Folga aplicada à janela quando a contagem é aproximada (sem tiktoken), para não recusar por erro de estimativa
+MARGEM_ESTIMATIVA = 0.10
+CODIFICACAO_PADRAO = "o200k_base"
+
+# Janela de contexto (prompt + resposta) por prefixo de nome do modelo; o prefixo mais longo vence
+JANELAS_CONTEXTO = {
+    "gpt-4.1": 1047576,
+    "gpt-4o": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4-32k": 32768,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo-instruct": 4096,
+    "gpt-3.5-turbo": 16385,
+    "o1": 200000,
+    "o3": 200000,
+    "o4-mini": 200000,
+    "text-davinci-003": 4097,
+    "text-embedding": 8191,
+}
+
+
+def janela_contexto(modelo: str) -> int:
+    """
+    Returns:
+        int: Janela de contexto do modelo em tokens, ou None se o modelo não for conhecido.
+    """
+    if not modelo:
+        return None
+    prefixos = [p for p in JANELAS_CONTEXTO if modelo.startswith(p)]
+    return JANELAS_CONTEXTO[max(prefixos, key=len)] if prefixos else None
+
+
+@lru_cache(maxsize=64)
+def _codificador(modelo: str):
+    """Codificador BPE do tiktoken para o modelo, ou None se indisponível (sem o pacote ou sem os arquivos BPE)."""
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(modelo or "")
+        except KeyError:
+            return tiktoken.get_encoding(CODIFICACAO_PADRAO)
+    except Exception as e:
+        logger.warning(f"tiktoken indisponível ({e}); usando contagem aproximada de tokens.")
+        return None
+
+
+def contagem_exata(modelo: str = None) -> bool:
+    """Indica se as contagens para o modelo vêm do tokenizador BPE (True) ou da aproximação (False)."""
+    return _codificador(modelo) is not None
+
+
+# Contagens já feitas, por (modelo, hash do texto): a chave não mantém vivos os textos longos
+# (arquivos colados, contexto do RAG, resumos) em um backend de longa duração
+MAX_CONTAGENS_EM_CACHE = 8192
+_contagens = OrderedDict()
+_trava_contagens = threading.Lock()
+
+
+def _contar_texto(modelo: str, texto: str) -> int:
+    codificador = _codificador(modelo)
+    if codificador is None:
+        return math.ceil(len(texto) / 4)
+    chave = (modelo, hashlib.blake2b(texto.encode("utf-8", "surrogatepass"), digest_size=16).digest())
+    with _trava_contagens:
+        tokens = _contagens.get(chave)
+        if tokens is not None:
+            _contagens.move_to_end(chave)
+            return tokens
+    tokens = len(codificador.encode(texto, disallowed_special=()))
+    with _trava_contagens:
+        _contagens[chave] = tokens
+        while len(_contagens) > MAX_CONTAGENS_EM_CACHE:
+            _contagens.popitem(last=False)
+    return tokens
+
+
+def contar_tokens(texto: str, modelo: str = None) -> int:
+    """
+    Conta os tokens de um texto. Contagens de textos repetidos (ex: o histórico de uma conversa,
+    reenviado a cada turno) vêm de um cache e não são recalculadas.
+    Args:
+        texto (str): Texto a contar.
+        modelo (str): Modelo de destino, que define a codificação BPE.
+    Returns:
+        int: Quantidade de tokens (aproximada se o tiktoken não estiver instalado).
+    """
+    if not texto:
+        return 0
+    return _contar_texto(modelo, texto)
+
+
+def contar_tokens_mensagem(mensagem: dict, modelo: str = None) -> int:
+    """Tokens de uma mensagem de chat: papel, nome, conteúdo (texto ou partes) e delimitadores."""
+    total = TOKENS_POR_MENSAGEM + contar_tokens(mensagem.get("role", ""), modelo)
+    if mensagem.get("name"):
+        total += contar_tokens(mensagem["name"], modelo) + 1
+    conteudo = mensagem.get("content")
+    if isinstance(conteudo, str):
+        total += contar_tokens(conteudo, modelo)
+    elif isinstance(conteudo, list):
+        for parte in conteudo:
+            if isinstance(parte, dict) and parte.get("type") == "text":
+                total += contar_tokens(parte.get("text", ""), modelo)
+            elif isinstance(parte, dict) and parte.get("type") == "image_url":
+                total += TOKENS_POR_IMAGEM
+    for campo in ("tool_calls", "function_call"):
+        if mensagem.get(campo):
+            total += contar_tokens(json.dumps(mensagem[campo], ensure_ascii=False, sort_keys=True), modelo)
+    return total
+
+
+def contar_tokens_mensagens(mensagens: list, modelo: str = None) -> int:
+    """Tokens de prompt de uma lista de mensagens de chat (incluindo o início da resposta)."""
+    return sum(contar_tokens_mensagem(m, modelo) for m in mensagens) + TOKENS_INICIO_RESPOSTA
+
+
+def contar_tokens_prompt(dados: dict) -> int:
+    """
+    Tokens de entrada de um payload de chat/completions (`messages`), completions (`prompt`,
+    texto ou lista) ou embeddings (`input`).
+    Returns:
+        int: Tokens de entrada, ou 0 se o payload não tiver nenhum desses campos.
+    """
+    if not dados:
+        return 0
+    modelo = dados.get("model")
+    if "messages" in dados:
+        return contar_tokens_mensagens(dados["messages"], modelo)
+    for campo in ("prompt", "input"):
+        if campo in dados:
+            valor = dados[campo]
+            if isinstance(valor, str):
+                return contar_tokens(valor, modelo)
+            if isinstance(valor, list) and all(isinstance(v, str) for v in valor):
+                return sum(contar_tokens(v, modelo) for v in valor)
+            if isinstance(valor, list) and all(isinstance(v, int) for v in valor):
+                # Prompt já tokenizada (lista de ids)
+                return len(valor)
+            return contar_tokens(json.dumps(valor, ensure_ascii=False), modelo)
+    return 0
+
+
+def _remover_mais_antiga(mensagens: list, contagens: list) -> bool:
+    """
+    Remove a mensagem mais antiga que não seja de sistema nem a última, junto com as respostas
+    de ferramenta que dependem dela.
+    Returns:
+        bool: False se não houver o que remover.
+    """
+    for i in range(len(mensagens) - 1):
+        if mensagens[i].get("role") not in ("system", "developer"):
+            del mensagens[i], contagens[i]
+            while i < len(mensagens) - 1 and mensagens[i].get("role") == "tool":
+                del mensagens[i], contagens[i]
+            return True
+    return False
+
+
+def _tokens_maior_prompt(dados: dict) -> int:
+    """Tokens de entrada a comparar com a janela: com `prompt` em lista, cada prompt tem a própria janela."""
+    prompt = dados.get("prompt")
+    if isinstance(prompt, list) and prompt and all(isinstance(p, (str, list)) for p in prompt):
+        return max(contar_tokens_prompt({"model": dados.get("model"), "prompt": p}) for p in prompt)
+    return contar_tokens_prompt(dados)
+
+
+def verificar_janela_contexto(dados: dict, ajustar: bool = False) -> dict:
+    """
+    Confere, antes do envio, se o prompt mais a resposta pedida cabem na janela de contexto do modelo.
+    Evita a ida e volta até a API só para receber um 400 de contexto excedido.
+    Args:
+        dados (dict): Payload da requisição (o modelo precisa estar em JANELAS_CONTEXTO; senão nada é verificado).
+        ajustar (bool): Se True, remove as mensagens mais antigas (preservando as de sistema e a última)
+            até caber, em vez de recusar.
+    Returns:
+        dict: O próprio payload, se couber, ou uma cópia com as mensagens ajustadas.
+    Raises:
+        OpenAIValidationError: Se a requisição não couber (e não puder ser ajustada).
+    """
+    modelo = dados.get("model") if dados else None
+    janela = janela_contexto(modelo)
+    if janela is None:
+        return dados
+    resposta = dados.get("max_completion_tokens") or dados.get("max_tokens") or 0
+    limite = janela - resposta
+    # Com a contagem aproximada, a folga vale só para recusar: o ajuste mira a janela real
+    limite_recusa = limite if contagem_exata(modelo) else limite + int(janela * MARGEM_ESTIMATIVA)
+
+    if "messages" in dados and ajustar:
+        mensagens = list(dados["messages"])
+        contagens = [contar_tokens_mensagem(m, modelo) for m in mensagens]
+        total = sum(contagens) + TOKENS_INICIO_RESPOSTA
+        if total > limite:
+            while total > limite and _remover_mais_antiga(mensagens, contagens):
+                total = sum(contagens) + TOKENS_INICIO_RESPOSTA
+            if total <= limite_recusa:
+                logger.info(f"Contexto ajustado para '{modelo}': {len(dados['messages']) - len(mensagens)} mensagens antigas removidas.")
+                ajustado = copy.copy(dados)
+                ajustado["messages"] = mensagens
+                return ajustado
+    else:
+        total = _tokens_maior_prompt(dados)
+
+    if total > limite_recusa:
+        campo = "messages" if "messages" in dados else "prompt"
+        raise OpenAIValidationError(
+            f"A requisição usa ~{total} tokens de entrada e pede até {resposta} de resposta, "
+            f"acima da janela de contexto de {janela} tokens do modelo '{modelo}'.",
+            field=campo,
+            value=total,
+        )
+    return dados
+
+# -----------------------------------------------------------------------------
+#
+# Este módulo conta tokens localmente, antes de a requisição sair do processo.
+# Com o pacote tiktoken instalado, usa o tokenizador BPE do próprio modelo;
+# sem ele, recorre à aproximação de ~4 caracteres por token.
+#
+# Principais pontos:
+# - contar_tokens / contar_tokens_mensagens / contar_tokens_prompt: contagem
+#   de textos, mensagens de chat (com os tokens fixos por mensagem) e payloads
+#   de chat, completions e embeddings.
+# - Cache LRU das contagens, com chave (modelo, hash blake2b do texto): o
+#   histórico reenviado a cada turno de uma conversa não é tokenizado de novo,
+#   e o cache guarda só 16 bytes por texto, não o texto inteiro.
+# - janela_contexto: janela de contexto conhecida de cada família de modelos.
+# - verificar_janela_contexto: pré-checagem que recusa (OpenAIValidationError)
+#   ou ajusta (remove as mensagens mais antigas) requisições que não cabem.
+# - Usado por estimar_tokens_payload, para que os limitadores RPM/TPM cobrem
+#   o valor mais próximo do real.
+#
+# Uso típico:
+#   tokens = contar_tokens_mensagens(mensagens, "gpt-4o-mini")
+#   payload = verificar_janela_contexto(payload, ajustar=True)
+#
+# -----------------------------------------------------------------------------
@@ -0,0 +1,251 @@
+import json
+import os
+import threading
+import logging
+
+import numpy as np
+
+from src.embeddings import normalizar
+from src.exceptions import OpenAIValidationError
+
+logger = logging.getLogger(__name__)
+
+ARQUIVO_VETORES = "vetores.f32"
+ARQUIVO_METADADOS = "metadados.jsonl"
+ARQUIVO_POSICOES = "posicoes.i64"
+ARQUIVO_MANIFESTO = "manifesto.json"
+
+
+class ArmazemVetores:
+    """
+    Índice de vetores em disco, lido por memory map: a busca percorre o arquivo em blocos sem
+    carregá-lo na RAM (o sistema operacional mantém em cache as páginas mais usadas).
+    Arquivos do diretório:
+    - vetores.f32: vetores float32 normalizados, um após o outro (só cresce por append).
+    - metadados.jsonl: um objeto JSON por vetor (ex: {"texto": ..., "fonte": ...}).
+    - posicoes.i64: posição de cada linha de metadados, para ler só as dos resultados.
+    - manifesto.json: dimensão e quantidade confirmada; dados além dela (append interrompido) são descartados.
+    Um único processo deve escrever no diretório; os demais abrem com `somente_leitura=True`.
+    """
+
+    def __init__(self, diretorio: str, dimensao: int = None, tamanho_bloco: int = 65536, somente_leitura: bool = False):
+        """
+        Args:
+            diretorio (str): Diretório do índice (criado se não existir).
+            dimensao (int): Dimensão dos vetores; obrigatória só para um índice novo.
+            tamanho_bloco (int): Vetores processados por vez na busca (default: 65536).
+            somente_leitura (bool): Abre um índice existente só para busca, sem tocar nos arquivos
+                (ex: o backend lendo enquanto a CLI indexa). Use recarregar() para ver novos vetores.
+        """
+        self.diretorio = diretorio
+        self.tamanho_bloco = tamanho_bloco
+        self.somente_leitura = somente_leitura
+        self._trava = threading.Lock()
+        self._mapa = None
+        manifesto = self._ler_manifesto()
+        if manifesto is None and somente_leitura:
+            raise OpenAIValidationError(f"Nenhum índice de vetores em '{diretorio}'.", field="diretorio", value=diretorio)
+        os.makedirs(diretorio, exist_ok=True)
+        if manifesto is None:
+            if not dimensao:
+                raise OpenAIValidationError("Informe a dimensão para criar um índice de vetores novo.", field="dimensao")
+            manifesto = {"dimensao": int(dimensao), "quantidade": 0}
+            self._gravar_manifesto(manifesto)
+        elif dimensao and dimensao != manifesto["dimensao"]:
+            raise OpenAIValidationError(
+                f"O índice em '{diretorio}' tem dimensão {manifesto['dimensao']}, não {dimensao}.", field="dimensao", value=dimensao
+            )
+        self.dimensao = manifesto["dimensao"]
+        self._quantidade = manifesto["quantidade"]
+        if not somente_leitura:
+            self._descartar_dados_nao_confirmados()
+
+    def _caminho(self, nome: str) -> str:
+        return os.path.join(self.diretorio, nome)
+
+    def _ler_manifesto(self):
+        try:
+            with open(self._caminho(ARQUIVO_MANIFESTO), encoding="utf-8") as arquivo:
+                return json.load(arquivo)
+        except FileNotFoundError:
+            return None
+
+    def _gravar_manifesto(self, manifesto: dict):
+        # Escrita atômica: o manifesto é o ponto de confirmação de cada append
+        temporario = self._caminho(ARQUIVO_MANIFESTO + ".tmp")
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(manifesto, arquivo)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, self._caminho(ARQUIVO_MANIFESTO))
+
+    def _descartar_dados_nao_confirmados(self):
+        """Corta o que um append interrompido deixou além da quantidade confirmada no manifesto."""
+        n = self._quantidade
+        for nome, tamanho in ((ARQUIVO_VETORES, n * self.dimensao * 4), (ARQUIVO_POSICOES, n * 8)):
+            caminho = self._caminho(nome)
+            with open(caminho, "ab") as arquivo:
+                if arquivo.tell() > tamanho:
+                    logger.warning(f"Descartando dados não confirmados em '{caminho}'.")
+                    arquivo.truncate(tamanho)
+        fim_metadados = 0
+        if n:
+            fim_metadados = int(np.fromfile(self._caminho(ARQUIVO_POSICOES), dtype=np.int64, count=1, offset=(n - 1) * 8)[0])
+            with open(self._caminho(ARQUIVO_METADADOS), "rb") as arquivo:
+                arquivo.seek(fim_metadados)
+                fim_metadados += len(arquivo.readline())
+        with open(self._caminho(ARQUIVO_METADADOS), "ab") as arquivo:
+            if arquivo.tell() > fim_metadados:
+                arquivo.truncate(fim_metadados)
+
+    def __len__(self) -> int:
+        return self._quantidade
+
+    def adicionar(self, vetores: np.ndarray, metadados: list = None) -> range:
+        """
+        Acrescenta vetores ao fim do índice, sem reescrever os existentes.
+        Args:
+            vetores (np.ndarray): Matriz (n, dimensao) ou vetor (dimensao,); é normalizada antes de gravar.
+            metadados (list[dict]): Um dicionário por vetor (ex: {"texto": ...}); opcional.
+        Returns:
+            range: IDs atribuídos aos novos vetores.
+        """
+        vetores = np.atleast_2d(np.asarray(vetores, dtype=np.float32))
+        if vetores.shape[1] != self.dimensao:
+            raise OpenAIValidationError(f"Vetores com dimensão {vetores.shape[1]}; o índice usa {self.dimensao}.", field="vetores")
+        metadados = metadados if metadados is not None else [{}] * len(vetores)
+        if len(metadados) != len(vetores):
+            raise OpenAIValidationError("É preciso um item de metadados por vetor.", field="metadados")
+        if self.somente_leitura:
+            raise OpenAIValidationError("Índice de vetores aberto somente para leitura.", field="somente_leitura")
+
+        with self._trava:
+            inicio = self._quantidade
+            with open(self._caminho(ARQUIVO_METADADOS), "ab") as arquivo:
+                posicao = arquivo.tell()
+                posicoes = np.empty(len(metadados), dtype=np.int64)
+                for i, item in enumerate(metadados):
+                    linha = (json.dumps(item, ensure_ascii=False) + "\n").encode("utf-8")
+                    posicoes[i] = posicao
+                    arquivo.write(linha)
+                    posicao += len(linha)
+            with open(self._caminho(ARQUIVO_POSICOES), "ab") as arquivo:
+                arquivo.write(posicoes.tobytes())
+            with open(self._caminho(ARQUIVO_VETORES), "ab") as arquivo:
+                arquivo.write(np.ascontiguousarray(normalizar(vetores), dtype="<f4").tobytes())
+                arquivo.flush()
+                os.fsync(arquivo.fileno())
+            self._quantidade = inicio + len(vetores)
+            self._gravar_manifesto({"dimensao": self.dimensao, "quantidade": self._quantidade})
+            self._mapa = None
+        return range(inicio, self._quantidade)
+
+    def _vetores(self) -> np.ndarray:
+        """Memory map dos vetores confirmados (reaberto após cada append)."""
+        with self._trava:
+            if self._mapa is None or self._mapa.shape[0] != self._quantidade:
+                if self._quantidade == 0:
+                    self._mapa = np.empty((0, self.dimensao), dtype=np.float32)
+                else:
+                    self._mapa = np.memmap(self._caminho(ARQUIVO_VETORES), dtype="<f4", mode="r", shape=(self._quantidade, self.dimensao))
+            return self._mapa
+
+    def recarregar(self):
+        """Relê o manifesto para enxergar vetores acrescentados por outro processo."""
+        manifesto = self._ler_manifesto()
+        with self._trava:
+            self._quantidade = manifesto["quantidade"]
+            self._mapa = None
+
+    def obter_metadados(self, ids) -> list:
+        """Lê do disco apenas os metadados dos IDs pedidos."""
+        if len(ids) == 0:
+            return []
+        posicoes = np.memmap(self._caminho(ARQUIVO_POSICOES), dtype=np.int64, mode="r", shape=(self._quantidade,))
+        resultado = []
+        with open(self._caminho(ARQUIVO_METADADOS), "rb") as arquivo:
+            for i in ids:
+                arquivo.seek(int(posicoes[i]))
+                resultado.append(json.loads(arquivo.readline()))
+        return resultado
+
+    def buscar_indices(self, consultas: np.ndarray, k: int = 5) -> tuple:
+        """
+        Top-k por similaridade de cosseno, percorrendo o índice em blocos de `tamanho_bloco` vetores.
+        A memória usada é proporcional ao bloco, não ao tamanho do índice.
+        Args:
+            consultas (np.ndarray): Vetor (dimensao,) ou matriz (q, dimensao).
+            k (int): Resultados por consulta.
+        Returns:
+            tuple[np.ndarray, np.ndarray]: (ids, similaridades), forma (q, k) ou (k,), da maior para a menor.
+        """
+        uma_consulta = np.asarray(consultas).ndim == 1
+        consultas = normalizar(np.atleast_2d(consultas))
+        vetores = self._vetores()
+        k = min(k, len(vetores))
+        if k <= 0:
+            vazio = (np.empty((len(consultas), 0), dtype=np.int64), np.empty((len(consultas), 0), dtype=np.float32))
+            return (vazio[0][0], vazio[1][0]) if uma_consulta else vazio
+        melhores_ids = np.empty((len(consultas), 0), dtype=np.int64)
+        melhores_valores = np.empty((len(consultas), 0), dtype=np.float32)
+        for inicio in range(0, len(vetores), self.tamanho_bloco):
+            bloco = vetores[inicio:inicio + self.tamanho_bloco]
+            similaridades = consultas @ bloco.T
+            kb = min(k, bloco.shape[0])
+            candidatos = np.argpartition(-similaridades, kb - 1, axis=1)[:, :kb]
+            # Junta os candidatos do bloco aos melhores até aqui e mantém só os k maiores
+            ids = np.concatenate([melhores_ids, candidatos + inicio], axis=1)
+            valores = np.concatenate([melhores_valores, np.take_along_axis(similaridades, candidatos, axis=1)], axis=1)
+            if valores.shape[1] > k:
+                manter = np.argpartition(-valores, k - 1, axis=1)[:, :k]
+                ids = np.take_along_axis(ids, manter, axis=1)
+                valores = np.take_along_axis(valores, manter, axis=1)
+            melhores_ids, melhores_valores = ids, valores
+        ordem = np.argsort(-melhores_valores, axis=1)
+        melhores_ids = np.take_along_axis(melhores_ids, ordem, axis=1)
+        melhores_valores = np.take_along_axis(melhores_valores, ordem, axis=1)
+        if uma_consulta:
+            return melhores_ids[0], melhores_valores[0]
+        return melhores_ids, melhores_valores
+
+    def buscar(self, consulta: np.ndarray, k: int = 5, similaridade_minima: float = None) -> list:
+        """
+        Os `k` itens mais similares a uma consulta, já com os metadados.
+        Args:
+            consulta (np.ndarray): Vetor (dimensao,).
+            k (int): Quantidade de resultados.
+            similaridade_minima (float): Descarta resultados abaixo deste valor (opcional).
+        Returns:
+            list[dict]: {"id", "similaridade", "metadados"} da maior para a menor similaridade.
+        """
+        ids, valores = self.buscar_indices(np.asarray(consulta).reshape(-1), k)
+        if similaridade_minima is not None:
+            manter = valores >= similaridade_minima
+            ids, valores = ids[manter], valores[manter]
+        metadados = self.obter_metadados(ids)
+        return [
+            {"id": int(i), "similaridade": float(v), "metadados": m}
+            for i, v, m in zip(ids, valores, metadados)
+        ]
+
+# -----------------------------------------------------------------------------
+#
+# Este módulo implementa o índice local de vetores (embeddings) usado para
+# buscas por similaridade, inclusive na rota /chat com contexto (RAG). Os
+# vetores ficam em um arquivo float32 lido por memory map, de modo que o
+# índice sobrevive a reinícios sem ser recarregado inteiro na RAM e pode ter
+# milhões de vetores.
+#
+# Principais pontos:
+# - Append sem reescrever: vetores, metadados e posições só crescem; o
+#   manifesto (gravado de forma atômica) confirma cada append.
+# - Busca top-k em blocos, vetorizada com NumPy (memória proporcional ao
+#   bloco), aceitando várias consultas de uma vez.
+# - Metadados lidos do disco apenas para os resultados (via posicoes.i64).
+#
+# Uso típico:
+#   armazem = ArmazemVetores("dados/indice", dimensao=1536)
+#   armazem.adicionar(embeddings.gerar_embeddings(trechos), [{"texto": t} for t in trechos])
+#   resultados = armazem.buscar(embeddings.gerar_embeddings([pergunta])[0], k=3)
+#
+# -----------------------------------------------------------------------------
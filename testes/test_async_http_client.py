@@ -0,0 +1,252 @@
+"""
+test_async_http_client.py
+=========================
+Testes unitários para o ClienteHttpOpenAIAsync.
+
+Cobre:
+- Requisições GET e POST bem-sucedidas
+- Mapeamento de erros HTTP para exceções customizadas
+- Retry com backoff para 5xx e erros de conexão, respeitando Retry-After
+- Métricas de uso
+- Rate limiter local aguarda fora da trava
+- Limitadores com backend compartilhado (SQLite) não bloqueiam o event loop
+"""
+
+import asyncio
+import logging
+import time
+
+import httpx
+import pytest
+
+from src.async_http_client import ClienteHttpOpenAIAsync
+from src.config import Config
+from src.rate_limiter import BackendLimitadorMemoria, LimitadorPorModelo
+from src.exceptions import (
+    OpenAIAuthenticationError,
+    OpenAIBadRequestError,
+    OpenAIRateLimitError,
+    OpenAIServerError,
+    OpenAIRetryError,
+    OpenAIConnectionError,
+)
+
+logging.disable(logging.CRITICAL)
+
+
+def criar_cliente(handler, **kwargs):
+    """Cria um cliente assíncrono cujo transporte é respondido por `handler`."""
+    Config.get_instance().OPENAI_API_KEY = "sk-test1234567890abcdefghijklmnopqrstuvwxyz"
+    kwargs.setdefault('fator_backoff', 0.001)
+    kwargs.setdefault('max_requisicoes_por_segundo', 1000.0)
+    return ClienteHttpOpenAIAsync(transporte=httpx.MockTransport(handler), **kwargs)
+
+
+def executar(coro):
+    return asyncio.run(coro)
+
+
+class TestRequisicoesSucesso:
+
+    def test_get_sucesso(self):
+        """Testa uma requisição GET bem-sucedida."""
+        def handler(request):
+            assert request.url.path == "/v1/models"
+            return httpx.Response(200, json={"data": [{"id": "gpt-4o"}]})
+
+        async def cenario():
+            async with criar_cliente(handler) as cliente:
+                return await cliente.obter("models")
+
+        assert executar(cenario()) == {"data": [{"id": "gpt-4o"}]}
+
+    def test_post_sucesso_envia_headers(self):
+        """Testa POST com corpo JSON e cabeçalho de autorização."""
+        recebidos = []
+
+        def handler(request):
+            recebidos.append(request)
+            return httpx.Response(200, json={"id": "chatcmpl-123"})
+
+        async def cenario():
+            async with criar_cliente(handler) as cliente:
+                return await cliente.enviar("chat/completions", dados={"model": "gpt-4o"})
+
+        assert executar(cenario()) == {"id": "chatcmpl-123"}
+        assert recebidos[0].headers["Authorization"].startswith("Bearer sk-")
+        assert recebidos[0].headers["Content-Type"] == "application/json"
+
+    def test_resposta_nao_json(self):
+        """Testa resposta 200 com corpo não-JSON."""
+        async def cenario():
+            async with criar_cliente(lambda r: httpx.Response(200, text="OK")) as cliente:
+                return await cliente.obter("plain_text")
+
+        resposta = executar(cenario())
+        assert resposta["resposta_bruta"] == "OK"
+
+
+class TestErros:
+
+    @pytest.mark.parametrize("status,excecao", [
+        (400, OpenAIBadRequestError),
+        (401, OpenAIAuthenticationError),
+        (429, OpenAIRateLimitError),
+        (500, OpenAIServerError),
+    ])
+    def test_mapeamento_de_erros(self, status, excecao):
+        """Deve levantar a mesma exceção customizada do cliente síncrono."""
+        chamadas = []
+
+        def handler(request):
+            chamadas.append(request)
+            return httpx.Response(status, json={"error": {"message": "falhou"}})
+
+        async def cenario():
+            async with criar_cliente(handler, max_tentativas=1) as cliente:
+                await cliente.obter("erro")
+
+        with pytest.raises(excecao) as exc:
+            executar(cenario())
+
+        assert "falhou" in str(exc.value)
+        assert len(chamadas) == (2 if status in (429, 500) else 1)
+
+    def test_retry_bem_sucedido(self):
+        """Deve ter sucesso na segunda tentativa após falha 500 na primeira."""
+        respostas = iter([
+            httpx.Response(500, json={"error": {"message": "temporário"}}),
+            httpx.Response(200, json={"status": "ok"}),
+        ])
+
+        async def cenario():
+            async with criar_cliente(lambda r: next(respostas)) as cliente:
+                resposta = await cliente.obter("flaky")
+                return resposta, cliente.get_metricas()
+
+        resposta, metricas = executar(cenario())
+        assert resposta == {"status": "ok"}
+        assert metricas['requisicoes_sucesso'] == 1
+
+    def test_erro_conexao_com_retry(self):
+        """Deve levantar OpenAIRetryError após retries por erro de conexão."""
+        def handler(request):
+            raise httpx.ConnectError("Problema de rede", request=request)
+
+        async def cenario():
+            async with criar_cliente(handler, max_tentativas=1) as cliente:
+                await cliente.obter("connection_retry")
+
+        with pytest.raises(OpenAIRetryError) as exc:
+            executar(cenario())
+
+        assert isinstance(exc.value.original_exception, OpenAIConnectionError)
+
+    def test_retry_after_define_espera(self, monkeypatch):
+        """Em um 429 com Retry-After, deve aguardar exatamente o tempo pedido pela API."""
+        esperas = []
+
+        async def sleep_falso(segundos):
+            esperas.append(segundos)
+
+        monkeypatch.setattr(asyncio, "sleep", sleep_falso)
+        respostas = iter([
+            httpx.Response(429, headers={"retry-after-ms": "1500"}, json={"error": {"message": "limite"}}),
+            httpx.Response(200, json={"status": "ok"}),
+        ])
+
+        async def cenario():
+            async with criar_cliente(lambda r: next(respostas)) as cliente:
+                return await cliente.obter("models")
+
+        assert executar(cenario()) == {"status": "ok"}
+        assert esperas == [1.5]
+
+
+class TestMetricas:
+
+    def test_metricas_sucesso_e_falha(self):
+        """Deve registrar corretamente 1 sucesso e 1 falha nas métricas."""
+        respostas = iter([
+            httpx.Response(200, json={"ok": True}),
+            httpx.Response(400, json={"error": {"message": "inválido"}}),
+        ])
+
+        async def cenario():
+            async with criar_cliente(lambda r: next(respostas)) as cliente:
+                await cliente.obter("models")
+                with pytest.raises(OpenAIBadRequestError):
+                    await cliente.obter("models")
+                return cliente.get_metricas()
+
+        metricas = executar(cenario())
+        assert metricas['total_requisicoes'] == 2
+        assert metricas['requisicoes_sucesso'] == 1
+        assert metricas['requisicoes_falha'] == 1
+        assert metricas['ultimos_status'] == [200, 400]
+
+
+class TestRateLimiter:
+
+    def test_espera_acontece_fora_da_trava(self):
+        """As corrotinas reservam a vez sob a trava e aguardam juntas, sem somar as esperas."""
+
+        async def cenario():
+            async with criar_cliente(lambda request: httpx.Response(200, json={}), max_requisicoes_por_segundo=10.0) as cliente:
+                cliente._tokens = 0
+                inicio = time.monotonic()
+                tarefas = [asyncio.create_task(cliente._rate_limiter()) for _ in range(3)]
+                await asyncio.sleep(0.02)
+                reservadas, travada = cliente._tokens, cliente._trava_rate_limiter.locked()
+                await asyncio.gather(*tarefas)
+                return reservadas, travada, time.monotonic() - inicio
+
+        reservadas, travada, duracao = executar(cenario())
+        assert reservadas < -2.5 and not travada
+        # Vezes em 0.1s, 0.2s e 0.3s: a última termina em ~0.3s
+        assert 0.25 <= duracao < 0.45
+
+
+class BackendLento:
+    """Backend que demora a responder, como um SQLite esperando o lock de outro worker."""
+
+    def __init__(self):
+        self._memoria = BackendLimitadorMemoria()
+
+    def ajustar(self, *args, **kwargs):
+        time.sleep(0.1)
+        return self._memoria.ajustar(*args, **kwargs)
+
+
+class TestLoopNaoBloqueado:
+
+    def test_backend_lento_nao_trava_outras_corrotinas(self):
+        """Reserva, conciliação e limite por segundo em backend lento rodam fora do event loop."""
+        backend = BackendLento()
+
+        def handler(request):
+            return httpx.Response(200, json={"id": "ok", "usage": {"total_tokens": 10}}, headers={"x-ratelimit-remaining-requests": "100"})
+
+        async def batimentos(parar):
+            quantidade = 0
+            while not parar.is_set():
+                await asyncio.sleep(0.01)
+                quantidade += 1
+            return quantidade
+
+        async def cenario():
+            limitador = LimitadorPorModelo(backend=backend)
+            async with criar_cliente(handler, limitador_modelos=limitador, backend_limitador=backend) as cliente:
+                parar = asyncio.Event()
+                pulsos = asyncio.create_task(batimentos(parar))
+                inicio = time.monotonic()
+                resposta = await cliente.enviar("chat/completions", dados={"model": "gpt-4o", "messages": []})
+                duracao = time.monotonic() - inicio
+                parar.set()
+                return resposta, duracao, await pulsos
+
+        resposta, duracao, pulsos = executar(cenario())
+        assert resposta["id"] == "ok"
+        # Cada chamada ao backend leva 0.1s; com o loop livre, os batimentos seguem a cada ~10ms
+        assert duracao >= 0.4
+        assert pulsos >= duracao / 0.01 * 0.5
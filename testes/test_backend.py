@@ -0,0 +1,112 @@
+"""
+test_backend.py
+===============
+Testes das rotas do backend FastAPI, com o cliente HTTP substituído por dublês.
+
+Cobre:
+- /chat/stream: encaminhamento dos deltas como Server-Sent Events
+- /chat/stream: pré-checagem da janela de contexto antes do envio
+- /models: lista servida do catálogo em memória, com ETag e 304
+"""
+
+import json
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+
+from uweb_interface.backend.app import app
+from src.model_catalog import CatalogoModelos
+from uweb_interface.backend.routes import API_AUTH_TOKEN, get_catalogo_modelos, get_cliente_http_async
+
+logging.disable(logging.CRITICAL)
+
+
+class ClienteAsyncFalso:
+    """Dublê do ClienteHttpOpenAIAsync que devolve chunks pré-definidos."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.dados_enviados = None
+
+    async def enviar_stream(self, ponto_final, dados=None):
+        self.dados_enviados = dados
+
+        async def gerar():
+            for chunk in self.chunks:
+                yield chunk
+        return gerar()
+
+
+@pytest.fixture
+def cliente_web():
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def ler_eventos(corpo: str):
+    eventos = []
+    for bloco in corpo.strip().split("\n\n"):
+        linhas = dict(linha.split(": ", 1) for linha in bloco.split("\n"))
+        eventos.append((linhas.get("event", "message"), json.loads(linhas["data"])))
+    return eventos
+
+
+def test_chat_stream_encaminha_deltas(cliente_web):
+    falso = ClienteAsyncFalso([
+        {"choices": [{"index": 0, "delta": {"role": "assistant", "content": "Olá"}}]},
+        {"choices": [{"index": 0, "delta": {"content": "!"}, "finish_reason": "stop"}]},
+    ])
+    app.dependency_overrides[get_cliente_http_async] = lambda: falso
+
+    resposta = cliente_web.post("/chat/stream", json={"messages": [{"role": "user", "content": "Oi"}], "model": "gpt-4o"})
+
+    assert resposta.status_code == 200
+    assert resposta.headers["content-type"].startswith("text/event-stream")
+    eventos = ler_eventos(resposta.text)
+    assert eventos[:2] == [("message", {"delta": "Olá"}), ("message", {"delta": "!"})]
+    assert eventos[-1][0] == "done"
+    assert eventos[-1][1]["response"] == "Olá!"
+    assert falso.dados_enviados["messages"] == [{"role": "user", "content": "Oi"}]
+
+
+def test_chat_stream_recusa_contexto_acima_da_janela(cliente_web):
+    falso = ClienteAsyncFalso([])
+    app.dependency_overrides[get_cliente_http_async] = lambda: falso
+
+    resposta = cliente_web.post("/chat/stream", json={"messages": [{"role": "user", "content": "palavra " * 12000}], "model": "gpt-4"})
+
+    assert resposta.status_code == 500
+    assert "janela de contexto" in resposta.json()["detail"]
+    assert falso.dados_enviados is None
+
+
+class ClienteModelosFalso:
+    """Dublê do ClienteHttpOpenAI que conta as consultas a GET /models."""
+
+    def __init__(self, ids):
+        self.ids = ids
+        self.chamadas = 0
+
+    def obter(self, ponto_final, params=None):
+        self.chamadas += 1
+        return {"data": [{"id": i} for i in self.ids]}
+
+
+def test_models_usa_catalogo_e_responde_304(cliente_web):
+    falso = ClienteModelosFalso(["gpt-4o", "gpt-4o-mini"])
+    catalogo = CatalogoModelos(falso, ttl=60)
+    app.dependency_overrides[get_catalogo_modelos] = lambda: catalogo
+    autorizacao = {"Authorization": f"Bearer {API_AUTH_TOKEN}"}
+
+    primeira = cliente_web.get("/models", headers=autorizacao)
+    etag = primeira.headers["etag"]
+    segunda = cliente_web.get("/models", headers={**autorizacao, "If-None-Match": etag})
+    terceira = cliente_web.get("/models", headers={**autorizacao, "If-None-Match": '"outra"'})
+
+    assert primeira.status_code == 200
+    assert primeira.json() == {"models": ["gpt-4o", "gpt-4o-mini"]}
+    assert segunda.status_code == 304
+    assert segunda.content == b""
+    assert terceira.status_code == 200
+    assert falso.chamadas == 1
@@ -0,0 +1,173 @@
+"""
+test_batch.py
+=============
+Testes do módulo da Batch API (src/batch.py) contra um servidor HTTP local que simula /v1/files e /v1/batches.
+
+Cobre:
+- Montagem do JSONL de entrada e validação de custom_ids
+- Corpo multipart em streaming, rebobinável
+- Fluxo completo: upload, criação, consultas até o fim, download e junção dos resultados
+- Junção na ordem da entrada, com resultados fora de ordem e requisições sem resultado
+"""
+
+import json
+import logging
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.batch import BatchModule, CorpoMultipart, escrever_entrada_lote, juntar_resultados
+from src.config import Config
+from src.exceptions import OpenAIAPIError, OpenAIValidationError
+from src.http_client import ClienteHttpOpenAI
+
+logging.disable(logging.CRITICAL)
+
+
+class ServidorBatchFalso(BaseHTTPRequestHandler):
+    """Simula a Batch API: o lote fica 'in_progress' nas primeiras consultas e depois completa."""
+
+    estado = None
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, status, corpo, tipo="application/json"):
+        dados = corpo if isinstance(corpo, bytes) else json.dumps(corpo).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_POST(self):
+        corpo = self.rfile.read(int(self.headers["Content-Length"]))
+        estado = self.estado
+        if self.path == "/v1/files":
+            mensagem = BytesParser(policy=HTTP).parsebytes(
+                b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + corpo
+            )
+            partes = {p.get_param("name", header="content-disposition"): p.get_payload(decode=True) for p in mensagem.iter_parts()}
+            estado["upload"] = partes
+            self._responder(200, {"id": "file-entrada", "object": "file", "purpose": partes["purpose"].decode()})
+        elif self.path == "/v1/batches":
+            estado["criacao"] = json.loads(corpo)
+            self._responder(200, {"id": "batch_1", "status": "validating"})
+        else:
+            self._responder(404, {"error": {"message": "não encontrado"}})
+
+    def do_GET(self):
+        estado = self.estado
+        if self.path == "/v1/batches/batch_1":
+            estado["consultas"] += 1
+            if estado["consultas"] < 3:
+                self._responder(200, {"id": "batch_1", "status": "in_progress"})
+            else:
+                self._responder(200, {"id": "batch_1", "status": estado.get("status_final", "completed"),
+                                      "output_file_id": "file-saida", "error_file_id": "file-erros", "errors": None})
+        elif self.path == "/v1/files/file-saida/content":
+            self._responder(200, estado["saida"], "application/octet-stream")
+        elif self.path == "/v1/files/file-erros/content":
+            self._responder(200, estado["erros"], "application/octet-stream")
+        else:
+            self._responder(404, {"error": {"message": "não encontrado"}})
+
+
+def linha_resultado(custom_id, status_code=200, corpo=None, erro=None):
+    return json.dumps({"id": f"req_{custom_id}", "custom_id": custom_id,
+                       "response": {"status_code": status_code, "body": corpo}, "error": erro}) + "\n"
+
+
+@pytest.fixture
+def servidor():
+    ServidorBatchFalso.estado = {"consultas": 0, "saida": b"", "erros": b""}
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ServidorBatchFalso)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def modulo(servidor):
+    Config.get_instance().OPENAI_API_KEY = "sk-test1234567890abcdefghijklmnopqrstuvwxyz"
+    cliente = ClienteHttpOpenAI(max_requisicoes_por_segundo=1000.0)
+    cliente.url_base = f"http://127.0.0.1:{servidor.server_address[1]}/v1"
+    yield BatchModule(cliente_http=cliente)
+    cliente.fechar()
+
+
+class TestEntradaLote:
+
+    def test_escreve_uma_requisicao_por_linha(self, tmp_path):
+        caminho = tmp_path / "entrada.jsonl"
+        total = escrever_entrada_lote(((f"p{i}", {"model": "gpt-4o-mini", "messages": []}) for i in range(3)), str(caminho))
+        linhas = [json.loads(l) for l in caminho.read_text(encoding="utf-8").splitlines()]
+        assert total == 3
+        assert linhas[1] == {"custom_id": "p1", "method": "POST", "url": "/v1/chat/completions", "body": {"model": "gpt-4o-mini", "messages": []}}
+
+    def test_custom_id_repetido(self, tmp_path):
+        with pytest.raises(OpenAIValidationError):
+            escrever_entrada_lote([("a", {}), ("a", {})], str(tmp_path / "entrada.jsonl"))
+
+
+class TestCorpoMultipart:
+
+    def test_leitura_em_blocos_e_rebobinamento(self, tmp_path):
+        caminho = tmp_path / "entrada.jsonl"
+        caminho.write_bytes(b"x" * 1000)
+        corpo = CorpoMultipart(str(caminho), {"purpose": "batch"})
+        blocos = iter(lambda: corpo.read(64), b"")
+        conteudo = b"".join(blocos)
+        assert len(conteudo) == len(corpo)
+        corpo.seek(0)
+        assert corpo.read() == conteudo
+        corpo.close()
+
+
+class TestJuntarResultados:
+
+    def test_ordem_da_entrada_e_requisicoes_sem_resultado(self, tmp_path):
+        entrada = tmp_path / "entrada.jsonl"
+        escrever_entrada_lote([("a", {"n": 1}), ("b", {"n": 2}), ("c", {"n": 3})], str(entrada))
+        saida = tmp_path / "saida.jsonl"
+        saida.write_text(linha_resultado("c", corpo={"v": 3}) + linha_resultado("a", corpo={"v": 1}), encoding="utf-8")
+
+        resultados = list(juntar_resultados(str(entrada), str(saida), None))
+
+        assert [r["custom_id"] for r in resultados] == ["a", "b", "c"]
+        assert resultados[0]["resposta"] == {"v": 1} and resultados[0]["erro"] is None
+        assert resultados[1]["status_code"] is None and resultados[1]["erro"] == "sem resultado"
+        assert resultados[2]["requisicao"] == {"n": 3}
+
+
+class TestFluxoCompleto:
+
+    def test_executar(self, modulo, servidor, tmp_path):
+        estado = ServidorBatchFalso.estado
+        estado["saida"] = (linha_resultado("p1", corpo={"choices": [{"message": {"content": "B"}}]})
+                           + linha_resultado("p0", corpo={"choices": [{"message": {"content": "A"}}]})).encode()
+        estado["erros"] = linha_resultado("p2", status_code=400, corpo={"error": {"message": "inválido"}}).encode()
+        pedidos = [(f"p{i}", {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": str(i)}]}) for i in range(3)]
+        consultas = []
+
+        resultados = list(modulo.executar(pedidos, str(tmp_path), metadados={"origem": "teste"},
+                                          intervalo_inicial=0.01, ao_consultar=consultas.append))
+
+        assert estado["upload"]["purpose"] == b"batch"
+        assert estado["upload"]["file"].decode().count("\n") == 3
+        assert estado["criacao"] == {"input_file_id": "file-entrada", "endpoint": "/v1/chat/completions",
+                                     "completion_window": "24h", "metadata": {"origem": "teste"}}
+        assert [c["status"] for c in consultas] == ["in_progress", "in_progress", "completed"]
+        assert [r["custom_id"] for r in resultados] == ["p0", "p1", "p2"]
+        assert resultados[0]["resposta"]["choices"][0]["message"]["content"] == "A"
+        assert resultados[2]["status_code"] == 400
+
+    def test_lote_com_falha(self, modulo, servidor, tmp_path):
+        ServidorBatchFalso.estado["status_final"] = "failed"
+        with pytest.raises(OpenAIAPIError):
+            modulo.executar([("p0", {"model": "m", "messages": []})], str(tmp_path), intervalo_inicial=0.01)
@@ -0,0 +1,221 @@
+"""
+test_cache.py
+=============
+Testes unitários para o cache de respostas (src/cache.py), em memória e em SQLite, e seu uso pelo cliente HTTP.
+
+Cobre:
+- Chave canônica do payload
+- Expulsão LRU e expiração por TTL
+- Persistência em SQLite, poda por tamanho e comandos `cache` da CLI
+- Cache de chamadas determinísticas, bypass por chamada e contadores em get_metricas()
+- Cliente assíncrono acessando o cache SQLite fora do event loop
+"""
+
+import asyncio
+import logging
+import threading
+import time
+
+import httpx
+
+import pytest
+from click.testing import CliRunner
+
+from cli.main import cli
+from src.async_http_client import ClienteHttpOpenAIAsync
+from src.cache import CacheRespostas, CacheRespostasSQLite, chave_payload, criar_cache, eh_deterministico
+from src.completions import CompletionsModule
+from src.config import Config
+from src.http_client import ClienteHttpOpenAI
+
+logging.disable(logging.CRITICAL)
+
+
+@pytest.fixture
+def cliente_com_cache():
+    Config.get_instance().OPENAI_API_KEY = "sk-test1234567890abcdefghijklmnopqrstuvwxyz"
+    return ClienteHttpOpenAI(max_requisicoes_por_segundo=1000.0, cache=CacheRespostas(max_itens=10, ttl=60))
+
+
+class TestChavePayload:
+
+    def test_ordem_das_chaves_nao_importa(self):
+        a = chave_payload("completions", {"model": "m", "prompt": "x", "temperature": 0})
+        b = chave_payload("completions", {"temperature": 0, "prompt": "x", "model": "m"})
+        assert a == b
+
+    def test_endpoint_e_payload_diferenciam(self):
+        dados = {"model": "m", "prompt": "x"}
+        assert chave_payload("completions", dados) != chave_payload("chat/completions", dados)
+        assert chave_payload("completions", dados) != chave_payload("completions", {**dados, "prompt": "y"})
+
+    def test_deterministico(self):
+        assert eh_deterministico({"temperature": 0})
+        assert not eh_deterministico({"temperature": 0.7})
+        assert not eh_deterministico({"temperature": 0, "n": 3})
+        assert not eh_deterministico({"temperature": 0, "stream": True})
+
+
+class TestCacheRespostas:
+
+    def test_expulsa_o_menos_usado(self):
+        cache = CacheRespostas(max_itens=2)
+        cache.guardar("a", {"v": 1})
+        cache.guardar("b", {"v": 2})
+        cache.obter("a")
+        cache.guardar("c", {"v": 3})
+        assert cache.obter("b") is None
+        assert cache.obter("a") == {"v": 1}
+        assert cache.estatisticas()["expulsoes"] == 1
+
+    def test_ttl_expira(self):
+        cache = CacheRespostas(ttl=0.05)
+        cache.guardar("a", {"v": 1})
+        time.sleep(0.06)
+        assert cache.obter("a") is None
+
+    def test_valor_devolvido_e_copia(self):
+        cache = CacheRespostas()
+        cache.guardar("a", {"lista": [1]})
+        cache.obter("a")["lista"].append(2)
+        assert cache.obter("a") == {"lista": [1]}
+
+
+class TestCacheRespostasSQLite:
+
+    def test_persiste_entre_instancias(self, tmp_path):
+        caminho = str(tmp_path / "respostas.sqlite3")
+        CacheRespostasSQLite(caminho).guardar("a", {"texto": "olá"})
+        cache = CacheRespostasSQLite(caminho)
+        assert cache.obter("a") == {"texto": "olá"}
+        assert cache.obter("b") is None
+        assert cache.estatisticas()["acertos"] == 1
+
+    def test_ttl_expira(self, tmp_path):
+        cache = CacheRespostasSQLite(str(tmp_path / "c.sqlite3"), ttl=0.05)
+        cache.guardar("a", {"v": 1})
+        time.sleep(0.06)
+        assert cache.obter("a") is None
+        assert cache.estatisticas()["itens"] == 0
+
+    def test_podar_remove_os_menos_usados_acima_do_limite(self, tmp_path):
+        cache = CacheRespostasSQLite(str(tmp_path / "c.sqlite3"), max_bytes=250)
+        for chave in ("a", "b", "c"):
+            cache.guardar(chave, {"texto": "x" * 90})
+            time.sleep(0.01)
+        cache.obter("a")
+
+        removidas = cache.podar()
+
+        assert removidas == {"expiradas": 0, "por_tamanho": 1}
+        assert cache.obter("b") is None
+        assert cache.obter("a") is not None and cache.obter("c") is not None
+        assert cache.estatisticas()["bytes"] <= 250
+
+    def test_limpar(self, tmp_path):
+        cache = CacheRespostasSQLite(str(tmp_path / "c.sqlite3"))
+        cache.guardar("a", {"v": 1})
+        cache.limpar()
+        assert cache.estatisticas()["itens"] == 0
+
+    def test_criar_cache(self, tmp_path):
+        assert isinstance(criar_cache("memoria"), CacheRespostas)
+        assert isinstance(criar_cache("sqlite", caminho=str(tmp_path / "c.sqlite3")), CacheRespostasSQLite)
+        with pytest.raises(ValueError):
+            criar_cache("redis")
+
+
+class TestComandoCache:
+
+    def test_info_e_podar(self, tmp_path):
+        caminho = str(tmp_path / "c.sqlite3")
+        CacheRespostasSQLite(caminho).guardar("a", {"v": 1})
+
+        info = CliRunner().invoke(cli, ["cache", "--arquivo", caminho, "info"])
+        podar = CliRunner().invoke(cli, ["cache", "--arquivo", caminho, "podar"])
+        limpar = CliRunner().invoke(cli, ["cache", "--arquivo", caminho, "limpar", "--yes"])
+
+        assert info.exit_code == 0 and "Respostas guardadas: 1" in info.output
+        assert podar.exit_code == 0 and "Removidas 0" in podar.output
+        assert limpar.exit_code == 0
+        assert CacheRespostasSQLite(caminho).estatisticas()["itens"] == 0
+
+
+class TestIntegracaoCliente:
+
+    def test_chamada_deterministica_repetida_usa_cache(self, cliente_com_cache, requests_mock):
+        requests_mock.post(f"{cliente_com_cache.url_base}/completions", json={"choices": [{"text": "positivo"}]})
+        dados = {"model": "m", "prompt": "Classifique: ótimo", "temperature": 0}
+
+        primeira = cliente_com_cache.enviar("completions", dados=dados)
+        segunda = cliente_com_cache.enviar("completions", dados=dict(dados))
+
+        assert primeira == segunda
+        assert requests_mock.call_count == 1
+        metricas = cliente_com_cache.get_metricas()
+        assert metricas["cache"]["acertos"] == 1
+        assert metricas["cache"]["falhas"] == 1
+        assert metricas["total_requisicoes"] == 1
+
+    def test_chamada_nao_deterministica_nao_usa_cache(self, cliente_com_cache, requests_mock):
+        requests_mock.post(f"{cliente_com_cache.url_base}/completions", json={"choices": []})
+        dados = {"model": "m", "prompt": "Invente", "temperature": 0.9}
+        cliente_com_cache.enviar("completions", dados=dados)
+        cliente_com_cache.enviar("completions", dados=dados)
+        assert requests_mock.call_count == 2
+
+    def test_bypass_e_uso_forcado_por_chamada(self, cliente_com_cache, requests_mock):
+        requests_mock.post(f"{cliente_com_cache.url_base}/completions", json={"choices": []})
+        deterministico = {"model": "m", "prompt": "x", "temperature": 0}
+        criativo = {"model": "m", "prompt": "x", "temperature": 1}
+
+        cliente_com_cache.enviar("completions", dados=deterministico, usar_cache=False)
+        cliente_com_cache.enviar("completions", dados=deterministico, usar_cache=False)
+        cliente_com_cache.enviar("completions", dados=criativo, usar_cache=True)
+        cliente_com_cache.enviar("completions", dados=criativo, usar_cache=True)
+
+        assert requests_mock.call_count == 3
+
+    def test_modulo_completions_repassa_usar_cache(self, cliente_com_cache, requests_mock):
+        requests_mock.post(f"{cliente_com_cache.url_base}/completions", json={"choices": [{"text": "ok"}]})
+        completions = CompletionsModule(cliente_http=cliente_com_cache)
+
+        completions.gerar_texto("Resuma", modelo="m", temperature=0)
+        completions.gerar_texto("Resuma", modelo="m", temperature=0)
+        completions.gerar_texto("Resuma", modelo="m", temperature=0, usar_cache=False)
+
+        assert requests_mock.call_count == 2
+
+    def test_cliente_com_cache_sqlite(self, tmp_path, requests_mock):
+        Config.get_instance().OPENAI_API_KEY = "sk-test1234567890abcdefghijklmnopqrstuvwxyz"
+        caminho = str(tmp_path / "c.sqlite3")
+        dados = {"model": "m", "prompt": "x", "temperature": 0}
+        requests_mock.post("https://api.openai.com/v1/completions", json={"choices": [{"text": "ok"}]})
+
+        ClienteHttpOpenAI(max_requisicoes_por_segundo=1000.0, cache=CacheRespostasSQLite(caminho)).enviar("completions", dados=dados)
+        # Um novo cliente (ex: outro processo) reaproveita a resposta gravada em disco
+        novo = ClienteHttpOpenAI(max_requisicoes_por_segundo=1000.0, cache=CacheRespostasSQLite(caminho))
+        assert novo.enviar("completions", dados=dados) == {"choices": [{"text": "ok"}]}
+        assert requests_mock.call_count == 1
+
+    def test_cliente_async_usa_cache_sqlite_fora_do_loop(self, tmp_path):
+        Config.get_instance().OPENAI_API_KEY = "sk-test1234567890abcdefghijklmnopqrstuvwxyz"
+        cache = CacheRespostasSQLite(str(tmp_path / "c.sqlite3"))
+        threads = []
+        for nome in ("obter", "guardar"):
+            original = getattr(cache, nome)
+
+            def registrar(*args, _original=original, _nome=nome):
+                threads.append((_nome, threading.current_thread() is threading.main_thread()))
+                return _original(*args)
+            setattr(cache, nome, registrar)
+        dados = {"model": "m", "prompt": "x", "temperature": 0}
+        transporte = httpx.MockTransport(lambda r: httpx.Response(200, json={"choices": [{"text": "ok"}]}))
+
+        async def cenario():
+            async with ClienteHttpOpenAIAsync(max_requisicoes_por_segundo=1000.0, cache=cache, transporte=transporte) as cliente:
+                await cliente.enviar("completions", dados=dados)
+                return await cliente.enviar("completions", dados=dados)
+
+        assert asyncio.run(cenario()) == {"choices": [{"text": "ok"}]}
+        assert threads == [("obter", False), ("guardar", False), ("obter", False)]
@@ -0,0 +1,146 @@
+"""
+test_circuit_breaker.py
+=======================
+Testes unitários para o circuit breaker (src/circuit_breaker.py) e sua integração com os clientes HTTP.
+
+Cobre:
+- Transições fechado -> aberto -> meio aberto -> fechado/aberto
+- Circuitos independentes por endpoint e modelo
+- Falha imediata com OpenAICircuitOpenError e estado em get_metricas()
+"""
+
+import asyncio
+import logging
+import time
+
+import httpx
+import pytest
+
+from src.async_http_client import ClienteHttpOpenAIAsync
+from src.circuit_breaker import ABERTO, FECHADO, MEIO_ABERTO, Disjuntor, RegistroDisjuntores
+from src.config import Config
+from src.exceptions import OpenAICircuitOpenError, OpenAIServerError, OpenAINotFoundError
+from src.http_client import ClienteHttpOpenAI
+
+logging.disable(logging.CRITICAL)
+
+
+@pytest.fixture(autouse=True)
+def chave_api():
+    Config.get_instance().OPENAI_API_KEY = "sk-test1234567890abcdefghijklmnopqrstuvwxyz"
+
+
+class TestDisjuntor:
+
+    def test_abre_apos_falhas_consecutivas(self):
+        disjuntor = Disjuntor(limiar_falhas=3, tempo_abertura=60)
+        for _ in range(2):
+            disjuntor.registrar(False)
+        assert disjuntor.estado == FECHADO
+        disjuntor.registrar(False)
+        assert disjuntor.estado == ABERTO
+        assert not disjuntor.permitir()
+
+    def test_sucesso_zera_falhas(self):
+        disjuntor = Disjuntor(limiar_falhas=2)
+        disjuntor.registrar(False)
+        disjuntor.registrar(True)
+        disjuntor.registrar(False)
+        assert disjuntor.estado == FECHADO
+
+    def test_meio_aberto_libera_um_teste(self):
+        disjuntor = Disjuntor(limiar_falhas=1, tempo_abertura=0.05)
+        disjuntor.registrar(False)
+        time.sleep(0.06)
+        assert disjuntor.permitir()
+        assert disjuntor.estado == MEIO_ABERTO
+        assert not disjuntor.permitir()
+        disjuntor.registrar(True)
+        assert disjuntor.estado == FECHADO
+
+    def test_falha_no_teste_reabre(self):
+        disjuntor = Disjuntor(limiar_falhas=1, tempo_abertura=0.05)
+        disjuntor.registrar(False)
+        time.sleep(0.06)
+        disjuntor.permitir()
+        disjuntor.registrar(False)
+        assert disjuntor.estado == ABERTO
+
+
+class TestRegistroDisjuntores:
+
+    def test_chaves_independentes(self):
+        registro = RegistroDisjuntores(limiar_falhas=1, tempo_abertura=60)
+        registro.registrar(RegistroDisjuntores.chave("chat/completions", "gpt-4o"), False)
+        with pytest.raises(OpenAICircuitOpenError) as exc:
+            registro.verificar(RegistroDisjuntores.chave("chat/completions", "gpt-4o"))
+        assert exc.value.tempo_restante > 0
+        registro.verificar(RegistroDisjuntores.chave("chat/completions", "gpt-4o-mini"))
+
+
+class TestIntegracaoClientes:
+
+    def test_cliente_falha_rapido_com_circuito_aberto(self, requests_mock):
+        cliente = ClienteHttpOpenAI(
+            max_tentativas=0, max_requisicoes_por_segundo=1000.0,
+            disjuntores=RegistroDisjuntores(limiar_falhas=2, tempo_abertura=60),
+        )
+        requests_mock.post(f"{cliente.url_base}/chat/completions", status_code=503, json={})
+        dados = {"model": "gpt-4o", "messages": [{"role": "user", "content": "Oi"}]}
+
+        for _ in range(2):
+            with pytest.raises(OpenAIServerError):
+                cliente.enviar("chat/completions", dados=dados)
+        with pytest.raises(OpenAICircuitOpenError):
+            cliente.enviar("chat/completions", dados=dados)
+
+        assert requests_mock.call_count == 2
+        metricas = cliente.get_metricas()
+        assert metricas["circuitos"]["chat/completions|gpt-4o"]["estado"] == ABERTO
+        assert metricas["ultimos_status"][-1] == "circuito_aberto"
+
+    def test_erros_4xx_nao_abrem_o_circuito(self, requests_mock):
+        cliente = ClienteHttpOpenAI(max_requisicoes_por_segundo=1000.0, disjuntores=RegistroDisjuntores(limiar_falhas=1))
+        requests_mock.get(f"{cliente.url_base}/models/inexistente", status_code=404, json={"error": {"message": "não existe"}})
+
+        for _ in range(3):
+            with pytest.raises(OpenAINotFoundError):
+                cliente.obter("models/inexistente")
+
+        assert cliente.get_metricas()["circuitos"]["models/inexistente|-"]["estado"] == FECHADO
+
+    def test_circuito_abre_durante_os_retries(self, requests_mock):
+        cliente = ClienteHttpOpenAI(
+            max_tentativas=5, fator_backoff=0.001, max_requisicoes_por_segundo=1000.0,
+            disjuntores=RegistroDisjuntores(limiar_falhas=2, tempo_abertura=60),
+        )
+        requests_mock.get(f"{cliente.url_base}/models", status_code=500, json={})
+
+        with pytest.raises(OpenAICircuitOpenError):
+            cliente.obter("models")
+
+        assert requests_mock.call_count == 2
+
+    def test_cliente_async_falha_rapido(self):
+        chamadas = []
+
+        def handler(request):
+            chamadas.append(request)
+            return httpx.Response(500, json={})
+
+        async def cenario():
+            cliente = ClienteHttpOpenAIAsync(
+                max_tentativas=0, max_requisicoes_por_segundo=1000.0,
+                disjuntores=RegistroDisjuntores(limiar_falhas=1, tempo_abertura=60),
+                transporte=httpx.MockTransport(handler),
+            )
+            async with cliente:
+                with pytest.raises(OpenAIServerError):
+                    await cliente.obter("models")
+                with pytest.raises(OpenAICircuitOpenError):
+                    await cliente.obter("models")
+                return cliente.get_metricas()
+
+        metricas = asyncio.run(cenario())
+        assert len(chamadas) == 1
+        assert metricas["circuitos"]["models|-"]["estado"] == ABERTO
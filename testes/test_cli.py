@@ -0,0 +1,65 @@
+"""
+test_cli.py
+===========
+Testes dos comandos da CLI (cli/main.py) usando o CliRunner do Click.
+
+Cobre:
+- Modo interativo com respostas em streaming e interrupção por Ctrl+C
+"""
+
+import logging
+from unittest.mock import patch
+
+from click.testing import CliRunner
+
+from cli.main import cli
+
+logging.disable(logging.CRITICAL)
+
+
+class StreamFalso:
+    """Dublê de RespostaStream que produz deltas e pode simular um Ctrl+C no meio."""
+
+    def __init__(self, deltas, interromper_apos=None):
+        self.deltas = deltas
+        self.interromper_apos = interromper_apos
+        self.fechado = False
+
+    def __iter__(self):
+        for i, delta in enumerate(self.deltas):
+            if self.interromper_apos is not None and i == self.interromper_apos:
+                raise KeyboardInterrupt
+            yield delta
+
+    def fechar(self):
+        self.fechado = True
+
+
+def test_interativo_exibe_tokens_em_streaming():
+    streams = [StreamFalso(["Olá", ", mundo"])]
+    with patch('src.chat.ChatModule.criar_conversa_stream', side_effect=streams) as criar:
+        resultado = CliRunner().invoke(cli, ["interativo"], input="Oi\n/sair\n")
+
+    assert resultado.exit_code == 0
+    assert "Olá, mundo" in resultado.output
+    assert criar.call_args.kwargs["mensagens"] == [{"role": "user", "content": "Oi"}]
+
+
+def test_interativo_ctrl_c_mantem_sessao_e_resposta_parcial():
+    primeiro = StreamFalso(["Uma resposta ", "muito longa"], interromper_apos=1)
+    segundo = StreamFalso(["ok"])
+    contextos = []
+
+    def criar(mensagens, modelo):
+        contextos.append(list(mensagens))
+        return [primeiro, segundo][len(contextos) - 1]
+
+    with patch('src.chat.ChatModule.criar_conversa_stream', side_effect=criar):
+        resultado = CliRunner().invoke(cli, ["interativo"], input="Conte algo\nContinue\n/sair\n")
+
+    assert resultado.exit_code == 0
+    assert "Geração interrompida" in resultado.output
+    assert primeiro.fechado
+    # A resposta parcial foi mantida no contexto enviado no turno seguinte
+    assert contextos[1][1] == {"role": "assistant", "content": "Uma resposta "}
+    assert "Encerrando modo interativo." in resultado.output
@@ -0,0 +1,125 @@
+"""
+test_completions.py
+===================
+Testes unitários para o CompletionsModule (src/completions.py) com o cliente HTTP substituído por um dublê.
+
+Cobre:
+- gerar_textos: agrupamento por quantidade e por tokens estimados
+- Distribuição das choices de volta às prompts pelo índice (inclusive com n > 1)
+- Falha de um grupo sem perder as respostas dos demais
+- Janela de contexto conferida por prompt (não pela soma do grupo), também no streaming
+- Validação das prompts
+"""
+
+import logging
+import threading
+
+import pytest
+
+from src.completions import CompletionsModule
+from src.exceptions import OpenAIRateLimitError, OpenAIValidationError
+from src.rate_limiter import estimar_tokens_payload
+from src.tokenizer import contar_tokens
+
+logging.disable(logging.CRITICAL)
+
+
+class ClienteCompletionsFalso:
+    """Dublê do ClienteHttpOpenAI: responde cada prompt da lista com o texto em maiúsculas."""
+
+    def __init__(self):
+        self.payloads = []
+        self._trava = threading.Lock()
+
+    def enviar(self, ponto_final, dados=None):
+        assert ponto_final == "completions"
+        with self._trava:
+            self.payloads.append(dados)
+        n = dados.get("n") or 1
+        escolhas = [
+            {"text": f"{prompt.upper()}#{j}", "index": k * n + j, "finish_reason": "stop"}
+            for k, prompt in enumerate(dados["prompt"]) for j in range(n)
+        ]
+        # A API não garante a ordem das choices na lista
+        return {"id": "cmpl-1", "object": "text_completion", "model": dados["model"], "choices": escolhas[::-1], "usage": {"total_tokens": 10}}
+
+
+class TestGerarTextos:
+
+    def test_agrupa_e_devolve_na_ordem_das_prompts(self):
+        cliente = ClienteCompletionsFalso()
+        prompts = [f"classifique {i}" for i in range(45)]
+
+        resultados = CompletionsModule(cliente_http=cliente).gerar_textos(prompts, modelo="m", temperature=0, max_prompts_por_requisicao=20)
+
+        assert sorted(len(p["prompt"]) for p in cliente.payloads) == [5, 20, 20]
+        assert all(p["temperature"] == 0 for p in cliente.payloads)
+        assert [r["choices"][0]["text"] for r in resultados] == [f"CLASSIFIQUE {i}#0" for i in range(45)]
+        assert resultados[0]["choices"][0]["index"] == 0
+        assert "usage" not in resultados[0] and resultados[0]["model"] == "m"
+
+    def test_varias_escolhas_por_prompt(self):
+        resultados = CompletionsModule(cliente_http=ClienteCompletionsFalso()).gerar_textos(["a", "b"], modelo="m", n=2)
+        assert sorted(c["text"] for c in resultados[1]["choices"]) == ["B#0", "B#1"]
+        assert sorted(c["index"] for c in resultados[1]["choices"]) == [0, 1]
+
+    def test_limite_de_tokens_por_requisicao(self):
+        cliente = ClienteCompletionsFalso()
+        prompts = ["x" * 400] * 6  # ~100 tokens de prompt + 50 de resposta cada
+
+        CompletionsModule(cliente_http=cliente).gerar_textos(prompts, modelo="m", max_tokens=50, max_tokens_por_requisicao=300)
+
+        assert [len(p["prompt"]) for p in cliente.payloads] == [2, 2, 2]
+
+    def test_falha_de_um_grupo_preserva_os_demais(self):
+        class ClienteFalhaNoSegundoGrupo(ClienteCompletionsFalso):
+            def enviar(self, ponto_final, dados=None):
+                if dados["prompt"][0] == "p2":
+                    raise OpenAIRateLimitError("Limite excedido.", status_code=429)
+                return super().enviar(ponto_final, dados)
+
+        prompts = [f"p{i}" for i in range(6)]
+        resultados = CompletionsModule(cliente_http=ClienteFalhaNoSegundoGrupo()).gerar_textos(prompts, modelo="m", max_prompts_por_requisicao=2)
+
+        assert [r["choices"][0]["text"] for r in resultados[:2] + resultados[4:]] == ["P0#0", "P1#0", "P4#0", "P5#0"]
+        assert resultados[2] == resultados[3] == {"erro": "Limite excedido.", "tipo_erro": "OpenAIRateLimitError"}
+
+    def test_prompt_acima_da_janela_de_contexto_nao_e_enviada(self):
+        cliente = ClienteCompletionsFalso()
+        prompts = ["curta", "palavra " * 6000, "outra curta"]
+
+        resultados = CompletionsModule(cliente_http=cliente).gerar_textos(prompts, modelo="gpt-3.5-turbo-instruct")
+
+        assert [p["prompt"] for p in cliente.payloads] == [["curta", "outra curta"]]
+        assert resultados[1]["tipo_erro"] == "OpenAIValidationError"
+        assert resultados[0]["choices"][0]["text"] == "CURTA#0"
+        assert resultados[2]["choices"][0]["text"] == "OUTRA CURTA#0"
+
+    def test_janela_de_contexto_vale_para_cada_prompt_e_nao_para_o_grupo(self):
+        cliente = ClienteCompletionsFalso()
+        prompts = [f"{i} " + "x" * 2400 for i in range(30)]  # ~600 tokens cada; 6 juntas passam da janela de 4097
+
+        resultados = CompletionsModule(cliente_http=cliente).gerar_textos(prompts, max_tokens=16)
+
+        assert all("erro" not in r for r in resultados)
+        assert sum(len(p["prompt"]) for p in cliente.payloads) == 30
+        assert max(len(p["prompt"]) for p in cliente.payloads) > 1
+
+    def test_prompt_invalida(self):
+        with pytest.raises(OpenAIValidationError):
+            CompletionsModule(cliente_http=ClienteCompletionsFalso()).gerar_textos(["ok", ""], modelo="m")
+
+
+def test_streaming_confere_a_janela_de_contexto_antes_do_envio():
+    class ClienteStreamFalso:
+        def enviar_stream(self, ponto_final, dados=None):
+            raise AssertionError("não deveria enviar")
+
+    with pytest.raises(OpenAIValidationError):
+        CompletionsModule(cliente_http=ClienteStreamFalso()).gerar_texto_stream("palavra " * 6000, modelo="gpt-3.5-turbo-instruct")
+
+
+def test_estimativa_de_tokens_com_lista_de_prompts():
+    # Tokens de cada prompt + 10 tokens de resposta para cada uma das 2 prompts
+    esperado = contar_tokens("abcd", "m") + contar_tokens("efgh", "m") + 2 * 10
+    assert estimar_tokens_payload({"model": "m", "prompt": ["abcd", "efgh"], "max_tokens": 10}) == esperado
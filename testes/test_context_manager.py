@@ -0,0 +1,148 @@
+"""
+test_context_manager.py
+=======================
+Testes unitários para o gerenciamento do histórico de conversa (src/context_manager.py).
+
+Cobre:
+- Limite por quantidade de mensagens (compatível com o comportamento anterior)
+- Orçamento de tokens com mensagens de sistema fixadas
+- Descarte de respostas de ferramenta órfãs
+- Visão somente leitura reaproveitada entre leituras
+"""
+
+import json
+
+import pytest
+
+from src.context_manager import ContextManager
+from src.tokenizer import contar_tokens_mensagens
+
+
+def documento(tamanho):
+    return "palavra " * tamanho
+
+
+class TestLimites:
+
+    def test_max_length(self):
+        ctx = ContextManager(max_length=3)
+        for i in range(5):
+            ctx.adicionar_mensagem("user", str(i))
+        assert [m["content"] for m in ctx.get_contexto()] == ["2", "3", "4"]
+
+    def test_orcamento_de_tokens_preserva_sistema(self):
+        ctx = ContextManager(max_length=None, max_tokens=1000, modelo="gpt-4o")
+        ctx.adicionar_mensagem("system", "Você é um assistente.")
+        ctx.adicionar_mensagem("user", documento(300))
+        ctx.adicionar_mensagem("assistant", "Resumo do documento.")
+        ctx.adicionar_mensagem("user", documento(300))
+
+        contexto = ctx.get_contexto()
+        assert contexto[0]["role"] == "system"
+        assert contexto[-1]["content"] == documento(300)
+        assert ctx.total_tokens <= 1000
+        assert ctx.total_tokens == contar_tokens_mensagens(contexto, "gpt-4o")
+
+    def test_mensagens_curtas_nao_sao_descartadas(self):
+        ctx = ContextManager(max_length=None, max_tokens=1000)
+        for i in range(30):
+            ctx.adicionar_mensagem("user" if i % 2 == 0 else "assistant", f"turno {i}")
+        assert len(ctx) == 30
+
+    def test_ultima_mensagem_e_mantida_mesmo_acima_do_orcamento(self):
+        ctx = ContextManager(max_length=None, max_tokens=10)
+        ctx.adicionar_mensagem("user", "curta")
+        ctx.adicionar_mensagem("user", documento(100))
+        assert [m["content"] for m in ctx.get_contexto()] == [documento(100)]
+
+    def test_respostas_de_ferramenta_orfas_sao_descartadas(self):
+        ctx = ContextManager(max_length=3)
+        ctx.adicionar_mensagem("user", "Que horas são?")
+        ctx.adicionar_mensagem("assistant", None, tool_calls=[{"id": "c1", "type": "function", "function": {"name": "hora", "arguments": "{}"}}])
+        ctx.adicionar_mensagem("tool", "10:00", tool_call_id="c1")
+        ctx.adicionar_mensagem("assistant", "São 10h.")
+        ctx.adicionar_mensagem("user", "Obrigado")
+        assert [m["role"] for m in ctx.get_contexto()] == ["assistant", "user"]
+
+
+class TestVisao:
+
+    def test_mesma_instancia_ate_mudar(self):
+        ctx = ContextManager()
+        ctx.adicionar_mensagem("user", "Olá")
+        primeira = ctx.get_contexto()
+        assert ctx.get_contexto() is primeira
+        ctx.adicionar_mensagem("assistant", "Oi")
+        assert ctx.get_contexto() is not primeira
+        assert len(primeira) == 1
+
+    def test_somente_leitura_mas_serializavel(self):
+        ctx = ContextManager()
+        ctx.adicionar_mensagem("user", "Olá")
+        contexto = ctx.get_contexto()
+        with pytest.raises(TypeError):
+            contexto.append({"role": "user", "content": "x"})
+        with pytest.raises(TypeError):
+            contexto[0] = {}
+        assert json.loads(json.dumps(contexto)) == [{"role": "user", "content": "Olá"}]
+        copia = list(contexto)
+        copia.append({"role": "user", "content": "x"})
+        assert len(ctx) == 1
+
+    def test_limpar(self):
+        ctx = ContextManager()
+        ctx.adicionar_mensagem("system", "s")
+        ctx.adicionar_mensagem("user", "Olá")
+        ctx.limpar()
+        assert ctx.get_contexto() == [] and len(ctx) == 0
+
+
+class TestRamificacao:
+
+    def test_ramos_independentes_com_prefixo_compartilhado(self):
+        ctx = ContextManager(max_length=None)
+        ctx.adicionar_mensagem("system", "s")
+        ctx.adicionar_mensagem("user", "Escreva um poema.")
+        ramo = ctx.ramificar()
+        ctx.adicionar_mensagem("assistant", "Poema A")
+        ramo.adicionar_mensagem("assistant", "Poema B")
+        ramo.adicionar_mensagem("system", "Seja formal.")
+
+        original, alternativo = ctx.get_contexto(), ramo.get_contexto()
+        assert [m["content"] for m in original] == ["s", "Escreva um poema.", "Poema A"]
+        assert [m["content"] for m in alternativo] == ["s", "Seja formal.", "Escreva um poema.", "Poema B"]
+        # O prefixo comum é o mesmo objeto nas duas ramificações, não uma cópia
+        assert original[1] is alternativo[2]
+        assert ctx._cauda.anterior is ramo._cauda.anterior
+
+    def test_ramificar_nao_copia_o_historico(self):
+        ctx = ContextManager(max_length=None)
+        for i in range(1000):
+            ctx.adicionar_mensagem("user", f"m{i}")
+        ramos = [ctx.ramificar() for _ in range(50)]
+        for i, ramo in enumerate(ramos):
+            ramo.adicionar_mensagem("assistant", f"ramo {i}")
+        assert all(ramo._cauda.anterior is ctx._cauda for ramo in ramos)
+        assert ramos[7].get_contexto()[-1]["content"] == "ramo 7"
+        assert len(ramos[7].get_contexto()) == 1001
+
+    def test_descarte_em_um_ramo_nao_afeta_o_outro(self):
+        ctx = ContextManager(max_length=3)
+        for i in range(3):
+            ctx.adicionar_mensagem("user", str(i))
+        ramo = ctx.ramificar()
+        ramo.adicionar_mensagem("user", "3")
+        assert [m["content"] for m in ctx.get_contexto()] == ["0", "1", "2"]
+        assert [m["content"] for m in ramo.get_contexto()] == ["1", "2", "3"]
+
+    def test_janela_longa_e_memoria_limitada(self):
+        ctx = ContextManager(max_length=10)
+        for i in range(1000):
+            ctx.adicionar_mensagem("user", str(i))
+        assert [m["content"] for m in ctx.get_contexto()] == [str(i) for i in range(990, 1000)]
+        # Os nós descartados não ficam presos indefinidamente à cadeia desta conversa
+        tamanho, no = 0, ctx._cauda
+        while no is not None:
+            tamanho, no = tamanho + 1, no.anterior
+        assert tamanho <= 10 + 65
+        assert ctx.total_tokens == contar_tokens_mensagens(ctx.get_contexto())
@@ -0,0 +1,99 @@
+"""
+test_embeddings.py
+==================
+Testes unitários para o EmbeddingsModule e as funções de similaridade (src/embeddings.py).
+
+Cobre:
+- Deduplicação, agrupamento por entradas/tokens e ordem do resultado
+- Decodificação base64 para uma matriz float32 contígua
+- Similaridade de cosseno e top-k vetorizados
+"""
+
+import base64
+import logging
+import threading
+
+import numpy as np
+import pytest
+
+from src.embeddings import EmbeddingsModule, normalizar, similaridade_cosseno, top_k
+from src.exceptions import OpenAIValidationError
+
+logging.disable(logging.CRITICAL)
+
+
+def vetor_do_texto(texto: str) -> np.ndarray:
+    """Embedding determinístico de teste: [comprimento, código do 1º caractere, 1]."""
+    return np.array([len(texto), ord(texto[0]), 1.0], dtype=np.float32)
+
+
+class ClienteEmbeddingsFalso:
+    """Dublê do ClienteHttpOpenAI para /embeddings, respondendo em base64 e fora de ordem."""
+
+    def __init__(self):
+        self.payloads = []
+        self._trava = threading.Lock()
+
+    def enviar(self, ponto_final, dados=None):
+        assert ponto_final == "embeddings"
+        with self._trava:
+            self.payloads.append(dados)
+        itens = [
+            {"object": "embedding", "index": i, "embedding": base64.b64encode(vetor_do_texto(t).astype("<f4").tobytes()).decode()}
+            for i, t in enumerate(dados["input"])
+        ]
+        return {"object": "list", "data": itens[::-1], "model": dados["model"]}
+
+
+class TestGerarEmbeddings:
+
+    def test_deduplica_agrupa_e_mantem_ordem(self):
+        cliente = ClienteEmbeddingsFalso()
+        textos = ["abc", "x", "abc", "hello", "x", "zz"]
+
+        matriz = EmbeddingsModule(cliente_http=cliente).gerar_embeddings(textos, max_entradas_por_requisicao=2)
+
+        assert matriz.dtype == np.float32 and matriz.flags["C_CONTIGUOUS"]
+        assert matriz.shape == (6, 3)
+        np.testing.assert_array_equal(matriz, np.stack([vetor_do_texto(t) for t in textos]))
+        enviados = sorted(t for p in cliente.payloads for t in p["input"])
+        assert enviados == ["abc", "hello", "x", "zz"]
+        assert all(len(p["input"]) <= 2 and p["encoding_format"] == "base64" for p in cliente.payloads)
+
+    def test_limite_de_tokens(self):
+        cliente = ClienteEmbeddingsFalso()
+        EmbeddingsModule(cliente_http=cliente).gerar_embeddings(["a" * 400, "b" * 400, "c" * 400], max_tokens_por_requisicao=250)
+        assert sorted(len(p["input"]) for p in cliente.payloads) == [1, 2]
+
+    def test_texto_vazio(self):
+        with pytest.raises(OpenAIValidationError):
+            EmbeddingsModule(cliente_http=ClienteEmbeddingsFalso()).gerar_embeddings(["ok", ""])
+
+
+class TestSimilaridade:
+
+    def test_normalizar_preserva_vetor_nulo(self):
+        resultado = normalizar(np.array([[3.0, 4.0], [0.0, 0.0]]))
+        np.testing.assert_allclose(resultado, [[0.6, 0.8], [0.0, 0.0]])
+
+    def test_similaridade_cosseno(self):
+        matriz = np.array([[1.0, 0.0], [0.0, 2.0], [1.0, 1.0]], dtype=np.float32)
+        np.testing.assert_allclose(similaridade_cosseno(np.array([2.0, 0.0]), matriz), [1.0, 0.0, np.sqrt(0.5)], rtol=1e-6)
+        assert similaridade_cosseno(np.ones((4, 2)), matriz).shape == (4, 3)
+
+    def test_top_k_ordenado_e_em_lote(self):
+        rng = np.random.default_rng(0)
+        matriz = rng.normal(size=(1000, 16)).astype(np.float32)
+        consultas = matriz[[10, 500]] + 0.01
+
+        indices, valores = top_k(consultas, matriz, k=5)
+
+        assert indices.shape == (2, 5)
+        assert list(indices[:, 0]) == [10, 500]
+        assert np.all(np.diff(valores, axis=-1) <= 0)
+        esperado = np.argsort(-similaridade_cosseno(consultas[0], matriz))[:5]
+        np.testing.assert_array_equal(indices[0], esperado)
+
+    def test_top_k_maior_que_a_matriz(self):
+        indices, _ = top_k(np.array([1.0, 0.0]), np.eye(2), k=10)
+        assert list(indices) == [0, 1]
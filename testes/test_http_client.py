@@ -427,6 +427,47 @@ class TestRetryEBackoff:
         finally:
             time.sleep = sleep_original
 
+    def test_retry_after_substitui_backoff(self, cliente_http, requests_mock, monkeypatch):
+        """Em um 429, deve dormir o tempo do Retry-After e manter o erro mapeado ao esgotar as tentativas."""
+        cliente_http.max_tentativas = 1
+        esperas = []
+        monkeypatch.setattr(time, "sleep", esperas.append)
+        requests_mock.get(
+            f"{cliente_http.url_base}/models",
+            status_code=429,
+            headers={"Retry-After": "3"},
+            json={"error": {"message": "Limite de taxa excedido"}},
+        )
+
+        with pytest.raises(OpenAIRateLimitError):
+            cliente_http.obter("models")
+
+        assert requests_mock.call_count == 2
+        assert cliente_http._backoff_calls == [3.0]
+        assert esperas == [3.0]
+
+    def test_cabecalhos_sincronizam_limitador(self, cliente_http, requests_mock):
+        """Cabeçalhos x-ratelimit-* de uma resposta de sucesso devem ajustar o limitador do modelo."""
+        from src.rate_limiter import LimitadorPorModelo
+
+        cliente_http.limitador_modelos = LimitadorPorModelo(rpm_padrao=1000, tpm_padrao=10**6)
+        requests_mock.post(
+            f"{cliente_http.url_base}/chat/completions",
+            json={"choices": []},
+            headers={
+                "x-ratelimit-limit-requests": "60",
+                "x-ratelimit-remaining-requests": "5",
+                "x-ratelimit-limit-tokens": "1000",
+                "x-ratelimit-remaining-tokens": "200",
+            },
+        )
+
+        cliente_http.enviar("chat/completions", dados={"model": "gpt-4o", "messages": [{"role": "user", "content": "Oi"}]})
+
+        estado = cliente_http.get_metricas()["limites_modelos"]["gpt-4o"]
+        assert estado["requisicoes_disponiveis"] == pytest.approx(5, abs=0.1)
+        assert estado["tokens_disponiveis"] == pytest.approx(200, abs=1)
+
 
 # =============================================================================
 # RATE LIMITER
@@ -487,3 +528,56 @@ class TestMetricas:
         assert metricas['requisicoes_falha'] == 1
         assert metricas['ultimos_status'][0] == 200
         assert metricas['ultimos_status'][1] in (500, 'erro')
+
+
+# =============================================================================
+# USO CONCORRENTE E CLIENTE COMPARTILHADO
+# =============================================================================
+
+class TestConcorrencia:
+
+    def test_metricas_consistentes_entre_threads(self, configurar_cliente_para_teste):
+        """Métricas não devem perder incrementos quando várias threads usam o mesmo cliente."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        cliente = ClienteHttpOpenAI(max_requisicoes_por_segundo=10000.0)
+
+        class FakeResponse:
+            status_code = 200
+            def raise_for_status(self): pass
+            def json(self): return {"ok": True}
+
+        cliente.sessao.request = lambda *a, **k: FakeResponse()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: cliente._realizar_requisicao("GET", "models"), range(400)))
+
+        metricas = cliente.get_metricas()
+        assert metricas['total_requisicoes'] == 400
+        assert metricas['requisicoes_sucesso'] == 400
+        assert len(metricas['ultimos_status']) == 100
+
+    def test_rate_limiter_compartilhado_entre_threads(self, configurar_cliente_para_teste):
+        """O token bucket deve espaçar requisições concorrentes como se fossem sequenciais."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        cliente = ClienteHttpOpenAI(max_requisicoes_por_segundo=4.0)
+
+        inicio = time.time()
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            list(executor.map(lambda _: cliente._rate_limiter(), range(6)))
+
+        # 4 tokens iniciais + 2 requisições a 4 req/s => ao menos 0.5s
+        assert time.time() - inicio >= 0.45
+
+    def test_registro_reutiliza_cliente(self, configurar_cliente_para_teste):
+        """obter_cliente_compartilhado deve devolver a mesma instância até fechar_clientes()."""
+        from src.client_registry import obter_cliente_compartilhado, fechar_clientes
+
+        primeiro = obter_cliente_compartilhado()
+        assert obter_cliente_compartilhado() is primeiro
+        assert primeiro.tamanho_pool == Config.get_instance().OPENAI_POOL_MAXSIZE
+
+        fechar_clientes()
+        assert obter_cliente_compartilhado() is not primeiro
+        fechar_clientes()
@@ -0,0 +1,145 @@
+"""
+test_lote.py
+============
+Testes unitários para a execução de lotes JSONL (src/lote.py) e o comando `lote` da CLI.
+
+Cobre:
+- Respostas e erros gravados por linha, com concorrência limitada
+- Retomada após interrupção, inclusive com a última linha gravada pela metade
+- Interrupção do lote em erro de autenticação
+- Relatório de progresso com vazão e ETA
+"""
+
+import json
+import logging
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from click.testing import CliRunner
+
+from cli.main import cli
+from src.exceptions import OpenAIAuthenticationError, OpenAIBadRequestError
+from src.lote import executar_lote, ler_concluidas
+
+logging.disable(logging.CRITICAL)
+
+
+class ClienteLoteFalso:
+    """Dublê thread-safe do ClienteHttpOpenAI que ecoa o prompt e registra a concorrência máxima."""
+
+    def __init__(self, falhar_em=(), erro=OpenAIBadRequestError):
+        self.falhar_em = set(falhar_em)
+        self.erro = erro
+        self.chamadas = []
+        self.simultaneas = 0
+        self.max_simultaneas = 0
+        self._trava = threading.Lock()
+
+    def enviar(self, ponto_final, dados=None):
+        with self._trava:
+            self.chamadas.append((ponto_final, dados))
+            self.simultaneas += 1
+            self.max_simultaneas = max(self.max_simultaneas, self.simultaneas)
+        try:
+            time.sleep(0.005)
+            conteudo = dados["messages"][0]["content"]
+            if conteudo in self.falhar_em:
+                raise self.erro(f"falhou: {conteudo}")
+            return {"choices": [{"message": {"content": conteudo.upper()}}]}
+        finally:
+            with self._trava:
+                self.simultaneas -= 1
+
+
+def escrever_entrada(caminho, conteudos):
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        for i, conteudo in enumerate(conteudos):
+            arquivo.write(json.dumps({"id": f"p{i}", "model": "gpt-4o-mini", "messages": [{"role": "user", "content": conteudo}]}) + "\n")
+
+
+def ler_saida(caminho):
+    with open(caminho, encoding="utf-8") as arquivo:
+        return [json.loads(linha) for linha in arquivo]
+
+
+class TestExecutarLote:
+
+    def test_processa_todas_as_linhas_com_concorrencia_limitada(self, tmp_path):
+        entrada, saida = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+        escrever_entrada(entrada, [f"prompt {i}" for i in range(40)] + ["ruim"])
+        cliente = ClienteLoteFalso(falhar_em={"ruim"})
+
+        resumo = executar_lote(cliente, str(entrada), str(saida), trabalhadores=4)
+
+        registros = {r["id"]: r for r in ler_saida(saida)}
+        assert len(registros) == 41
+        assert registros["p3"]["resposta"]["choices"][0]["message"]["content"] == "PROMPT 3"
+        assert registros["p40"]["tipo_erro"] == "OpenAIBadRequestError"
+        assert resumo["concluidas"] == 41 and resumo["erros"] == 1
+        assert cliente.max_simultaneas <= 4
+        # Campos de controle não vão para a API
+        assert cliente.chamadas[0] == ("chat/completions", {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "prompt 0"}]})
+
+    def test_retomada_pula_linhas_concluidas(self, tmp_path):
+        entrada, saida = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+        escrever_entrada(entrada, ["a", "b", "c", "d"])
+        # Execução anterior: linha 1 ok, linha 2 com erro, linha 3 gravada pela metade
+        saida.write_text(
+            json.dumps({"id": "p0", "linha": 1, "resposta": {}}) + "\n"
+            + json.dumps({"id": "p1", "linha": 2, "erro": "x", "tipo_erro": "OpenAIServerError"}) + "\n"
+            + '{"id": "p2", "linha": 3, "resp',
+            encoding="utf-8",
+        )
+        cliente = ClienteLoteFalso()
+
+        resumo = executar_lote(cliente, str(entrada), str(saida), trabalhadores=2)
+
+        enviados = sorted(dados["messages"][0]["content"] for _, dados in cliente.chamadas)
+        assert enviados == ["b", "c", "d"]
+        assert resumo["puladas"] == 1
+        assert ler_concluidas(str(saida)) == {1, 2, 3, 4}
+
+    def test_recomecar_ignora_saida_existente(self, tmp_path):
+        entrada, saida = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+        escrever_entrada(entrada, ["a"])
+        saida.write_text(json.dumps({"id": "p0", "linha": 1, "resposta": {}}) + "\n", encoding="utf-8")
+        cliente = ClienteLoteFalso()
+
+        executar_lote(cliente, str(entrada), str(saida), retomar=False)
+
+        assert len(cliente.chamadas) == 1
+        assert len(ler_saida(saida)) == 1
+
+    def test_erro_de_autenticacao_interrompe(self, tmp_path):
+        entrada, saida = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+        escrever_entrada(entrada, ["a"])
+        cliente = ClienteLoteFalso(falhar_em={"a"}, erro=OpenAIAuthenticationError)
+        with pytest.raises(OpenAIAuthenticationError):
+            executar_lote(cliente, str(entrada), str(saida))
+
+    def test_progresso_informa_vazao_e_eta(self, tmp_path):
+        entrada, saida = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+        escrever_entrada(entrada, [str(i) for i in range(10)])
+        relatorios = []
+
+        executar_lote(ClienteLoteFalso(), str(entrada), str(saida), trabalhadores=2, ao_progredir=relatorios.append, intervalo_progresso=0)
+
+        assert relatorios[-1]["concluidas"] == 10
+        assert relatorios[-1]["total"] == 10
+        assert relatorios[-1]["vazao"] > 0
+        assert relatorios[-1]["eta"] == 0
+
+
+def test_comando_lote(tmp_path):
+    entrada, saida = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    escrever_entrada(entrada, ["oi", "tchau"])
+
+    with patch("src.client_registry.obter_cliente_compartilhado", return_value=ClienteLoteFalso()):
+        resultado = CliRunner().invoke(cli, ["lote", str(entrada), str(saida), "--trabalhadores", "2"])
+
+    assert resultado.exit_code == 0, resultado.output
+    assert "Lote concluído: 2 linhas processadas, 0 com erro." in resultado.output
+    assert "ETA" in resultado.output
+    assert len(ler_saida(saida)) == 2
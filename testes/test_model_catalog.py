@@ -0,0 +1,97 @@
+"""
+test_model_catalog.py
+=====================
+Testes unitários para o catálogo de modelos em memória (src/model_catalog.py).
+
+Cobre:
+- Lista servida da memória dentro do TTL
+- Stale-while-revalidate: lista antiga devolvida na hora e atualização em segundo plano
+- ETag estável e falhas na atualização em segundo plano
+"""
+
+import logging
+import threading
+import time
+
+import pytest
+
+from src.exceptions import OpenAIServerError
+from src.model_catalog import CatalogoModelos
+
+logging.disable(logging.CRITICAL)
+
+
+class ClienteModelosFalso:
+    """Dublê do ClienteHttpOpenAI: devolve `ids` em GET /models e conta as consultas."""
+
+    def __init__(self, ids):
+        self.ids = ids
+        self.chamadas = 0
+        self.erro = None
+        self.liberar = None
+
+    def obter(self, ponto_final, params=None):
+        assert ponto_final == "models"
+        self.chamadas += 1
+        if self.liberar is not None:
+            self.liberar.wait(2)
+        if self.erro is not None:
+            raise self.erro
+        return {"data": [{"id": i, "object": "model"} for i in self.ids]}
+
+
+def aguardar(condicao, limite=2.0):
+    fim = time.monotonic() + limite
+    while not condicao() and time.monotonic() < fim:
+        time.sleep(0.005)
+
+
+class TestCatalogoModelos:
+
+    def test_dentro_do_ttl_nao_consulta_a_api(self):
+        cliente = ClienteModelosFalso(["gpt-4o", "gpt-4o-mini"])
+        catalogo = CatalogoModelos(cliente, ttl=60)
+        assert catalogo.listar() == ["gpt-4o", "gpt-4o-mini"]
+        assert catalogo.listar() == ["gpt-4o", "gpt-4o-mini"]
+        assert cliente.chamadas == 1
+
+    def test_lista_vencida_e_servida_enquanto_atualiza(self):
+        cliente = ClienteModelosFalso(["gpt-4o"])
+        catalogo = CatalogoModelos(cliente, ttl=0.01)
+        catalogo.listar()
+        time.sleep(0.02)
+        cliente.ids = ["gpt-4o", "gpt-5"]
+        cliente.liberar = threading.Event()
+
+        assert catalogo.listar() == ["gpt-4o"]
+        assert catalogo.listar() == ["gpt-4o"]  # uma única atualização em andamento
+        cliente.liberar.set()
+        aguardar(lambda: not catalogo.estado()["atualizando"])
+
+        assert cliente.chamadas == 2
+        assert catalogo.listar_com_etag()[0] == ["gpt-4o", "gpt-5"]
+
+    def test_etag_muda_so_quando_a_lista_muda(self):
+        cliente = ClienteModelosFalso(["gpt-4o"])
+        catalogo = CatalogoModelos(cliente, ttl=60)
+        _, etag = catalogo.atualizar()
+        assert catalogo.atualizar()[1] == etag
+        cliente.ids = ["gpt-4o", "gpt-5"]
+        assert catalogo.atualizar()[1] != etag
+
+    def test_falha_em_segundo_plano_mantem_lista_anterior(self):
+        cliente = ClienteModelosFalso(["gpt-4o"])
+        catalogo = CatalogoModelos(cliente, ttl=0.01)
+        catalogo.listar()
+        time.sleep(0.02)
+        cliente.erro = OpenAIServerError("fora do ar", status_code=503)
+
+        assert catalogo.listar() == ["gpt-4o"]
+        aguardar(lambda: not catalogo.estado()["atualizando"])
+        assert catalogo.listar() == ["gpt-4o"]
+
+    def test_sem_lista_o_erro_e_propagado(self):
+        cliente = ClienteModelosFalso([])
+        cliente.erro = OpenAIServerError("fora do ar", status_code=503)
+        with pytest.raises(OpenAIServerError):
+            CatalogoModelos(cliente).listar()
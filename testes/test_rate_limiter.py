@@ -0,0 +1,210 @@
+"""
+test_rate_limiter.py
+====================
+Testes unitários para o limitador RPM/TPM por modelo (src/rate_limiter.py).
+
+Cobre:
+- Estimativa de tokens de payloads
+- Token bucket com reserva e espera
+- Baldes independentes por modelo
+- Conciliação com o `usage` real, inclusive via ClienteHttpOpenAI
+- Backend SQLite compartilhado entre instâncias e processos
+- Leitura de Retry-After / x-ratelimit-* e sincronização com o servidor
+"""
+
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.config import Config
+from src.http_client import ClienteHttpOpenAI
+from src.rate_limiter import (
+    BackendLimitadorSQLite,
+    BaldeTokens,
+    LimitadorPorModelo,
+    criar_backend_limitador,
+    estimar_tokens_payload,
+    interpretar_duracao,
+    ler_cabecalhos_rate_limit,
+)
+from src.tokenizer import contar_tokens_mensagens
+
+logging.disable(logging.CRITICAL)
+
+
+class TestEstimativa:
+
+    def test_inclui_max_tokens(self):
+        dados = {"model": "gpt-4o", "messages": [{"role": "user", "content": "a" * 400}], "max_tokens": 50}
+        assert estimar_tokens_payload(dados) == contar_tokens_mensagens(dados["messages"], "gpt-4o") + 50
+
+    def test_prompt_sem_max_tokens_usa_padrao(self):
+        assert estimar_tokens_payload({"prompt": "abcd"}, tokens_resposta_padrao=10) == 11
+
+    def test_payload_vazio(self):
+        assert estimar_tokens_payload(None) == 0
+
+
+class TestBaldeTokens:
+
+    def test_reserva_dentro_do_saldo_nao_espera(self):
+        balde = BaldeTokens(capacidade=10, taxa_por_segundo=1)
+        assert balde.reservar(10) == 0.0
+
+    def test_reserva_acima_do_saldo_calcula_espera(self):
+        balde = BaldeTokens(capacidade=10, taxa_por_segundo=5)
+        balde.reservar(10)
+        assert balde.reservar(5) == pytest.approx(1.0, abs=0.05)
+
+    def test_reservas_concorrentes_sao_enfileiradas(self):
+        balde = BaldeTokens(capacidade=1, taxa_por_segundo=1000)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            esperas = sorted(executor.map(lambda _: balde.reservar(1), range(8)))
+        # Cada reserva além da primeira espera 1ms a mais que a anterior
+        assert esperas[0] == 0.0
+        assert esperas[-1] == pytest.approx(0.007, abs=0.002)
+
+
+class TestLimitadorPorModelo:
+
+    def test_modelos_tem_baldes_independentes(self):
+        limitador = LimitadorPorModelo({"gpt-4o": {"rpm": 60, "tpm": 1000}})
+        assert limitador.reservar("gpt-4o", 1000).espera == 0.0
+        assert limitador.reservar("gpt-4o", 100).espera > 0
+        assert limitador.reservar("gpt-4o-mini", 1000).espera == 0.0
+
+    def test_limite_rpm(self):
+        limitador = LimitadorPorModelo(rpm_padrao=2, tpm_padrao=10**6)
+        limitador.reservar("m", 1)
+        limitador.reservar("m", 1)
+        assert limitador.reservar("m", 1).espera == pytest.approx(30.0, abs=0.1)
+
+    def test_reconciliar_devolve_tokens_nao_usados(self):
+        limitador = LimitadorPorModelo({"m": {"rpm": 100, "tpm": 1000}})
+        reserva = limitador.reservar("m", 800)
+        limitador.reconciliar(reserva, 100)
+        assert limitador.estado()["m"]["tokens_disponiveis"] == pytest.approx(900, abs=1)
+
+    def test_adquirir_aguarda(self):
+        limitador = LimitadorPorModelo({"m": {"rpm": 600, "tpm": 600}})
+        limitador.adquirir("m", 600)
+        inicio = time.time()
+        limitador.adquirir("m", 1)
+        assert time.time() - inicio >= 0.09
+
+
+class TestCabecalhosServidor:
+
+    @pytest.mark.parametrize("valor, esperado", [
+        ("6m0s", 360.0), ("20ms", 0.02), ("1h2m3.5s", 3723.5), ("30", 30.0), ("0.5s", 0.5),
+    ])
+    def test_interpretar_duracao(self, valor, esperado):
+        assert interpretar_duracao(valor) == pytest.approx(esperado)
+
+    def test_interpretar_duracao_invalida(self):
+        assert interpretar_duracao("amanhã") is None
+        assert interpretar_duracao(None) is None
+
+    def test_retry_after_ms_tem_prioridade(self):
+        limites = ler_cabecalhos_rate_limit({"retry-after-ms": "250", "retry-after": "1"})
+        assert limites.retry_after == pytest.approx(0.25)
+
+    def test_retry_after_em_data_http(self):
+        from email.utils import formatdate
+        limites = ler_cabecalhos_rate_limit({"retry-after": formatdate(time.time() + 10, usegmt=True)})
+        assert 8 <= limites.retry_after <= 10
+
+    def test_sincronizar_reduz_saldo_e_corrige_limites(self):
+        limitador = LimitadorPorModelo(rpm_padrao=500, tpm_padrao=30000)
+        limites = ler_cabecalhos_rate_limit({
+            "x-ratelimit-limit-requests": "100",
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-limit-tokens": "20000",
+            "x-ratelimit-remaining-tokens": "15000",
+            "x-ratelimit-reset-tokens": "15s",
+        })
+        limitador.sincronizar("m", limites)
+        estado = limitador.estado()["m"]
+        assert estado["tokens_disponiveis"] == pytest.approx(15000, abs=10)
+        # Sem requisições restantes, a próxima espera a reposição no ritmo real (100 RPM)
+        assert limitador.reservar("m", 1).espera == pytest.approx(0.6, abs=0.05)
+
+    def test_sincronizar_nao_aumenta_saldo(self):
+        limitador = LimitadorPorModelo({"m": {"rpm": 60, "tpm": 1000}})
+        limitador.reservar("m", 900)
+        limitador.sincronizar("m", ler_cabecalhos_rate_limit({"x-ratelimit-remaining-tokens": "1000"}))
+        assert limitador.estado()["m"]["tokens_disponiveis"] == pytest.approx(100, abs=1)
+
+    def test_retry_after_pausa_o_modelo(self):
+        limitador = LimitadorPorModelo({"m": {"rpm": 600, "tpm": 10**6}})
+        limitador.sincronizar("m", ler_cabecalhos_rate_limit({"retry-after": "2"}))
+        assert limitador.reservar("m", 1).espera == pytest.approx(2.0, abs=0.05)
+
+
+class TestIntegracaoCliente:
+
+    def test_cliente_concilia_usage(self, requests_mock):
+        Config.get_instance().OPENAI_API_KEY = "sk-test1234567890abcdefghijklmnopqrstuvwxyz"
+        limitador = LimitadorPorModelo({"gpt-4o": {"rpm": 100, "tpm": 10000}})
+        cliente = ClienteHttpOpenAI(limitador_modelos=limitador, max_requisicoes_por_segundo=1000.0)
+        requests_mock.post(f"{cliente.url_base}/chat/completions", json={"choices": [], "usage": {"total_tokens": 30}})
+
+        cliente.enviar("chat/completions", dados={"model": "gpt-4o", "messages": [{"role": "user", "content": "Oi"}], "max_tokens": 500})
+
+        estado = cliente.get_metricas()["limites_modelos"]["gpt-4o"]
+        assert estado["tokens_disponiveis"] == pytest.approx(10000 - 30, abs=1)
+        assert estado["requisicoes_disponiveis"] == pytest.approx(99, abs=0.1)
+
+
+def _reservar_em_outro_processo(caminho, fila):
+    balde = BaldeTokens(capacidade=5, taxa_por_segundo=0.001, backend=BackendLimitadorSQLite(caminho), chave="k")
+    fila.put([balde.reservar(1) for _ in range(5)])
+
+
+class TestBackendSQLite:
+
+    def test_instancias_dividem_o_mesmo_balde(self, tmp_path):
+        caminho = str(tmp_path / "limites.sqlite3")
+        balde_a = BaldeTokens(10, 1, backend=BackendLimitadorSQLite(caminho), chave="k")
+        balde_b = BaldeTokens(10, 1, backend=BackendLimitadorSQLite(caminho), chave="k")
+        assert balde_a.reservar(10) == 0.0
+        assert balde_b.reservar(2) == pytest.approx(2.0, abs=0.05)
+
+    def test_chaves_diferentes_sao_independentes(self, tmp_path):
+        backend = BackendLimitadorSQLite(str(tmp_path / "limites.sqlite3"))
+        limitador = LimitadorPorModelo({"m": {"rpm": 60, "tpm": 100}}, backend=backend, namespace="a:")
+        outro = LimitadorPorModelo({"m": {"rpm": 60, "tpm": 100}}, backend=backend, namespace="b:")
+        limitador.reservar("m", 100)
+        assert outro.reservar("m", 100).espera == 0.0
+        assert limitador.reservar("m", 10).espera > 0
+
+    def test_processos_dividem_o_orcamento(self, tmp_path):
+        caminho = str(tmp_path / "limites.sqlite3")
+        contexto = multiprocessing.get_context("spawn")
+        fila = contexto.Queue()
+        processos = [contexto.Process(target=_reservar_em_outro_processo, args=(caminho, fila)) for _ in range(2)]
+        for processo in processos:
+            processo.start()
+        esperas = fila.get(timeout=30) + fila.get(timeout=30)
+        for processo in processos:
+            processo.join(timeout=30)
+        # 10 reservas contra um balde de 5: exatamente metade precisa esperar
+        assert sum(1 for espera in esperas if espera > 0) == 5
+
+    def test_cliente_usa_backend_para_limite_por_segundo(self, tmp_path):
+        Config.get_instance().OPENAI_API_KEY = "sk-test1234567890abcdefghijklmnopqrstuvwxyz"
+        backend = BackendLimitadorSQLite(str(tmp_path / "limites.sqlite3"))
+        cliente_a = ClienteHttpOpenAI(max_requisicoes_por_segundo=10.0, backend_limitador=backend)
+        cliente_b = ClienteHttpOpenAI(max_requisicoes_por_segundo=10.0, backend_limitador=backend)
+        for _ in range(10):
+            cliente_a._rate_limiter()
+        inicio = time.time()
+        cliente_b._rate_limiter()
+        assert time.time() - inicio >= 0.08
+
+    def test_backend_desconhecido(self):
+        with pytest.raises(ValueError):
+            criar_backend_limitador("redis")
@@ -0,0 +1,121 @@
+"""
+test_retry.py
+=============
+Testes unitários para a política de retry (src/retry.py) e sua integração com os clientes HTTP.
+
+Cobre:
+- Backoff com "decorrelated jitter" limitado por teto
+- Orçamento de retries proporcional ao tráfego
+- Tempo máximo total gasto em retries
+- OpenAIRetryError antecipado quando o orçamento acaba
+"""
+
+import asyncio
+import logging
+import time
+
+import httpx
+import pytest
+
+from src.async_http_client import ClienteHttpOpenAIAsync
+from src.config import Config
+from src.exceptions import OpenAIRetryError, OpenAIServerError
+from src.http_client import ClienteHttpOpenAI
+from src.retry import CicloRetry, OrcamentoRetry, espera_decorrelacionada
+
+logging.disable(logging.CRITICAL)
+
+
+@pytest.fixture(autouse=True)
+def chave_api():
+    Config.get_instance().OPENAI_API_KEY = "sk-test1234567890abcdefghijklmnopqrstuvwxyz"
+
+
+class TestJitter:
+
+    def test_espera_fica_entre_base_e_triplo_da_anterior(self):
+        esperas = [espera_decorrelacionada(2.0, 0.5, 100.0) for _ in range(200)]
+        assert all(0.5 <= espera <= 6.0 for espera in esperas)
+        # Com jitter, as esperas não são todas iguais
+        assert len(set(esperas)) > 1
+
+    def test_espera_respeita_teto(self):
+        assert espera_decorrelacionada(50.0, 1.0, 5.0, sortear=lambda a, b: b) == 5.0
+
+
+class TestOrcamentoRetry:
+
+    def test_consumo_limitado_ao_saldo(self):
+        orcamento = OrcamentoRetry(proporcao=0.1, capacidade=2)
+        assert orcamento.consumir() and orcamento.consumir()
+        assert not orcamento.consumir()
+        assert orcamento.estado()["retries_negados"] == 1
+
+    def test_requisicoes_repoem_o_orcamento(self):
+        orcamento = OrcamentoRetry(proporcao=0.1, capacidade=1)
+        orcamento.consumir()
+        for _ in range(10):
+            orcamento.registrar_requisicao()
+        assert orcamento.consumir()
+
+
+class TestCicloRetry:
+
+    def test_retry_after_tem_prioridade(self):
+        assert CicloRetry(0.1, 10.0).proxima_espera(espera_servidor=2.5) == 2.5
+
+    def test_tempo_maximo_nega_retry(self):
+        ciclo = CicloRetry(0.1, 10.0, tempo_maximo=1.0)
+        assert ciclo.proxima_espera(espera_servidor=5.0) is None
+        assert "tempo máximo" in ciclo.motivo
+
+
+class TestIntegracaoClientes:
+
+    def test_orcamento_esgotado_levanta_retry_error_antecipado(self, requests_mock):
+        cliente = ClienteHttpOpenAI(
+            max_tentativas=3, fator_backoff=0.001, max_requisicoes_por_segundo=1000.0,
+            orcamento_retry=OrcamentoRetry(proporcao=0.0, capacidade=1),
+        )
+        requests_mock.get(f"{cliente.url_base}/models", status_code=500, json={"error": {"message": "instável"}})
+
+        with pytest.raises(OpenAIRetryError) as exc:
+            cliente.obter("models")
+
+        assert "orçamento" in str(exc.value)
+        assert isinstance(exc.value.original_exception, OpenAIServerError)
+        # Uma tentativa original + o único retry permitido, em vez de 4 chamadas
+        assert requests_mock.call_count == 2
+
+    def test_tempo_maximo_total(self, requests_mock):
+        cliente = ClienteHttpOpenAI(max_tentativas=5, fator_backoff=0.2, max_requisicoes_por_segundo=1000.0, tempo_maximo_retries=0.3)
+        requests_mock.get(f"{cliente.url_base}/models", status_code=503, json={})
+
+        inicio = time.time()
+        with pytest.raises(OpenAIRetryError):
+            cliente.obter("models")
+
+        assert time.time() - inicio < 1.0
+        assert requests_mock.call_count < 6
+
+    def test_cliente_async_respeita_orcamento(self):
+        chamadas = []
+
+        def handler(request):
+            chamadas.append(request)
+            return httpx.Response(500, json={"error": {"message": "instável"}})
+
+        async def cenario():
+            cliente = ClienteHttpOpenAIAsync(
+                max_tentativas=3, fator_backoff=0.001, max_requisicoes_por_segundo=1000.0,
+                orcamento_retry=OrcamentoRetry(proporcao=0.0, capacidade=0),
+                transporte=httpx.MockTransport(handler),
+            )
+            async with cliente:
+                await cliente.obter("models")
+
+        with pytest.raises(OpenAIRetryError) as exc:
+            asyncio.run(cenario())
+
+        assert isinstance(exc.value.original_exception, OpenAIServerError)
+        assert len(chamadas) == 1
@@ -0,0 +1,148 @@
+"""
+test_semantic_cache.py
+======================
+Testes unitários para o cache semântico do chat (src/semantic_cache.py) e sua integração com o ChatModule.
+
+Cobre:
+- Acerto para perguntas equivalentes acima do limiar e falha abaixo dele
+- Separação por modelo e por histórico/parâmetros
+- Expulsão LRU, expiração por TTL e métricas de acerto
+- Falha ao gerar o embedding não impede a chamada ao modelo
+"""
+
+import logging
+from unittest.mock import patch
+
+import pytest
+
+from src.chat import ChatModule
+from src.exceptions import OpenAIServerError
+from src.semantic_cache import CacheSemantico
+
+logging.disable(logging.CRITICAL)
+
+# Perguntas reformuladas recebem vetores próximos; assuntos diferentes, vetores ortogonais
+VETORES = {
+    "Como troco minha senha?": [1.0, 0.0, 0.0],
+    "Qual o procedimento para alterar a senha?": [0.98, 0.2, 0.0],
+    "Como cancelo minha assinatura?": [0.0, 1.0, 0.0],
+    "Qual o horário de atendimento?": [0.0, 0.0, 1.0],
+}
+
+
+class ClienteFalso:
+    """Dublê do ClienteHttpOpenAI: embeddings da tabela acima e respostas de chat numeradas."""
+
+    def __init__(self):
+        self.chamadas_chat = 0
+        self.falhar_embeddings = False
+
+    def enviar(self, ponto_final, dados=None, usar_cache=None):
+        if ponto_final == "embeddings":
+            if self.falhar_embeddings:
+                raise OpenAIServerError("indisponível", status_code=503)
+            return {"data": [{"index": i, "embedding": VETORES[t]} for i, t in enumerate(dados["input"])]}
+        self.chamadas_chat += 1
+        return {"choices": [{"message": {"role": "assistant", "content": f"resposta {self.chamadas_chat}"}}]}
+
+
+def pergunta(texto, historico=()):
+    return list(historico) + [{"role": "user", "content": texto}]
+
+
+@pytest.fixture
+def cliente():
+    return ClienteFalso()
+
+
+@pytest.fixture
+def chat(cliente):
+    return ChatModule(cliente_http=cliente, cache_semantico=CacheSemantico(cliente_http=cliente, limiar=0.95))
+
+
+def conteudo(resposta):
+    return resposta["choices"][0]["message"]["content"]
+
+
+class TestCacheSemantico:
+
+    def test_pergunta_reformulada_reaproveita_resposta(self, chat, cliente):
+        primeira = chat.criar_conversa(pergunta("Como troco minha senha?"), modelo="gpt-4o-mini")
+        segunda = chat.criar_conversa(pergunta("Qual o procedimento para alterar a senha?"), modelo="gpt-4o-mini")
+        terceira = chat.criar_conversa(pergunta("Como cancelo minha assinatura?"), modelo="gpt-4o-mini")
+
+        assert conteudo(primeira) == conteudo(segunda) == "resposta 1"
+        assert conteudo(terceira) == "resposta 2"
+        assert cliente.chamadas_chat == 2
+
+    def test_limiar(self, cliente):
+        chat = ChatModule(cliente_http=cliente, cache_semantico=CacheSemantico(cliente_http=cliente, limiar=0.999))
+        chat.criar_conversa(pergunta("Como troco minha senha?"))
+        chat.criar_conversa(pergunta("Qual o procedimento para alterar a senha?"))
+        assert cliente.chamadas_chat == 2
+
+    def test_separado_por_modelo_historico_e_parametros(self, chat, cliente):
+        chat.criar_conversa(pergunta("Como troco minha senha?"), modelo="gpt-4o-mini")
+        chat.criar_conversa(pergunta("Como troco minha senha?"), modelo="gpt-4o")
+        chat.criar_conversa(pergunta("Como troco minha senha?", [{"role": "system", "content": "Responda em inglês."}]), modelo="gpt-4o-mini")
+        chat.criar_conversa(pergunta("Como troco minha senha?"), modelo="gpt-4o-mini", max_tokens=10)
+        assert cliente.chamadas_chat == 4
+
+        chat.criar_conversa(pergunta("Como troco minha senha?"), modelo="gpt-4o")
+        assert cliente.chamadas_chat == 4
+
+    def test_usar_cache_false_ignora(self, chat, cliente):
+        chat.criar_conversa(pergunta("Como troco minha senha?"))
+        chat.criar_conversa(pergunta("Como troco minha senha?"), usar_cache=False)
+        assert cliente.chamadas_chat == 2
+
+    def test_resposta_devolvida_e_copia(self, chat):
+        chat.criar_conversa(pergunta("Como troco minha senha?"))["choices"][0]["message"]["content"] = "alterada"
+        assert conteudo(chat.criar_conversa(pergunta("Como troco minha senha?"))) == "resposta 1"
+
+    def test_expulsao_lru(self, cliente):
+        cache = CacheSemantico(cliente_http=cliente, max_itens_por_modelo=2)
+        chat = ChatModule(cliente_http=cliente, cache_semantico=cache)
+        chat.criar_conversa(pergunta("Como troco minha senha?"))
+        chat.criar_conversa(pergunta("Como cancelo minha assinatura?"))
+        chat.criar_conversa(pergunta("Como troco minha senha?"))  # acerto: senha passa a ser a mais recente
+        chat.criar_conversa(pergunta("Qual o horário de atendimento?"))  # expulsa assinatura
+        assert cliente.chamadas_chat == 3
+
+        chat.criar_conversa(pergunta("Como troco minha senha?"))
+        chat.criar_conversa(pergunta("Como cancelo minha assinatura?"))
+        assert cliente.chamadas_chat == 4
+        assert cache.estatisticas()["expulsoes"] == 2
+
+    def test_ttl(self, cliente):
+        chat = ChatModule(cliente_http=cliente, cache_semantico=CacheSemantico(cliente_http=cliente, ttl=60))
+        with patch("src.semantic_cache.time.monotonic", return_value=1000.0):
+            chat.criar_conversa(pergunta("Como troco minha senha?"))
+        with patch("src.semantic_cache.time.monotonic", return_value=1061.0):
+            chat.criar_conversa(pergunta("Como troco minha senha?"))
+        assert cliente.chamadas_chat == 2
+
+    def test_estatisticas(self, chat):
+        chat.criar_conversa(pergunta("Como troco minha senha?"), modelo="a")
+        chat.criar_conversa(pergunta("Qual o procedimento para alterar a senha?"), modelo="a")
+        chat.criar_conversa(pergunta("Como troco minha senha?"), modelo="b")
+        chat.criar_conversa(pergunta("Como cancelo minha assinatura?"), modelo="b")
+
+        estatisticas = chat.cache_semantico.estatisticas()
+        assert estatisticas["consultas"] == 4
+        assert estatisticas["acertos"] == 1
+        assert estatisticas["taxa_acerto"] == pytest.approx(0.25)
+        assert estatisticas["itens"] == 3
+        assert estatisticas["por_modelo"]["a"] == {"consultas": 2, "acertos": 1, "taxa_acerto": 0.5, "itens": 1}
+
+    def test_falha_no_embedding_segue_para_a_api(self, chat, cliente):
+        cliente.falhar_embeddings = True
+        assert conteudo(chat.criar_conversa(pergunta("Como troco minha senha?"))) == "resposta 1"
+        assert chat.cache_semantico.estatisticas()["erros_embedding"] == 1
+
+    def test_ultima_mensagem_nao_e_pergunta(self, chat, cliente):
+        mensagens = pergunta("Como troco minha senha?") + [{"role": "assistant", "content": "..."}]
+        chat.criar_conversa(mensagens)
+        chat.criar_conversa(mensagens)
+        assert cliente.chamadas_chat == 2
+        assert chat.cache_semantico.estatisticas()["consultas"] == 0
@@ -0,0 +1,220 @@
+"""
+test_sessions.py
+================
+Testes unitários para as sessões de conversa do /chat (src/sessions.py e rotas /chat/sessions).
+
+Cobre:
+- Expiração por inatividade e recusa de novas sessões no limite (sem descartar as ativas)
+- Turnos com session_id enviando só a mensagem nova
+- Imagens enviadas apenas no turno em que foram anexadas
+- Sessão inalterada quando a chamada ao modelo falha
+- Turno do /chat/stream gravado na sessão ao fim do stream
+- 404 para sessão desconhecida e remoção de sessões
+- Autenticação na criação e na remoção de sessões, e 503 com Retry-After no limite
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import sessions
+from src.sessions import ArmazemSessoes, LimiteSessoesAtingido
+from uweb_interface.backend.app import app
+from uweb_interface.backend.routes import API_AUTH_TOKEN, get_armazem_sessoes, get_cliente_http, get_cliente_http_async
+from testes.test_backend import ClienteAsyncFalso, ler_eventos
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(sessions.time, "monotonic", relogio)
+    return relogio
+
+
+class TestArmazemSessoes:
+    def test_expira_sessoes_ociosas(self, relogio):
+        armazem = ArmazemSessoes(ttl_ocioso=60)
+        ativa, ociosa = armazem.criar(), armazem.criar()
+        relogio.agora += 40
+        assert armazem.obter(ativa.id) is ativa
+        relogio.agora += 30
+        assert armazem.obter(ociosa.id) is None
+        assert armazem.obter(ativa.id) is ativa
+        assert armazem.estatisticas() == {"sessoes": 1, "expiradas": 1, "recusadas": 0}
+
+    def test_recusa_nova_sessao_no_limite_sem_descartar_as_ativas(self, relogio):
+        armazem = ArmazemSessoes(max_sessoes=2, ttl_ocioso=60)
+        primeira, segunda = armazem.criar(), armazem.criar()
+        relogio.agora += 20
+        armazem.obter(primeira.id)
+        with pytest.raises(LimiteSessoesAtingido) as erro:
+            armazem.criar()
+        assert erro.value.tempo_restante == 40
+        assert armazem.obter(primeira.id) is primeira and armazem.obter(segunda.id) is segunda
+
+        armazem.remover(segunda.id)
+        terceira = armazem.criar()
+        assert armazem.obter(terceira.id) is terceira
+        assert armazem.estatisticas() == {"sessoes": 2, "expiradas": 0, "recusadas": 1}
+
+    def test_sessoes_expiradas_liberam_vagas(self, relogio):
+        armazem = ArmazemSessoes(max_sessoes=1, ttl_ocioso=60)
+        antiga = armazem.criar()
+        relogio.agora += 61
+        nova = armazem.criar()
+        assert armazem.obter(antiga.id) is None and armazem.obter(nova.id) is nova
+
+    def test_orcamento_de_tokens_por_sessao(self):
+        sessao = ArmazemSessoes(max_tokens_por_sessao=60).criar()
+        for i in range(20):
+            sessao.contexto.adicionar_mensagem("user", f"mensagem número {i} da conversa")
+        assert sessao.contexto.total_tokens <= 60
+        assert sessao.contexto.get_contexto()[-1]["content"] == "mensagem número 19 da conversa"
+
+    def test_ids_unicos_e_remocao(self):
+        armazem = ArmazemSessoes()
+        ids = {armazem.criar().id for _ in range(50)}
+        assert len(ids) == 50
+        assert armazem.remover(ids.pop()) is True
+        assert len(armazem) == 49
+
+
+class ClienteChatFalso:
+    """Dublê do ClienteHttpOpenAI que registra as mensagens de cada chamada."""
+
+    def __init__(self):
+        self.chamadas = []
+        self.falhar = False
+
+    def enviar(self, ponto_final, dados=None):
+        if self.falhar:
+            raise RuntimeError("upstream indisponível")
+        self.chamadas.append(dados["messages"])
+        return {"choices": [{"message": {"content": f"resposta {len(self.chamadas)}"}}]}
+
+
+@pytest.fixture
+def web():
+    falso = ClienteChatFalso()
+    armazem = ArmazemSessoes()
+    app.dependency_overrides[get_cliente_http] = lambda: falso
+    app.dependency_overrides[get_armazem_sessoes] = lambda: armazem
+    yield TestClient(app), falso, armazem
+    app.dependency_overrides.clear()
+
+
+AUTORIZACAO = {"Authorization": f"Bearer {API_AUTH_TOKEN}"}
+
+
+def _nova_sessao(cliente):
+    resposta = cliente.post("/chat/sessions", headers=AUTORIZACAO)
+    assert resposta.status_code == 201
+    return resposta.json()["session_id"]
+
+
+def test_chat_com_sessao_envia_so_a_mensagem_nova(web):
+    cliente, falso, _ = web
+    sessao = _nova_sessao(cliente)
+
+    r1 = cliente.post("/chat", json={"session_id": sessao, "messages": [{"role": "system", "content": "Seja breve."}, {"role": "user", "content": "Oi"}]})
+    r2 = cliente.post("/chat", json={"session_id": sessao, "messages": [{"role": "user", "content": "Tudo bem?"}]})
+
+    assert r1.json() == {"response": "resposta 1", "session_id": sessao}
+    assert r2.status_code == 200
+    assert falso.chamadas[1] == [
+        {"role": "system", "content": "Seja breve."},
+        {"role": "user", "content": "Oi"},
+        {"role": "assistant", "content": "resposta 1"},
+        {"role": "user", "content": "Tudo bem?"},
+    ]
+
+
+def test_imagem_vai_so_no_turno_em_que_foi_enviada(web):
+    cliente, falso, _ = web
+    sessao = _nova_sessao(cliente)
+    arquivo = {"type": "image", "name": "foto.png", "mime": "image/png", "data": "QUJD"}
+
+    cliente.post("/chat", json={"session_id": sessao, "messages": [{"role": "user", "content": "Descreva"}], "files": [arquivo]})
+    cliente.post("/chat", json={"session_id": sessao, "messages": [{"role": "user", "content": "E a cor?"}]})
+
+    assert falso.chamadas[0][0]["content"][1]["image_url"]["url"] == "data:image/png;base64,QUJD"
+    anterior = falso.chamadas[1][0]["content"]
+    assert anterior[0] == {"type": "text", "text": "Descreva"}
+    assert anterior[1] == {"type": "text", "text": "[imagem enviada anteriormente]"}
+
+
+def test_falha_nao_altera_a_sessao(web):
+    cliente, falso, armazem = web
+    sessao = _nova_sessao(cliente)
+    cliente.post("/chat", json={"session_id": sessao, "messages": [{"role": "user", "content": "Oi"}]})
+
+    falso.falhar = True
+    assert cliente.post("/chat", json={"session_id": sessao, "messages": [{"role": "user", "content": "Perdida"}]}).status_code == 500
+    assert len(armazem.obter(sessao).contexto) == 2
+
+
+def test_sessao_desconhecida_e_remocao(web):
+    cliente, falso, _ = web
+    assert cliente.post("/chat", json={"session_id": "inexistente", "messages": [{"role": "user", "content": "Oi"}]}).status_code == 404
+
+    sessao = _nova_sessao(cliente)
+    assert cliente.delete(f"/chat/sessions/{sessao}", headers=AUTORIZACAO).status_code == 204
+    assert cliente.delete(f"/chat/sessions/{sessao}", headers=AUTORIZACAO).status_code == 404
+    assert cliente.post("/chat", json={"session_id": sessao, "messages": [{"role": "user", "content": "Oi"}]}).status_code == 404
+    assert falso.chamadas == []
+
+
+def test_criacao_e_remocao_de_sessao_exigem_autenticacao(web):
+    cliente, _, armazem = web
+    assert cliente.post("/chat/sessions").status_code in (401, 403)
+    assert cliente.post("/chat/sessions", headers={"Authorization": "Bearer errado"}).status_code == 401
+    assert len(armazem) == 0
+
+    sessao = _nova_sessao(cliente)
+    assert cliente.delete(f"/chat/sessions/{sessao}").status_code in (401, 403)
+    assert cliente.delete(f"/chat/sessions/{sessao}", headers={"Authorization": "Bearer errado"}).status_code == 401
+    assert armazem.obter(sessao) is not None
+
+
+def test_criacao_de_sessao_no_limite_responde_503(web, relogio):
+    cliente, _, _ = web
+    armazem = ArmazemSessoes(max_sessoes=1, ttl_ocioso=60)
+    app.dependency_overrides[get_armazem_sessoes] = lambda: armazem
+    sessao = _nova_sessao(cliente)
+
+    resposta = cliente.post("/chat/sessions", headers=AUTORIZACAO)
+
+    assert resposta.status_code == 503
+    assert resposta.headers["Retry-After"] == "60"
+    assert armazem.obter(sessao) is not None
+
+
+def test_chat_sem_sessao_continua_sem_estado(web):
+    cliente, falso, armazem = web
+    resposta = cliente.post("/chat", json={"messages": [{"role": "user", "content": "Oi"}]})
+    assert resposta.json() == {"response": "resposta 1", "session_id": None}
+    assert len(armazem) == 0
+
+
+def test_chat_stream_com_sessao(web):
+    cliente, falso, armazem = web
+    sessao = _nova_sessao(cliente)
+    cliente.post("/chat", json={"session_id": sessao, "messages": [{"role": "user", "content": "Oi"}]})
+    falso_async = ClienteAsyncFalso([{"choices": [{"index": 0, "delta": {"role": "assistant", "content": "Tudo"}, "finish_reason": "stop"}]}])
+    app.dependency_overrides[get_cliente_http_async] = lambda: falso_async
+
+    resposta = cliente.post("/chat/stream", json={"session_id": sessao, "messages": [{"role": "user", "content": "Tudo bem?"}]})
+
+    assert ler_eventos(resposta.text)[-1] == ("done", {"response": "Tudo", "usage": None, "session_id": sessao})
+    assert falso_async.dados_enviados["messages"][-2:] == [
+        {"role": "assistant", "content": "resposta 1"},
+        {"role": "user", "content": "Tudo bem?"},
+    ]
+    assert armazem.obter(sessao).contexto.get_contexto()[-1] == {"role": "assistant", "content": "Tudo"}
@@ -0,0 +1,213 @@
+"""
+test_singleflight.py
+====================
+Testes unitários para o agrupamento de chamadas idênticas simultâneas (src/singleflight.py) e seu uso pelos clientes HTTP.
+
+Cobre:
+- Uma única execução para chamadas simultâneas com a mesma chave (threads e asyncio)
+- Propagação da exceção da chamada líder para quem aguardava
+- Cancelamento da líder (e de quem aguarda) no cliente assíncrono
+- Resultado alterado pelo chamador da líder não chega a quem aguardava
+- Integração com ClienteHttpOpenAI e ClienteHttpOpenAIAsync
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from src.async_http_client import ClienteHttpOpenAIAsync
+from src.config import Config
+from src.exceptions import OpenAIServerError
+from src.http_client import ClienteHttpOpenAI
+from src.singleflight import GrupoChamadas, GrupoChamadasAsync
+
+logging.disable(logging.CRITICAL)
+
+
+@pytest.fixture(autouse=True)
+def chave_api():
+    Config.get_instance().OPENAI_API_KEY = "sk-test1234567890abcdefghijklmnopqrstuvwxyz"
+
+
+class TestGrupoChamadas:
+
+    def test_chamadas_simultaneas_executam_uma_vez(self):
+        grupo = GrupoChamadas()
+        execucoes = []
+        liberar = threading.Event()
+
+        def chamada():
+            execucoes.append(1)
+            liberar.wait(2)
+            return {"lista": [1]}
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            futuros = [executor.submit(grupo.executar, "k", chamada) for _ in range(5)]
+            while grupo.estatisticas()["agrupadas"] < 4:
+                time.sleep(0.005)
+            liberar.set()
+            resultados = [f.result() for f in futuros]
+
+        assert len(execucoes) == 1
+        assert all(r == {"lista": [1]} for r in resultados)
+        # Cada chamador recebe seu próprio objeto
+        resultados[0]["lista"].append(2)
+        assert resultados[1] == {"lista": [1]}
+        assert grupo.estatisticas() == {"agrupadas": 4, "em_andamento": 0}
+
+    def test_excecao_e_repassada_a_quem_aguardava(self):
+        grupo = GrupoChamadas()
+        liberar = threading.Event()
+
+        def chamada():
+            liberar.wait(2)
+            raise OpenAIServerError("fora do ar", status_code=503)
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futuros = [executor.submit(grupo.executar, "k", chamada) for _ in range(3)]
+            while grupo.estatisticas()["agrupadas"] < 2:
+                time.sleep(0.005)
+            liberar.set()
+            for futuro in futuros:
+                with pytest.raises(OpenAIServerError):
+                    futuro.result()
+
+    def test_chave_liberada_apos_a_chamada(self):
+        grupo = GrupoChamadas()
+        assert grupo.executar("k", lambda: 1) == 1
+        assert grupo.executar("k", lambda: 2) == 2
+
+
+class TestGrupoChamadasAsync:
+
+    def test_chamadas_simultaneas_executam_uma_vez(self):
+        execucoes = []
+
+        async def chamada():
+            execucoes.append(1)
+            await asyncio.sleep(0.02)
+            return {"ok": True}
+
+        async def cenario():
+            grupo = GrupoChamadasAsync()
+            return await asyncio.gather(*(grupo.executar("k", chamada) for _ in range(5)))
+
+        resultados = asyncio.run(cenario())
+        assert len(execucoes) == 1
+        assert resultados == [{"ok": True}] * 5
+
+    def test_cancelamento_da_lider_nao_cancela_quem_aguardava(self):
+        execucoes = []
+
+        async def chamada():
+            execucoes.append(1)
+            await asyncio.sleep(0.05)
+            return len(execucoes)
+
+        async def cenario():
+            grupo = GrupoChamadasAsync()
+            lider = asyncio.create_task(grupo.executar("k", chamada))
+            await asyncio.sleep(0)
+            seguidora = asyncio.create_task(grupo.executar("k", chamada))
+            await asyncio.sleep(0.01)
+            lider.cancel()
+            return await seguidora
+
+        assert asyncio.run(cenario()) == 2
+
+    def test_cancelamento_de_quem_aguarda_nao_afeta_a_lider(self):
+        async def chamada():
+            await asyncio.sleep(0.03)
+            return "ok"
+
+        async def cenario():
+            grupo = GrupoChamadasAsync()
+            lider = asyncio.create_task(grupo.executar("k", chamada))
+            await asyncio.sleep(0)
+            seguidora = asyncio.create_task(grupo.executar("k", chamada))
+            await asyncio.sleep(0.01)
+            seguidora.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await seguidora
+            return await lider
+
+        assert asyncio.run(cenario()) == "ok"
+
+    def test_alteracao_do_chamador_da_lider_nao_chega_a_quem_aguardava(self):
+        async def chamada():
+            await asyncio.sleep(0.01)
+            return {"lista": [1]}
+
+        async def lider_que_altera(grupo):
+            resultado = await grupo.executar("k", chamada)
+            # Altera antes de devolver o controle ao loop, quando quem aguardava ainda não copiou
+            resultado["lista"].append(2)
+            return resultado
+
+        async def cenario():
+            grupo = GrupoChamadasAsync()
+            lider = asyncio.create_task(lider_que_altera(grupo))
+            await asyncio.sleep(0)
+            return await asyncio.gather(lider, *(grupo.executar("k", chamada) for _ in range(3)))
+
+        resultados = asyncio.run(cenario())
+        assert resultados[0] == {"lista": [1, 2]}
+        assert resultados[1:] == [{"lista": [1]}] * 3
+
+
+class TestIntegracaoClientes:
+
+    def test_cliente_agrupa_posts_deterministicos(self, requests_mock):
+        cliente = ClienteHttpOpenAI(max_requisicoes_por_segundo=1000.0)
+        liberar = threading.Event()
+
+        def responder(request, context):
+            liberar.wait(2)
+            return {"choices": [{"text": "positivo"}]}
+
+        requests_mock.post(f"{cliente.url_base}/completions", json=responder)
+        dados = {"model": "m", "prompt": "Classifique: ótimo", "temperature": 0}
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futuros = [executor.submit(cliente.enviar, "completions", dict(dados)) for _ in range(4)]
+            while cliente.agrupador.estatisticas()["agrupadas"] < 3:
+                time.sleep(0.005)
+            liberar.set()
+            resultados = [f.result() for f in futuros]
+
+        assert requests_mock.call_count == 1
+        assert resultados == [{"choices": [{"text": "positivo"}]}] * 4
+        assert cliente.get_metricas()["chamadas_agrupadas"]["agrupadas"] == 3
+
+    def test_cliente_nao_agrupa_posts_nao_deterministicos(self, requests_mock):
+        cliente = ClienteHttpOpenAI(max_requisicoes_por_segundo=1000.0)
+        requests_mock.post(f"{cliente.url_base}/completions", json={"choices": []})
+        dados = {"model": "m", "prompt": "Invente", "temperature": 0.9}
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            list(executor.map(lambda _: cliente.enviar("completions", dados=dados), range(3)))
+
+        assert requests_mock.call_count == 3
+        assert cliente.get_metricas()["chamadas_agrupadas"]["agrupadas"] == 0
+
+    def test_cliente_async_agrupa_gets(self):
+        chamadas = []
+
+        async def handler(request):
+            chamadas.append(request)
+            await asyncio.sleep(0.02)
+            return httpx.Response(200, json={"data": []})
+
+        async def cenario():
+            cliente = ClienteHttpOpenAIAsync(max_requisicoes_por_segundo=1000.0, transporte=httpx.MockTransport(handler))
+            async with cliente:
+                return await asyncio.gather(*(cliente.obter("models") for _ in range(5)))
+
+        resultados = asyncio.run(cenario())
+        assert len(chamadas) == 1
+        assert resultados == [{"data": []}] * 5
@@ -0,0 +1,134 @@
+"""
+test_streaming.py
+=================
+Testes unitários para o suporte a streaming (Server-Sent Events).
+
+Cobre:
+- Parser SSE (eventos multi-linha, comentários, [DONE])
+- Agregação dos chunks na resposta final
+- enviar_stream nos clientes síncrono e assíncrono (incluindo retry antes do primeiro byte)
+- ChatModule.criar_conversa_stream
+"""
+
+import asyncio
+import json
+import logging
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from src.async_http_client import ClienteHttpOpenAIAsync
+from src.chat import ChatModule
+from src.config import Config
+from src.http_client import ClienteHttpOpenAI
+from src.streaming import iterar_eventos_sse, AgregadorStream, RespostaStream, RespostaStreamAsync
+
+logging.disable(logging.CRITICAL)
+
+
+def corpo_sse(*chunks):
+    """Monta um corpo SSE com os chunks informados e o marcador [DONE]."""
+    eventos = [f"data: {json.dumps(c)}\n\n" for c in chunks]
+    return "".join(eventos) + "data: [DONE]\n\n"
+
+
+CHUNKS_CHAT = [
+    {"id": "c1", "object": "chat.completion.chunk", "model": "gpt-4o", "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}}]},
+    {"id": "c1", "object": "chat.completion.chunk", "model": "gpt-4o", "choices": [{"index": 0, "delta": {"content": "Olá"}}]},
+    {"id": "c1", "object": "chat.completion.chunk", "model": "gpt-4o", "choices": [{"index": 0, "delta": {"content": ", mundo"}, "finish_reason": "stop"}]},
+    {"id": "c1", "object": "chat.completion.chunk", "model": "gpt-4o", "choices": [], "usage": {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5}},
+]
+
+
+class TestParserSSE:
+
+    def test_eventos_simples_e_done(self):
+        linhas = corpo_sse({"a": 1}, {"b": 2}).split("\n") + ["data: {\"ignorado\": true}", ""]
+        assert list(iterar_eventos_sse(linhas)) == [{"a": 1}, {"b": 2}]
+
+    def test_comentarios_e_evento_multilinha(self):
+        linhas = [": keep-alive", "", "event: message", "data: {\"a\":", "data: 1}", "", "data: [DONE]", ""]
+        assert list(iterar_eventos_sse(linhas)) == [{"a": 1}]
+
+
+class TestAgregador:
+
+    def test_resposta_final_chat(self):
+        agregador = AgregadorStream()
+        deltas = [agregador.adicionar(c) for c in CHUNKS_CHAT]
+
+        assert "".join(deltas) == "Olá, mundo"
+        final = agregador.resposta_final()
+        assert final["object"] == "chat.completion"
+        assert final["choices"][0]["message"] == {"role": "assistant", "content": "Olá, mundo"}
+        assert final["choices"][0]["finish_reason"] == "stop"
+        assert final["usage"]["total_tokens"] == 5
+
+    def test_resposta_final_completions(self):
+        agregador = AgregadorStream()
+        agregador.adicionar({"object": "text_completion", "choices": [{"index": 0, "text": "Oi"}]})
+        agregador.adicionar({"object": "text_completion", "choices": [{"index": 0, "text": "!", "finish_reason": "length"}]})
+
+        assert agregador.resposta_final()["choices"] == [{"index": 0, "text": "Oi!", "finish_reason": "length"}]
+
+
+class TestClienteSincrono:
+
+    @pytest.fixture
+    def cliente(self):
+        Config.get_instance().OPENAI_API_KEY = "sk-test1234567890abcdefghijklmnopqrstuvwxyz"
+        return ClienteHttpOpenAI(fator_backoff=0.001, max_requisicoes_por_segundo=1000.0)
+
+    def test_enviar_stream(self, cliente, requests_mock):
+        requests_mock.post(f"{cliente.url_base}/chat/completions", text=corpo_sse(*CHUNKS_CHAT))
+
+        stream = RespostaStream(cliente.enviar_stream("chat/completions", dados={"model": "gpt-4o"}))
+
+        assert list(stream) == ["Olá", ", mundo"]
+        assert stream.concluida
+        assert stream.resposta_final()["choices"][0]["message"]["content"] == "Olá, mundo"
+        assert requests_mock.last_request.json()["stream"] is True
+
+    def test_retry_antes_do_primeiro_byte(self, cliente, requests_mock):
+        requests_mock.post(f"{cliente.url_base}/chat/completions", [
+            {"status_code": 500, "json": {"error": {"message": "temporário"}}},
+            {"status_code": 200, "text": corpo_sse(*CHUNKS_CHAT)},
+        ])
+
+        chunks = list(cliente.enviar_stream("chat/completions", dados={}))
+
+        assert len(chunks) == len(CHUNKS_CHAT)
+        assert requests_mock.call_count == 2
+
+
+class TestClienteAssincrono:
+
+    def test_enviar_stream_async(self):
+        Config.get_instance().OPENAI_API_KEY = "sk-test1234567890abcdefghijklmnopqrstuvwxyz"
+        transporte = httpx.MockTransport(lambda r: httpx.Response(200, text=corpo_sse(*CHUNKS_CHAT), headers={"Content-Type": "text/event-stream"}))
+
+        async def cenario():
+            async with ClienteHttpOpenAIAsync(transporte=transporte, max_requisicoes_por_segundo=1000.0) as cliente:
+                stream = RespostaStreamAsync(await cliente.enviar_stream("chat/completions", dados={}))
+                deltas = [delta async for delta in stream]
+                return deltas, stream.resposta_final()
+
+        deltas, final = asyncio.run(cenario())
+        assert deltas == ["Olá", ", mundo"]
+        assert final["usage"]["prompt_tokens"] == 3
+
+
+class TestChatModuleStream:
+
+    def test_criar_conversa_stream(self):
+        with patch('src.chat.ClienteHttpOpenAI') as MockCliente:
+            MockCliente.return_value.enviar_stream.return_value = iter(CHUNKS_CHAT)
+            chat = ChatModule()
+
+            stream = chat.criar_conversa_stream([{"role": "user", "content": "Oi"}], "gpt-4o", temperature=0)
+
+            assert "".join(stream) == "Olá, mundo"
+            _, kwargs = MockCliente.return_value.enviar_stream.call_args
+            assert kwargs["dados"]["temperature"] == 0
+            assert kwargs["dados"]["stream_options"] == {"include_usage": True}
@@ -0,0 +1,150 @@
+"""
+test_summarizer.py
+==================
+Testes unitários para a compactação do contexto por resumo (src/summarizer.py + ContextManager).
+
+Cobre:
+- Troca das mensagens mais antigas por um resumo ao passar do limiar
+- Resumo em segundo plano, sem bloquear novas mensagens
+- Resumo rolante (o novo incorpora o anterior) e cache dos resumos
+- Falha do resumo e mensagens descartadas enquanto o resumo era gerado
+"""
+
+import logging
+import threading
+
+import pytest
+
+from src.context_manager import PREFIXO_RESUMO, ContextManager
+from src.exceptions import OpenAIServerError
+from src.summarizer import ResumidorConversa
+
+logging.disable(logging.CRITICAL)
+
+
+class ClienteResumoFalso:
+    """Dublê do ClienteHttpOpenAI que devolve resumos numerados e pode ser pausado ou falhar."""
+
+    def __init__(self):
+        self.transcricoes = []
+        self.liberar = threading.Event()
+        self.liberar.set()
+        self.falhar = False
+
+    def enviar(self, ponto_final, dados=None):
+        self.liberar.wait(5)
+        if self.falhar:
+            raise OpenAIServerError("indisponível", status_code=503)
+        self.transcricoes.append(dados["messages"][1]["content"])
+        return {"choices": [{"message": {"content": f"resumo {len(self.transcricoes)}"}}]}
+
+
+@pytest.fixture(autouse=True)
+def tokens_fixos(monkeypatch):
+    # Contagem fixa por mensagem, para que os limiares não dependam do tokenizador instalado
+    monkeypatch.setattr("src.context_manager.contar_tokens_mensagem", lambda m, modelo=None: 10 if m["role"] == "system" else 18)
+
+
+@pytest.fixture
+def cliente():
+    return ClienteResumoFalso()
+
+
+@pytest.fixture
+def resumidor(cliente):
+    resumidor = ResumidorConversa(cliente_http=cliente)
+    yield resumidor
+    cliente.liberar.set()
+    resumidor.fechar()
+
+
+def novo_contexto(resumidor, **kwargs):
+    parametros = {"max_length": None, "max_tokens": None, "limiar_resumo": 60, "mensagens_por_resumo": 2}
+    parametros.update(kwargs)
+    ctx = ContextManager(resumidor=resumidor, **parametros)
+    ctx.adicionar_mensagem("system", "Você é um assistente.")
+    return ctx
+
+
+def conversar(ctx, turnos, inicio=0):
+    for i in range(inicio, inicio + turnos):
+        ctx.adicionar_mensagem("user", f"pergunta {i} " + "x" * 40)
+        ctx.adicionar_mensagem("assistant", f"resposta {i} " + "y" * 40)
+
+
+def conteudos(ctx):
+    return [m["content"] for m in ctx.get_contexto()]
+
+
+class TestCompactacao:
+
+    def test_troca_mais_antigas_por_resumo(self, resumidor, cliente):
+        ctx = novo_contexto(resumidor)
+        conversar(ctx, 2)
+        assert ctx.aguardar_resumo(timeout=5)
+
+        contexto = ctx.get_contexto()
+        assert contexto[0]["content"] == "Você é um assistente."
+        assert contexto[1] == {"role": "system", "content": PREFIXO_RESUMO + "resumo 1"}
+        assert contexto[2]["content"].startswith("pergunta 1")
+        assert ctx.resumo == "resumo 1"
+        assert "pergunta 0" in cliente.transcricoes[0] and "resposta 0" in cliente.transcricoes[0]
+
+    def test_nao_bloqueia_o_proximo_turno(self, resumidor, cliente):
+        cliente.liberar.clear()
+        ctx = novo_contexto(resumidor)
+        conversar(ctx, 2)
+        ctx.adicionar_mensagem("user", "pergunta 2")
+        # Enquanto o resumo não fica pronto, o contexto segue completo
+        assert len(ctx.get_contexto()) == 6
+
+        cliente.liberar.set()
+        assert ctx.aguardar_resumo(timeout=5)
+        assert len(ctx.get_contexto()) == 5
+        assert ctx.get_contexto()[1]["content"] == PREFIXO_RESUMO + "resumo 1"
+
+    def test_resumo_rolante(self, resumidor, cliente):
+        ctx = novo_contexto(resumidor)
+        conversar(ctx, 2)
+        ctx.aguardar_resumo(timeout=5)
+        conversar(ctx, 1, inicio=2)
+        ctx.aguardar_resumo(timeout=5)
+
+        assert ctx.resumo == "resumo 2"
+        assert "resumo 1" in cliente.transcricoes[1]
+        assert sum(PREFIXO_RESUMO in c for c in conteudos(ctx)) == 1
+
+    def test_resumo_em_cache(self, resumidor, cliente):
+        mensagens = [{"role": "user", "content": "Meu nome é Ana."}, {"role": "assistant", "content": "Olá, Ana!"}]
+        assert resumidor.resumir(mensagens) == resumidor.resumir(list(mensagens)) == "resumo 1"
+        assert len(cliente.transcricoes) == 1
+        resumidor.resumir(mensagens, resumo_anterior="outro")
+        assert len(cliente.transcricoes) == 2
+
+    def test_falha_mantem_contexto(self, resumidor, cliente):
+        cliente.falhar = True
+        ctx = novo_contexto(resumidor)
+        conversar(ctx, 2)
+        assert not ctx.aguardar_resumo(timeout=5)
+        assert len(ctx.get_contexto()) == 5 and ctx.resumo is None
+
+        # Só tenta de novo depois de mais `mensagens_por_resumo` mensagens
+        cliente.falhar = False
+        ctx.adicionar_mensagem("user", "mais uma")
+        assert not ctx.aguardar_resumo(timeout=5)
+        ctx.adicionar_mensagem("assistant", "certo")
+        assert ctx.aguardar_resumo(timeout=5)
+
+    def test_mensagens_descartadas_durante_o_resumo(self, resumidor, cliente):
+        cliente.liberar.clear()
+        ctx = novo_contexto(resumidor, mensagens_por_resumo=4, max_length=5)
+        conversar(ctx, 3)
+        # O limite de 5 mensagens já descartou a primeira do trecho que está sendo resumido
+        assert conteudos(ctx)[1].startswith("resposta 0")
+
+        ctx.limiar_resumo = None  # sem nova compactação depois desta
+        cliente.liberar.set()
+        ctx.aguardar_resumo(timeout=5)
+        assert conteudos(ctx)[1] == PREFIXO_RESUMO + "resumo 1"
+        assert [" ".join(c.split()[:2]) for c in conteudos(ctx)[2:]] == ["pergunta 1", "resposta 1", "pergunta 2", "resposta 2"]
+        assert "pergunta 0" in cliente.transcricoes[0]
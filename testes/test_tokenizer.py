@@ -0,0 +1,193 @@
+"""
+test_tokenizer.py
+=================
+Testes unitários para a contagem local de tokens e a pré-checagem da janela de contexto (src/tokenizer.py).
+
+Cobre:
+- Contagem de textos, mensagens e payloads (messages, prompt, input)
+- Cache das contagens por hash do texto, com tamanho limitado
+- Janela de contexto por prefixo de modelo
+- Recusa e ajuste automático de conversas que não cabem na janela
+- Integração com ChatModule e com a estimativa dos limitadores
+"""
+
+import logging
+from collections import OrderedDict
+
+import pytest
+
+from src import tokenizer
+from src.chat import ChatModule
+from src.exceptions import OpenAIValidationError
+from src.rate_limiter import estimar_tokens_payload
+from src.tokenizer import (
+    JANELAS_CONTEXTO,
+    TOKENS_INICIO_RESPOSTA,
+    contar_tokens,
+    contar_tokens_mensagem,
+    contar_tokens_mensagens,
+    contar_tokens_prompt,
+    janela_contexto,
+    verificar_janela_contexto,
+)
+
+logging.disable(logging.CRITICAL)
+
+
+def mensagem(role, tamanho):
+    return {"role": role, "content": "palavra " * tamanho}
+
+
+class TestContagem:
+
+    def test_texto(self):
+        assert contar_tokens("") == 0
+        assert contar_tokens("Olá, tudo bem?") > 0
+        assert contar_tokens("palavra " * 200) > contar_tokens("palavra " * 100)
+
+    def test_mensagens_somam_partes_e_delimitadores(self):
+        mensagens = [{"role": "system", "content": "Seja breve."}, {"role": "user", "content": "Oi"}]
+        assert contar_tokens_mensagens(mensagens, "gpt-4o") == (
+            contar_tokens_mensagem(mensagens[0], "gpt-4o") + contar_tokens_mensagem(mensagens[1], "gpt-4o") + TOKENS_INICIO_RESPOSTA
+        )
+        assert contar_tokens_mensagem(mensagens[1]) > contar_tokens("Oi")
+
+    def test_conteudo_em_partes(self):
+        simples = {"role": "user", "content": "descreva"}
+        com_imagem = {"role": "user", "content": [{"type": "text", "text": "descreva"}, {"type": "image_url", "image_url": {"url": "data:..."}}]}
+        assert contar_tokens_mensagem(com_imagem) > contar_tokens_mensagem(simples)
+
+    def test_payloads(self):
+        assert contar_tokens_prompt({"model": "m", "prompt": "abc def"}) == contar_tokens("abc def", "m")
+        assert contar_tokens_prompt({"model": "m", "prompt": ["abc", "def"]}) == contar_tokens("abc", "m") + contar_tokens("def", "m")
+        assert contar_tokens_prompt({"prompt": [1, 2, 3]}) == 3
+        assert contar_tokens_prompt({"input": "texto"}) == contar_tokens("texto")
+        assert contar_tokens_prompt({}) == 0
+
+    def test_estimativa_do_limitador_usa_contagem(self):
+        dados = {"model": "gpt-4o", "messages": [mensagem("user", 50)], "max_tokens": 100, "n": 2}
+        assert estimar_tokens_payload(dados) == contar_tokens_prompt(dados) + 200
+        assert estimar_tokens_payload({"input": ["a", "b"]}) == contar_tokens_prompt({"input": ["a", "b"]})
+
+    def test_cache_de_contagens_nao_guarda_o_texto(self, monkeypatch):
+        class CodificadorFalso:
+            chamadas = 0
+
+            def encode(self, texto, disallowed_special=()):
+                CodificadorFalso.chamadas += 1
+                return texto.split()
+
+        monkeypatch.setattr(tokenizer, "_codificador", lambda modelo=None: CodificadorFalso())
+        monkeypatch.setattr(tokenizer, "_contagens", OrderedDict())
+        monkeypatch.setattr(tokenizer, "MAX_CONTAGENS_EM_CACHE", 2)
+        documento = "palavra " * 5000
+
+        assert contar_tokens(documento, "m") == contar_tokens(documento, "m") == 5000
+        assert CodificadorFalso.chamadas == 1
+        assert all(len(digest) == 16 for _, digest in tokenizer._contagens)
+        contar_tokens("a", "m")
+        contar_tokens("b", "m")
+        assert len(tokenizer._contagens) == 2
+
+
+class TestJanelaContexto:
+
+    def test_prefixo_mais_longo(self):
+        assert janela_contexto("gpt-4o-mini-2024-07-18") == JANELAS_CONTEXTO["gpt-4o"]
+        assert janela_contexto("gpt-4-turbo") == JANELAS_CONTEXTO["gpt-4-turbo"]
+        assert janela_contexto("gpt-4-0613") == JANELAS_CONTEXTO["gpt-4"]
+        assert janela_contexto("modelo-desconhecido") is None
+
+    def test_cabe(self):
+        dados = {"model": "gpt-4", "messages": [mensagem("user", 10)]}
+        assert verificar_janela_contexto(dados) is dados
+
+    def test_recusa(self):
+        dados = {"model": "gpt-4", "messages": [mensagem("user", 20000)]}
+        with pytest.raises(OpenAIValidationError) as erro:
+            verificar_janela_contexto(dados)
+        assert erro.value.field == "messages"
+
+    def test_max_tokens_conta_na_janela(self):
+        dados = {"model": "gpt-4", "messages": [mensagem("user", 1000)]}
+        verificar_janela_contexto(dados)
+        with pytest.raises(OpenAIValidationError):
+            verificar_janela_contexto(dict(dados, max_tokens=janela_contexto("gpt-4")))
+
+    def test_prompts_em_lista_tem_cada_uma_a_propria_janela(self):
+        dados = {"model": "gpt-4", "prompt": ["palavra " * 2000] * 4}
+        assert verificar_janela_contexto(dados) is dados
+        with pytest.raises(OpenAIValidationError):
+            verificar_janela_contexto({"model": "gpt-4", "prompt": ["curta", "palavra " * 20000]})
+
+    def test_modelo_desconhecido_nao_e_verificado(self):
+        dados = {"model": "meu-modelo", "messages": [mensagem("user", 20000)]}
+        assert verificar_janela_contexto(dados) is dados
+
+    def test_ajuste_remove_mais_antigas_e_preserva_sistema(self):
+        mensagens = [
+            {"role": "system", "content": "Você é um assistente."},
+            mensagem("user", 3000),
+            {"role": "assistant", "content": None, "tool_calls": [{"id": "c1", "type": "function", "function": {"name": "f", "arguments": "{}"}}]},
+            {"role": "tool", "tool_call_id": "c1", "content": "resultado"},
+            mensagem("assistant", 3000),
+            mensagem("user", 3000),
+            mensagem("assistant", 10),
+            mensagem("user", 10),
+        ]
+        dados = {"model": "gpt-4", "messages": mensagens, "max_tokens": 500}
+
+        ajustado = verificar_janela_contexto(dados, ajustar=True)
+
+        assert ajustado is not dados and dados["messages"] == mensagens
+        assert ajustado["messages"][0]["role"] == "system"
+        assert ajustado["messages"][-1] is mensagens[-1]
+        assert all(m["role"] != "tool" for m in ajustado["messages"][:2])
+        assert len(ajustado["messages"]) < len(mensagens)
+        verificar_janela_contexto(ajustado)
+
+    def test_ajuste_mira_a_janela_real_mesmo_com_contagem_aproximada(self, monkeypatch):
+        monkeypatch.setattr("src.tokenizer.contagem_exata", lambda modelo=None: False)
+        janela = janela_contexto("gpt-4")
+        mensagens = [mensagem("user", 2000), mensagem("assistant", 2000), mensagem("user", 200)]
+        dados = {"model": "gpt-4", "messages": mensagens}
+        # Acima da janela, mas dentro da folga da estimativa: sem ajustar, passa como está
+        assert janela < contar_tokens_prompt(dados) <= janela * 1.1
+        assert verificar_janela_contexto(dados) is dados
+
+        ajustado = verificar_janela_contexto(dados, ajustar=True)
+
+        assert contar_tokens_prompt(ajustado) <= janela
+        assert ajustado["messages"][-1] is mensagens[-1]
+
+    def test_ajuste_impossivel(self):
+        dados = {"model": "gpt-4", "messages": [mensagem("system", 10), mensagem("user", 20000)]}
+        with pytest.raises(OpenAIValidationError):
+            verificar_janela_contexto(dados, ajustar=True)
+
+
+class ClienteChatFalso:
+    def __init__(self):
+        self.payloads = []
+
+    def enviar(self, ponto_final, dados=None):
+        self.payloads.append(dados)
+        return {"choices": [{"message": {"content": "ok"}}]}
+
+
+class TestChatModule:
+
+    def test_recusa_antes_de_enviar(self):
+        cliente = ClienteChatFalso()
+        with pytest.raises(OpenAIValidationError):
+            ChatModule(cliente_http=cliente).criar_conversa([mensagem("user", 20000)], modelo="gpt-4")
+        assert cliente.payloads == []
+
+    def test_ajustar_contexto(self):
+        cliente = ClienteChatFalso()
+        mensagens = [mensagem("user", 5000), mensagem("assistant", 5000), mensagem("user", 10)]
+        ChatModule(cliente_http=cliente).criar_conversa(mensagens, modelo="gpt-4", ajustar_contexto=True)
+        enviadas = cliente.payloads[0]["messages"]
+        assert enviadas[-1] is mensagens[-1]
+        assert mensagens[0] not in enviadas
+        assert "ajustar_contexto" not in cliente.payloads[0]
@@ -0,0 +1,146 @@
+"""
+test_vector_store.py
+====================
+Testes unitários para o índice de vetores em disco (src/vector_store.py) e seu uso como contexto no /chat.
+
+Cobre:
+- Persistência entre instâncias e append incremental
+- Busca top-k em blocos igual à busca direta
+- Descarte de um append interrompido e abertura somente leitura
+- Injeção do contexto nas rotas /chat e /chat/stream
+"""
+
+import logging
+import os
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from src.embeddings import similaridade_cosseno
+from src.exceptions import OpenAIValidationError
+from src.vector_store import ARQUIVO_METADADOS, ARQUIVO_VETORES, ArmazemVetores
+from uweb_interface.backend.app import app
+from uweb_interface.backend.routes import get_armazem_vetores, get_cliente_http, get_cliente_http_async
+from testes.test_backend import ClienteAsyncFalso
+
+logging.disable(logging.CRITICAL)
+
+
+@pytest.fixture
+def vetores():
+    return np.random.default_rng(42).normal(size=(500, 8)).astype(np.float32)
+
+
+class TestArmazemVetores:
+
+    def test_persiste_e_acrescenta(self, tmp_path, vetores):
+        armazem = ArmazemVetores(str(tmp_path), dimensao=8)
+        assert armazem.adicionar(vetores[:300], [{"texto": f"t{i}"} for i in range(300)]) == range(0, 300)
+
+        reaberto = ArmazemVetores(str(tmp_path))
+        assert reaberto.adicionar(vetores[300:], [{"texto": f"t{i}"} for i in range(300, 500)]) == range(300, 500)
+        assert len(ArmazemVetores(str(tmp_path))) == 500
+        assert os.path.getsize(tmp_path / ARQUIVO_VETORES) == 500 * 8 * 4
+
+        resultado = ArmazemVetores(str(tmp_path)).buscar(vetores[420], k=1)
+        assert resultado[0]["id"] == 420
+        assert resultado[0]["metadados"] == {"texto": "t420"}
+        assert resultado[0]["similaridade"] == pytest.approx(1.0, abs=1e-5)
+
+    def test_busca_em_blocos_igual_a_busca_direta(self, tmp_path, vetores):
+        armazem = ArmazemVetores(str(tmp_path), dimensao=8, tamanho_bloco=64)
+        armazem.adicionar(vetores)
+        consultas = np.random.default_rng(1).normal(size=(3, 8))
+
+        ids, valores = armazem.buscar_indices(consultas, k=10)
+
+        esperado = np.argsort(-similaridade_cosseno(consultas, vetores), axis=1)[:, :10]
+        np.testing.assert_array_equal(ids, esperado)
+        assert np.all(np.diff(valores, axis=1) <= 0)
+
+    def test_similaridade_minima_e_indice_vazio(self, tmp_path):
+        armazem = ArmazemVetores(str(tmp_path), dimensao=2)
+        assert armazem.buscar(np.array([1.0, 0.0])) == []
+        armazem.adicionar(np.array([[1.0, 0.0], [0.0, 1.0]]), [{"texto": "a"}, {"texto": "b"}])
+        assert [r["metadados"]["texto"] for r in armazem.buscar(np.array([1.0, 0.1]), k=2, similaridade_minima=0.5)] == ["a"]
+
+    def test_append_interrompido_e_descartado(self, tmp_path, vetores):
+        armazem = ArmazemVetores(str(tmp_path), dimensao=8)
+        armazem.adicionar(vetores[:10], [{"texto": str(i)} for i in range(10)])
+        # Simula um processo morto no meio de um append (dados gravados, manifesto não)
+        with open(tmp_path / ARQUIVO_VETORES, "ab") as arquivo:
+            arquivo.write(vetores[10:12].tobytes()[:40])
+        with open(tmp_path / ARQUIVO_METADADOS, "ab") as arquivo:
+            arquivo.write(b'{"texto": "incomp')
+
+        reaberto = ArmazemVetores(str(tmp_path))
+        assert len(reaberto) == 10
+        reaberto.adicionar(vetores[10:11], [{"texto": "10"}])
+        assert reaberto.buscar(vetores[10], k=1)[0]["metadados"] == {"texto": "10"}
+
+    def test_somente_leitura(self, tmp_path, vetores):
+        with pytest.raises(OpenAIValidationError):
+            ArmazemVetores(str(tmp_path / "inexistente"), somente_leitura=True)
+        ArmazemVetores(str(tmp_path), dimensao=8).adicionar(vetores[:5])
+        leitor = ArmazemVetores(str(tmp_path), somente_leitura=True)
+        with pytest.raises(OpenAIValidationError):
+            leitor.adicionar(vetores[:1])
+        ArmazemVetores(str(tmp_path)).adicionar(vetores[5:7])
+        leitor.recarregar()
+        assert len(leitor) == 7
+
+    def test_dimensao_divergente(self, tmp_path):
+        ArmazemVetores(str(tmp_path), dimensao=4)
+        with pytest.raises(OpenAIValidationError):
+            ArmazemVetores(str(tmp_path), dimensao=8)
+
+
+class ClienteRagFalso:
+    """Dublê do ClienteHttpOpenAI: embeddings fixos e chat que devolve as mensagens recebidas."""
+
+    def __init__(self):
+        self.mensagens = None
+
+    def enviar(self, ponto_final, dados=None):
+        if ponto_final == "embeddings":
+            return {"data": [{"index": 0, "embedding": [1.0, 0.0]}]}
+        self.mensagens = dados["messages"]
+        return {"choices": [{"message": {"content": "ok"}}]}
+
+
+def test_chat_com_contexto(tmp_path):
+    armazem = ArmazemVetores(str(tmp_path), dimensao=2)
+    armazem.adicionar(np.array([[1.0, 0.1], [0.0, 1.0]]), [{"texto": "Prazo de entrega: 5 dias."}, {"texto": "Irrelevante."}])
+    falso = ClienteRagFalso()
+    app.dependency_overrides[get_cliente_http] = lambda: falso
+    app.dependency_overrides[get_armazem_vetores] = lambda: armazem
+    try:
+        resposta = TestClient(app).post("/chat", json={"messages": [{"role": "user", "content": "Qual o prazo?"}], "use_context": True})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert resposta.status_code == 200
+    assert falso.mensagens[0]["role"] == "system"
+    assert "Prazo de entrega: 5 dias." in falso.mensagens[0]["content"]
+    assert "Irrelevante." not in falso.mensagens[0]["content"]
+    assert falso.mensagens[1] == {"role": "user", "content": "Qual o prazo?"}
+
+
+def test_chat_stream_com_contexto(tmp_path):
+    armazem = ArmazemVetores(str(tmp_path), dimensao=2)
+    armazem.adicionar(np.array([[1.0, 0.1]]), [{"texto": "Prazo de entrega: 5 dias."}])
+    falso_async = ClienteAsyncFalso([{"choices": [{"index": 0, "delta": {"role": "assistant", "content": "5 dias"}, "finish_reason": "stop"}]}])
+    falso = ClienteRagFalso()
+    app.dependency_overrides[get_cliente_http] = lambda: falso
+    app.dependency_overrides[get_cliente_http_async] = lambda: falso_async
+    app.dependency_overrides[get_armazem_vetores] = lambda: armazem
+    try:
+        resposta = TestClient(app).post("/chat/stream", json={"messages": [{"role": "user", "content": "Qual o prazo?"}], "use_context": True})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert resposta.status_code == 200
+    mensagens = falso_async.dados_enviados["messages"]
+    assert mensagens[0]["role"] == "system" and "Prazo de entrega: 5 dias." in mensagens[0]["content"]
+    assert mensagens[1] == {"role": "user", "content": "Qual o prazo?"}
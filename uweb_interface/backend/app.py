@@ -1,8 +1,31 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from uweb_interface.backend.routes import router
+from src.client_registry import (
+    obter_cliente_compartilhado,
+    obter_cliente_async_compartilhado,
+    obter_catalogo_modelos,
+    obter_armazem_sessoes,
+    fechar_clientes,
+    fechar_clientes_async,
+)
+
+
+# --- CICLO DE VIDA ---
+# O cliente HTTP é criado uma única vez por processo e reaproveitado por todas as requisições
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.cliente_http = obter_cliente_compartilhado()
+    app.state.cliente_http_async = obter_cliente_async_compartilhado()
+    app.state.catalogo_modelos = obter_catalogo_modelos()
+    app.state.armazem_sessoes = obter_armazem_sessoes()
+    yield
+    fechar_clientes()
+    await fechar_clientes_async()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # --- CORS ---
 app.add_middleware(
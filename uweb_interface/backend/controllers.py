@@ -1,57 +1,216 @@
-from fastapi import HTTPException
-from uweb_interface.backend.schemas import ChatRequest, ChatResponse, CompletionRequest, CompletionResponse, ModelListResponse, ConfigResponse
+import asyncio
+import json
+import logging
+import math
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from uweb_interface.backend.schemas import ChatRequest, ChatResponse, SessionResponse, CompletionRequest, CompletionResponse, ModelListResponse, ConfigResponse
 from src.chat import ChatModule
 from src.http_client import ClienteHttpOpenAI
+from src.async_http_client import ClienteHttpOpenAIAsync
+from src.streaming import RespostaStreamAsync
+from src.model_catalog import CatalogoModelos
+from src.embeddings import EmbeddingsModule
+from src.vector_store import ArmazemVetores
+from src.semantic_cache import CacheSemantico
+from src.sessions import ArmazemSessoes, LimiteSessoesAtingido, Sessao
+from src.tokenizer import verificar_janela_contexto
 from src.config import Config
 
+logger = logging.getLogger(__name__)
 
-def handle_chat(payload: ChatRequest) -> ChatResponse:
+
+def _montar_mensagens(payload: ChatRequest) -> list:
+    """Converte o ChatRequest em mensagens no formato da OpenAI, anexando os arquivos à última mensagem."""
+    mensagens = [m.dict() for m in payload.messages]
+
+    # Processa arquivos se existirem
+    if payload.files:
+        content_parts = []
+
+        last_msg = mensagens[-1] if mensagens else None
+        if last_msg and last_msg.get('content'):
+            content_parts.append({"type": "text", "text": last_msg['content']})
+
+        for f in payload.files:
+            if f.type == 'image':
+                content_parts.append({
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:{f.mime};base64,{f.data}"
+                    }
+                })
+            elif f.type == 'text':
+                content_parts.append({
+                    "type": "text",
+                    "text": f"Conteúdo do arquivo '{f.name}':\n\n{f.data}"
+                })
+
+        if mensagens:
+            mensagens[-1] = {"role": "user", "content": content_parts}
+        else:
+            mensagens = [{"role": "user", "content": content_parts}]
+    return mensagens
+
+
+def _injetar_contexto(mensagens: list, cliente: ClienteHttpOpenAI, armazem: ArmazemVetores) -> list:
+    """Busca no índice de vetores os trechos mais próximos da última pergunta e os envia como mensagem de sistema."""
+    pergunta = next((m["content"] for m in reversed(mensagens) if m["role"] == "user" and isinstance(m["content"], str)), None)
+    if not pergunta or not len(armazem):
+        return mensagens
+    config = Config.get_instance()
+    consulta = EmbeddingsModule(cliente_http=cliente).gerar_embeddings([pergunta], modelo=config.OPENAI_EMBEDDINGS_MODEL)[0]
+    trechos = armazem.buscar(consulta, k=config.OPENAI_RAG_TOP_K, similaridade_minima=config.OPENAI_RAG_MIN_SIMILARITY)
+    if not trechos:
+        return mensagens
+    contexto = "\n\n".join(t["metadados"].get("texto", "") for t in trechos)
+    instrucao = {"role": "system", "content": f"Use o contexto abaixo, se for relevante, para responder.\n\nContexto:\n{contexto}"}
+    return [instrucao] + mensagens
+
+
+def _sem_imagens(mensagem: dict) -> dict:
+    """Cópia da mensagem para o histórico da sessão: as imagens (base64) vão só no turno em que foram enviadas."""
+    if not isinstance(mensagem.get("content"), list):
+        return mensagem
+    partes = [
+        {"type": "text", "text": "[imagem enviada anteriormente]"} if p.get("type") == "image_url" else p
+        for p in mensagem["content"]
+    ]
+    return {**mensagem, "content": partes}
+
+
+def _responder(chat_module: ChatModule, mensagens: list, payload: ChatRequest, cliente: ClienteHttpOpenAI, armazem: ArmazemVetores) -> str:
+    if payload.use_context and armazem is not None:
+        mensagens = _injetar_contexto(mensagens, cliente, armazem)
+
+    resposta = chat_module.criar_conversa(
+        mensagens=mensagens,
+        modelo=payload.model or "gpt-4o"
+    )
+    return resposta["choices"][0]["message"]["content"].strip()
+
+
+def _obter_sessao(payload: ChatRequest, sessoes: ArmazemSessoes) -> Sessao:
+    """Sessão indicada em `session_id` (None se o pedido não usa sessão); 404 se ela não existir mais."""
+    if not payload.session_id:
+        return None
+    sessao = sessoes.obter(payload.session_id) if sessoes is not None else None
+    if sessao is None:
+        raise HTTPException(status_code=404, detail="Sessão não encontrada ou expirada; inicie uma nova em POST /chat/sessions.")
+    return sessao
+
+
+def _mensagens_da_sessao(sessao: Sessao, novas: list) -> list:
+    """Histórico da sessão seguido das mensagens novas, montado em uma ramificação (a sessão não muda)."""
+    with sessao.trava:
+        envio = sessao.contexto.ramificar()
+    envio.resumidor = None  # quem agenda resumos é o contexto que fica na sessão
+    for mensagem in novas:
+        envio.adicionar_mensagem(**mensagem)
+    return list(envio.get_contexto())
+
+
+def _salvar_turno(sessao: Sessao, novas: list, resposta: str):
+    """Guarda o turno concluído na sessão; só é chamado com sucesso, então uma falha não deixa meio turno no histórico."""
+    with sessao.trava:
+        contexto = sessao.contexto.ramificar()
+        for mensagem in novas:
+            contexto.adicionar_mensagem(**_sem_imagens(mensagem))
+        contexto.adicionar_mensagem("assistant", resposta)
+        sessao.contexto = contexto
+
+
+def handle_chat(payload: ChatRequest, cliente: ClienteHttpOpenAI, armazem: ArmazemVetores = None, cache_semantico: CacheSemantico = None, sessoes: ArmazemSessoes = None) -> ChatResponse:
+    sessao = _obter_sessao(payload, sessoes)
     try:
-        chat_module = ChatModule()
-        mensagens = [m.dict() for m in payload.messages]
-
-        # Processa arquivos se existirem
-        if payload.files:
-            content_parts = []
-
-            last_msg = mensagens[-1] if mensagens else None
-            if last_msg and last_msg.get('content'):
-                content_parts.append({"type": "text", "text": last_msg['content']})
-
-            for f in payload.files:
-                if f.type == 'image':
-                    content_parts.append({
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:{f.mime};base64,{f.data}"
-                        }
-                    })
-                elif f.type == 'text':
-                    content_parts.append({
-                        "type": "text",
-                        "text": f"Conteúdo do arquivo '{f.name}':\n\n{f.data}"
-                    })
-
-            if mensagens:
-                mensagens[-1] = {"role": "user", "content": content_parts}
-            else:
-                mensagens = [{"role": "user", "content": content_parts}]
-
-        resposta = chat_module.criar_conversa(
-            mensagens=mensagens,
-            modelo=payload.model or "gpt-4o"
-        )
-        conteudo = resposta["choices"][0]["message"]["content"].strip()
-        return ChatResponse(response=conteudo)
+        chat_module = ChatModule(cliente_http=cliente, cache_semantico=cache_semantico)
+        novas = _montar_mensagens(payload)
+        mensagens = _mensagens_da_sessao(sessao, novas) if sessao is not None else novas
+        conteudo = _responder(chat_module, mensagens, payload, cliente, armazem)
+        if sessao is None:
+            return ChatResponse(response=conteudo)
+        _salvar_turno(sessao, novas, conteudo)
+        return ChatResponse(response=conteudo, session_id=sessao.id)
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
 
-def handle_completions(payload: CompletionRequest) -> CompletionResponse:
+def handle_create_session(sessoes: ArmazemSessoes, modelo: str = None) -> SessionResponse:
+    try:
+        sessao = sessoes.criar(modelo=modelo)
+    except LimiteSessoesAtingido as e:
+        # Servidor sem vagas: o cliente pode seguir sem sessão (enviando o histórico) ou tentar depois
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(1, math.ceil(e.tempo_restante)))})
+    return SessionResponse(session_id=sessao.id)
+
+
+def handle_delete_session(sessoes: ArmazemSessoes, session_id: str) -> Response:
+    if not sessoes.remover(session_id):
+        raise HTTPException(status_code=404, detail="Sessão não encontrada ou expirada.")
+    return Response(status_code=204)
+
+
+def _evento_sse(dados: dict, evento: str = None) -> str:
+    linha_evento = f"event: {evento}\n" if evento else ""
+    return f"{linha_evento}data: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+
+async def handle_chat_stream(payload: ChatRequest, cliente: ClienteHttpOpenAIAsync, request: Request, sessoes: ArmazemSessoes = None, armazem: ArmazemVetores = None, cliente_sincrono: ClienteHttpOpenAI = None) -> StreamingResponse:
+    """
+    Encaminha os deltas do modelo ao navegador como Server-Sent Events, à medida que chegam.
+    Cada delta é lido do upstream somente depois que o anterior foi entregue ao cliente
+    (backpressure), e o stream upstream é fechado assim que o navegador desconecta.
+    Com `session_id`, o turno só entra no histórico da sessão quando o stream termina completo.
+    Com `use_context`, os trechos do índice de vetores entram como no /chat (a busca roda em uma
+    thread, pois usa o cliente síncrono e o disco).
+    """
+    sessao = _obter_sessao(payload, sessoes)
+    novas = _montar_mensagens(payload)
+    mensagens = _mensagens_da_sessao(sessao, novas) if sessao is not None else novas
+    try:
+        # Erros antes do primeiro byte (contexto excedido, autenticação, 4xx, retries esgotados) viram resposta HTTP normal
+        if payload.use_context and armazem is not None:
+            mensagens = await asyncio.to_thread(_injetar_contexto, mensagens, cliente_sincrono, armazem)
+        dados = {
+            "model": payload.model or "gpt-4o",
+            "messages": mensagens,
+            "stream_options": {"include_usage": True},
+        }
+        dados = verificar_janela_contexto(dados)
+        chunks = await cliente.enviar_stream("chat/completions", dados=dados)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def eventos():
+        stream = RespostaStreamAsync(chunks)
+        try:
+            async for delta in stream:
+                if await request.is_disconnected():
+                    logger.info("Cliente desconectou durante o streaming; encerrando o stream upstream.")
+                    return
+                yield _evento_sse({"delta": delta})
+            final = stream.resposta_final()
+            conteudo = final["choices"][0]["message"]["content"] if final["choices"] else ""
+            if sessao is not None:
+                _salvar_turno(sessao, novas, conteudo)
+            yield _evento_sse({"response": conteudo, "usage": final.get("usage"), "session_id": sessao.id if sessao else None}, evento="done")
+        except Exception as e:
+            logger.error(f"Erro durante o streaming do chat: {e}", exc_info=True)
+            yield _evento_sse({"detail": str(e)}, evento="error")
+        finally:
+            await stream.fechar()
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def handle_completions(payload: CompletionRequest, cliente: ClienteHttpOpenAI) -> CompletionResponse:
     try:
-        cliente = ClienteHttpOpenAI()
         dados = {
             "prompt": payload.prompt,
             "model": payload.model,
@@ -67,14 +226,21 @@ def handle_completions(payload: CompletionRequest) -> CompletionResponse:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-def handle_list_models() -> ModelListResponse:
+def handle_list_models(catalogo: CatalogoModelos, request: Request, response: Response):
+    """
+    Devolve a lista de modelos a partir do catálogo em memória, com ETag.
+    Se o navegador já tem a mesma lista (If-None-Match), responde 304 sem corpo.
+    """
     try:
-        cliente = ClienteHttpOpenAI()
-        resposta = cliente.obter("models")
-        modelos = [m["id"] for m in resposta.get("data", [])]
-        return ModelListResponse(models=modelos)
+        modelos, etag = catalogo.listar_com_etag()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    cabecalhos = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    etags_cliente = [t.strip() for t in request.headers.get("if-none-match", "").split(",")]
+    if etag in etags_cliente or "*" in etags_cliente:
+        return Response(status_code=304, headers=cabecalhos)
+    response.headers.update(cabecalhos)
+    return ModelListResponse(models=modelos)
 
 
 def handle_get_config() -> ConfigResponse:
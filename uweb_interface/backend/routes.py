@@ -1,8 +1,16 @@
 import os
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from uweb_interface.backend.schemas import ChatRequest, ChatResponse, CompletionRequest, CompletionResponse, ModelListResponse, ConfigResponse
-from uweb_interface.backend.controllers import handle_chat, handle_completions, handle_list_models, handle_get_config
+from uweb_interface.backend.schemas import ChatRequest, ChatResponse, SessionResponse, CompletionRequest, CompletionResponse, ModelListResponse, ConfigResponse
+from uweb_interface.backend.controllers import handle_chat, handle_chat_stream, handle_create_session, handle_delete_session, handle_completions, handle_list_models, handle_get_config
+from src.client_registry import obter_cliente_compartilhado, obter_cliente_async_compartilhado, obter_catalogo_modelos, obter_armazem_vetores, obter_cache_semantico, obter_armazem_sessoes
+from src.http_client import ClienteHttpOpenAI
+from src.async_http_client import ClienteHttpOpenAIAsync
+from src.model_catalog import CatalogoModelos
+from src.vector_store import ArmazemVetores
+from src.semantic_cache import CacheSemantico
+from src.sessions import ArmazemSessoes
 
 router = APIRouter()
 
@@ -20,6 +28,42 @@ def authenticate(credentials: HTTPAuthorizationCredentials = Depends(security)):
         )
 
 
+# --- DEPENDÊNCIAS ---
+
+def get_cliente_http(request: Request) -> ClienteHttpOpenAI:
+    """Retorna o cliente HTTP compartilhado criado no lifespan da aplicação."""
+    cliente = getattr(request.app.state, "cliente_http", None)
+    return cliente if cliente is not None else obter_cliente_compartilhado()
+
+
+def get_cliente_http_async(request: Request) -> ClienteHttpOpenAIAsync:
+    """Retorna o cliente HTTP assíncrono compartilhado criado no lifespan da aplicação."""
+    cliente = getattr(request.app.state, "cliente_http_async", None)
+    return cliente if cliente is not None else obter_cliente_async_compartilhado()
+
+
+def get_catalogo_modelos(request: Request) -> CatalogoModelos:
+    """Retorna o catálogo de modelos em memória criado no lifespan da aplicação."""
+    catalogo = getattr(request.app.state, "catalogo_modelos", None)
+    return catalogo if catalogo is not None else obter_catalogo_modelos()
+
+
+def get_armazem_vetores() -> ArmazemVetores:
+    """Retorna o índice de vetores usado como contexto no /chat (None se não configurado)."""
+    return obter_armazem_vetores()
+
+
+def get_cache_semantico() -> CacheSemantico:
+    """Retorna o cache semântico do /chat (None se desligado)."""
+    return obter_cache_semantico()
+
+
+def get_armazem_sessoes(request: Request) -> ArmazemSessoes:
+    """Retorna o armazém de sessões de conversa criado no lifespan da aplicação."""
+    sessoes = getattr(request.app.state, "armazem_sessoes", None)
+    return sessoes if sessoes is not None else obter_armazem_sessoes()
+
+
 # --- ROTAS ---
 
 @router.get("/")
@@ -38,18 +82,33 @@ def auth_check():
 
 
 @router.post("/chat", response_model=ChatResponse)
-def chat_endpoint(payload: ChatRequest):
-    return handle_chat(payload)
+def chat_endpoint(payload: ChatRequest, cliente: ClienteHttpOpenAI = Depends(get_cliente_http), armazem: ArmazemVetores = Depends(get_armazem_vetores), cache_semantico: CacheSemantico = Depends(get_cache_semantico), sessoes: ArmazemSessoes = Depends(get_armazem_sessoes)):
+    return handle_chat(payload, cliente, armazem, cache_semantico, sessoes)
+
+
+@router.post("/chat/sessions", response_model=SessionResponse, status_code=201, dependencies=[Depends(authenticate)])
+def create_session_endpoint(model: Optional[str] = None, sessoes: ArmazemSessoes = Depends(get_armazem_sessoes)):
+    return handle_create_session(sessoes, model)
+
+
+@router.delete("/chat/sessions/{session_id}", status_code=204, dependencies=[Depends(authenticate)])
+def delete_session_endpoint(session_id: str, sessoes: ArmazemSessoes = Depends(get_armazem_sessoes)):
+    return handle_delete_session(sessoes, session_id)
+
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(payload: ChatRequest, request: Request, cliente: ClienteHttpOpenAIAsync = Depends(get_cliente_http_async), sessoes: ArmazemSessoes = Depends(get_armazem_sessoes), armazem: ArmazemVetores = Depends(get_armazem_vetores), cliente_sincrono: ClienteHttpOpenAI = Depends(get_cliente_http)):
+    return await handle_chat_stream(payload, cliente, request, sessoes, armazem, cliente_sincrono)
 
 
 @router.post("/completions", response_model=CompletionResponse, dependencies=[Depends(authenticate)])
-def completions_endpoint(payload: CompletionRequest):
-    return handle_completions(payload)
+def completions_endpoint(payload: CompletionRequest, cliente: ClienteHttpOpenAI = Depends(get_cliente_http)):
+    return handle_completions(payload, cliente)
 
 
 @router.get("/models", response_model=ModelListResponse, dependencies=[Depends(authenticate)])
-def list_models():
-    return handle_list_models()
+def list_models(request: Request, response: Response, catalogo: CatalogoModelos = Depends(get_catalogo_modelos)):
+    return handle_list_models(catalogo, request, response)
 
 
 @router.get("/config", response_model=ConfigResponse, dependencies=[Depends(authenticate)])
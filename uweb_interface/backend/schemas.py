@@ -3,6 +3,10 @@ from typing import List, Optional, Any, Dict
 
 class ChatResponse(BaseModel):
     response: str
+    session_id: Optional[str] = None
+
+class SessionResponse(BaseModel):
+    session_id: str
 
 class Message(BaseModel):
     role: str
@@ -18,6 +22,8 @@ class ChatRequest(BaseModel):
     messages: List[Message]
     model: Optional[str] = "gpt-3.5-turbo"
     files: Optional[List[FilePayload]] = []
+    use_context: Optional[bool] = False  # busca trechos no índice de vetores (OPENAI_VECTOR_STORE_PATH)
+    session_id: Optional[str] = None     # com sessão, `messages` traz só as mensagens novas do turno
 
 class CompletionRequest(BaseModel):
     prompt: str
@@ -28,6 +28,16 @@ function getFileIcon(type) {
   return '📝';
 }
 
+function parseSseEvent(raw) {
+  let event = 'message';
+  const dataLines = [];
+  for (const line of raw.split('\n')) {
+    if (line.startsWith('event:')) event = line.slice(6).trim();
+    else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+  }
+  return { event, data: dataLines.length ? JSON.parse(dataLines.join('\n')) : null };
+}
+
 function formatBytes(bytes) {
   if (bytes < 1024) return bytes + ' B';
   if (bytes < 1024 * 1024) return (bytes / 1024).toFixed(1) + ' KB';
@@ -39,16 +49,22 @@ export default function Chat() {
   const [input, setInput] = useState('');
   const [files, setFiles] = useState([]);
   const [loading, setLoading] = useState(false);
+  const [streaming, setStreaming] = useState(false);
   const [error, setError] = useState(null);
   const [dragOver, setDragOver] = useState(false);
   const bottomRef = useRef(null);
   const inputRef = useRef(null);
   const fileInputRef = useRef(null);
+  const abortRef = useRef(null);
+  const sessionRef = useRef(null);
 
   useEffect(() => {
     bottomRef.current?.scrollIntoView({ behavior: 'smooth' });
   }, [messages, loading]);
 
+  // Cancela o stream em andamento ao sair da página
+  useEffect(() => () => abortRef.current?.abort(), []);
+
   const handleFiles = (newFiles) => {
     const arr = Array.from(newFiles)
       .filter(f => {
@@ -68,6 +84,28 @@ export default function Chat() {
     setFiles(prev => [...prev, ...arr]);
   };
 
+  // Sessão no servidor: o histórico fica no backend e cada turno envia só a mensagem nova
+  const ensureSession = async () => {
+    if (sessionRef.current) return sessionRef.current;
+    const res = await fetch('http://localhost:8000/chat/sessions', {
+      method: 'POST',
+      headers: { 'Authorization': 'Bearer API_LUCA' },
+    });
+    if (res.status === 503) return null; // servidor sem vagas: segue sem sessão, enviando o histórico
+    if (!res.ok) throw new Error(`Erro ${res.status}`);
+    sessionRef.current = (await res.json()).session_id;
+    return sessionRef.current;
+  };
+
+  const dropSession = () => {
+    const sessionId = sessionRef.current;
+    sessionRef.current = null;
+    if (sessionId) fetch(`http://localhost:8000/chat/sessions/${sessionId}`, {
+      method: 'DELETE',
+      headers: { 'Authorization': 'Bearer API_LUCA' },
+    }).catch(() => {});
+  };
+
   const removeFile = (id) => setFiles(prev => prev.filter(f => f.id !== id));
 
   const toBase64 = (file) => new Promise((resolve, reject) => {
@@ -122,32 +160,75 @@ export default function Chat() {
       .filter(m => m.id !== 0)
       .map(m => ({ role: m.role, content: m.content }));
 
+    const assistantId = Date.now() + 1;
+    const controller = new AbortController();
+    abortRef.current = controller;
+
+    const newMessage = { role: 'user', content: text || 'Analise os arquivos enviados.' };
+    const postStream = async (sessionId, turnMessages) => fetch('http://localhost:8000/chat/stream', {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Authorization': 'Bearer API_LUCA',
+      },
+      body: JSON.stringify({
+        session_id: sessionId,
+        messages: turnMessages,
+        model: 'gpt-4o',
+        files: processedFiles,
+      }),
+      signal: controller.signal,
+    });
+
     try {
-      const response = await fetch('http://localhost:8000/chat', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-          'Authorization': 'Bearer API_LUCA',
-        },
-        body: JSON.stringify({
-          messages: [...historyMessages, { role: 'user', content: text || 'Analise os arquivos enviados.' }],
-          model: 'gpt-4o',
-          files: processedFiles,
-        }),
-      });
+      const sessionId = await ensureSession();
+      let response = await postStream(sessionId, sessionId ? [newMessage] : [...historyMessages, newMessage]);
+      if (response.status === 404) {
+        // A sessão expirou no servidor: abre outra e reenvia o histórico visível uma única vez
+        sessionRef.current = null;
+        response = await postStream(await ensureSession(), [...historyMessages, newMessage]);
+      }
 
       if (!response.ok) throw new Error(`Erro ${response.status}`);
 
-      const data = await response.json();
-      setMessages(prev => [...prev, {
-        id: Date.now() + 1,
-        role: 'assistant',
-        content: data.response || data.message || JSON.stringify(data),
-        time: formatTime(new Date()),
-      }]);
+      // Lê o stream SSE e renderiza cada delta assim que chega
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let started = false;
+
+      const appendDelta = (delta) => {
+        if (!started) {
+          started = true;
+          setStreaming(true);
+          setMessages(prev => [...prev, { id: assistantId, role: 'assistant', content: delta, time: formatTime(new Date()) }]);
+        } else {
+          setMessages(prev => prev.map(m => (m.id === assistantId ? { ...m, content: m.content + delta } : m)));
+        }
+      };
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        for (const raw of events) {
+          const { event, data } = parseSseEvent(raw);
+          if (!data) continue;
+          if (event === 'error') throw new Error(data.detail || 'Erro no streaming');
+          if (event === 'done') {
+            if (!started) appendDelta(data.response || '');
+          } else if (data.delta) {
+            appendDelta(data.delta);
+          }
+        }
+      }
     } catch (err) {
-      setError(err.message);
+      if (err.name !== 'AbortError') setError(err.message);
     } finally {
+      if (abortRef.current === controller) abortRef.current = null;
+      setStreaming(false);
       setLoading(false);
       inputRef.current?.focus();
     }
@@ -157,7 +238,7 @@ export default function Chat() {
     if (e.key === 'Enter' && !e.shiftKey) { e.preventDefault(); sendMessage(); }
   };
 
-  const clearChat = () => { setMessages(INITIAL_MESSAGES); setFiles([]); setError(null); };
+  const clearChat = () => { abortRef.current?.abort(); dropSession(); setMessages(INITIAL_MESSAGES); setFiles([]); setError(null); };
 
   const handleDrop = (e) => {
     e.preventDefault();
@@ -192,7 +273,7 @@ export default function Chat() {
         )}
         <div style={styles.messages}>
           {messages.map((msg, i) => <MessageBubble key={msg.id} msg={msg} index={i} />)}
-          {loading && <TypingIndicator />}
+          {loading && !streaming && <TypingIndicator />}
           {error && (
             <div style={styles.error}>
               <span>⚠</span><span>Erro ao conectar: {error}</span>